@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟服务商服务器
+模拟 OpenAI（Chat Completions 与 Responses 格式）、Gemini、DashScope 和 Tavily 接口，
+以及供URL/图片分析器抓取的静态网页和图片，用于在没有真实密钥的情况下压测整个工作流。
+
+支持:
+- 可配置的延迟分布（固定、均匀、正态、对数正态、指数）
+- 按比例注入500错误和429限流（带Retry-After）
+- 基于令牌桶的token速率限制
+- OpenAI Files/Batches 接口（提交后同步处理，首次查询即为完成状态）
+
+用法:
+    python benchmarks/fake_provider_server.py --port 8765 --latency lognormal:0.4:0.5 --rate-limit-rate 0.05
+"""
+
+import argparse
+import base64
+import json
+from email.parser import BytesParser
+from email.policy import HTTP
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+# 1x1 PNG，供图片分析器下载
+TINY_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+
+@dataclass
+class LatencyModel:
+    """
+    延迟分布
+
+    spec格式: "<kind>:<参数...>"，单位为秒
+        fixed:0.2
+        uniform:0.1:0.5
+        normal:0.3:0.1
+        lognormal:<中位数>:<sigma>
+        exponential:<均值>
+    """
+    kind: str = "fixed"
+    params: Tuple[float, ...] = (0.0,)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        parts = spec.split(":")
+        kind = parts[0].strip().lower()
+        params = tuple(float(p) for p in parts[1:]) or (0.0,)
+        if kind not in ("fixed", "uniform", "normal", "lognormal", "exponential"):
+            raise ValueError(f"不支持的延迟分布: {kind}")
+        return cls(kind=kind, params=params)
+
+    def sample(self, rng: random.Random) -> float:
+        """采样一次延迟（秒）"""
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1] if len(p) > 1 else p[0])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1] if len(p) > 1 else 0.0)
+        elif self.kind == "lognormal":
+            median = p[0] if p[0] > 0 else 1e-3
+            value = rng.lognormvariate(math.log(median), p[1] if len(p) > 1 else 0.5)
+        else:
+            value = rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+
+class TokenBucket:
+    """令牌桶，模拟服务商的token吞吐上限"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: float):
+        """获取指定数量的token，不足时阻塞等待"""
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+@dataclass
+class FakeProviderConfig:
+    """模拟服务器配置"""
+    latency: LatencyModel = field(default_factory=LatencyModel)
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    tokens_per_second: float = 0.0
+    response_tokens: int = 120
+    page_count: int = 20
+    seed: Optional[int] = None
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数量：中文按字、其他按4字符一个token"""
+    cjk = len(re.findall(r'[一-鿿]', text))
+    return max(1, cjk + (len(text) - cjk) // 4)
+
+
+def build_answer(prompt: str, tokens: int) -> str:
+    """生成带列表格式的确定性回答，让关键点提取逻辑有内容可用"""
+    keys_line = re.search(r'必须包含所有条目编号：(.+)', prompt)
+    if keys_line:
+        # 微批处理提示词要求以条目编号为键的JSON
+        keys = re.findall(r'item_\d+', keys_line.group(1))
+        per_item = max(1, tokens // max(1, len(keys)))
+        return json.dumps({
+            key: {
+                "analysis": build_answer(f"{key} {prompt[:40]}", per_item),
+                "key_points": [f"{key} 模拟要点：内容结构清晰，包含可供测试的关键信息。"]
+            }
+            for key in keys
+        }, ensure_ascii=False)
+    topic = re.sub(r'\s+', ' ', prompt.strip())[:40]
+    lines = [f"这是针对「{topic}」的模拟分析结果。"]
+    index = 1
+    while estimate_tokens("\n".join(lines)) < tokens:
+        lines.append(f"{index}. 模拟要点{index}：内容结构清晰，包含可供测试的关键信息与说明。")
+        index += 1
+    return "\n".join(lines)
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    """模拟服务商请求处理器"""
+
+    protocol_version = "HTTP/1.1"
+    server: "FakeProviderHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- 通用辅助 ---
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return {}
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._send(status, body, "application/json; charset=utf-8", headers)
+
+    def _read_multipart(self) -> Dict[str, bytes]:
+        """解析multipart/form-data请求体，返回 {字段名: 内容}"""
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+        header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode("utf-8")
+        message = BytesParser(policy=HTTP).parsebytes(header + raw)
+        if not message.is_multipart():
+            return {}
+        return {
+            part.get_param("name", header="content-disposition"): part.get_payload(decode=True) or b""
+            for part in message.iter_parts()
+        }
+
+    def _inject_faults(self) -> bool:
+        """按配置注入延迟、限流和错误，返回True表示已经发送了错误响应"""
+        fake = self.server.fake
+        time.sleep(fake.sample_latency())
+        roll = fake.roll()
+        if roll < fake.config.rate_limit_rate:
+            fake.count("rate_limited")
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached for requests", "type": "rate_limit_exceeded"}},
+                {"Retry-After": f"{fake.config.retry_after:g}"}
+            )
+            return True
+        if roll < fake.config.rate_limit_rate + fake.config.error_rate:
+            fake.count("errors")
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return True
+        return False
+
+    def _complete(self, prompt: str) -> Tuple[str, Dict[str, int]]:
+        """生成回答并按token速率限流"""
+        fake = self.server.fake
+        answer = build_answer(prompt, fake.config.response_tokens)
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(answer)
+        fake.bucket.acquire(prompt_tokens + completion_tokens)
+        return answer, {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+    # --- 路由 ---
+
+    def do_GET(self):
+        fake = self.server.fake
+        fake.count("requests")
+        path = self.path.split("?", 1)[0]
+
+        page_match = re.fullmatch(r"/pages/(\d+)", path)
+        if page_match:
+            time.sleep(fake.sample_latency())
+            self._send(200, fake.render_page(int(page_match.group(1))), "text/html; charset=utf-8")
+            return
+        if re.fullmatch(r"/images/[\w-]+\.png", path):
+            time.sleep(fake.sample_latency())
+            self._send(200, TINY_PNG, "image/png")
+            return
+        if path == "/stats":
+            self._send_json(200, fake.snapshot())
+            return
+        batch_match = re.fullmatch(r"(?:/v1)?/batches/([\w-]+)", path)
+        if batch_match and batch_match.group(1) in fake.batches:
+            self._send_json(200, fake.batches[batch_match.group(1)])
+            return
+        file_match = re.fullmatch(r"(?:/v1)?/files/([\w-]+)/content", path)
+        if file_match and file_match.group(1) in fake.files:
+            self._send(200, fake.files[file_match.group(1)], "application/jsonl")
+            return
+        self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        fake = self.server.fake
+        fake.count("requests")
+        path = self.path.split("?", 1)[0]
+
+        if re.fullmatch(r"(?:/v1)?/files", path):
+            fields = self._read_multipart()
+            if "file" not in fields:
+                self._send_json(400, {"error": {"message": "missing file"}})
+                return
+            self._send_json(200, fake.store_file(fields["file"], fields.get("purpose", b"").decode("utf-8")))
+            return
+        payload = self._read_json()
+        if re.fullmatch(r"(?:/v1)?/batches", path):
+            if payload.get("input_file_id") not in fake.files:
+                self._send_json(404, {"error": {"message": "input file not found"}})
+                return
+            self._send_json(200, fake.run_batch(payload))
+            return
+
+        if self._inject_faults():
+            return
+
+        if path.endswith("/chat/completions"):
+            fake.count("openai_chat")
+            prompt = "\n".join(str(m.get("content", "")) for m in payload.get("messages", []))
+            answer, usage = self._complete(prompt)
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model", "fake-model"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop"
+                }],
+                "usage": {**usage, "total_tokens": usage["prompt_tokens"] + usage["completion_tokens"]}
+            })
+        elif path.endswith("/responses"):
+            fake.count("openai_responses")
+            answer, usage = self._complete(str(payload.get("input", "")))
+            self._send_json(200, {
+                "id": f"resp_{uuid.uuid4().hex[:12]}",
+                "object": "response",
+                "model": payload.get("model", "fake-model"),
+                "output": [{
+                    "type": "message",
+                    "role": "assistant",
+                    "content": [{"type": "output_text", "text": answer}]
+                }],
+                "usage": {
+                    "input_tokens": usage["prompt_tokens"],
+                    "output_tokens": usage["completion_tokens"],
+                    "total_tokens": usage["prompt_tokens"] + usage["completion_tokens"]
+                }
+            })
+        elif ":generateContent" in path:
+            fake.count("gemini")
+            prompt = " ".join(
+                part.get("text", "")
+                for content in payload.get("contents", [])
+                for part in content.get("parts", [])
+            )
+            answer, usage = self._complete(prompt)
+            self._send_json(200, {
+                "candidates": [{
+                    "content": {"parts": [{"text": answer}], "role": "model"},
+                    "finishReason": "STOP",
+                    "index": 0
+                }],
+                "usageMetadata": {
+                    "promptTokenCount": usage["prompt_tokens"],
+                    "candidatesTokenCount": usage["completion_tokens"],
+                    "totalTokenCount": usage["prompt_tokens"] + usage["completion_tokens"]
+                }
+            })
+        elif "/services/aigc/" in path:
+            fake.count("dashscope")
+            texts = []
+            for message in payload.get("input", {}).get("messages", []):
+                content = message.get("content", "")
+                if isinstance(content, list):
+                    texts.extend(part.get("text", "") for part in content if isinstance(part, dict))
+                else:
+                    texts.append(str(content))
+            answer, usage = self._complete(" ".join(texts))
+            self._send_json(200, {
+                "output": {"choices": [{
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": [{"text": answer}]}
+                }]},
+                "usage": {"input_tokens": usage["prompt_tokens"], "output_tokens": usage["completion_tokens"]},
+                "request_id": uuid.uuid4().hex
+            })
+        elif path.endswith("/search"):
+            fake.count("tavily_search")
+            self._send_json(200, fake.render_search(payload))
+        elif path.endswith("/extract"):
+            fake.count("tavily_extract")
+            urls = payload.get("urls", [])
+            urls = [urls] if isinstance(urls, str) else urls
+            self._send_json(200, {
+                "results": [{"url": url, "raw_content": f"{url} 的完整正文内容。" * 20} for url in urls],
+                "failed_results": [],
+                "response_time": 0.01
+            })
+        else:
+            self._send_json(404, {"error": {"message": f"unknown endpoint {path}"}})
+
+
+class FakeProviderHTTPServer(ThreadingHTTPServer):
+    """带共享状态的多线程HTTP服务器"""
+
+    daemon_threads = True
+    fake: "FakeProviderServer"
+
+
+class FakeProviderServer:
+    """模拟服务商服务器，可在进程内以后台线程运行"""
+
+    def __init__(self, config: FakeProviderConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeProviderConfig()
+        self.bucket = TokenBucket(self.config.tokens_per_second)
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._counts_lock = threading.Lock()
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.httpd = FakeProviderHTTPServer((host, port), FakeProviderHandler)
+        self.httpd.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def provider_env(self) -> Dict[str, str]:
+        """返回把各服务商指向本服务器所需的环境变量"""
+        return {
+            "OPENAI_API_KEY": "fake-openai-key",
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "GOOGLE_API_KEY": "fake-google-key",
+            "GOOGLE_API_BASE_URL": self.url,
+            "ALIBABA_API_KEY": "fake-alibaba-key",
+            "DASHSCOPE_HTTP_BASE_URL": f"{self.url}/api/v1",
+            "TAVILY_API_KEY": "tvly-fake-key",
+            "TAVILY_BASE_URL": self.url,
+        }
+
+    def start(self) -> "FakeProviderServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def sample_latency(self) -> float:
+        with self._rng_lock:
+            return self.config.latency.sample(self._rng)
+
+    def roll(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+
+    def count(self, key: str):
+        with self._counts_lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._counts_lock:
+            return dict(self._counts)
+
+    def store_file(self, content: bytes, purpose: str) -> Dict[str, Any]:
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        self.files[file_id] = content
+        self.count("files")
+        return {"id": file_id, "object": "file", "bytes": len(content), "purpose": purpose}
+
+    def run_batch(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """同步处理批处理输入文件中的每个聊天请求，按错误率注入请求级错误"""
+        self.count("batches")
+        lines = []
+        failed = 0
+        for raw in self.files[payload["input_file_id"]].decode("utf-8").splitlines():
+            if not raw.strip():
+                continue
+            item = json.loads(raw)
+            body = item.get("body", {})
+            if self.roll() < self.config.error_rate:
+                failed += 1
+                response = {"status_code": 500, "body": {"error": {"message": "Injected server error"}}}
+            else:
+                prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+                answer = build_answer(prompt, self.config.response_tokens)
+                response = {"status_code": 200, "body": {
+                    "object": "chat.completion",
+                    "model": body.get("model", "fake-model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(answer)},
+                }}
+            lines.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                "custom_id": item.get("custom_id"),
+                "response": response,
+                "error": None,
+            }, ensure_ascii=False))
+        output_id = f"file-{uuid.uuid4().hex[:12]}"
+        self.files[output_id] = ("\n".join(lines) + "\n").encode("utf-8")
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": payload.get("endpoint"),
+            "input_file_id": payload["input_file_id"],
+            "status": "completed",
+            "output_file_id": output_id,
+            "error_file_id": None,
+            "request_counts": {"total": len(lines), "completed": len(lines) - failed, "failed": failed},
+        }
+        return self.batches[batch_id]
+
+    def render_page(self, index: int) -> bytes:
+        """生成互相链接的静态网页"""
+        links = "".join(
+            f'<a href="/pages/{(index * 3 + offset) % self.config.page_count}">相关页面</a>'
+            for offset in (1, 2)
+        )
+        html = (
+            f"<html><head><title>模拟页面 {index}</title></head><body>"
+            f"<h1>模拟页面 {index}</h1>"
+            f"<p>{'这是用于压测的网页正文内容。' * 30}</p>"
+            f'<img src="/images/{index}.png">{links}</body></html>'
+        )
+        return html.encode("utf-8")
+
+    def render_search(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """生成Tavily搜索结果"""
+        query = payload.get("query", "")
+        max_results = int(payload.get("max_results") or 5)
+        results = []
+        for i in range(max_results):
+            item = {
+                "title": f"{query} - 结果 {i + 1}",
+                "url": f"{self.url}/pages/{i % self.config.page_count}",
+                "content": f"关于 {query} 的摘要内容 {i + 1}。" * 5,
+                "score": round(1.0 - i * 0.1, 2),
+            }
+            if payload.get("include_raw_content"):
+                item["raw_content"] = f"关于 {query} 的完整正文 {i + 1}。" * 200
+            results.append(item)
+        return {
+            "query": query,
+            "answer": f"关于 {query} 的模拟答案。" if payload.get("include_answer") else None,
+            "results": results,
+            "response_time": 0.01,
+        }
+
+
+def config_from_args(args: argparse.Namespace) -> FakeProviderConfig:
+    """从命令行参数构建配置"""
+    return FakeProviderConfig(
+        latency=LatencyModel.parse(args.latency),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        seed=args.seed,
+    )
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """注册模拟服务器相关的命令行参数"""
+    parser.add_argument('--latency', default='fixed:0.05', help='延迟分布，如 fixed:0.2、lognormal:0.3:0.6')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='注入500错误的比例')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='注入429限流的比例')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='429响应的Retry-After秒数')
+    parser.add_argument('--tokens-per-second', type=float, default=0.0, help='token吞吐上限，0表示不限制')
+    parser.add_argument('--response-tokens', type=int, default=120, help='每个回答的大致token数')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='本地模拟服务商服务器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeProviderServer(config_from_args(args), host=args.host, port=args.port)
+    print(f"🚀 模拟服务商服务器已启动: {server.url}")
+    print("📋 将以下环境变量导出后即可让框架使用模拟服务:")
+    for key, value in server.provider_env().items():
+        print(f"  export {key}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 服务器已停止")
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
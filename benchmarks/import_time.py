@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导入耗时基准测试
+在干净的子进程中用 `python -X importtime` 导入各入口模块，统计累计导入耗时，
+列出自身耗时最高的模块，并检查不应在启动时加载的服务商SDK。超过预算时返回非零退出码。
+
+用法:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --modules src.config --top 15
+    python benchmarks/import_time.py --budget src.config=300 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 入口模块 -> 累计导入耗时预算（毫秒）。预算留有余量，只用于发现明显的回归
+IMPORT_BUDGETS = {
+    "src.config": 400,
+    "src.analyzers": 400,
+    "src.graph.workflow": 3000,
+    "src.core.multimodalAgent": 3000,
+}
+
+# 只应在首次使用时导入的服务商SDK和重量级解析库
+LAZY_MODULES = ("openai", "google.generativeai", "dashscope", "tavily", "bs4", "PIL")
+
+
+def measure(module: str) -> Dict[str, object]:
+    """
+    在子进程中导入模块一次
+
+    Returns:
+        {"module", "total_ms", "entries": [(模块名, 自身耗时ms, 累计耗时ms)], "loaded_lazy": [...]}
+    """
+    probe = (
+        f"import sys, json; import {module}; "
+        f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    )
+    env = {**os.environ, "LOG_LEVEL": "WARNING", "PYTHONDONTWRITEBYTECODE": "1"}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=project_root, env=env, capture_output=True, text=True, timeout=120
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{completed.stderr[-2000:]}")
+
+    entries: List[Tuple[str, float, float]] = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # 表头
+        entries.append((parts[2].strip(), self_us / 1000, cumulative_us / 1000))
+
+    total = next((cumulative for name, _, cumulative in entries if name == module), 0.0)
+    return {
+        "module": module,
+        "total_ms": total,
+        "entries": entries,
+        "loaded_lazy": json.loads(completed.stdout.strip().splitlines()[-1]),
+    }
+
+
+def best_of(module: str, repeat: int) -> Dict[str, object]:
+    """多次测量取累计耗时最小的一次，减少机器负载造成的波动"""
+    return min((measure(module) for _ in range(max(1, repeat))), key=lambda r: r["total_ms"])
+
+
+def parse_budgets(values: List[str]) -> Dict[str, float]:
+    budgets = dict(IMPORT_BUDGETS)
+    for value in values or []:
+        module, _, ms = value.partition("=")
+        budgets[module] = float(ms)
+    return budgets
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='导入耗时基准测试')
+    parser.add_argument('--modules', nargs='+', help='要测量的入口模块（默认: 所有有预算的模块）')
+    parser.add_argument('--budget', nargs='+', metavar='MODULE=MS', help='覆盖某个模块的预算（毫秒）')
+    parser.add_argument('--repeat', type=int, default=3, help='每个模块测量次数，取最小值')
+    parser.add_argument('--top', type=int, default=10, help='列出自身耗时最高的模块数量')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出结果')
+    args = parser.parse_args()
+
+    budgets = parse_budgets(args.budget)
+    modules = args.modules or list(budgets)
+    failed = False
+    report = []
+
+    for module in modules:
+        result = best_of(module, args.repeat)
+        budget = budgets.get(module)
+        over_budget = budget is not None and result["total_ms"] > budget
+        failed = failed or over_budget or bool(result["loaded_lazy"])
+        heaviest = sorted(result["entries"], key=lambda e: e[1], reverse=True)[:args.top]
+        report.append({
+            "module": module,
+            "total_ms": round(result["total_ms"], 1),
+            "budget_ms": budget,
+            "loaded_lazy": result["loaded_lazy"],
+            "heaviest": [{"module": name, "self_ms": round(s, 1), "cumulative_ms": round(c, 1)}
+                         for name, s, c in heaviest],
+        })
+
+        if args.json:
+            continue
+        status = "❌" if over_budget or result["loaded_lazy"] else "✅"
+        budget_text = f" / 预算 {budget:.0f} ms" if budget is not None else ""
+        print(f"{status} {module}: {result['total_ms']:.1f} ms{budget_text}")
+        if result["loaded_lazy"]:
+            print(f"   ⚠️ 启动时加载了应延迟导入的模块: {', '.join(result['loaded_lazy'])}")
+        for name, self_ms, cumulative_ms in heaviest:
+            print(f"   {self_ms:8.1f} ms  (累计 {cumulative_ms:8.1f} ms)  {name}")
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工作流基准测试
+在本地模拟服务商服务器上，以不同并发度驱动 analysis_node、ForumAnalyzer 和 Flask API，
+统计 p50/p95/p99 延迟、每秒处理条目数、每请求CPU时间和内存增长，结果保存为JSON以便跨提交对比。
+
+用法:
+    python benchmarks/run_benchmarks.py --concurrency 1 4 16 --requests 32
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_provider_server import FakeProviderServer, add_server_arguments, config_from_args
+
+SCENARIOS = ("analysis_node", "forum", "api", "api_batch")
+DEFAULT_RESULTS_DIR = os.path.join(project_root, "benchmarks", "results")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """计算百分位数（线性插值）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def git_commit() -> str:
+    """获取当前提交，失败时返回unknown"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def max_rss_kb() -> int:
+    """当前进程的峰值常驻内存（KB），只增不减，不能用来计算某一段运行的内存增长"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS返回字节，Linux返回KB
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def current_rss_kb() -> Optional[int]:
+    """当前进程此刻的常驻内存（KB），从 /proc/self/statm 读取；没有 /proc 的平台返回None"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def build_analysis_requests(base_url: str, index: int) -> List[Dict[str, Any]]:
+    """构建一组混合类型的分析请求"""
+    from src.core.multimodalAgent import create_analysis_request
+    from src.graph.state import ContentType
+
+    return [
+        create_analysis_request(f"基准测试文本 {index}：大语言模型推动了各行业的智能化升级。", ContentType.TEXT, "基准测试"),
+        create_analysis_request(f"def add_{index}(a, b):\n    return a + b\n", ContentType.CODE, "Python"),
+        create_analysis_request(f"{base_url}/pages/{index % 20}", ContentType.URL, "基准测试页面"),
+        create_analysis_request(f"search: 基准测试查询 {index}", ContentType.TEXT, None),
+    ]
+
+
+def build_forum_data(base_url: str, index: int) -> Dict[str, Any]:
+    """构建包含链接和图片的论坛数据"""
+    from src.utils.forumDataAdapter import convert_user_forum_data
+
+    posts = []
+    for i in range(10):
+        posts.append({
+            "postId": f"post_{i + 1}",
+            "username": f"用户{i % 4}",
+            "time": "1 天",
+            "content": {
+                "text": f"第{i + 1}楼：关于基准测试主题 {index} 的讨论内容。" * 3,
+                "images": [f"{base_url}/images/{index}-{i}.png"] if i % 3 == 0 else [],
+                "codeBlocks": [],
+                "links": [{"text": "参考", "href": f"{base_url}/pages/{(index + i) % 20}"}] if i % 2 == 0 else []
+            }
+        })
+    return convert_user_forum_data({
+        "url": f"{base_url}/t/topic/{index}",
+        "timestamp": datetime.now().isoformat(),
+        "topicTitle": f"基准测试论坛主题 {index}",
+        "replyInfo": "",
+        "totalPosts": len(posts),
+        "posts": posts
+    })
+
+
+def make_operation(scenario: str, base_url: str, micro_batching: bool = False) -> Tuple[Callable[[int], Any], int]:
+    """返回场景的单次操作函数和每次操作处理的条目数"""
+    if scenario == "analysis_node":
+        from src.graph.nodes import analysis_node
+
+        def run(index: int):
+            state = {"analysis_requests": build_analysis_requests(base_url, index), "messages": [], "metadata": {}}
+            return analysis_node(state)
+        return run, len(build_analysis_requests(base_url, 0))
+
+    if scenario == "forum":
+        from src.analyzers import ForumAnalyzer
+
+        def run(index: int):
+            return ForumAnalyzer().analyze_forum(build_forum_data(base_url, index))
+        return run, 1
+
+    if scenario == "api":
+        from src.api.server import app
+
+        def run(index: int):
+            response = app.test_client().post("/analyze", json={
+                "content": f"基准测试API文本 {index}：云原生架构提升了交付效率。",
+                "content_type": "text",
+                "context": "基准测试"
+            })
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            return response
+        return run, 1
+
+    if scenario == "api_batch":
+        from src.api.server import app
+
+        def run(index: int):
+            requests_data = [
+                {"content": f"短文本 {index}-{i}：边缘计算降低了时延。", "content_type": "text"} if i % 2 == 0 else
+                {"content": f"def f_{index}_{i}(x):\n    return x * {i}\n", "content_type": "code", "context": "Python"}
+                for i in range(8)
+            ]
+            response = app.test_client().post("/analyze/batch", json={
+                "requests": requests_data,
+                "micro_batching": micro_batching
+            })
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            return response
+        return run, 8
+
+    raise ValueError(f"未知场景: {scenario}")
+
+
+def run_scenario(scenario: str, concurrency: int, total: int, server: FakeProviderServer,
+                 micro_batching: bool = False) -> Dict[str, Any]:
+    """在指定并发度下运行一个场景"""
+    operation, items_per_op = make_operation(scenario, server.url, micro_batching)
+    # 预热一次，避免把导入和首次连接计入结果
+    operation(0)
+
+    latencies: List[float] = []
+    errors = 0
+
+    def timed(index: int):
+        start = time.perf_counter()
+        try:
+            operation(index)
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, e
+
+    calls_before = server.snapshot().get("requests", 0)
+    rss_before = current_rss_kb()
+    cpu_before = time.process_time()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for elapsed, error in pool.map(timed, range(1, total + 1)):
+            latencies.append(elapsed)
+            if error is not None:
+                errors += 1
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_before
+    rss_after = current_rss_kb()
+    provider_calls = server.snapshot().get("requests", 0) - calls_before
+
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "operations": total,
+        "items": total * items_per_op,
+        "errors": errors,
+        "wall_seconds": round(wall, 4),
+        "items_per_second": round(total * items_per_op / wall, 3) if wall > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2),
+        },
+        "cpu_ms_per_request": round(cpu / total * 1000, 3),
+        "peak_rss_kb": max_rss_kb(),
+        "rss_kb": rss_after,
+        # 场景前后当前常驻内存之差；无法读取当前常驻内存时为None
+        "rss_growth_kb_per_request": round((rss_after - rss_before) / total, 3) if rss_after is not None else None,
+        "provider_requests_per_item": round(provider_calls / (total * items_per_op), 3),
+    }
+
+
+def compare_results(base_path: str, new_path: str, threshold: float) -> bool:
+    """对比两份结果，返回是否存在超过阈值的回归"""
+    with open(base_path, 'r', encoding='utf-8') as f:
+        base = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    regressed = False
+    print(f"{'场景':<16}{'并发':>6}{'p95(ms)':>22}{'条目/秒':>22}")
+    for key in sorted(set(base) & set(new)):
+        b, n = base[key], new[key]
+        p95_ratio = n["latency_ms"]["p95"] / b["latency_ms"]["p95"] if b["latency_ms"]["p95"] else 1.0
+        ips_ratio = n["items_per_second"] / b["items_per_second"] if b["items_per_second"] else 1.0
+        flag = ""
+        if p95_ratio > 1 + threshold or ips_ratio < 1 - threshold:
+            regressed = True
+            flag = "  ⚠️ 回归"
+        print(
+            f"{key[0]:<16}{key[1]:>6}"
+            f"{b['latency_ms']['p95']:>10.1f}→{n['latency_ms']['p95']:<10.1f}"
+            f"{b['items_per_second']:>10.2f}→{n['items_per_second']:<10.2f}{flag}"
+        )
+    return regressed
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='工作流基准测试')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS), help='要运行的场景')
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16], help='并发度列表')
+    parser.add_argument('--requests', type=int, default=32, help='每个并发度下的操作次数')
+    parser.add_argument('--output', help='结果JSON文件路径（默认写入benchmarks/results/）')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='对比两份结果文件')
+    parser.add_argument('--threshold', type=float, default=0.1, help='对比时判定回归的相对阈值')
+    parser.add_argument('--micro-batching', action='store_true', help='api_batch场景中开启微批处理')
+    parser.add_argument('--verbose', action='store_true', help='显示分析器的输出和日志')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare_results(args.compare[0], args.compare[1], args.threshold) else 0)
+
+    server = FakeProviderServer(config_from_args(args)).start()
+    # 必须在导入src之前设置，配置对象在导入时读取环境变量
+    os.environ.update(server.provider_env())
+    if not args.verbose:
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    print(f"🚀 模拟服务商服务器: {server.url}")
+    results = []
+    try:
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                print(f"⏱️  {scenario} @ 并发 {concurrency} ...", flush=True)
+                sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+                with sink:
+                    result = run_scenario(scenario, concurrency, args.requests, server, args.micro_batching)
+                results.append(result)
+                print(
+                    f"   p50={result['latency_ms']['p50']}ms p95={result['latency_ms']['p95']}ms "
+                    f"p99={result['latency_ms']['p99']}ms 条目/秒={result['items_per_second']} "
+                    f"CPU/请求={result['cpu_ms_per_request']}ms 错误={result['errors']}"
+                )
+    finally:
+        server.stop()
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "server": {
+                "latency": args.latency,
+                "error_rate": args.error_rate,
+                "rate_limit_rate": args.rate_limit_rate,
+                "tokens_per_second": args.tokens_per_second,
+                "response_tokens": args.response_tokens,
+            },
+            "micro_batching": args.micro_batching,
+        },
+        "results": results,
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        output = os.path.join(DEFAULT_RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 结果已保存到: {output}")
+
+
+if __name__ == "__main__":
+    main()
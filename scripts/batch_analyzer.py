@@ -2,6 +2,9 @@
 # -*- coding: utf-8 -*-
 """
 批量内容分析脚本
+
+默认在线模式通过工作流逐个分析并生成综合总结；
+--bulk 离线模式把请求渲染为OpenAI Batch格式提交，适合不需要即时结果的大批量任务。
 """
 
 import sys
@@ -14,8 +17,8 @@ from typing import List, Dict, Any
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from src.core.multimodal_agent import run_custom_analysis, create_analysis_request
-from src.graph.state import ContentType
+from src.core.multimodalAgent import run_custom_analysis
+from src.utils.resultWriter import JsonlResultWriter, json_default
 
 
 def load_batch_requests(file_path: str) -> List[Dict[str, Any]]:
@@ -28,7 +31,161 @@ def load_batch_requests(file_path: str) -> List[Dict[str, Any]]:
 def save_batch_result(result: Dict[str, Any], output_path: str):
     """保存批量分析结果"""
     with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+        json.dump(result, f, ensure_ascii=False, indent=2, default=json_default)
+
+
+def open_result_writer(args, output_path: str) -> JsonlResultWriter:
+    """按命令行参数创建流式JSONL输出"""
+    max_bytes = int(args.shard_mb * 1024 * 1024) if args.shard_mb else None
+    return JsonlResultWriter(output_path, max_bytes=max_bytes, max_records=args.shard_records)
+
+
+def resolve_checkpoint(args) -> str:
+    """确定在线模式的检查点路径，--resume 未指定 --checkpoint 时使用输入文件旁的默认路径"""
+    checkpoint_path = args.checkpoint
+    if args.resume and not checkpoint_path:
+        if not args.input_file:
+            print("❌ --resume 需要输入文件或 --checkpoint 参数")
+            sys.exit(1)
+        checkpoint_path = os.path.splitext(args.input_file)[0] + ".checkpoint.db"
+    if checkpoint_path:
+        print(f"💾 检查点: {checkpoint_path}")
+    return checkpoint_path
+
+
+def iter_analysis_requests(raw_requests):
+    """把原始请求逐个转换为分析请求，跳过无效的请求"""
+    from src.core.bulkBatch import parse_request
+
+    for i, req_data in enumerate(raw_requests):
+        try:
+            yield parse_request(req_data)
+        except ValueError as e:
+            print(f"❌ 请求{i+1}: {str(e)}")
+
+
+def run_parallel(args):
+    """逐条并行模式：每个条目独立调用工作流，结果边完成边输出"""
+    from src.core.batchEngine import BatchEngine, format_duration
+    from src.core.bulkBatch import iter_request_file
+
+    total = None
+    if args.sample:
+        raw_requests = create_sample_requests()
+        total = len(raw_requests)
+    elif args.input_file:
+        raw_requests = iter_request_file(args.input_file)
+        if args.input_file.endswith('.jsonl'):
+            # 预先数一遍行数用于估算剩余时间，输入本身仍然流式读取
+            with open(args.input_file, 'r', encoding='utf-8') as f:
+                total = sum(1 for line in f if line.strip())
+    else:
+        print("❌ 请指定输入文件或使用 --sample 参数")
+        sys.exit(1)
+
+    def report(snapshot):
+        total_text = f"/{snapshot['total']}" if snapshot['total'] is not None else ""
+        print(f"⏳ {snapshot['completed']}{total_text} | {snapshot['items_per_second']:.1f} 条/秒 | "
+              f"预计剩余 {format_duration(snapshot['eta'])}")
+
+    engine = BatchEngine(
+        workers=args.workers,
+        group_size=args.group_size,
+        processes=args.processes,
+        checkpoint_path=resolve_checkpoint(args),
+        resume=args.resume,
+        progress_callback=report
+    )
+
+    # 非 .jsonl 的输出需要收集全部结果后一次写入
+    writer = None
+    collected = []
+    if args.output and args.output.endswith('.jsonl'):
+        writer = open_result_writer(args, args.output)
+        sink = writer.write
+    else:
+        sink = lambda result, index: collected.append((index, result))
+
+    print("\n🔍 开始逐条并行分析...")
+    try:
+        stats = engine.run(iter_analysis_requests(raw_requests), result_sink=sink, total=total,
+                           summarize=not args.no_summary)
+        if writer:
+            writer.write_summary(
+                mode="parallel",
+                items_per_second=round(stats["items_per_second"], 2),
+                final_summary=stats["final_summary"],
+                consolidated_key_points=stats["consolidated_key_points"]
+            )
+    finally:
+        if writer:
+            writer.close()
+
+    print(f"\n📊 分析统计:")
+    print(f"  - 总请求数: {stats['total']}")
+    print(f"  - 成功分析: {stats['successful']}")
+    print(f"  - 失败分析: {stats['failed']}")
+    print(f"  - 吞吐量: {stats['items_per_second']:.1f} 条/秒，耗时 {format_duration(stats['elapsed'])}")
+
+    if writer:
+        print(f"💾 结果已保存到: {', '.join(writer.paths)}")
+    elif args.output:
+        collected.sort(key=lambda item: item[0])
+        save_batch_result({
+            "analysis_results": [result for _, result in collected],
+            "final_summary": stats["final_summary"],
+            "consolidated_key_points": stats["consolidated_key_points"],
+        }, args.output)
+        print(f"💾 结果已保存到: {args.output}")
+    elif stats["final_summary"]:
+        print(f"\n🎯 综合总结:")
+        print(stats["final_summary"][:200] + "..." if len(stats["final_summary"]) > 200 else stats["final_summary"])
+
+
+def run_bulk(args):
+    """离线批量模式：渲染 -> 提交 -> 轮询 -> 流式映射结果"""
+    from src.core.bulkBatch import BulkJob, create_executor, iter_request_file
+
+    work_dir = args.work_dir or (os.path.splitext(args.input_file)[0] + ".bulk" if args.input_file else "bulk_job")
+    job = BulkJob(work_dir)
+    executor = create_executor(args.executor, workers=args.workers or 8)
+
+    if args.resume and job.prepared:
+        print(f"♻️ 继续已有的批量作业: {work_dir}")
+    else:
+        if args.sample:
+            raw_requests = create_sample_requests()
+        elif args.input_file:
+            raw_requests = iter_request_file(args.input_file)
+        else:
+            print("❌ 请指定输入文件或使用 --sample 参数")
+            sys.exit(1)
+        counts = job.prepare(raw_requests)
+        print(f"📝 已渲染 {counts['rendered']} 个请求，跳过 {counts['skipped']} 个，无效 {counts['invalid']} 个")
+
+    def report(shards):
+        done = sum((s.get("request_counts") or {}).get("completed", 0) for s in shards)
+        total = sum(s["count"] for s in shards)
+        print(f"⏳ 批处理进度: {done}/{total}")
+
+    job.submit(executor)
+    try:
+        job.wait(executor, poll_interval=args.poll_interval, progress=report if args.verbose else None)
+    except TimeoutError as e:
+        print(f"⏰ {str(e)}")
+        sys.exit(1)
+
+    output_path = args.output or os.path.join(work_dir, "results.jsonl")
+    with open_result_writer(args, output_path) as writer:
+        for analysis_result in job.iter_results():
+            writer.write(analysis_result)
+        writer.write_summary(mode="bulk", executor=args.executor)
+
+    print(f"\n📊 分析统计:")
+    print(f"  - 总请求数: {writer.total}")
+    print(f"  - 成功分析: {writer.successful}")
+    print(f"  - 失败分析: {writer.total - writer.successful}")
+    print(f"💾 结果已保存到: {', '.join(writer.paths)}")
 
 
 def create_sample_requests():
@@ -56,12 +213,36 @@ def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='批量内容分析工具')
     parser.add_argument('input_file', nargs='?', help='输入的分析请求JSON文件（可选）')
-    parser.add_argument('-o', '--output', help='输出分析结果的JSON文件')
+    parser.add_argument('-o', '--output', help='输出分析结果的文件，.jsonl 后缀时每个条目完成后立即写入')
     parser.add_argument('--sample', action='store_true', help='使用示例数据进行演示')
     parser.add_argument('--verbose', action='store_true', help='显示详细信息')
+    parser.add_argument('--bulk', action='store_true', help='离线批量模式，输出JSONL结果（不生成综合总结）')
+    parser.add_argument('--executor', choices=['local', 'openai'], default='openai',
+                        help='批量模式的执行器：openai 使用Batch接口，local 在本地并发调用（默认: openai）')
+    parser.add_argument('--work-dir', help='批量作业工作目录（默认: <输入文件名>.bulk）')
+    parser.add_argument('--poll-interval', type=float, default=30.0, help='批量作业轮询间隔秒数（默认: 30）')
+    parser.add_argument('--resume', action='store_true',
+                        help='继续中断的作业：批量模式继续工作目录中的作业，在线模式跳过检查点中已完成的条目')
+    parser.add_argument('--shard-mb', type=float, help='JSONL输出按大小轮转为多个分片（MB）')
+    parser.add_argument('--shard-records', type=int, help='JSONL输出按条数轮转为多个分片')
+    parser.add_argument('--checkpoint', help='在线模式的SQLite检查点路径（--resume 时默认: <输入文件名>.checkpoint.db）')
+    parser.add_argument('--workers', type=int,
+                        help='并发数：local 执行器默认8，--parallel 模式默认 BATCH_WORKERS')
+    parser.add_argument('--parallel', action='store_true',
+                        help='逐条并行模式：每个条目独立调用工作流，最后对抽样结果生成总结')
+    parser.add_argument('--group-size', type=int, help='--parallel 模式每次工作流调用的条目数（默认: BATCH_GROUP_SIZE）')
+    parser.add_argument('--processes', type=int, default=0, help='--parallel 模式使用的进程数，0表示使用线程池')
+    parser.add_argument('--no-summary', action='store_true', help='--parallel 模式不生成最终总结')
     
     args = parser.parse_args()
     
+    if args.bulk:
+        run_bulk(args)
+        return
+    if args.parallel:
+        run_parallel(args)
+        return
+    
     # 确定分析请求来源
     if args.sample:
         requests_data = create_sample_requests()
@@ -85,32 +266,7 @@ def main():
     print(f"✅ 准备分析 {len(requests_data)} 个内容")
     
     # 转换为分析请求对象
-    analysis_requests = []
-    for i, req_data in enumerate(requests_data):
-        try:
-            content = req_data["content"]
-            content_type_str = req_data["content_type"]
-            context = req_data.get("context")
-            
-            # 转换内容类型
-            type_mapping = {
-                "url": ContentType.URL,
-                "image": ContentType.IMAGE, 
-                "code": ContentType.CODE,
-                "text": ContentType.TEXT
-            }
-            
-            if content_type_str.lower() not in type_mapping:
-                print(f"❌ 请求{i+1}: 不支持的内容类型 {content_type_str}")
-                continue
-                
-            content_type = type_mapping[content_type_str.lower()]
-            analysis_requests.append(create_analysis_request(content, content_type, context))
-            
-        except KeyError as e:
-            print(f"❌ 请求{i+1}缺少必需字段: {str(e)}")
-        except Exception as e:
-            print(f"❌ 请求{i+1}处理错误: {str(e)}")
+    analysis_requests = list(iter_analysis_requests(requests_data))
     
     if not analysis_requests:
         print("❌ 没有有效的分析请求")
@@ -118,10 +274,22 @@ def main():
     
     print(f"✅ 成功创建 {len(analysis_requests)} 个分析请求")
     
+    checkpoint_path = resolve_checkpoint(args)
+    
+    # .jsonl 输出在每个条目完成后立即写入，进程中断时已完成的结果不会丢失
+    writer = None
+    if args.output and args.output.endswith('.jsonl'):
+        writer = open_result_writer(args, args.output)
+    
     # 执行批量分析
     print("\n🔍 开始批量分析...")
     try:
-        result = run_custom_analysis(analysis_requests)
+        result = run_custom_analysis(
+            analysis_requests,
+            checkpoint_path=checkpoint_path,
+            resume=args.resume,
+            result_sink=writer.write if writer else None
+        )
         
         if result:
             print("✅ 批量分析完成!")
@@ -145,7 +313,14 @@ def main():
                     print()
             
             # 保存结果
-            if args.output:
+            if writer:
+                writer.write_summary(
+                    final_summary=result.get("final_summary"),
+                    consolidated_key_points=result.get("consolidated_key_points", [])
+                )
+                writer.close()
+                print(f"💾 结果已保存到: {', '.join(writer.paths)}")
+            elif args.output:
                 save_batch_result(result, args.output)
                 print(f"💾 结果已保存到: {args.output}")
             else:
@@ -168,6 +343,9 @@ def main():
     except Exception as e:
         print(f"❌ 批量分析过程中出现错误: {str(e)}")
         sys.exit(1)
+    finally:
+        if writer:
+            writer.close()
 
 
 if __name__ == "__main__":
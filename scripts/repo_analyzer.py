@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+仓库分析脚本 - 命令行工具
+"""
+
+import sys
+import os
+import json
+import argparse
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.analyzers.repoAnalyzer import RepositoryAnalyzer
+from src.utils.resultWriter import SUCCESS_CONFIDENCE, json_default
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='代码仓库分析工具')
+    parser.add_argument('path', help='仓库目录或tar包（需位于 REPO_ALLOWED_ROOTS 下）')
+    parser.add_argument('-o', '--output', help='输出分析结果的JSON文件')
+    parser.add_argument('--verbose', action='store_true', help='显示详细信息')
+
+    args = parser.parse_args()
+
+    try:
+        result = RepositoryAnalyzer().analyze_repository(args.path)
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+
+    metadata = result["metadata"]
+    print(f"✅ 分析完成，置信度: {result['confidence']:.2f}")
+    print(f"📂 文件: {metadata.get('files', 0)} 个，重新分析 {metadata.get('analyzed', 0)} 个，"
+          f"缓存命中 {metadata.get('cached', 0)} 个，失败 {metadata.get('failed', 0)} 个")
+    if args.verbose:
+        for directory, summary in metadata.get("directories", {}).items():
+            print(f"\n📁 {directory}/\n{summary}")
+        print(f"\n📋 仓库总结:\n{result['analysis']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=json_default)
+        print(f"💾 结果已保存到: {args.output}")
+    if result["confidence"] <= SUCCESS_CONFIDENCE:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,37 @@
 """
 Content analyzers for multimodal analysis
+
+分析器在首次访问时才导入（PEP 562），`from src.analyzers import URLAnalyzer`
+只会加载URL分析器及其依赖，不会导入其他分析器用到的服务商SDK。
 """
 
-from .base import ContentAnalyzer
-from .urlAnalyzer import URLAnalyzer
-from .imageAnalyzer import ImageAnalyzer
-from .codeAnalyzer import CodeAnalyzer
-from .forumAnalyzer import ForumAnalyzer
-from .mcpAnalyzer import MCPAnalyzer
-from .tavily_analyzer import TavilyAnalyzer
-
-__all__ = [
-    'ContentAnalyzer',
-    'URLAnalyzer',
-    'ImageAnalyzer',
-    'CodeAnalyzer',
-    'ForumAnalyzer',
-    'MCPAnalyzer',
-    'TavilyAnalyzer'
-]
\ No newline at end of file
+import importlib
+
+# 导出名称 -> 所在子模块
+_EXPORTS = {
+    'ContentAnalyzer': '.base',
+    'URLAnalyzer': '.urlAnalyzer',
+    'ImageAnalyzer': '.imageAnalyzer',
+    'CodeAnalyzer': '.codeAnalyzer',
+    'ForumAnalyzer': '.forumAnalyzer',
+    'MCPAnalyzer': '.mcpAnalyzer',
+    'TavilyAnalyzer': '.tavily_analyzer',
+    'get_tavily_analyzer': '.tavily_analyzer',
+    'MicroBatcher': '.microBatcher',
+    'RepositoryAnalyzer': '.repoAnalyzer',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,12 +1,20 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 import re
+import time
 import logging
-from src.config import config
+from src.config import config, ProviderAPIError
 from src.graph.state import AnalysisResult, ContentType
 from src.utils import run_smithery_tool
+from src.utils import metrics
+from src.utils.cassette import record_call
+from src.analyzers.providerRouter import get_router
+from src.analyzers.providerResult import ProviderResult
 
 logger = logging.getLogger(__name__)
 
+# 默认的OpenAI模型
+OPENAI_MODEL = "gpt-4.1-mini-2025-04-14"
+
 
 class ContentAnalyzer:
     """内容分析器基类"""
@@ -14,72 +22,141 @@ class ContentAnalyzer:
     def __init__(self):
         self.config = config
 
-    def analyzeWithOpenai(self, prompt: str, content: str = None) -> str:
-        """使用OpenAI进行分析"""
-        try:
-            client = self.config.get_openai_client()
-            
-            # 调试日志，记录使用的base_url
-            logger.info(f"--- OpenAI API 调用 ---")
-            logger.info(f"使用 Base URL: {client.base_url}")
-            logger.info(f"模型: gpt-4.1-mini-2025-04-14")
-            logger.info(f"----------------------")
+    def _finish(self, result: ProviderResult, start: float) -> ProviderResult:
+        """补充耗时并记录调用指标"""
+        result.latency = time.perf_counter() - start
+        outcome = "success" if result.ok else result.error_kind.value
+        metrics.record_provider_call(result.provider, outcome, result.latency, result.usage)
+        return result
+    
+    def callOpenai(self, prompt: str) -> ProviderResult:
+        """调用OpenAI，返回类型化的结果"""
+        start = time.perf_counter()
+        with metrics.PROVIDER_IN_FLIGHT.labels(provider="openai").track_inprogress():
+            try:
+                client = self.config.get_openai_client()
+                
+                # 调试日志，记录使用的base_url
+                logger.info(f"--- OpenAI API 调用 ---")
+                logger.info(f"使用 Base URL: {client.base_url}")
+                logger.info(f"模型: {OPENAI_MODEL}")
+                logger.info(f"----------------------")
 
-            messages = [{"role": "user", "content": prompt}]
-            response = client.chat.completions.create(
-                model="gpt-4.1-mini-2025-04-14",
-                messages=messages,
-                max_tokens=self.config.max_tokens,
-                temperature=self.config.temperature
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.error(f"OpenAI分析失败: {str(e)}", exc_info=True)
-            return f"OpenAI分析失败: {str(e)}"
+                messages = [{"role": "user", "content": prompt}]
+                response = client.chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=messages,
+                    max_tokens=self.config.max_tokens,
+                    temperature=self.config.temperature
+                )
+                text = response.choices[0].message.content if response.choices else ""
+                result = ProviderResult.success("openai", text, getattr(response, "usage", None))
+            except Exception as e:
+                logger.error(f"OpenAI分析失败: {str(e)}", exc_info=True)
+                result = ProviderResult.failure("openai", e)
+        return self._finish(result, start)
     
-    def analyzeWithGemini(self, prompt: str) -> str:
-        """使用Gemini进行分析"""
-        try:
-            model = self.config.get_gemini_model()
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"Gemini分析失败: {str(e)}"
+    def callGemini(self, prompt: str) -> ProviderResult:
+        """调用Gemini，返回类型化的结果"""
+        start = time.perf_counter()
+        
+        def generate():
+            response = self.config.get_gemini_model().generate_content(prompt)
+            usage = getattr(response, "usage_metadata", None)
+            return {
+                "text": response.text,
+                "usage": {
+                    "input_tokens": getattr(usage, "prompt_token_count", 0),
+                    "output_tokens": getattr(usage, "candidates_token_count", 0)
+                } if usage else {}
+            }
+        
+        with metrics.PROVIDER_IN_FLIGHT.labels(provider="gemini").track_inprogress():
+            try:
+                response = record_call("gemini", {"model": "gemini-2.5-flash", "prompt": prompt}, generate)
+                result = ProviderResult.success("gemini", response["text"], response["usage"])
+            except Exception as e:
+                result = ProviderResult.failure("gemini", e)
+        return self._finish(result, start)
     
-    def analyzeWithAlibaba(self, prompt: str, image_data: str = None) -> str:
-        """使用阿里百炼进行分析"""
-        try:
-            import dashscope
-            from dashscope import MultiModalConversation
-            
-            messages = [{'role': 'user', 'content': prompt}]
-            
-            if image_data:
-                # 检查是否为base64数据
-                if image_data.startswith("data:image"):
-                    messages[0]['content'] = [
-                        {'text': prompt},
-                        {'image': image_data}  # base64数据
-                    ]
-                else:
-                    # 假设是URL
-                    messages[0]['content'] = [
-                        {'text': prompt},
-                        {'image': image_data}  # URL
-                    ]
+    def callAlibaba(self, prompt: str, image_data: Union[str, List[str]] = None) -> ProviderResult:
+        """调用阿里百炼，返回类型化的结果；image_data为列表时多张图片按顺序放进同一条消息"""
+        start = time.perf_counter()
+        messages = [{'role': 'user', 'content': prompt}]
+        
+        if image_data:
+            # image_data可以是base64数据（data:image开头）或图片URL
+            images = [image_data] if isinstance(image_data, str) else image_data
+            messages[0]['content'] = [{'text': prompt}] + [{'image': image} for image in images]
+        
+        def call_dashscope():
+            dashscope = self.config.get_dashscope()
             
-            response = MultiModalConversation.call(
+            response = dashscope.MultiModalConversation.call(
                 model='Moonshot-Kimi-K2-Instruct',
                 messages=messages
             )
-            
             if response.status_code == 200:
-                return response.output.choices[0]['message']['content']
-            else:
-                return f"阿里百炼分析失败: {response.message}"
-                
-        except Exception as e:
-            return f"阿里百炼分析失败: {str(e)}"
+                usage = response.usage or {}
+                return {
+                    "status_code": 200,
+                    "content": response.output.choices[0]['message']['content'],
+                    "usage": {
+                        "input_tokens": usage.get("input_tokens", 0),
+                        "output_tokens": usage.get("output_tokens", 0)
+                    }
+                }
+            return {"status_code": response.status_code, "message": response.message}
+        
+        with metrics.PROVIDER_IN_FLIGHT.labels(provider="alibaba").track_inprogress():
+            try:
+                response = record_call(
+                    "alibaba",
+                    {"model": "Moonshot-Kimi-K2-Instruct", "messages": messages},
+                    call_dashscope
+                )
+                if response["status_code"] == 200:
+                    content = response["content"]
+                    if isinstance(content, list):
+                        # 多模态响应的content是 [{"text": ...}] 列表
+                        content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+                    result = ProviderResult.success("alibaba", content, response.get("usage"))
+                else:
+                    result = ProviderResult.failure(
+                        "alibaba", ProviderAPIError(response["message"], status_code=response["status_code"])
+                    )
+            except Exception as e:
+                result = ProviderResult.failure("alibaba", e)
+        return self._finish(result, start)
+    
+    def analyzeWithOpenai(self, prompt: str, content: str = None) -> str:
+        """使用OpenAI进行分析（失败时返回失败信息字符串）"""
+        return self.callOpenai(prompt).message
+    
+    def analyzeWithGemini(self, prompt: str) -> str:
+        """使用Gemini进行分析（失败时返回失败信息字符串）"""
+        return self.callGemini(prompt).message
+    
+    def analyzeWithAlibaba(self, prompt: str, image_data: str = None) -> str:
+        """使用阿里百炼进行分析（失败时返回失败信息字符串）"""
+        return self.callAlibaba(prompt, image_data).message
+    
+    def analyzeWithRouting(self, prompt: str, policy: str = None) -> ProviderResult:
+        """
+        通过服务商路由器分析：优先OpenAI，慢请求对冲到Gemini，失败时降级
+
+        Args:
+            prompt: 提示词
+            policy: 路由策略（cost | balanced | latency），默认使用当前请求的策略
+
+        Returns:
+            最先成功的服务商结果；全部失败时为最后一个失败结果
+        """
+        providers = [
+            ("openai", self.callOpenai),
+            ("gemini", self.callGemini),
+        ]
+        return get_router().route(prompt, providers, policy)
     
     def extractKeyPoints(self, analysis: str) -> List[str]:
         """从分析结果中提取关键点"""
@@ -120,11 +197,14 @@ class ContentAnalyzer:
         try:
             result = run_smithery_tool(tool_name, arguments)
             if result:
+                metrics.MCP_ATTEMPTS.labels(tool=tool_name, outcome="success").inc()
                 logger.info(f"Smithery MCP工具 '{tool_name}' 执行成功")
                 return result
             else:
+                metrics.MCP_ATTEMPTS.labels(tool=tool_name, outcome="unavailable").inc()
                 logger.warning(f"Smithery MCP工具 '{tool_name}' 不可用或执行失败")
                 return None
         except Exception as e:
+            metrics.MCP_ATTEMPTS.labels(tool=tool_name, outcome="error").inc()
             logger.error(f"Smithery MCP工具执行失败: {str(e)}", exc_info=True)
             return None
\ No newline at end of file
@@ -1,98 +1,76 @@
-from typing import Dict, Any
-import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple
+import contextvars
+import logging
 from src.analyzers.base import ContentAnalyzer
+from src.analyzers.codeChunker import CodeChunk, split_code
+from src.analyzers.codeDiff import (
+    CONTEXT_LINES, SymbolChange, apply_hunks, collect_changes, diff_hunks, hunk_changes, looks_like_diff,
+    parse_unified_diff,
+)
+from src.analyzers.codeIndex import CodeIndex, detect_language, index_code
+from src.analyzers.providerResult import ProviderResult
+from src.config import config
 from src.graph.state import AnalysisResult, ContentType
+from src.utils import metrics
+from src.utils.ttlCache import MISSING, TTLCache
+
+logger = logging.getLogger(__name__)
+
+CHANGE_STATUS_LABELS = {"modified": "修改", "added": "新增", "removed": "删除"}
+
+# 代码块分析结果缓存，键为块内容哈希，值为 (分析文本, 服务商)
+chunk_cache = TTLCache("code_chunk", max_entries=config.code_chunk_cache_size, ttl=config.code_chunk_cache_ttl)
 
 
 class CodeAnalyzer(ContentAnalyzer):
     """代码分析器"""
     
-    def __init__(self):
-        super().__init__()
-        
-        # 支持的编程语言
-        self.language_keywords = {
-            'python': ['def', 'class', 'import', 'from', 'if __name__'],
-            'javascript': ['function', 'const', 'let', 'var', '=>'],
-            'java': ['public class', 'private', 'public', 'static'],
-            'cpp': ['#include', 'using namespace', 'int main'],
-            'go': ['package', 'func', 'import'],
-            'rust': ['fn', 'let', 'pub', 'use'],
-        }
-    
     def detect_language(self, code: str) -> str:
         """检测代码语言"""
-        code_lower = code.lower()
-        
-        # 计算每种语言的匹配度
-        language_scores = {}
-        for lang, keywords in self.language_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in code_lower)
-            if score > 0:
-                language_scores[lang] = score
-        
-        # 返回得分最高的语言
-        if language_scores:
-            return max(language_scores, key=language_scores.get)
-        else:
-            return "unknown"
+        return detect_language(code)
     
-    def extract_code_structure(self, code: str) -> Dict[str, Any]:
+    def extract_code_structure(self, code: str, language: str = None) -> Dict[str, Any]:
         """提取代码结构信息"""
-        structure = {
-            "functions": [],
-            "classes": [],
-            "imports": [],
-            "lines": len(code.split('\n')),
-            "complexity": "simple"
-        }
-        
-        lines = code.split('\n')
-        
-        # 提取函数定义
-        for line in lines:
-            line = line.strip()
-            if re.match(r'^(def|function|func)\s+\w+', line):
-                structure["functions"].append(line)
-            elif re.match(r'^class\s+\w+', line):
-                structure["classes"].append(line)
-            elif line.startswith(('import', 'from', 'using', '#include')):
-                structure["imports"].append(line)
-        
-        # 简单的复杂度评估
-        if structure["lines"] > 100 or len(structure["functions"]) > 10:
-            structure["complexity"] = "complex"
-        elif structure["lines"] > 50 or len(structure["functions"]) > 5:
-            structure["complexity"] = "medium"
-        
-        return structure
+        return self.index_code(code, language).structure()
     
-    def analyze_code(self, code: str, language: str = None) -> AnalysisResult:
-        """分析代码内容"""
-        print(f"💻 开始分析代码 ({language or '自动检测'})")
+    def index_code(self, code: str, language: str = None) -> CodeIndex:
+        """建立代码结构索引，未指定语言（或为 "Unknown"）时在同一次扫描中检测"""
+        return index_code(code, language)
+    
+    def describe_structure(self, structure: Dict[str, Any]) -> str:
+        """代码结构信息的提示词片段"""
+        text = f"""代码结构信息：
+        - 行数: {structure['lines']}
+        - 函数: {len(structure['functions'])}个
+        - 类: {len(structure['classes'])}个
+        - 导入: {len(structure['imports'])}个
+        - 最大圈复杂度: {structure.get('max_cyclomatic', 0)}，最大嵌套深度: {structure.get('max_nesting', 0)}
+        - 复杂度: {structure['complexity']}"""
+        if structure.get("hotspots"):
+            text += f"\n        - 复杂度最高的函数: {', '.join(structure['hotspots'])}"
+        return text
+    
+    def build_prompt(self, code: str, language: str = None) -> Tuple[str, str, Dict[str, Any]]:
+        """创建代码分析提示，返回 (提示词, 检测到的语言, 代码结构)"""
+        # 一次扫描完成语言检测、符号表和复杂度统计
+        index = self.index_code(code, language)
+        detected_language = index.language
+        structure = index.structure()
         
-        # 检测编程语言
-        if not language or language == "Unknown":
-            detected_language = self.detect_language(code)
+        if len(code) <= config.code_chunk_chars:
+            code_text = f"代码：\n{code}"
         else:
-            detected_language = language.lower()
-        
-        # 提取代码结构
-        structure = self.extract_code_structure(code)
+            # 超过预算时只发送符号概览和复杂度最高的函数
+            code_text = (f"符号概览：\n{index.outline()}\n\n"
+                         f"复杂度最高的部分（节选）：\n{index.excerpt(code, config.code_chunk_chars)}")
         
-        # 创建分析提示
         prompt = f"""
         请分析以下{detected_language}代码：
         
-        代码：
-        {code[:1000]}{"..." if len(code) > 1000 else ""}
+        {code_text}
         
-        代码结构信息：
-        - 行数: {structure['lines']}
-        - 函数: {len(structure['functions'])}个
-        - 类: {len(structure['classes'])}个
-        - 导入: {len(structure['imports'])}个
-        - 复杂度: {structure['complexity']}
+        {self.describe_structure(structure)}
         
         请提供：
         1. 代码功能和用途分析
@@ -102,12 +80,220 @@ class CodeAnalyzer(ContentAnalyzer):
         
         请从技术角度进行专业分析。
         """
+        return prompt, detected_language, structure
+    
+    def build_chunk_prompt(self, chunk: CodeChunk, language: str) -> str:
+        """创建单个代码块的分析提示，不包含块在文件中的位置，使内容相同的块可以共享缓存"""
+        return f"""
+        以下是一个{language}源文件中的代码片段 {chunk.name}：
         
-        # 使用AI分析
-        analysis = self.analyzeWithOpenai(prompt)
+        {chunk.text}
+        
+        请简要说明：
+        1. 这段代码的功能
+        2. 代码质量问题和潜在缺陷
+        3. 改进建议
+        """
+    
+    def build_reduce_prompt(self, language: str, structure: Dict[str, Any],
+                            chunks: List[CodeChunk], summaries: List[str]) -> str:
+        """根据各代码块的分析创建文件级汇总提示"""
+        sections = "\n\n".join(
+            f"### {chunk.name}（第{chunk.start_line}-{chunk.end_line}行）\n{summary}"
+            for chunk, summary in zip(chunks, summaries)
+        )
+        return f"""
+        以下是对一个{language}源文件各部分的分析：
+        
+        {sections}
+        
+        {self.describe_structure(structure)}
+        
+        请汇总为对整个文件的分析，提供：
+        1. 代码功能和用途分析
+        2. 代码质量和设计模式评估
+        3. 潜在的改进建议
+        4. 代码的技术特点和亮点
+        
+        请从技术角度进行专业分析。
+        """
+    
+    def run_cached(self, items: List[Tuple[str, str]], label: str) -> Tuple[List[ProviderResult], int]:
+        """
+        并行执行 (缓存键, 提示词) 列表中的模型调用，已缓存的项不再调用模型，成功的结果写入缓存
+        
+        Returns:
+            (与items顺序一致的结果列表, 命中缓存的项数)
+        """
+        results: List[ProviderResult] = [None] * len(items)
+        pending = []
+        for index, (key, _) in enumerate(items):
+            cached = chunk_cache.get(key)
+            if cached is MISSING:
+                pending.append(index)
+            else:
+                text, provider = cached
+                results[index] = ProviderResult(provider=provider, text=text)
+        
+        workers = min(max(1, config.code_chunk_workers), len(pending))
+        if workers:
+            logger.info(f"🧩 分析 {len(pending)} 个{label} (缓存命中: {len(items) - len(pending)}, 并发数: {workers})")
+            # 每个任务在当前上下文的副本中运行，保留本次请求的路由策略
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="code-chunk") as executor:
+                futures = {index: executor.submit(contextvars.copy_context().run, self.analyzeWithRouting, items[index][1])
+                           for index in pending}
+                for index, future in futures.items():
+                    results[index] = future.result()
+                    if results[index].ok:
+                        chunk_cache.set(items[index][0], (results[index].text, results[index].provider))
+        return results, len(items) - len(pending)
+    
+    def analyze_chunks(self, chunks: List[CodeChunk], language: str) -> Tuple[List[ProviderResult], int]:
+        """
+        并行分析代码块，已缓存的块不再调用模型
+        
+        Returns:
+            (与chunks顺序一致的结果列表, 命中缓存的块数)
+        """
+        return self.run_cached(
+            [(chunk.digest(language), self.build_chunk_prompt(chunk, language)) for chunk in chunks], "代码块"
+        )
+    
+    def analyze_large_code(self, code: str, detected_language: str, structure: Dict[str, Any]) -> AnalysisResult:
+        """把大段代码按语法边界切分，并行分析各块后汇总为文件级分析"""
+        chunks = split_code(code, detected_language, config.code_chunk_chars)
+        chunk_results, cached = self.analyze_chunks(chunks, detected_language)
+        summaries = [r.message for r in chunk_results]
+        
+        result = self.analyzeWithRouting(self.build_reduce_prompt(detected_language, structure, chunks, summaries))
+        if not result.ok and any(r.ok for r in chunk_results):
+            # 汇总失败时退回到各块分析的拼接
+            logger.warning(f"⚠️ 代码分析汇总失败，使用各代码块的分析: {result.error}")
+            text = "\n\n".join(f"{chunk.name}:\n{summary}" for chunk, summary in zip(chunks, summaries))
+            result = ProviderResult(provider=next(r.provider for r in chunk_results if r.ok), text=text)
+        
+        analysis = self.build_result(code, detected_language, structure, result)
+        if not all(r.ok for r in chunk_results):
+            analysis["confidence"] = min(analysis["confidence"], 0.6)
+        analysis["metadata"]["chunks"] = {
+            "count": len(chunks),
+            "cached": cached,
+            "failed": sum(1 for r in chunk_results if not r.ok),
+            "items": [{"name": c.name, "kind": c.kind, "lines": [c.start_line, c.end_line]} for c in chunks],
+        }
+        return analysis
+    
+    def build_change_prompt(self, change: SymbolChange, language: str) -> str:
+        """创建单个符号修改的审查提示：差异加上修改后的符号，符号过大时只发送带更多上下文的差异"""
+        code_text = ""
+        if change.status != "removed" and len(change.new_text) <= config.code_chunk_chars:
+            code_text = f"修改后的代码：\n{change.new_text}"
+        diff = change.diff(CONTEXT_LINES if code_text else CONTEXT_LINES * 3)
+        return f"""
+        请审查以下{language}代码中 {change.name} 的{CHANGE_STATUS_LABELS[change.status]}：
+        
+        差异：
+        {diff}
+        
+        {code_text}
+        
+        请简要说明：
+        1. 这次修改做了什么
+        2. 修改是否引入缺陷或风险（边界条件、错误处理、兼容性）
+        3. 改进建议
+        """
+    
+    def build_review_prompt(self, language: str, changes: List[SymbolChange], reviews: List[str]) -> str:
+        """根据各处修改的审查创建整体审查提示"""
+        sections = "\n\n".join(
+            f"### {change.name}（{CHANGE_STATUS_LABELS[change.status]}，第{change.start_line}-{change.end_line}行）\n{review}"
+            for change, review in zip(changes, reviews)
+        )
+        return f"""
+        以下是对一次{language}代码修改中各处变更的审查：
+        
+        {sections}
+        
+        请汇总为对这次修改的整体审查，提供：
+        1. 修改内容概述
+        2. 潜在缺陷和风险
+        3. 改进建议
+        """
+    
+    @metrics.timed_analyzer("code_diff")
+    def analyze_code_diff(self, content: str, previous: str = None, language: str = None) -> AnalysisResult:
+        """
+        差异模式的代码分析：只分析被修改的函数、方法和类，未修改的部分不调用模型
+        
+        Args:
+            content: 新版本代码，或统一差异格式的补丁
+            previous: 上一版本代码；content 为补丁时可以省略，此时按差异中的每段修改分别分析
+            language: 编程语言
+        """
+        print(f"💻 开始分析代码修改 ({language or '自动检测'})")
+        
+        if looks_like_diff(content):
+            hunks = parse_unified_diff(content)
+            new_code = apply_hunks(previous, hunks) if previous is not None else None
+        elif previous is None:
+            raise ValueError("差异模式需要上一版本代码或统一差异格式的补丁")
+        else:
+            new_code = content
+            hunks = diff_hunks(previous, content)
         
-        if "失败" in analysis:
-            analysis = self.analyzeWithGemini(prompt)
+        if new_code is None:
+            changes = hunk_changes(hunks)
+            index = self.index_code("\n".join(change.new_text for change in changes), language)
+            untouched = 0
+        else:
+            changes, index, untouched = collect_changes(previous, new_code, hunks, language)
+        detected_language = index.language
+        structure = index.structure()
+        
+        if not changes:
+            result = ProviderResult(provider="local", text="两个版本的代码没有差异。")
+            reviews, cached = [], 0
+        else:
+            reviews, cached = self.run_cached(
+                [(change.digest(detected_language), self.build_change_prompt(change, detected_language))
+                 for change in changes], "修改"
+            )
+            if len(changes) == 1:
+                result = reviews[0]
+            else:
+                result = self.analyzeWithRouting(
+                    self.build_review_prompt(detected_language, changes, [r.message for r in reviews])
+                )
+                if not result.ok and any(r.ok for r in reviews):
+                    # 汇总失败时退回到各处修改审查的拼接
+                    logger.warning(f"⚠️ 代码修改审查汇总失败，使用各处修改的审查: {result.error}")
+                    text = "\n\n".join(f"{c.name}:\n{r.message}" for c, r in zip(changes, reviews))
+                    result = ProviderResult(provider=next(r.provider for r in reviews if r.ok), text=text)
+        
+        analysis = self.build_result(content, detected_language, structure, result)
+        if not all(r.ok for r in reviews):
+            analysis["confidence"] = min(analysis["confidence"], 0.6)
+        added = sum(len(h.changed_lines()[0]) for h in hunks)
+        removed = sum(len(h.changed_lines()[1]) for h in hunks)
+        analysis["key_points"].insert(2, f"修改: {len(changes)}处，+{added} -{removed}行，未修改的符号: {untouched}个")
+        analysis["key_points"] = analysis["key_points"][:10]
+        analysis["metadata"]["diff"] = {
+            "mode": "versions" if new_code is not None else "patch",
+            "hunks": len(hunks),
+            "added": added,
+            "removed": removed,
+            "untouched": untouched,
+            "cached": cached,
+            "failed": sum(1 for r in reviews if not r.ok),
+            "changes": [{"name": c.name, "kind": c.kind, "status": c.status, "lines": [c.start_line, c.end_line]}
+                        for c in changes],
+        }
+        return analysis
+    
+    def build_result(self, code: str, detected_language: str, structure: Dict[str, Any],
+                     provider_result: ProviderResult) -> AnalysisResult:
+        """根据模型结果构建代码分析结果"""
+        analysis = provider_result.message
         
         # 提取关键点
         key_points = self.extractKeyPoints(analysis)
@@ -117,7 +303,7 @@ class CodeAnalyzer(ContentAnalyzer):
         key_points.insert(1, f"代码行数: {structure['lines']}, 复杂度: {structure['complexity']}")
         
         # 评估置信度
-        confidence = 0.9 if "失败" not in analysis else 0.4
+        confidence = 0.9 if provider_result.ok else 0.4
         
         return {
             "content_type": ContentType.CODE,
@@ -128,6 +314,22 @@ class CodeAnalyzer(ContentAnalyzer):
             "confidence": confidence,
             "metadata": {
                 "language": detected_language,
-                "structure": structure
+                "structure": structure,
+                "provider": provider_result.provider
             }
-        }
\ No newline at end of file
+        }
+    
+    @metrics.timed_analyzer("code")
+    def analyze_code(self, code: str, language: str = None) -> AnalysisResult:
+        """分析代码内容"""
+        print(f"💻 开始分析代码 ({language or '自动检测'})")
+        
+        if len(code) > config.code_chunk_chars:
+            index = self.index_code(code, language)
+            return self.analyze_large_code(code, index.language, index.structure())
+        
+        prompt, detected_language, structure = self.build_prompt(code, language)
+        
+        # 使用AI分析
+        result = self.analyzeWithRouting(prompt)
+        return self.build_result(code, detected_language, structure, result)
@@ -0,0 +1,245 @@
+"""
+代码分块
+按语法边界把大段代码切分为可以独立分析的块：Python使用ast按函数和类切分，
+使用花括号的语言按顶层代码块切分，其他语言按缩进切分。每个函数和类保持为独立的块，只有零散语句（导入、常量等）
+和很小的零散块与相邻块合并，超过上限的块（如很大的类）先按方法切分，仍然过大时按行切分。
+"""
+
+import ast
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# 使用花括号划分代码块的语言
+BRACE_LANGUAGES = {
+    "javascript", "typescript", "java", "cpp", "c", "c++", "csharp", "c#", "go", "rust",
+    "kotlin", "swift", "scala", "php", "dart",
+}
+
+# 顶层代码块开头的定义，用于给块命名
+_DEFINITION_PATTERN = re.compile(
+    r"^\s*(?:export\s+)?(?:pub(?:\([^)]*\))?\s+)?(?:public|private|protected|static|async|abstract|final|\s)*"
+    r"(?:def|class|function|func|fn|interface|struct|enum|impl|trait|object|type)\s+(?:\([^)]*\)\s*)?([\w.$]+)"
+)
+
+
+@dataclass(slots=True)
+class CodeChunk:
+    """一个代码块，行号从1开始"""
+    name: str
+    kind: str
+    start_line: int
+    end_line: int
+    text: str
+
+    def digest(self, language: str = "") -> str:
+        """块内容的哈希，内容不变时哈希不变，与块在文件中的位置无关"""
+        return hashlib.sha256(f"{language}\n{self.text}".encode("utf-8")).hexdigest()
+
+
+def _block_name(lines: List[str], default: str) -> str:
+    for line in lines:
+        match = _DEFINITION_PATTERN.match(line)
+        if match:
+            return match.group(1)
+    return default
+
+
+def _split_lines(chunk: CodeChunk, max_chars: int) -> List[CodeChunk]:
+    """把超过上限的块按行切分"""
+    lines = chunk.text.split("\n")
+    pieces, current, size, start = [], [], 0, chunk.start_line
+    for offset, line in enumerate(lines):
+        if current and size + len(line) + 1 > max_chars:
+            pieces.append(CodeChunk(f"{chunk.name}#{len(pieces) + 1}", chunk.kind, start,
+                                    start + len(current) - 1, "\n".join(current)))
+            start, current, size = chunk.start_line + offset, [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        name = f"{chunk.name}#{len(pieces) + 1}" if pieces else chunk.name
+        pieces.append(CodeChunk(name, chunk.kind, start, start + len(current) - 1, "\n".join(current)))
+    return pieces
+
+
+def _merge_small(chunks: List[CodeChunk], max_chars: int, min_chars: int) -> List[CodeChunk]:
+    """
+    合并零散语句：相邻的零散块合并，小于min_chars的零散块并入相邻的块，合并后不超过max_chars。
+    函数和类之间不合并，块边界只由它们自身决定，修改（包括加长）一个函数时只有这一块需要重新分析
+    """
+    merged: List[CodeChunk] = []
+    for chunk in chunks:
+        previous = merged[-1] if merged else None
+        if (previous is not None
+                and (previous.kind == "block" and chunk.kind == "block"
+                     or previous.kind == "block" and len(previous.text) < min_chars
+                     or chunk.kind == "block" and len(chunk.text) < min_chars)
+                and len(previous.text) + len(chunk.text) + 1 <= max_chars):
+            name = previous.name if chunk.kind == "block" else f"{previous.name}, {chunk.name}"
+            kind = chunk.kind if previous.kind == "block" else previous.kind
+            merged[-1] = CodeChunk(name, kind, previous.start_line, chunk.end_line, previous.text + "\n" + chunk.text)
+        else:
+            merged.append(chunk)
+    result = []
+    for chunk in merged:
+        result.extend(_split_lines(chunk, max_chars) if len(chunk.text) > max_chars else [chunk])
+    return result
+
+
+def _python_node_chunks(node: ast.AST, lines: List[str], prefix: str, max_chars: int) -> List[CodeChunk]:
+    start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+    end = node.end_lineno
+    text = "\n".join(lines[start - 1:end])
+    name = f"{prefix}{node.name}"
+    kind = "class" if isinstance(node, ast.ClassDef) else "function"
+    if kind != "class" or len(text) <= max_chars:
+        return [CodeChunk(name, kind, start, end, text)]
+
+    # 过大的类：类头和属性作为一个块，每个方法作为单独的块
+    chunks: List[CodeChunk] = []
+    cursor = start
+    for child in node.body:
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            child_start = min([child.lineno] + [d.lineno for d in child.decorator_list])
+            if child_start > cursor:
+                chunks.append(CodeChunk(name if cursor == start else f"{name}#body", "block", cursor, child_start - 1,
+                                        "\n".join(lines[cursor - 1:child_start - 1])))
+            chunks.extend(_python_node_chunks(child, lines, f"{name}.", max_chars))
+            cursor = child.end_lineno + 1
+    if cursor <= end:
+        chunks.append(CodeChunk(f"{name}#body", "block", cursor, end, "\n".join(lines[cursor - 1:end])))
+    return chunks
+
+
+def split_python(code: str, max_chars: int) -> Optional[List[CodeChunk]]:
+    """按顶层函数和类切分Python代码，语法错误时返回None"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    lines = code.split("\n")
+    chunks: List[CodeChunk] = []
+    cursor = 1
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        node_start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        if node_start > cursor:
+            chunks.append(CodeChunk("module", "block", cursor, node_start - 1,
+                                    "\n".join(lines[cursor - 1:node_start - 1])))
+        chunks.extend(_python_node_chunks(node, lines, "", max_chars))
+        cursor = node.end_lineno + 1
+    if cursor <= len(lines):
+        chunks.append(CodeChunk("module", "block", cursor, len(lines), "\n".join(lines[cursor - 1:])))
+    return [c for c in chunks if c.text.strip()]
+
+
+def _strip_literals(line: str, in_block_comment: bool) -> Tuple[str, bool]:
+    """去掉一行中的字符串、字符字面量和注释，只保留用于统计花括号的代码"""
+    out = []
+    i = 0
+    quote = None
+    while i < len(line):
+        ch = line[i]
+        if in_block_comment:
+            if line.startswith("*/", i):
+                in_block_comment = False
+                i += 2
+                continue
+            i += 1
+            continue
+        if quote:
+            if ch == "\\":
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+            i += 1
+            continue
+        if line.startswith("//", i):
+            break
+        if line.startswith("/*", i):
+            in_block_comment = True
+            i += 2
+            continue
+        if ch in "\"'`":
+            quote = ch
+            i += 1
+            continue
+        out.append(ch)
+        i += 1
+    return "".join(out), in_block_comment
+
+
+def split_braces(code: str) -> List[CodeChunk]:
+    """按花括号深度回到0的位置切分顶层代码块"""
+    lines = code.split("\n")
+    chunks: List[CodeChunk] = []
+    depth = 0
+    start = 1
+    in_block_comment = False
+    opened = False
+    for number, line in enumerate(lines, 1):
+        stripped, in_block_comment = _strip_literals(line, in_block_comment)
+        for ch in stripped:
+            if ch == "{":
+                depth += 1
+                opened = True
+            elif ch == "}":
+                depth = max(0, depth - 1)
+        if depth == 0 and opened:
+            block = lines[start - 1:number]
+            name = _block_name(block, "")
+            kind = "function" if name else "block"
+            chunks.append(CodeChunk(name or "module", kind, start, number, "\n".join(block)))
+            start = number + 1
+            opened = False
+        elif depth == 0 and not opened and not line.strip():
+            # 顶层空行之前的声明（导入、常量等）作为普通块
+            if number > start:
+                block = lines[start - 1:number - 1]
+                chunks.append(CodeChunk(_block_name(block, "module"), "block", start, number - 1, "\n".join(block)))
+            start = number + 1
+    if start <= len(lines):
+        block = lines[start - 1:]
+        chunks.append(CodeChunk(_block_name(block, "module"), "block", start, len(lines), "\n".join(block)))
+    return [c for c in chunks if c.text.strip()]
+
+
+def split_indent(code: str) -> List[CodeChunk]:
+    """按顶格（无缩进）开始的新定义切分，适用于缩进划分代码块的语言"""
+    lines = code.split("\n")
+    chunks: List[CodeChunk] = []
+    start = 1
+    for number, line in enumerate(lines, 1):
+        if number > start and line and not line[0].isspace() and _DEFINITION_PATTERN.match(line):
+            block = lines[start - 1:number - 1]
+            chunks.append(CodeChunk(_block_name(block, "module"), "function" if _DEFINITION_PATTERN.match(block[0]) else "block",
+                                    start, number - 1, "\n".join(block)))
+            start = number
+    block = lines[start - 1:]
+    chunks.append(CodeChunk(_block_name(block, "module"), "function" if block and _DEFINITION_PATTERN.match(block[0]) else "block",
+                            start, len(lines), "\n".join(block)))
+    return [c for c in chunks if c.text.strip()]
+
+
+def split_code(code: str, language: str, max_chars: int, min_chars: int = None) -> List[CodeChunk]:
+    """
+    按语法边界切分代码
+
+    Args:
+        code: 源代码
+        language: 编程语言（小写）
+        max_chars: 每块的最大字符数
+        min_chars: 小于该字符数的零散块并入相邻的块（默认: max_chars的1/8）
+
+    Returns:
+        按行号排序的代码块列表
+    """
+    chunks = None
+    if language == "python":
+        chunks = split_python(code, max_chars)
+    if chunks is None:
+        chunks = split_braces(code) if language in BRACE_LANGUAGES else split_indent(code)
+    return _merge_small(chunks, max_chars, max_chars // 8 if min_chars is None else min_chars)
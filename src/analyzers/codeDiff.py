@@ -0,0 +1,264 @@
+"""
+代码差异
+解析统一差异格式（或比较新旧两个版本），用结构索引把每处修改映射到包含它的函数、方法或类，
+得到需要重新分析的符号列表。未修改的符号不会出现在列表中，分析量只与修改的大小有关。
+"""
+
+import difflib
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.analyzers.codeIndex import CodeIndex, Symbol, index_code
+from src.graph.state import AnalysisRequest, ContentType
+
+# 差异中每处修改前后保留的上下文行数
+CONTEXT_LINES = 3
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)$", re.M)
+
+
+@dataclass(slots=True)
+class Hunk:
+    """差异中的一段修改，行号从1开始"""
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+    section: str = ""  # @@ 行后的函数上下文（git diff 提供）
+    path: str = ""
+    lines: List[str] = field(default_factory=list)  # 以 " "、"-"、"+" 开头的行
+
+    def changed_lines(self) -> Tuple[List[int], List[int]]:
+        """返回 (新版本中新增或修改的行号, 旧版本中删除的行号)"""
+        old, new = self.old_start, self.new_start
+        added, removed = [], []
+        for line in self.lines:
+            tag = line[:1]
+            if tag == "+":
+                added.append(new)
+                new += 1
+            elif tag == "-":
+                removed.append(old)
+                old += 1
+            elif tag != "\\":
+                old += 1
+                new += 1
+        return added, removed
+
+    def side(self, tag: str) -> str:
+        """一侧的代码："-" 为旧版本，"+" 为新版本"""
+        return "\n".join(line[1:] for line in self.lines if line[:1] in (" ", tag))
+
+    @property
+    def text(self) -> str:
+        header = f"@@ -{self.old_start},{self.old_count} +{self.new_start},{self.new_count} @@"
+        return "\n".join([f"{header} {self.section}".rstrip()] + self.lines)
+
+
+@dataclass(slots=True)
+class SymbolChange:
+    """一个被修改的符号（或差异中无法对应到符号的一段修改）"""
+    name: str
+    kind: str  # function | method | class | module | hunk
+    status: str  # modified | added | removed
+    start_line: int  # 新版本中的行号，删除的符号为旧版本中的行号
+    end_line: int
+    old_text: str
+    new_text: str
+
+    def digest(self, language: str = "") -> str:
+        """修改内容的哈希，符号的新旧内容都不变时哈希不变，与符号在文件中的位置无关"""
+        key = f"diff\n{language}\n{self.kind} {self.name}\n{self.old_text}\0{self.new_text}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def diff(self, context: int = CONTEXT_LINES) -> str:
+        """符号新旧内容的统一差异（不含文件头）"""
+        lines = difflib.unified_diff(self.old_text.split("\n") if self.old_text else [],
+                                     self.new_text.split("\n") if self.new_text else [], lineterm="", n=context)
+        return "\n".join(line for line in lines if not line.startswith(("--- ", "+++ ")))
+
+
+def looks_like_diff(text: str) -> bool:
+    """内容是否为统一差异格式"""
+    head = text.lstrip()
+    return head.startswith(("diff --git", "--- ", "@@ ", "Index: ")) and HUNK_HEADER.search(text) is not None
+
+
+def is_diff_request(request: AnalysisRequest) -> bool:
+    """是否为差异模式的代码分析请求：提供了上一版本，或内容是补丁"""
+    return request["content_type"] == ContentType.CODE and (
+        request.get("previous_content") is not None or looks_like_diff(request["content"])
+    )
+
+
+def _diff_path(line: str) -> str:
+    path = line[4:].split("\t", 1)[0].strip()
+    return path[2:] if path.startswith(("a/", "b/")) else path
+
+
+def parse_unified_diff(text: str) -> List[Hunk]:
+    """解析统一差异格式，支持 git diff 和 diff -u 的输出"""
+    hunks: List[Hunk] = []
+    path = ""
+    old_left = new_left = 0
+    for line in text.splitlines():
+        if old_left > 0 or new_left > 0:
+            # 部分工具会去掉空白上下文行行尾的空格
+            line = line or " "
+            tag = line[:1]
+            if tag == "+":
+                new_left -= 1
+            elif tag == "-":
+                old_left -= 1
+            elif tag == " ":
+                old_left -= 1
+                new_left -= 1
+            elif tag != "\\":
+                raise ValueError(f"差异格式错误: {line[:80]}")
+            hunks[-1].lines.append(line)
+            continue
+        match = HUNK_HEADER.match(line)
+        if match:
+            old_start, old_count, new_start, new_count, section = match.groups()
+            old_left = 1 if old_count is None else int(old_count)
+            new_left = 1 if new_count is None else int(new_count)
+            hunks.append(Hunk(int(old_start), old_left, int(new_start), new_left, section.strip(), path))
+        elif line.startswith("+++ "):
+            path = _diff_path(line)
+        elif line.startswith("\\") and hunks:
+            hunks[-1].lines.append(line)
+    if not hunks:
+        raise ValueError("没有找到差异内容（需要统一差异格式）")
+    if old_left > 0 or new_left > 0:
+        raise ValueError("差异内容不完整")
+    return hunks
+
+
+def diff_hunks(old: str, new: str, context: int = CONTEXT_LINES) -> List[Hunk]:
+    """比较新旧两个版本，返回修改列表；内容相同时返回空列表"""
+    lines = difflib.unified_diff(old.split("\n"), new.split("\n"), lineterm="", n=context)
+    text = "\n".join(lines)
+    return parse_unified_diff(text) if text else []
+
+
+def apply_hunks(old: str, hunks: List[Hunk]) -> str:
+    """把差异应用到旧版本，上下文或删除的行与旧版本不一致时抛出 ValueError"""
+    if len({hunk.path for hunk in hunks}) > 1:
+        raise ValueError("差异包含多个文件，只能应用到一个文件的上一版本")
+    lines = old.split("\n")
+    output: List[str] = []
+    position = 0
+    for hunk in sorted(hunks, key=lambda h: h.old_start):
+        # 旧版本行数为0时，old_start 是插入位置之前的行号
+        start = hunk.old_start - 1 if hunk.old_count else hunk.old_start
+        if start < position:
+            raise ValueError(f"差异中的修改重叠（第{hunk.old_start}行）")
+        output.extend(lines[position:start])
+        position = start
+        for line in hunk.lines:
+            tag, body = line[:1], line[1:]
+            if tag == "+":
+                output.append(body)
+            elif tag in (" ", "-"):
+                if position >= len(lines) or lines[position] != body:
+                    raise ValueError(f"差异与上一版本不一致（第{position + 1}行）")
+                if tag == " ":
+                    output.append(body)
+                position += 1
+    output.extend(lines[position:])
+    return "\n".join(output)
+
+
+def enclosing_symbol(index: CodeIndex, line: int) -> Optional[Symbol]:
+    """包含该行的最内层函数、方法或类"""
+    best = None
+    for symbol in index.symbols:
+        if symbol.kind != "import" and symbol.start_line <= line <= symbol.end_line:
+            if best is None or symbol.start_line >= best.start_line:
+                best = symbol
+    return best
+
+
+def hunk_changes(hunks: List[Hunk]) -> List[SymbolChange]:
+    """没有上一版本时，每段修改作为一个分析单元，用差异自带的函数上下文命名"""
+    changes = []
+    for hunk in hunks:
+        name = hunk.section or f"{hunk.path or 'code'}:{hunk.new_start}"
+        old_text, new_text = hunk.side("-"), hunk.side("+")
+        status = "added" if not hunk.old_count else ("removed" if not hunk.new_count else "modified")
+        changes.append(SymbolChange(name, "hunk", status, hunk.new_start,
+                                    hunk.new_start + max(hunk.new_count, 1) - 1, old_text, new_text))
+    return changes
+
+
+def _symbol_text(lines: List[str], symbol: Symbol) -> str:
+    return "\n".join(lines[symbol.start_line - 1:symbol.end_line])
+
+
+def collect_changes(old: str, new: str, hunks: List[Hunk], language: Optional[str] = None
+                    ) -> Tuple[List[SymbolChange], CodeIndex, int]:
+    """
+    把修改映射到包含它的符号
+
+    Returns:
+        (被修改的符号列表, 新版本的结构索引, 未修改的函数和类的数量)
+    """
+    new_index = index_code(new, language)
+    old_index = index_code(old, new_index.language)
+    new_lines, old_lines = new.split("\n"), old.split("\n")
+    old_by_name: Dict[Tuple[str, str], Symbol] = {}
+    for symbol in old_index.symbols:
+        old_by_name.setdefault((symbol.name, symbol.kind), symbol)
+    new_by_name: Dict[Tuple[str, str], Symbol] = {}
+    for symbol in new_index.symbols:
+        new_by_name.setdefault((symbol.name, symbol.kind), symbol)
+
+    touched_new: Dict[Tuple[str, str], Symbol] = {}
+    removed_old: Dict[Tuple[str, str], Symbol] = {}
+    module_hunks: List[Hunk] = []
+    for hunk in hunks:
+        added, removed = hunk.changed_lines()
+        module_level = False
+        for line in added:
+            symbol = enclosing_symbol(new_index, line)
+            if symbol is None:
+                module_level = True
+            else:
+                touched_new[(symbol.name, symbol.kind)] = symbol
+        for line in removed:
+            symbol = enclosing_symbol(old_index, line)
+            if symbol is None:
+                module_level = True
+            elif (symbol.name, symbol.kind) in new_by_name:
+                key = (symbol.name, symbol.kind)
+                touched_new.setdefault(key, new_by_name[key])
+            else:
+                removed_old[(symbol.name, symbol.kind)] = symbol
+        if module_level:
+            module_hunks.append(hunk)
+
+    changes = []
+    for key, symbol in sorted(touched_new.items(), key=lambda item: item[1].start_line):
+        previous = old_by_name.get(key)
+        old_text = _symbol_text(old_lines, previous) if previous else ""
+        new_text = _symbol_text(new_lines, symbol)
+        if old_text != new_text:
+            changes.append(SymbolChange(symbol.name, symbol.kind, "modified" if previous else "added",
+                                        symbol.start_line, symbol.end_line, old_text, new_text))
+    for key, symbol in sorted(removed_old.items(), key=lambda item: item[1].start_line):
+        changes.append(SymbolChange(symbol.name, symbol.kind, "removed", symbol.start_line, symbol.end_line,
+                                    _symbol_text(old_lines, symbol), ""))
+    for hunk in module_hunks:
+        changes.append(SymbolChange("module", "module", "modified", hunk.new_start,
+                                    hunk.new_start + max(hunk.new_count, 1) - 1, hunk.side("-"), hunk.side("+")))
+
+    # 包含被修改方法的类也算作被修改
+    changed = [(c.start_line, c.end_line) for c in changes if c.status != "removed"]
+    untouched = sum(
+        1 for s in new_index.symbols
+        if s.kind != "import" and (s.name, s.kind) not in touched_new
+        and not any(s.start_line <= start and end <= s.end_line for start, end in changed)
+    )
+    return changes, new_index, untouched
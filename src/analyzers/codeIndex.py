@@ -0,0 +1,567 @@
+"""
+代码结构索引
+一次遍历代码建立符号表（函数、类和导入及其行号范围），圈复杂度（以及按缩进划分的语言的嵌套深度）
+在第一次需要时（measure()）按函数范围统计，只需要符号和行号范围的调用方（如差异分析）不必付出这部分开销。
+Python使用ast，其他语言在去掉字符串和注释后用正则做轻量词法扫描；未指定语言时根据词频统计检测。
+"""
+
+import ast
+import heapq
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.analyzers.codeChunker import BRACE_LANGUAGES
+
+# 各语言的特征词及权重，只统计完整的词法单元（"fn"不会匹配"function"）
+LANGUAGE_TOKENS: Dict[str, Dict[str, int]] = {
+    "python": {"def": 3, "elif": 5, "self": 2, "None": 2, "lambda": 2, "except": 3, "pass": 2,
+               "__name__": 5, "__init__": 5, "import": 1, "from": 1, "True": 1, "False": 1},
+    "javascript": {"function": 3, "const": 2, "let": 1, "var": 2, "=>": 2, "===": 5, "!==": 5, "console": 4,
+                   "require": 3, "undefined": 4, "typeof": 3, "export": 2, "await": 1},
+    "java": {"public": 2, "private": 2, "protected": 2, "void": 2, "extends": 2, "implements": 3, "System": 4,
+             "String": 2, "throws": 4, "@Override": 5, "final": 1, "new": 1, "package": 1},
+    "cpp": {"#include": 6, "std": 4, "cout": 4, "namespace": 3, "template": 4, "nullptr": 5, "#define": 4,
+            "unsigned": 3, "typedef": 3, "::": 1},
+    "go": {"package": 3, "func": 4, ":=": 4, "nil": 3, "fmt": 4, "chan": 4, "defer": 5, "range": 2},
+    "ruby": {"end": 2, "elsif": 5, "puts": 4, "require": 2, "attr_accessor": 5, "nil": 2, "unless": 3, "do": 1},
+    "rust": {"fn": 4, "mut": 4, "impl": 4, "pub": 2, "crate": 5, "trait": 4, "&self": 5, "unwrap": 4,
+             "println!": 5, "Some": 3, "Ok": 2, "Err": 2, "match": 2, "let": 1, "use": 1},
+}
+
+# 语言检测只统计开头这么多字符
+_DETECT_CHARS = 200_000
+_LANGUAGE_TOKEN = re.compile(r"#\w+|@\w+|&self|\w+!|[A-Za-z_]\w*|:=|=>|===|!==|::")
+
+_C_STRIP = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|`(?:\\.|[^`\\])*`|\'(?:\\.|[^\'\\\n])\'', re.S)
+_JS_STRIP = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|`(?:\\.|[^`\\])*`|\'(?:\\.|[^\'\\\n])*\'', re.S)
+_HASH_STRIP = re.compile(r'"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|#[^\n]*|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'')
+_JS_LIKE = {"javascript", "typescript", "php", "dart"}
+
+# 超过该行数的Python代码不再使用ast（解析耗时随文件大小增长过快），改用缩进扫描
+AST_MAX_LINES = 5000
+
+_MODIFIERS = (r"(?:(?:export|default|pub(?:\([^)\n]*\))?|public|private|protected|internal|static|async|abstract|"
+              r"final|override|virtual|inline|extern|unsafe|open|sealed|data)[ \t]+)*")
+# 在候选行的行首匹配（re.M），各部分都不跨越换行
+_BRACE_DEF = re.compile(
+    # 关键字定义：function foo / func (r *T) foo / fn foo / class Foo / struct Foo ...
+    r"^(?:[ \t]*" + _MODIFIERS +
+    r"(?P<kw>function\*?|func|fn|fun|def|class|struct|interface|enum|impl|trait|object|record|union|type)[ \t]+"
+    r"(?:\([^)\n]*\)[ \t]*)?(?P<name>[\w$]+)"
+    # 箭头函数：const foo = (...) =>
+    r"|[ \t]*(?:export[ \t]+)?(?:const|let|var)[ \t]+(?P<arrow>[\w$]+)[ \t]*=[ \t]*(?:async[ \t]*)?"
+    r"(?:\([^)\n]*\)|[\w$]+)[ \t]*=>"
+    # 带返回类型的函数：int main(void) / public static void run(String[] args) throws X
+    r"|[ \t]*(?!(?:return|else|new|throw|case|await|yield|go|defer|delete)\b)(?:[\w:<>,\[\]*&]+[ \t]+)+\**"
+    r"(?!(?:if|for|foreach|while|switch|catch|sizeof)\b)(?P<cname>[A-Za-z_]\w*)[ \t]*\([^;{}\n]*\)[ \t\w,.]*(?:\{|$)"
+    # 类中的方法：render() { / async load(id) {
+    r"|[ \t]+(?:(?:async|static|get|set)[ \t]+)*(?!(?:if|for|foreach|while|switch|catch|function)\b)"
+    r"(?P<mname>[A-Za-z_$][\w$]*)[ \t]*\([^;{}\n]*\)[ \t]*(?::[^{\n]*)?\{)",
+    re.M,
+)
+_BRACES = re.compile(r"[{}]")
+_BRACE_IMPORTS = re.compile(r"^[ \t]*(?:import |using |use |#include|#import|require)", re.M)
+# 可能是定义或导入的行中一定出现的字符串，先用它们找出候选行，只在候选行上匹配上面的正则
+_BRACE_DEF_HINT = re.compile(r"\(|=>|function|func|fn|fun|def|class|struct|interface|enum|impl|trait|object|record|"
+                             r"union|type")
+_BRACE_IMPORT_HINT = re.compile(r"import |using |use |#include|#import|require")
+_BRACE_BRANCH = re.compile(r"\b(?:if|for|foreach|while|case|catch)\b|&&|\|\|")
+_CLASS_KEYWORDS = {"class", "struct", "interface", "enum", "impl", "trait", "object", "record", "union", "type"}
+
+_INDENT_DEF = re.compile(r"^([ \t]*)(?:(?:async|export|public|private|protected|static)[ \t]+)*"
+                         r"(def|class|function|func|fn|fun|sub|module|proc)[ \t]+([\w$.:?!]+)", re.M)
+_INDENT_IMPORTS = re.compile(r"^(?:import |from |require |require_relative |use |using |include |source )", re.M)
+_INDENT_DEF_HINT = re.compile(r"def|class|function|func|fn|fun|sub|module|proc")
+_INDENT_IMPORT_HINT = re.compile(r"import |from |require |use |using |include |source ")
+_INDENT_BRANCH = re.compile(r"\b(?:if|elif|elsif|for|while|until|unless|except|rescue|case|when|and|or)\b|&&|\|\|")
+
+
+@dataclass(slots=True)
+class Symbol:
+    """符号表中的一项，行号从1开始"""
+    name: str
+    kind: str  # function | method | class | import
+    start_line: int
+    end_line: int
+    signature: str
+    complexity: int = 1  # 扫描建立的索引在 measure() 之后才有效
+    depth: int = 0  # 函数体内代码块的最大嵌套深度
+
+
+@dataclass(slots=True)
+class CodeIndex:
+    """一段代码的结构索引"""
+    language: str
+    lines: int
+    symbols: List[Symbol]
+    # 尚未统计时保存 (去掉字符串和注释后的代码, 分支模式, 是否按缩进统计嵌套深度)，measure() 之后释放
+    _pending: Optional[Tuple[str, "re.Pattern", bool]] = field(default=None, repr=False, compare=False)
+
+    def measure(self) -> "CodeIndex":
+        """
+        统计每个函数的圈复杂度和（按缩进划分的语言的）嵌套深度，只在第一次调用时计算，返回索引本身
+
+        每个函数只扫描自己的范围（定义行之后到结束行），再减去直接嵌套的函数中的分支。
+        """
+        if self._pending is None:
+            return self
+        text, pattern, indented = self._pending
+        self._pending = None
+        if indented:
+            _indent_depths(text, self.symbols)
+        offsets = [0]
+        for line in text.split("\n"):
+            offsets.append(offsets[-1] + len(line) + 1)
+
+        def branches(symbol: Symbol) -> int:
+            return len(pattern.findall(text, offsets[symbol.start_line], offsets[symbol.end_line]))
+
+        functions = sorted(self.functions, key=lambda f: (f.start_line, -f.end_line))
+        open_functions: List[Symbol] = []
+        for function in functions:
+            while open_functions and open_functions[-1].end_line < function.start_line:
+                open_functions.pop()
+            count = branches(function)
+            function.complexity = 1 + count
+            if open_functions:
+                open_functions[-1].complexity -= count
+            open_functions.append(function)
+        return self
+
+    @property
+    def functions(self) -> List[Symbol]:
+        return [s for s in self.symbols if s.kind in ("function", "method")]
+
+    @property
+    def classes(self) -> List[Symbol]:
+        return [s for s in self.symbols if s.kind == "class"]
+
+    @property
+    def imports(self) -> List[Symbol]:
+        return [s for s in self.symbols if s.kind == "import"]
+
+    def rating(self) -> str:
+        """根据最大圈复杂度、嵌套深度和函数数量评估整体复杂度"""
+        functions = self.measure().functions
+        worst = max((f.complexity for f in functions), default=1)
+        depth = max((f.depth for f in functions), default=0)
+        if worst > 15 or depth > 4 or len(functions) > 50:
+            return "complex"
+        if worst > 7 or depth > 2 or len(functions) > 15:
+            return "medium"
+        return "simple"
+
+    def hotspots(self, limit: int = 5) -> List[Symbol]:
+        """圈复杂度最高的函数"""
+        return sorted(self.measure().functions, key=lambda f: (-f.complexity, -f.depth, f.start_line))[:limit]
+
+    def structure(self) -> Dict[str, Any]:
+        """代码结构信息（可JSON序列化），保留旧版的 functions/classes/imports/lines/complexity 字段"""
+        functions = self.measure().functions
+        return {
+            "functions": [f.signature for f in functions],
+            "classes": [c.signature for c in self.classes],
+            "imports": [i.signature for i in self.imports],
+            "lines": self.lines,
+            "complexity": self.rating(),
+            "max_cyclomatic": max((f.complexity for f in functions), default=0),
+            "max_nesting": max((f.depth for f in functions), default=0),
+            "hotspots": [f.name for f in self.hotspots() if f.complexity > 1],
+        }
+
+    def outline(self, limit: int = 60) -> str:
+        """符号概览，每行一个函数或类"""
+        self.measure()
+        entries = [s for s in self.symbols if s.kind != "import"]
+        text = [
+            f"L{s.start_line}-{s.end_line} {s.kind} {s.name}"
+            + (f" (圈复杂度{s.complexity}, 嵌套{s.depth})" if s.kind != "class" else "")
+            for s in entries[:limit]
+        ]
+        if len(entries) > limit:
+            text.append(f"... 另有{len(entries) - limit}个符号")
+        return "\n".join(text)
+
+    def excerpt(self, code: str, max_chars: int) -> str:
+        """
+        在字符预算内摘取最值得分析的代码：导入语句和复杂度最高的函数，按原顺序排列
+
+        Args:
+            code: 建立索引时使用的源代码
+            max_chars: 摘录的最大字符数
+        """
+        lines = code.split("\n")
+        self.measure()
+        imports = self.imports[:20]
+        header = "\n".join(i.signature for i in imports)
+        budget = max_chars - len(header)
+        chosen: List[Symbol] = []
+        for function in sorted(self.functions, key=lambda f: (-f.complexity, -f.depth, f.start_line)):
+            if any(c.start_line <= function.end_line and function.start_line <= c.end_line for c in chosen):
+                continue
+            size = sum(len(line) + 1 for line in lines[function.start_line - 1:function.end_line])
+            if size <= budget:
+                chosen.append(function)
+                budget -= size + 5
+        if not chosen:
+            return (header + "\n" if header else "") + code[:max(0, budget)]
+        parts = [header] if header else []
+        parts.extend("\n".join(lines[f.start_line - 1:f.end_line]) for f in sorted(chosen, key=lambda f: f.start_line))
+        return "\n...\n".join(parts)
+
+
+def detect_language(code: str) -> str:
+    """根据特征词的出现次数检测编程语言，无法判断时返回 "unknown" """
+    counts = Counter(_LANGUAGE_TOKEN.findall(code[:_DETECT_CHARS]))
+    scores = {
+        language: sum(weight * min(counts[token], 10) for token, weight in tokens.items())
+        for language, tokens in LANGUAGE_TOKENS.items()
+    }
+    language, score = max(scores.items(), key=lambda item: item[1])
+    return language if score >= 4 else "unknown"
+
+
+class _PythonIndexer(ast.NodeVisitor):
+    """遍历一次Python语法树，建立符号表并统计复杂度"""
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self.symbols: List[Symbol] = []
+        self.scope: List[Symbol] = []
+        self.depth = 0
+
+    def _function(self) -> Optional[Symbol]:
+        return self.scope[-1] if self.scope and self.scope[-1].kind != "class" else None
+
+    def _branch(self, amount: int = 1):
+        function = self._function()
+        if function is not None:
+            function.complexity += amount
+
+    def _nested(self, nodes: List[ast.AST]):
+        self.depth += 1
+        function = self._function()
+        if function is not None and function.depth < self.depth:
+            function.depth = self.depth
+        for node in nodes:
+            self.visit(node)
+        self.depth -= 1
+
+    def _define(self, node, kind: str):
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        prefix = ".".join(s.name.rsplit(".", 1)[-1] for s in self.scope)
+        name = f"{prefix}.{node.name}" if prefix else node.name
+        symbol = Symbol(name, kind, start, node.end_lineno, self.lines[node.lineno - 1].strip())
+        self.symbols.append(symbol)
+        saved = self.depth
+        self.scope.append(symbol)
+        self.depth = 0
+        self.generic_visit(node)
+        self.scope.pop()
+        self.depth = saved
+
+    def visit_ClassDef(self, node):
+        self._define(node, "class")
+
+    def visit_FunctionDef(self, node):
+        self._define(node, "method" if self.scope and self.scope[-1].kind == "class" else "function")
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Import(self, node):
+        name = ", ".join(alias.name for alias in node.names)
+        self.symbols.append(Symbol(name, "import", node.lineno, node.end_lineno, self.lines[node.lineno - 1].strip()))
+
+    def visit_ImportFrom(self, node):
+        name = "." * node.level + (node.module or "")
+        self.symbols.append(Symbol(name, "import", node.lineno, node.end_lineno, self.lines[node.lineno - 1].strip()))
+
+    def visit_If(self, node):
+        self._branch()
+        self.visit(node.test)
+        self._nested(node.body)
+        if len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
+            # elif 与 if 处于同一嵌套层级
+            self.visit_If(node.orelse[0])
+        elif node.orelse:
+            self._nested(node.orelse)
+
+    def visit_For(self, node):
+        self._branch()
+        self.visit(node.iter)
+        self._nested(node.body + node.orelse)
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        self._branch()
+        self.visit(node.test)
+        self._nested(node.body + node.orelse)
+
+    def visit_Try(self, node):
+        self._branch(len(node.handlers))
+        self._nested(node.body + node.handlers + node.orelse + node.finalbody)
+
+    visit_TryStar = visit_Try
+
+    def visit_With(self, node):
+        self._nested(node.items + node.body)
+
+    visit_AsyncWith = visit_With
+
+    def visit_Match(self, node):
+        self._branch(len(node.cases))
+        self.visit(node.subject)
+        self._nested(node.cases)
+
+    def visit_IfExp(self, node):
+        self._branch()
+        self.generic_visit(node)
+
+    def visit_BoolOp(self, node):
+        self._branch(len(node.values) - 1)
+        self.generic_visit(node)
+
+    def visit_comprehension(self, node):
+        self._branch(1 + len(node.ifs))
+        self.generic_visit(node)
+
+
+def _index_python(code: str) -> Optional[CodeIndex]:
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    lines = code.split("\n")
+    indexer = _PythonIndexer(lines)
+    indexer.visit(tree)
+    symbols = sorted(indexer.symbols, key=lambda s: s.start_line)
+    return CodeIndex("python", len(lines), symbols)
+
+
+def _blank_literals(match: "re.Match") -> str:
+    # 保留换行，使去掉字面量后的行号与原代码一致
+    return "\n" * match.group().count("\n")
+
+
+def _line_counter(text: str):
+    """返回按位置递增调用的行号函数，只统计两次调用之间的换行"""
+    position, number = 0, 1
+
+    def line_at(offset: int) -> int:
+        nonlocal position, number
+        number += text.count("\n", position, offset)
+        position = offset
+        return number
+
+    return line_at
+
+
+def _candidate_lines(text: str, hint: "re.Pattern") -> List[int]:
+    """包含 hint 的行的行首位置，按顺序排列；找到一处后直接跳到下一行继续查找"""
+    starts = []
+    position = 0
+    while True:
+        match = hint.search(text, position)
+        if match is None:
+            return starts
+        starts.append(text.rfind("\n", 0, match.start()) + 1)
+        position = text.find("\n", match.start())
+        if position < 0:
+            return starts
+
+
+def _line_text(text: str, offset: int) -> str:
+    """从 offset 到行尾的内容"""
+    end = text.find("\n", offset)
+    return text[offset:] if end < 0 else text[offset:end]
+
+
+def _index_braces(code: str, language: str) -> CodeIndex:
+    """
+    在去掉字符串和注释后的代码中找出定义和导入所在的行，再按位置顺序处理花括号确定符号范围
+
+    只有候选行、定义和花括号由Python逐个处理，其余代码由正则引擎扫描，不逐行循环。
+    """
+    text = (_JS_STRIP if language in _JS_LIKE else _C_STRIP).sub(_blank_literals, code)
+    original = code.split("\n")
+    line_at = _line_counter(text)
+
+    imports = [(start, 0, None) for start in _candidate_lines(text, _BRACE_IMPORT_HINT)
+               if _BRACE_IMPORTS.match(text, start)]
+    definitions = []
+    for start in _candidate_lines(text, _BRACE_DEF_HINT):
+        line = _line_text(text, start)
+        # 以分号结尾的普通语句不是定义（单行箭头函数除外）
+        if line.endswith(";") and "=>" not in line:
+            continue
+        match = _BRACE_DEF.match(text, start)
+        if match:
+            definitions.append((start, 1, match))
+    # (位置, 顺序, 事件)：同一位置先处理导入，再处理定义，最后处理花括号
+    events = heapq.merge(imports, definitions, [(m.start(), 2, m.group()) for m in _BRACES.finditer(text)])
+    symbols: List[Symbol] = []
+    open_symbols: List[tuple] = []  # (符号, 符号体的花括号深度)
+    function: Optional[tuple] = None  # 当前所在的最内层函数
+    pending: Optional[Symbol] = None
+    depth = 0
+    skip_until = -1  # 导入语句所在行的结束位置，这一行的其他内容不再处理
+
+    for position, order, event in events:
+        if position < skip_until:
+            continue
+        if order == 0:
+            if depth == 0:
+                number = line_at(position)
+                signature = original[number - 1].strip()
+                name = signature.split(None, 1)[-1].rstrip(";").strip(" (") or signature
+                symbols.append(Symbol(name, "import", number, number, signature))
+                skip_until = position + len(_line_text(text, position))
+        elif order == 1:
+            number = line_at(position)
+            name = event.group("name") or event.group("arrow") or event.group("cname") or event.group("mname")
+            kind = "class" if event.group("kw") in _CLASS_KEYWORDS else "function"
+            owner = open_symbols[-1][0] if open_symbols else None
+            if kind == "function" and owner is not None and owner.kind == "class":
+                kind, name = "method", f"{owner.name}.{name}"
+            symbol = Symbol(name, kind, number, number, original[number - 1].strip())
+            if event.group("arrow") and "{" not in _line_text(text, position):
+                # 单行箭头函数没有函数体
+                symbols.append(symbol)
+            else:
+                pending = symbol
+        elif event == "{":
+            depth += 1
+            if pending is not None:
+                symbols.append(pending)
+                open_symbols.append((pending, depth))
+                if pending.kind != "class":
+                    function = (pending, depth)
+                pending = None
+            elif function is not None and function[0].depth < depth - function[1]:
+                function[0].depth = depth - function[1]
+        else:
+            if open_symbols and open_symbols[-1][1] == depth:
+                open_symbols.pop()[0].end_line = line_at(position)
+                function = next((e for e in reversed(open_symbols) if e[0].kind != "class"), None)
+            depth = max(0, depth - 1)
+    for symbol, _ in open_symbols:
+        symbol.end_line = len(original)
+    symbols.sort(key=lambda s: s.start_line)
+    return CodeIndex(language, len(original), symbols, (text, _BRACE_BRANCH, False))
+
+
+# 查找缩进不大于定义行的下一个非空行的正则，按定义行的缩进缓存
+_DEDENT: Dict[int, "re.Pattern"] = {}
+
+
+def _index_indent(code: str, language: str) -> CodeIndex:
+    """
+    按缩进确定符号范围，适用于大型Python文件、Ruby、Shell等语言
+
+    定义和导入只在候选行的行首匹配；符号在之后第一个缩进不大于定义行的非空行之前结束（Ruby等语言中
+    缩进相同的 end 行属于符号），同样由正则查找而不逐行扫描。嵌套深度在 measure() 中统计。
+    """
+    text = _HASH_STRIP.sub(_blank_literals, code)
+    original = code.split("\n")
+    line_at = _line_counter(text)
+
+    symbols: List[Symbol] = []
+    open_symbols: List[Symbol] = []
+    for line_start in _candidate_lines(text, _INDENT_DEF_HINT):
+        match = _INDENT_DEF.match(text, line_start)
+        if match is None:
+            continue
+        indent, keyword, name = match.groups()
+        start = line_at(match.start())
+        dedent = _DEDENT.get(len(indent))
+        if dedent is None:
+            dedent = _DEDENT[len(indent)] = re.compile(r"\n([ \t]{0,%d})(?=\S)" % len(indent))
+        closing = dedent.search(text, match.end())
+        if closing is not None and len(closing.group(1)) == len(indent) \
+                and _line_text(text, closing.end()).rstrip() == "end":
+            end = start + text.count("\n", match.start(), closing.end())
+        else:
+            # 最后一个非空行
+            offset = closing.start() if closing is not None else len(text)
+            while offset > match.end() and text[offset - 1] in " \t\r\n":
+                offset -= 1
+            end = start + text.count("\n", match.start(), offset)
+
+        while open_symbols and open_symbols[-1].end_line < start:
+            open_symbols.pop()
+        kind = "class" if keyword in ("class", "module") else "function"
+        owner = open_symbols[-1] if open_symbols else None
+        if kind == "function" and owner is not None and owner.kind == "class":
+            kind, name = "method", f"{owner.name}.{name}"
+        symbol = Symbol(name, kind, start, end, original[start - 1].strip())
+        symbols.append(symbol)
+        open_symbols.append(symbol)
+
+    line_at = _line_counter(text)
+    for line_start in _candidate_lines(text, _INDENT_IMPORT_HINT):
+        if not _INDENT_IMPORTS.match(text, line_start):
+            continue
+        number = line_at(line_start)
+        signature = original[number - 1].strip()
+        symbols.append(Symbol(signature.split(None, 1)[-1], "import", number, number, signature))
+    symbols.sort(key=lambda s: s.start_line)
+    return CodeIndex(language, len(original), symbols, (text, _INDENT_BRANCH, True))
+
+
+def _indent_depths(text: str, symbols: List[Symbol]):
+    """逐行统计按缩进划分的语言中每个函数的最大嵌套深度"""
+    starts = {s.start_line: s for s in symbols if s.kind != "import"}
+    open_symbols: List[tuple] = []  # (符号, 定义行的缩进, 定义行所在的缩进层数)
+    function: Optional[tuple] = None
+    indents: List[int] = []
+    for number, line in enumerate(text.split("\n"), 1):
+        content = line.lstrip()
+        if not content:
+            continue
+        indent = len(line) - len(content)
+        if open_symbols and indent <= open_symbols[-1][1]:
+            while open_symbols and indent <= open_symbols[-1][1]:
+                open_symbols.pop()
+            function = next((e for e in reversed(open_symbols) if e[0].kind != "class"), None)
+        while indents and indents[-1] >= indent:
+            indents.pop()
+        indents.append(indent)
+
+        symbol = starts.get(number)
+        if symbol is not None:
+            open_symbols.append((symbol, indent, len(indents)))
+            if symbol.kind != "class":
+                function = open_symbols[-1]
+            continue
+        if function is not None:
+            symbol, _, levels = function
+            if symbol.depth < len(indents) - levels - 1:
+                symbol.depth = len(indents) - levels - 1
+
+
+def index_code(code: str, language: Optional[str] = None, measure: bool = False) -> CodeIndex:
+    """
+    建立代码结构索引
+
+    Args:
+        code: 源代码
+        language: 编程语言，未指定或为 "unknown" 时自动检测
+        measure: 是否立即统计圈复杂度（索引需要传给其他进程时使用），否则在第一次需要时统计
+
+    Returns:
+        包含符号表和行号范围的索引
+    """
+    language = (language or "").lower()
+    if not language or language == "unknown":
+        language = detect_language(code)
+    if language == "python":
+        index = _index_python(code) if code.count("\n") < AST_MAX_LINES else None
+        index = index if index is not None else _index_indent(code, language)
+    elif language in BRACE_LANGUAGES or (language == "unknown" and code.count("{") * 20 > code.count("\n")):
+        index = _index_braces(code, language)
+    else:
+        index = _index_indent(code, language)
+    return index.measure() if measure else index
@@ -5,13 +5,36 @@
 集成到现有的多模态内容分析框架中
 """
 
+import logging
 import re
 import requests
 from typing import Dict, Any, List, Tuple
 from urllib.parse import urlparse
+from src.config import config
 from src.graph.state import ForumData, ProcessedForumData, ContentType
 from src.analyzers.base import ContentAnalyzer
+from src.analyzers.imageProbe import decorative_reason
+from src.analyzers.providerResult import ProviderResult
 from src.analyzers.urlAnalyzer import URLAnalyzer
+from src.utils import metrics
+from src.utils.urlCanonical import get_redirect_resolver, unique_urls, url_key
+
+logger = logging.getLogger(__name__)
+
+# 正文中的链接后面常紧跟标点，不属于链接
+TRAILING_PUNCTUATION = ".,;:!?'\"，。；：！？、）》」】"
+
+
+def trim_link(link: str) -> str:
+    """去掉链接末尾的标点；括号只在不成对时去掉（如维基百科的 Foo_(bar)）"""
+    while link:
+        if link[-1] in TRAILING_PUNCTUATION:
+            link = link[:-1]
+        elif link[-1] == ")" and link.count("(") < link.count(")"):
+            link = link[:-1]
+        else:
+            break
+    return link
 
 
 class ForumDataPreprocessor:
@@ -49,9 +72,9 @@ class ForumDataPreprocessor:
             for match in matches:
                 # 排除已经识别为图片的链接
                 if not any(img_ext in match.lower() for img_ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']):
-                    links.append(match)
+                    links.append(trim_link(match))
         
-        return list(set(links)), list(set(images))
+        return unique_urls(links), unique_urls(images)
     
     def preprocess_forum_data(self, forum_data: ForumData) -> ProcessedForumData:
         """预处理论坛数据"""
@@ -96,9 +119,9 @@ class ForumDataPreprocessor:
             # 提取额外的链接和图片
             extracted_links, extracted_images = self.extract_links_and_images(text_content)
             
-            # 合并所有链接和图片
-            all_post_links = list(set(post_links + extracted_links))
-            all_post_images = list(set(post_images + extracted_images))
+            # 合并所有链接和图片（按规范化后的地址去重，保持出现顺序）
+            all_post_links = unique_urls(post_links + extracted_links)
+            all_post_images = unique_urls(post_images + extracted_images)
             
             processed_data["content_summary"]["all_links"].extend(all_post_links)
             processed_data["content_summary"]["all_images"].extend(all_post_images)
@@ -121,8 +144,8 @@ class ForumDataPreprocessor:
         
         # 去重和整理
         processed_data["content_summary"]["key_users"] = list(processed_data["content_summary"]["key_users"])
-        processed_data["content_summary"]["all_links"] = list(set(processed_data["content_summary"]["all_links"]))
-        processed_data["content_summary"]["all_images"] = list(set(processed_data["content_summary"]["all_images"]))
+        processed_data["content_summary"]["all_links"] = unique_urls(processed_data["content_summary"]["all_links"])
+        processed_data["content_summary"]["all_images"] = unique_urls(processed_data["content_summary"]["all_images"])
         
         return processed_data
 
@@ -190,29 +213,91 @@ class ForumAnalyzer(ContentAnalyzer):
                 "confidence": 0.0
             }
     
+    def analyze_links(self, links: List[str], budget: int = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        按顺序分析链接，直到分析了 budget 个不同的网页
+        
+        短链接先解析跳转目标；规范化后地址相同、重定向到已分析的地址或正文与已分析网页相同的链接
+        记为重复，不占用名额。
+        
+        Returns:
+            (链接分析列表, 重复的链接数)
+        """
+        budget = config.forum_link_budget if budget is None else budget
+        resolver = get_redirect_resolver()
+        seen = set()
+        by_digest: Dict[str, Dict[str, Any]] = {}
+        analyses = []
+        duplicates = 0
+        for link in links:
+            if len(analyses) >= budget:
+                break
+            if not self._is_valid_url(link):
+                continue
+            url = resolver.resolve(link)
+            if url_key(url) in seen:
+                duplicates += 1
+                continue
+            seen.add(url_key(url))
+            try:
+                page = self.url_analyzer.fetch_page(url)
+            except Exception as e:
+                logger.warning(f"⚠️ 链接抓取失败 {url}: {str(e)}")
+                failure = ProviderResult(provider="none", text=f"无法获取URL内容: {str(e)}")
+                analyses.append({"url": url, "analysis": self.url_analyzer.build_result(url, failure, True)})
+                continue
+            # 重定向到已分析的地址，或正文与已分析的网页相同
+            digest = page.digest if page.text.strip() else None
+            key = url_key(page.url)
+            if key != url_key(url) and key in seen or digest in by_digest:
+                if digest in by_digest:
+                    by_digest[digest].setdefault("aliases", []).append(url)
+                duplicates += 1
+                continue
+            seen.add(key)
+            entry = {"url": url, "analysis": self.url_analyzer.analyze_page(url, page)}
+            if digest:
+                by_digest[digest] = entry
+            analyses.append(entry)
+        if duplicates:
+            logger.info(f"🔗 跳过 {duplicates} 个重复链接")
+        return analyses, duplicates
+    
     def create_media_analysis_requests(self, processed_data: ProcessedForumData) -> List[Dict[str, Any]]:
         """创建媒体内容分析请求"""
         analysis_requests = []
         summary = processed_data["content_summary"]
         topic_title = processed_data["topic_info"]["title"]
         
-        # 分析重要链接 - 使用URL workflow
-        for i, link in enumerate(summary['all_links'][:3]):  # 只分析前3个链接
-            if self._is_valid_url(link):
-                analysis_requests.append({
-                    "content": link,
-                    "content_type": ContentType.URL,
-                    "context": f"论坛讨论中的外部链接 #{i+1}: {topic_title}"
-                })
+        # 分析重要链接 - 使用URL workflow（与 analyze_links 一样，短链接先解析跳转目标，
+        # 跟踪参数不同或指向同一地址的链接不占用名额）
+        resolver = get_redirect_resolver()
+        links = []
+        seen = set()
+        for link in unique_urls(summary['all_links']):
+            if len(links) >= config.forum_link_budget:  # 只分析前几个链接
+                break
+            if not self._is_valid_url(link):
+                continue
+            url = resolver.resolve(link)
+            if url_key(url) not in seen:
+                seen.add(url_key(url))
+                links.append(url)
+        for i, link in enumerate(links):
+            analysis_requests.append({
+                "content": link,
+                "content_type": ContentType.URL,
+                "context": f"论坛讨论中的外部链接 #{i+1}: {topic_title}"
+            })
         
-        # 分析重要图片 - 使用Image workflow  
-        for i, img_url in enumerate(summary['all_images'][:2]):  # 只分析前2张图片
-            if self._is_valid_image_url(img_url):
-                analysis_requests.append({
-                    "content": img_url,
-                    "content_type": ContentType.IMAGE, 
-                    "context": f"论坛讨论中的图片 #{i+1}: {topic_title}"
-                })
+        # 分析重要图片 - 使用Image workflow（表情、头像和图标不占用名额）
+        images = [img for img in summary['all_images'] if self._is_valid_image_url(img) and not decorative_reason(img)]
+        for i, img_url in enumerate(images[:2]):  # 只分析前2张图片
+            analysis_requests.append({
+                "content": img_url,
+                "content_type": ContentType.IMAGE, 
+                "context": f"论坛讨论中的图片 #{i+1}: {topic_title}"
+            })
         
         return analysis_requests
     
@@ -244,6 +329,7 @@ class ForumAnalyzer(ContentAnalyzer):
             
         return False
     
+    @metrics.timed_analyzer("forum")
     def analyze_forum(self, forum_data: ForumData) -> Dict[str, Any]:
         """分析论坛内容的主入口"""
         try:
@@ -269,10 +355,8 @@ class ForumAnalyzer(ContentAnalyzer):
             请用简洁明了的语言总结，突出最重要的讨论要点。
             """
             
-            analysis = self.analyzeWithOpenai(prompt)
-            
-            if "失败" in analysis:
-                analysis = self.analyzeWithGemini(prompt)
+            result = self.analyzeWithRouting(prompt)
+            analysis = result.message
             
             # 4. 提取关键点
             key_points = self.extractKeyPoints(analysis)
@@ -280,15 +364,8 @@ class ForumAnalyzer(ContentAnalyzer):
             # 5. 创建媒体分析请求（供后续使用）
             media_requests = self.create_media_analysis_requests(processed_data)
             
-            # 6. 对重要链接进行联网搜索分析
-            link_analyses = []
-            for i, link in enumerate(processed_data["content_summary"]["all_links"][:3]):  # 分析前3个链接
-                if self._is_valid_url(link):
-                    link_analysis = self.analyze_link_content(link)
-                    link_analyses.append({
-                        "url": link,
-                        "analysis": link_analysis
-                    })
+            # 6. 对重要链接进行联网搜索分析（重复的链接不占用名额）
+            link_analyses, duplicate_links = self.analyze_links(processed_data["content_summary"]["all_links"])
             
             return {
                 "content_type": ContentType.FORUM,
@@ -296,7 +373,7 @@ class ForumAnalyzer(ContentAnalyzer):
                 "analysis": analysis,
                 "summary": analysis[:300] + "..." if len(analysis) > 300 else analysis,
                 "key_points": key_points,
-                "confidence": 0.9 if "失败" not in analysis else 0.3,
+                "confidence": 0.9 if result.ok else 0.3,
                 "processed_data": processed_data,
                 "media_requests": media_requests,
                 "link_analyses": link_analyses,  # 添加链接分析结果
@@ -304,7 +381,9 @@ class ForumAnalyzer(ContentAnalyzer):
                     "total_posts": processed_data['content_summary']['post_count'],
                     "users_count": len(processed_data['content_summary']['key_users']),
                     "links_count": len(processed_data['content_summary']['all_links']),
-                    "images_count": len(processed_data['content_summary']['all_images'])
+                    "images_count": len(processed_data['content_summary']['all_images']),
+                    "duplicate_links": duplicate_links,
+                    "provider": result.provider
                 }
             }
             
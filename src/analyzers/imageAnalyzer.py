@@ -1,10 +1,32 @@
-from typing import Dict, Any
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 import base64
-from PIL import Image
-import io
+import contextvars
+import logging
 from src.analyzers.base import ContentAnalyzer
+from src.analyzers.imageProbe import ImageProbe, image_header, probe_image, read_limited, shrink_image
+from src.analyzers.microBatcher import parse_keyed_json
+from src.analyzers.providerResult import ProviderResult
+from src.config import config
 from src.graph.state import AnalysisResult, ContentType
+from src.utils import metrics
+from src.utils.fetchScheduler import fetch_stream
+
+logger = logging.getLogger(__name__)
+
+# 批量分析时同时下载的图片数（每个主机的并发数另由抓取调度器限制）
+DOWNLOAD_WORKERS = 8
+
+IMAGE_BATCH_PROMPT = """下面按顺序给出了{count}张图片，依次编号为 {keys}。
+这些图片来自同一批内容，可以结合其他图片理解上下文，但请分别分析每一张。
+
+{items}
+
+请只返回一个JSON对象，不要添加其他文字。JSON的键是图片编号，值的格式为：
+{{"analysis": "该图片的分析", "key_points": ["关键点1", "关键点2"]}}
+每张图片请提供：主要内容和场景描述、关键元素和细节、用途和背景分析、图片质量和技术特点。
+必须包含所有条目编号：{keys}
+"""
 
 
 class ImageAnalyzer(ContentAnalyzer):
@@ -13,28 +35,47 @@ class ImageAnalyzer(ContentAnalyzer):
     def __init__(self):
         super().__init__()
     
-    def download_image(self, image_url: str) -> str:
-        """下载图片并转换为base64"""
+    def probe(self, image_url: str) -> ImageProbe:
+        """下载前探测图片，IMAGE_PROBE 关闭时不探测"""
+        if not config.image_probe:
+            return ImageProbe(image_url)
+        return probe_image(image_url)
+    
+    def download_image(self, image_url: str, probe: ImageProbe = None) -> Optional[str]:
+        """下载图片并转换为base64，超过 IMAGE_MAX_KB 时缩小为缩略图；失败时返回None"""
         try:
-            response = requests.get(image_url, timeout=10)
-            response.raise_for_status()
+            if probe is not None and probe.complete:
+                # 探测时已经读取了完整的文件
+                content = probe.head
+            else:
+                limit = int(config.image_max_download_mb * 1024 * 1024)
+                with fetch_stream("image", "GET", image_url, timeout=10) as response:
+                    response.raise_for_status()
+                    content = read_limited(response, limit + 1)
+                metrics.FETCH_BYTES.labels(source="image").inc(len(content))
+                if len(content) > limit:
+                    raise ValueError(f"图片超过 {config.image_max_download_mb}MB")
+            
+            if len(content) > config.image_max_kb * 1024:
+                original = len(content)
+                content, mime_type = shrink_image(content)
+                logger.info(f"🖼️ 图片 {image_url} 从 {original // 1024}KB 缩小到 {len(content) // 1024}KB")
+            else:
+                from PIL import Image
+                
+                mime_type = Image.MIME.get(image_header(content)[0] or "", "image/jpeg")
             
             # 转换为base64
-            image_base64 = base64.b64encode(response.content).decode('utf-8')
-            return f"data:image/jpeg;base64,{image_base64}"
+            image_base64 = base64.b64encode(content).decode('utf-8')
+            return f"data:{mime_type};base64,{image_base64}"
             
         except Exception as e:
-            return f"图片下载失败: {str(e)}"
+            logger.warning(f"⚠️ 图片下载失败: {image_url}: {str(e)}")
+            return None
     
-    def analyze_image(self, image_url: str) -> AnalysisResult:
-        """分析图片内容"""
-        print(f"🖼️ 开始分析图片: {image_url}")
-        
-        # 首先尝试下载图片
-        image_data = self.download_image(image_url)
-        
-        # 创建分析提示
-        prompt = f"""
+    def build_prompt(self, image_url: str) -> str:
+        """创建单张图片的分析提示"""
+        return f"""
         请分析这张图片：
         
         图片URL: {image_url}
@@ -47,19 +88,15 @@ class ImageAnalyzer(ContentAnalyzer):
         
         请详细描述你在图片中看到的内容。
         """
-        
-        # 尝试使用阿里百炼分析图片（传递实际图片数据）
-        if not image_data.startswith("图片下载失败"):
-            # 如果图片下载成功，传递base64数据给阿里百炼
-            analysis = self.analyze_with_alibaba(prompt, image_data)
-        else:
-            # 如果下载失败，仍然使用URL进行分析
-            analysis = self.analyze_with_alibaba(prompt, image_url)
+    
+    def build_result(self, image_url: str, result: ProviderResult, downloaded: bool) -> AnalysisResult:
+        """根据模型结果构建图片分析结果"""
+        analysis = result.message
         
         # 如果阿里百炼失败，提供更好的错误处理
-        if "失败" in analysis:
+        if not result.ok:
             # 提供更友好的错误信息
-            if image_data.startswith("图片下载失败"):
+            if not downloaded:
                 analysis = f"图片分析: {image_url}\n无法下载或访问此图片，可能是因为网络问题或图片不存在。"
             else:
                 analysis = f"图片分析: {image_url}\n虽然图片已下载，但无法进行详细分析。这可能是一张相关的图片，但需要更多上下文来理解其内容。"
@@ -68,7 +105,7 @@ class ImageAnalyzer(ContentAnalyzer):
         key_points = self.extractKeyPoints(analysis)
         
         # 评估置信度
-        confidence = 0.7 if "失败" not in analysis else 0.3
+        confidence = 0.7 if result.ok else 0.3
         
         return {
             "content_type": ContentType.IMAGE,
@@ -76,5 +113,151 @@ class ImageAnalyzer(ContentAnalyzer):
             "analysis": analysis,
             "summary": analysis[:300] + "..." if len(analysis) > 300 else analysis,
             "key_points": key_points,
-            "confidence": confidence
-        }
\ No newline at end of file
+            "confidence": confidence,
+            "metadata": {"provider": result.provider, "downloaded": downloaded}
+        }
+    
+    def skipped_result(self, probe: ImageProbe) -> AnalysisResult:
+        """探测后跳过的图片的结果，不调用模型"""
+        analysis = f"已跳过图片: {probe.url}\n原因: {probe.skip_reason}"
+        return {
+            "content_type": ContentType.IMAGE,
+            "original_content": probe.url,
+            "analysis": analysis,
+            "summary": analysis,
+            "key_points": [],
+            "confidence": 0.0,
+            "metadata": {"provider": "none", "analyzer": "image_probe", "skipped": probe.skip_reason,
+                         "format": probe.format, "width": probe.width, "height": probe.height}
+        }
+    
+    def analyze_downloaded(self, image_url: str, image_data: Optional[str]) -> AnalysisResult:
+        """分析一张图片：下载成功时传递base64数据，否则仍然使用URL进行分析"""
+        result = self.callAlibaba(self.build_prompt(image_url), image_data or image_url)
+        return self.build_result(image_url, result, image_data is not None)
+    
+    @metrics.timed_analyzer("image")
+    def analyze_image(self, image_url: str) -> AnalysisResult:
+        """分析图片内容"""
+        print(f"🖼️ 开始分析图片: {image_url}")
+        
+        # 先探测，表情、头像和尺寸过小的图片不下载也不分析
+        probe = self.probe(image_url)
+        if probe.skip_reason:
+            logger.info(f"⏭️ 跳过图片 {image_url}: {probe.skip_reason}")
+            return self.skipped_result(probe)
+        
+        # 然后下载图片
+        return self.analyze_downloaded(image_url, self.download_image(image_url, probe))
+    
+    def plan_batches(self, sizes: List[int], batch_size: int = None, max_bytes: int = None) -> List[List[int]]:
+        """按图片数和图片数据总量把图片分批，返回图片下标的分组；单张超过数据总量的图片单独成批"""
+        batch_size = max(1, batch_size or self.config.image_batch_size)
+        max_bytes = max_bytes or int(self.config.image_batch_max_mb * 1024 * 1024)
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_bytes = 0
+        for index, size in enumerate(sizes):
+            if current and (len(current) >= batch_size or current_bytes + size > max_bytes):
+                batches.append(current)
+                current, current_bytes = [], 0
+            current.append(index)
+            current_bytes += size
+        if current:
+            batches.append(current)
+        return batches
+    
+    def analyze_batch(self, image_urls: List[str], images: List[Optional[str]]) -> List[Optional[AnalysisResult]]:
+        """
+        在一次阿里百炼调用中分析多张图片
+        
+        Returns:
+            与输入一一对应的结果列表，无法从批量响应中取得结果的图片为None
+        """
+        keys = [f"item_{i + 1}" for i in range(len(image_urls))]
+        prompt = IMAGE_BATCH_PROMPT.format(
+            count=len(image_urls),
+            keys=", ".join(keys),
+            items="\n".join(f"[{key}] 图片URL: {url}" for key, url in zip(keys, image_urls)),
+        )
+        logger.info(f"🖼️ 批量分析 {len(image_urls)} 张图片")
+        result = self.callAlibaba(prompt, [data or url for url, data in zip(image_urls, images)])
+        data = parse_keyed_json(result.text) if result.ok else None
+        if data is None:
+            logger.warning(f"⚠️ 多图批量分析{'响应不是有效的JSON' if result.ok else f'调用失败: {result.error}'}，逐张分析")
+            return [None] * len(image_urls)
+        
+        results = []
+        for key, url, image in zip(keys, image_urls, images):
+            item = data.get(key)
+            analysis = item.get("analysis") if isinstance(item, dict) else None
+            if not isinstance(analysis, str) or not analysis.strip():
+                results.append(None)
+                continue
+            item_result = self.build_result(url, ProviderResult.success(result.provider, analysis), image is not None)
+            key_points = [p for p in item.get("key_points") or [] if isinstance(p, str)]
+            if key_points:
+                item_result["key_points"] = key_points
+            item_result["metadata"].update({"analyzer": "image_batch", "batch_size": len(image_urls)})
+            results.append(item_result)
+        return results
+    
+    @metrics.timed_analyzer("image_batch")
+    def analyze_images(self, image_urls: List[str]) -> List[AnalysisResult]:
+        """
+        批量分析多张图片：按图片数和数据量分批，每批一次模型调用，模型可以同时看到相关的图片
+        
+        探测后跳过的图片（表情、头像、尺寸过小）不下载也不调用模型；批量响应中缺失或无法解析的图片
+        逐张重新分析（复用已下载的数据）。
+        
+        Returns:
+            与输入一一对应的分析结果
+        """
+        if not image_urls:
+            return []
+        print(f"🖼️ 开始批量分析 {len(image_urls)} 张图片")
+        
+        def prepare(url: str):
+            # 先探测，跳过的图片不下载
+            probe = self.probe(url)
+            return probe, None if probe.skip_reason else self.download_image(url, probe)
+        
+        with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(image_urls)), thread_name_prefix="image-dl") as pool:
+            prepared = list(pool.map(prepare, image_urls))
+        probes = [probe for probe, _ in prepared]
+        images = [data for _, data in prepared]
+        
+        results: List[Optional[AnalysisResult]] = [None] * len(image_urls)
+        pending = []
+        for index, probe in enumerate(probes):
+            if probe.skip_reason:
+                logger.info(f"⏭️ 跳过图片 {probe.url}: {probe.skip_reason}")
+                results[index] = self.skipped_result(probe)
+            else:
+                pending.append(index)
+        batches = [[pending[k] for k in batch] for batch in
+                   self.plan_batches([len(images[i] or image_urls[i]) for i in pending])]
+        
+        def run(batch: List[int]):
+            if len(batch) == 1:
+                # 单张图片使用常规提示
+                return [self.analyze_downloaded(image_urls[batch[0]], images[batch[0]])]
+            return self.analyze_batch([image_urls[i] for i in batch], [images[i] for i in batch])
+        
+        workers = min(max(1, self.config.image_batch_workers), max(1, len(batches)))
+        # 每个任务在当前上下文的副本中运行，与其他分析保持一致
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-batch") as executor:
+            futures = [(batch, executor.submit(contextvars.copy_context().run, run, batch)) for batch in batches]
+            for batch, future in futures:
+                for index, result in zip(batch, future.result()):
+                    results[index] = result
+                if len(batch) > 1:
+                    batched = sum(1 for index in batch if results[index] is not None)
+                    metrics.IMAGE_BATCH_ITEMS.labels(outcome="batched").inc(batched)
+                    metrics.IMAGE_BATCH_ITEMS.labels(outcome="fallback").inc(len(batch) - batched)
+        
+        # 批量响应中没有结果的图片逐张分析
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = self.analyze_downloaded(image_urls[index], images[index])
+        return results
@@ -0,0 +1,179 @@
+"""
+图片探测
+下载和分析图片之前先判断是否值得分析：
+- 路径匹配表情、头像、图标、徽章等模式的图片直接跳过，不发送任何请求
+- 其他图片用Range请求只读取文件开头，由Pillow的惰性 Image.open 解析格式和尺寸，尺寸过小的跳过
+- 需要分析的图片超过字节上限时缩小为缩略图后再发送给模型
+"""
+
+import io
+import logging
+import re
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+from src.config import config
+from src.utils import metrics
+from src.utils.fetchScheduler import fetch_stream
+
+logger = logging.getLogger(__name__)
+
+# 表情、头像、图标等装饰性图片的URL模式（匹配主机名和路径，不区分大小写）
+DECORATIVE_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"/(images/)?emoji(s)?/",  # Discourse 等论坛的表情
+    r"twemoji|emojione|emoji\.discourse-cdn\.com",
+    r"/(user_)?avatars?/|/letter_avatar(_proxy)?/|gravatar\.com/avatar",
+    r"/favicon[^/]*$|/apple-touch-icon[^/]*$",
+    r"/(icons?|badges?|sprites?|smilies|smileys|stickers?)/",
+    r"(^|\.)shields\.io/|badge\.fury\.io|/badge\.svg$",
+    r"/(spacer|pixel|blank|transparent)\.(gif|png)$",
+))
+
+CONTENT_RANGE = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+
+# 缩略图的最小边长，再小模型就看不清内容了
+MIN_THUMBNAIL_SIDE = 256
+
+
+def decorative_reason(url: str) -> Optional[str]:
+    """URL匹配装饰性图片模式时返回原因，否则返回None"""
+    parts = urlsplit(url)
+    target = f"{parts.netloc}{parts.path}"
+    for pattern in DECORATIVE_PATTERNS:
+        if pattern.search(target):
+            return f"表情、头像或图标（匹配 {pattern.pattern}）"
+    return None
+
+
+@dataclass
+class ImageProbe:
+    """只读取文件开头得到的图片信息"""
+    url: str
+    format: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    size: Optional[int] = None  # 文件总字节数，服务器没有提供时为None
+    head: bytes = b""  # 已读取的文件开头
+    skip_reason: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        """读取的开头已经是完整的文件，下载时不必再请求"""
+        return self.size is not None and 0 < self.size <= len(self.head)
+
+
+def read_limited(response, limit: int) -> bytes:
+    """从流式响应中最多读取 limit 字节"""
+    chunks = []
+    received = 0
+    for chunk in response.iter_content(chunk_size=16384):
+        chunks.append(chunk)
+        received += len(chunk)
+        if received >= limit:
+            break
+    return b"".join(chunks)[:limit]
+
+
+def read_header(data: bytes) -> Tuple[str, Tuple[int, int]]:
+    """
+    用Pillow的惰性 Image.open 解析格式和尺寸，只需要文件开头
+
+    Raises:
+        Image.DecompressionBombError: 文件头声明的像素数超过 2×Image.MAX_IMAGE_PIXELS
+        UnidentifiedImageError 等: 无法识别的数据
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        return image.format, image.size
+
+
+def image_header(data: bytes) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+    """解析格式和尺寸，无法识别或像素数超过Pillow上限时返回 (None, None)"""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        return read_header(data)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError, SyntaxError):
+        return None, None
+
+
+def probe_image(url: str, head_bytes: int = None, min_side: int = None) -> ImageProbe:
+    """
+    探测图片：先按URL模式判断，再用Range请求读取文件开头解析格式和尺寸
+
+    探测请求失败或无法解析时不跳过，由后续的下载处理；文件头声明的像素数超过Pillow的
+    解压炸弹上限时跳过，这样的图片无法解码也不值得下载。
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    head_bytes = head_bytes or config.image_probe_bytes
+    min_side = config.image_min_side if min_side is None else min_side
+    probe = ImageProbe(url)
+
+    probe.skip_reason = decorative_reason(url)
+    if probe.skip_reason:
+        metrics.IMAGE_PROBES.labels(outcome="skipped_pattern").inc()
+        return probe
+
+    try:
+        with fetch_stream("image", "GET", url, headers={"Range": f"bytes=0-{head_bytes - 1}"}, timeout=10) as response:
+            response.raise_for_status()
+            probe.head = read_limited(response, head_bytes)
+    except Exception as e:
+        logger.warning(f"⚠️ 图片探测失败 {url}: {str(e)}")
+        metrics.IMAGE_PROBES.labels(outcome="failed").inc()
+        return probe
+    metrics.FETCH_BYTES.labels(source="image").inc(len(probe.head))
+
+    # 206响应的 Content-Range 给出文件总大小；服务器不支持Range时返回200和完整长度
+    total = CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+    if total:
+        probe.size = int(total.group(1))
+    elif response.status_code == 200 and response.headers.get("Content-Length", "").isdigit():
+        probe.size = int(response.headers["Content-Length"])
+
+    try:
+        probe.format, dimensions = read_header(probe.head)
+    except Image.DecompressionBombError as e:
+        probe.skip_reason = f"像素数超过上限（{e}）"
+        metrics.IMAGE_PROBES.labels(outcome="skipped_large").inc()
+        return probe
+    except (UnidentifiedImageError, OSError, ValueError, SyntaxError):
+        dimensions = None
+    if dimensions:
+        probe.width, probe.height = dimensions
+        if min(dimensions) < min_side:
+            probe.skip_reason = f"尺寸过小（{probe.width}x{probe.height}）"
+            metrics.IMAGE_PROBES.labels(outcome="skipped_small").inc()
+            return probe
+    metrics.IMAGE_PROBES.labels(outcome="analyzed").inc()
+    return probe
+
+
+def shrink_image(data: bytes, max_bytes: int = None, max_side: int = None) -> Tuple[bytes, str]:
+    """
+    把超过字节上限的图片缩小为JPEG缩略图，仍然超过上限时继续缩小边长（不小于 MIN_THUMBNAIL_SIDE）
+
+    Returns:
+        (图片数据, MIME类型)；无法解码时返回原数据
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    max_bytes = max_bytes or config.image_max_kb * 1024
+    side = max_side or config.image_max_side
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert("RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError, SyntaxError):
+        return data, "image/jpeg"
+    while True:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((side, side))
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, format="JPEG", quality=85, optimize=True)
+        if buffer.tell() <= max_bytes or side <= MIN_THUMBNAIL_SIDE:
+            metrics.IMAGE_PROBES.labels(outcome="thumbnailed").inc()
+            return buffer.getvalue(), "image/jpeg"
+        side = max(MIN_THUMBNAIL_SIDE, side // 2)
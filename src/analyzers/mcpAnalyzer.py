@@ -1,6 +1,7 @@
 from typing import Dict, Any, Optional
 from .base import ContentAnalyzer
 from src.graph.state import AnalysisResult, ContentType
+from src.utils import metrics
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,6 +12,7 @@ class MCPAnalyzer(ContentAnalyzer):
     def __init__(self):
         super().__init__()
     
+    @metrics.timed_analyzer("mcp")
     def analyze_content(self, content: str, content_type: ContentType = ContentType.TEXT) -> AnalysisResult:
         """
         使用MCP工具分析内容
@@ -63,12 +65,12 @@ class MCPAnalyzer(ContentAnalyzer):
         else:
             # 如果MCP工具不可用，回退到OpenAI分析
             logger.info("MCP工具不可用，回退到OpenAI分析")
-            analysis = self.analyzeWithOpenai(
-                f"请对以下文本内容进行分析：\n\n{content}",
-                content
-            )
+            provider_result = self.callOpenai(f"请对以下文本内容进行分析：\n\n{content}")
+            analysis = provider_result.message
             key_points = self.extractKeyPoints(analysis)
             metadata = {"fallback": "openai"}
+            if not provider_result.ok:
+                metadata["error"] = provider_result.error_kind.value
         
         return AnalysisResult(
             content=content,
@@ -96,12 +98,12 @@ class MCPAnalyzer(ContentAnalyzer):
         else:
             # 如果MCP工具不可用，回退到OpenAI分析
             logger.info("MCP工具不可用，回退到OpenAI分析")
-            analysis = self.analyzeWithOpenai(
-                f"请对以下代码进行分析：\n\n{content}",
-                content
-            )
+            provider_result = self.callOpenai(f"请对以下代码进行分析：\n\n{content}")
+            analysis = provider_result.message
             key_points = self.extractKeyPoints(analysis)
             metadata = {"fallback": "openai"}
+            if not provider_result.ok:
+                metadata["error"] = provider_result.error_kind.value
         
         return AnalysisResult(
             content=content,
@@ -128,12 +130,12 @@ class MCPAnalyzer(ContentAnalyzer):
         else:
             # 如果MCP工具不可用，回退到OpenAI分析
             logger.info("MCP工具不可用，回退到OpenAI分析")
-            analysis = self.analyzeWithOpenai(
-                f"请分析以下URL的内容：{content}",
-                content
-            )
+            provider_result = self.callOpenai(f"请分析以下URL的内容：{content}")
+            analysis = provider_result.message
             key_points = self.extractKeyPoints(analysis)
             metadata = {"fallback": "openai"}
+            if not provider_result.ok:
+                metadata["error"] = provider_result.error_kind.value
         
         return AnalysisResult(
             content=content,
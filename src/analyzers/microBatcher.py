@@ -0,0 +1,166 @@
+"""
+小条目微批处理
+把多个短文本和小代码块打包进一次模型调用，要求模型返回以条目编号为键的JSON，
+再拆分回每个条目的分析结果。解析失败或缺失的条目返回None，由调用方逐条分析。
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from src.analyzers.base import ContentAnalyzer
+from src.analyzers.codeAnalyzer import CodeAnalyzer
+from src.analyzers.providerResult import ProviderResult
+from src.analyzers.codeDiff import is_diff_request
+from src.graph.state import AnalysisRequest, AnalysisResult, ContentType
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_PROMPT = """请分别分析下面编号的每一个条目，条目之间相互独立。
+
+{items}
+
+请只返回一个JSON对象，不要添加其他文字。JSON的键是条目编号，值的格式为：
+{{"analysis": "该条目的分析，包括总结和要点", "key_points": ["关键点1", "关键点2"]}}
+文本条目请提供总结和关键点；代码条目请说明功能用途、质量评估和改进建议。
+必须包含所有条目编号：{keys}
+"""
+
+
+def is_batchable(request: AnalysisRequest, max_chars: int) -> bool:
+    """判断请求是否适合微批处理：短文本（搜索请求除外）和小代码块"""
+    content = request["content"]
+    if len(content) > max_chars or is_diff_request(request):
+        return False
+    if request["content_type"] == ContentType.TEXT:
+        return not content.startswith("search:")
+    return request["content_type"] == ContentType.CODE
+
+
+def parse_keyed_json(text: str) -> Optional[Dict[str, Any]]:
+    """从模型输出中解析JSON对象，兼容```json代码块包裹"""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class MicroBatcher(ContentAnalyzer):
+    """把小条目打包进共享模型调用的分析器"""
+
+    def __init__(self, batch_size: int = None, item_chars: int = None, batch_chars: int = None):
+        super().__init__()
+        self.batch_size = batch_size or self.config.micro_batch_size
+        self.item_chars = item_chars or self.config.micro_batch_item_chars
+        self.batch_chars = batch_chars or self.config.micro_batch_chars
+        self.code_analyzer = CodeAnalyzer()
+
+    def plan(self, requests: List[AnalysisRequest]) -> List[List[int]]:
+        """按条目数和总字符数把可批处理的请求分组，返回请求下标的分组"""
+        groups: List[List[int]] = []
+        current: List[int] = []
+        current_chars = 0
+        for index, request in enumerate(requests):
+            if not is_batchable(request, self.item_chars):
+                continue
+            size = len(request["content"])
+            if current and (len(current) >= self.batch_size or current_chars + size > self.batch_chars):
+                groups.append(current)
+                current, current_chars = [], 0
+            current.append(index)
+            current_chars += size
+        if current:
+            groups.append(current)
+        # 单个条目打包没有收益，留给常规路径处理
+        return [group for group in groups if len(group) > 1]
+
+    def _render_item(self, key: str, request: AnalysisRequest) -> str:
+        if request["content_type"] == ContentType.CODE:
+            language = request.get("context") or "unknown"
+            return f"[{key}] 代码（{language}）:\n```\n{request['content']}\n```"
+        context = f"（上下文: {request['context']}）" if request.get("context") else ""
+        return f"[{key}] 文本{context}:\n{request['content']}"
+
+    def _build_result(self, request: AnalysisRequest, item: Dict[str, Any],
+                      provider_result: ProviderResult, batch_size: int) -> Optional[AnalysisResult]:
+        analysis = item.get("analysis") if isinstance(item, dict) else None
+        if not isinstance(analysis, str) or not analysis.strip():
+            return None
+        key_points = [p for p in item.get("key_points") or [] if isinstance(p, str)] or self.extractKeyPoints(analysis)
+        metadata = {"analyzer": "micro_batch", "provider": provider_result.provider, "batch_size": batch_size}
+
+        if request["content_type"] == ContentType.CODE:
+            code = request["content"]
+            index = self.code_analyzer.index_code(code, request.get("context"))
+            language, structure = index.language, index.structure()
+            key_points = [
+                f"编程语言: {language}",
+                f"代码行数: {structure['lines']}, 复杂度: {structure['complexity']}",
+            ] + key_points
+            return {
+                "content_type": ContentType.CODE,
+                "original_content": code[:200] + "..." if len(code) > 200 else code,
+                "analysis": analysis,
+                "summary": analysis[:300] + "..." if len(analysis) > 300 else analysis,
+                "key_points": key_points[:10],
+                "confidence": 0.9,
+                "metadata": {**metadata, "language": language, "structure": structure}
+            }
+
+        return {
+            "content_type": ContentType.TEXT,
+            "original_content": request["content"][:100] + "...",
+            "analysis": analysis,
+            "summary": analysis[:200] + "...",
+            "key_points": key_points,
+            "confidence": 0.8,
+            "metadata": metadata
+        }
+
+    @metrics.timed_analyzer("micro_batch")
+    def analyze_group(self, requests: List[AnalysisRequest]) -> List[Optional[AnalysisResult]]:
+        """
+        在一次模型调用中分析一组请求
+
+        Returns:
+            与输入一一对应的结果列表，无法从批量响应中取得结果的条目为None
+        """
+        keys = [f"item_{i + 1}" for i in range(len(requests))]
+        prompt = BATCH_PROMPT.format(
+            items="\n\n".join(self._render_item(key, request) for key, request in zip(keys, requests)),
+            keys=", ".join(keys)
+        )
+        logger.info(f"📦 微批处理 {len(requests)} 个条目")
+        provider_result = self.analyzeWithRouting(prompt)
+        if not provider_result.ok:
+            logger.warning(f"⚠️ 微批处理调用失败: {provider_result.error}")
+            metrics.MICRO_BATCH_ITEMS.labels(outcome="fallback").inc(len(requests))
+            return [None] * len(requests)
+
+        data = parse_keyed_json(provider_result.text)
+        if data is None:
+            logger.warning("⚠️ 微批处理响应不是有效的JSON，逐条分析")
+            metrics.MICRO_BATCH_ITEMS.labels(outcome="fallback").inc(len(requests))
+            return [None] * len(requests)
+
+        results = []
+        for key, request in zip(keys, requests):
+            result = self._build_result(request, data.get(key), provider_result, len(requests))
+            metrics.MICRO_BATCH_ITEMS.labels(outcome="batched" if result else "fallback").inc()
+            results.append(result)
+        return results
+
+    def analyze_requests(self, requests: List[AnalysisRequest]) -> Dict[int, AnalysisResult]:
+        """对请求列表中可批处理的条目进行微批分析，返回 {请求下标: 分析结果}"""
+        results: Dict[int, AnalysisResult] = {}
+        for group in self.plan(requests):
+            for index, result in zip(group, self.analyze_group([requests[i] for i in group])):
+                if result is not None:
+                    results[index] = result
+        return results
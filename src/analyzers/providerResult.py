@@ -0,0 +1,108 @@
+"""
+服务商调用结果
+用类型化的结果代替"失败"字样的字符串判断，分析文本中正常出现"失败"二字不会再被误判为调用失败
+"""
+
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from src.config import OPENAI_RATE_LIMIT_ERRORS, ProviderAPIError
+
+# 旧接口返回的失败信息前缀
+PROVIDER_LABELS = {
+    "openai": "OpenAI",
+    "gemini": "Gemini",
+    "alibaba": "阿里百炼",
+}
+
+
+class ErrorKind(Enum):
+    """服务商错误类型"""
+    RATE_LIMIT = "rate_limit"
+    TIMEOUT = "timeout"
+    NETWORK = "network"
+    SERVER = "server"
+    AUTH = "auth"
+    BAD_REQUEST = "bad_request"
+    NOT_CONFIGURED = "not_configured"
+    EMPTY = "empty"
+    UNKNOWN = "unknown"
+
+
+# 可以重试或换一个服务商再试的错误
+RETRYABLE_ERRORS = {
+    ErrorKind.RATE_LIMIT,
+    ErrorKind.TIMEOUT,
+    ErrorKind.NETWORK,
+    ErrorKind.SERVER,
+    ErrorKind.EMPTY,
+}
+
+
+def classify_error(error: Exception) -> Tuple[ErrorKind, Optional[int]]:
+    """根据异常判断错误类型，返回 (错误类型, HTTP状态码)"""
+    status_code = getattr(error, "status_code", None)
+    if status_code is None and isinstance(getattr(error, "code", None), int):
+        # google.api_core 的异常使用 code 属性保存HTTP状态码
+        status_code = error.code
+
+    if isinstance(error, ProviderAPIError) and error.timeout or isinstance(error, requests.exceptions.Timeout):
+        return ErrorKind.TIMEOUT, status_code
+    if isinstance(error, ValueError) and "未配置" in str(error):
+        return ErrorKind.NOT_CONFIGURED, None
+    if status_code == 429:
+        return ErrorKind.RATE_LIMIT, status_code
+    if status_code in (401, 403):
+        return ErrorKind.AUTH, status_code
+    if status_code is not None and 500 <= status_code < 600:
+        return ErrorKind.SERVER, status_code
+    if status_code is not None and 400 <= status_code < 500:
+        return ErrorKind.BAD_REQUEST, status_code
+
+    message = str(error).lower()
+    if any(marker.lower() in message for marker in OPENAI_RATE_LIMIT_ERRORS):
+        return ErrorKind.RATE_LIMIT, status_code
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return ErrorKind.NETWORK, status_code
+    return ErrorKind.UNKNOWN, status_code
+
+
+@dataclass
+class ProviderResult:
+    """一次服务商调用的结果"""
+    provider: str
+    text: str = ""
+    error_kind: Optional[ErrorKind] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    usage: Dict[str, int] = field(default_factory=dict)
+    latency: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error_kind is None
+
+    @property
+    def retryable(self) -> bool:
+        return self.error_kind in RETRYABLE_ERRORS
+
+    @property
+    def message(self) -> str:
+        """成功时返回分析文本，失败时返回与旧接口一致的失败信息"""
+        if self.ok:
+            return self.text
+        return f"{PROVIDER_LABELS.get(self.provider, self.provider)}分析失败: {self.error}"
+
+    @classmethod
+    def success(cls, provider: str, text: str, usage: Dict[str, int] = None, latency: float = 0.0) -> "ProviderResult":
+        if not text or not text.strip():
+            return cls(provider, error_kind=ErrorKind.EMPTY, error="服务商返回了空结果", latency=latency)
+        return cls(provider, text=text, usage=usage or {}, latency=latency)
+
+    @classmethod
+    def failure(cls, provider: str, error: Exception, latency: float = 0.0) -> "ProviderResult":
+        kind, status_code = classify_error(error)
+        return cls(provider, error_kind=kind, error=str(error), status_code=status_code, latency=latency)
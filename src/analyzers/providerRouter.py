@@ -0,0 +1,228 @@
+"""
+服务商路由器
+按服务商统计滚动延迟，主服务商在自适应延迟（p95）内没有返回时向下一个服务商发送对冲请求，
+采用最先返回的有效结果。路由策略可以按请求选择:
+
+    cost      只在主服务商失败后顺序降级，不发送对冲请求（最省调用费用）
+    balanced  主服务商超过其p95延迟后发送对冲请求（默认）
+    latency   主服务商超过其p50延迟后即发送对冲请求，尽量压低尾延迟
+
+全局默认策略由环境变量 PROVIDER_ROUTING_POLICY 指定，单次请求可以通过 routing_policy() 覆盖。
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.analyzers.providerResult import ProviderResult
+from src.config import config
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+ROUTING_POLICIES = ("cost", "balanced", "latency")
+
+# 各策略用于计算对冲延迟的百分位
+POLICY_PERCENTILES = {"balanced": 95, "latency": 50}
+
+# 样本数达到该值后才使用统计出的百分位，否则使用最大对冲延迟
+MIN_SAMPLES = 20
+
+_policy_var: contextvars.ContextVar = contextvars.ContextVar("provider_routing_policy", default=None)
+
+
+def validate_policy(policy: str) -> str:
+    """校验路由策略名称"""
+    normalized = (policy or "").strip().lower()
+    if normalized not in ROUTING_POLICIES:
+        raise ValueError(f"不支持的路由策略: {policy}，支持的策略: {', '.join(ROUTING_POLICIES)}")
+    return normalized
+
+
+def current_policy() -> str:
+    """当前生效的路由策略"""
+    policy = _policy_var.get()
+    if policy:
+        return policy
+    try:
+        return validate_policy(config.provider_routing_policy)
+    except ValueError:
+        logger.warning(f"⚠️ PROVIDER_ROUTING_POLICY={config.provider_routing_policy} 无效，使用balanced")
+        return "balanced"
+
+
+@contextmanager
+def routing_policy(policy: Optional[str]):
+    """在代码块内使用指定的路由策略，policy为空时保持默认策略"""
+    if not policy:
+        yield
+        return
+    token = _policy_var.set(validate_policy(policy))
+    try:
+        yield
+    finally:
+        _policy_var.reset(token)
+
+
+class LatencyTracker:
+    """按服务商记录最近的成功请求耗时"""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+
+    def observe(self, provider: str, elapsed: float):
+        with self._lock:
+            self._samples[provider].append(elapsed)
+
+    def count(self, provider: str) -> int:
+        with self._lock:
+            return len(self._samples[provider])
+
+    def percentile(self, provider: str, pct: float) -> Optional[float]:
+        """返回指定百分位的耗时，样本不足时返回None"""
+        with self._lock:
+            samples = sorted(self._samples[provider])
+        if len(samples) < MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(round((len(samples) - 1) * pct / 100.0)))
+        return samples[index]
+
+
+class ProviderRouter:
+    """带延迟感知对冲的服务商路由器"""
+
+    def __init__(self, tracker: LatencyTracker = None, max_workers: int = None):
+        self.tracker = tracker or LatencyTracker()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.provider_router_workers,
+            thread_name_prefix="provider-router"
+        )
+
+    def hedge_delay(self, provider: str, policy: str) -> Optional[float]:
+        """计算发送对冲请求前的等待时间，None表示不对冲"""
+        if policy == "cost":
+            return None
+        observed = self.tracker.percentile(provider, POLICY_PERCENTILES[policy])
+        if observed is None:
+            return config.provider_hedge_max_delay
+        return min(max(observed, config.provider_hedge_min_delay), config.provider_hedge_max_delay)
+
+    def _submit(self, name: str, func: Callable[[str], ProviderResult], prompt: str) -> Tuple[Future, Future]:
+        """提交一次服务商调用，返回 (调用结果, 调用开始的时间)；开始时间在线程池真正执行调用时才设置"""
+        started: Future = Future()
+
+        def run():
+            started.set_result(time.monotonic())
+            start = time.perf_counter()
+            result = func(prompt)
+            if result.ok:
+                # 落选的请求完成后同样计入延迟窗口，避免只统计到较快的样本
+                self.tracker.observe(name, time.perf_counter() - start)
+            return result
+        return self._executor.submit(run), started
+
+    def route(
+        self,
+        prompt: str,
+        providers: Sequence[Tuple[str, Callable[[str], ProviderResult]]],
+        policy: str = None
+    ) -> ProviderResult:
+        """
+        按策略把请求发送给服务商，返回最先成功的结果
+
+        Args:
+            prompt: 提示词
+            providers: 按优先级排列的 (服务商名称, 调用函数) 列表
+            policy: 路由策略，默认使用当前生效的策略
+
+        Returns:
+            最先成功的结果；全部失败时返回最后一个失败结果
+        """
+        policy = validate_policy(policy) if policy else current_policy()
+        pending: Dict[Future, str] = {}
+        launched: List[str] = []
+        starts: List[Future] = []
+        hedged = False
+        last_result: Optional[ProviderResult] = None
+
+        def launch_next() -> bool:
+            if len(launched) >= len(providers):
+                return False
+            name, func = providers[len(launched)]
+            launched.append(name)
+            future, started = self._submit(name, func, prompt)
+            pending[future] = name
+            starts.append(started)
+            return True
+
+        launch_next()
+        while pending:
+            delay = self.hedge_delay(launched[-1], policy) if len(launched) < len(providers) else None
+            if delay is not None and not starts[-1].done():
+                # 对冲延迟从调用真正开始执行时计时，在线程池中排队的时间不算作服务商的延迟
+                done, _ = wait(list(pending) + [starts[-1]], return_when=FIRST_COMPLETED)
+                done.discard(starts[-1])
+                if not done:
+                    continue
+            else:
+                remaining = None if delay is None else max(0.0, delay - (time.monotonic() - starts[-1].result()))
+                done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+
+                if not done:
+                    # 超过对冲延迟仍未返回，向下一个服务商发送对冲请求
+                    logger.info(f"⏱️ {launched[-1]} 超过 {delay:.2f}s 未返回，向 {providers[len(launched)][0]} 发送对冲请求")
+                    launch_next()
+                    hedged = True
+                    continue
+
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = ProviderResult.failure(name, e)
+
+                if result.ok:
+                    if hedged:
+                        metrics.PROVIDER_HEDGES.labels(primary=launched[0], hedge=launched[1], winner=name).inc()
+                    self._cancel(pending)
+                    return result
+
+                last_result = result
+                if not pending and launch_next():
+                    metrics.record_fallback(name, launched[-1])
+                    logger.info(f"🔄 {name}失败（{result.error_kind.value}），降级到 {launched[-1]}")
+
+        return last_result
+
+    @staticmethod
+    def _cancel(pending: Dict[Future, str]):
+        """
+        取消落选的请求
+
+        尚未开始的请求直接取消；已经发出的HTTP请求无法中断，只放弃其结果，
+        它会在自身超时内结束并释放线程。
+        """
+        for future in pending:
+            future.cancel()
+        pending.clear()
+
+
+_router: Optional[ProviderRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ProviderRouter:
+    """获取进程内共享的路由器，延迟统计在所有分析器之间共享"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ProviderRouter()
+    return _router
@@ -0,0 +1,577 @@
+"""
+仓库分析
+把本地目录或tar包作为一个整体分析：按忽略规则遍历源文件，在进程池中为每个文件建立结构索引，
+在模型并发上限内并行分析各文件，再从最深的目录开始逐层汇总，根目录的汇总即仓库总结。
+文件分析按文件内容哈希、目录汇总按目录下全部内容的哈希保存在SQLite缓存中，代码更新后重新运行
+只会分析变化的文件以及包含它们的目录。
+"""
+
+import contextvars
+import fnmatch
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import posixpath
+import sqlite3
+import tarfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.analyzers.base import ContentAnalyzer
+from src.analyzers.codeAnalyzer import CodeAnalyzer
+from src.analyzers.codeIndex import CodeIndex, index_code
+from src.analyzers.providerResult import ProviderResult
+from src.config import config
+from src.graph.state import AnalysisResult, ContentType
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# 提示词或缓存内容的格式变化时递增，使旧的缓存条目失效
+CACHE_VERSION = "1"
+
+LANGUAGE_EXTENSIONS = {
+    ".py": "python", ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+    ".ts": "typescript", ".tsx": "typescript", ".java": "java", ".go": "go", ".rs": "rust",
+    ".c": "c", ".h": "c", ".cc": "cpp", ".cpp": "cpp", ".cxx": "cpp", ".hpp": "cpp", ".cs": "csharp",
+    ".kt": "kotlin", ".swift": "swift", ".scala": "scala", ".php": "php", ".rb": "ruby", ".dart": "dart",
+    ".sh": "shell", ".lua": "lua",
+}
+
+# 没有.gitignore时也会忽略的目录和文件
+DEFAULT_IGNORES = (
+    ".git/", ".hg/", ".svn/", "node_modules/", "__pycache__/", ".venv/", "venv/", ".tox/", ".nox/",
+    ".mypy_cache/", ".pytest_cache/", "dist/", "build/", "vendor/", "third_party/",
+    "*.min.js", "*_pb2.py", "*.pb.go",
+)
+
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# 汇总提示中所有子项摘要的总字符预算
+ROLLUP_CHARS = 12000
+
+
+@dataclass(slots=True)
+class IgnoreRule:
+    """一条.gitignore规则"""
+    pattern: str
+    base: str  # 规则所在的目录（相对仓库根目录），根目录为空字符串
+    negated: bool
+    dir_only: bool
+    anchored: bool
+
+    def matches(self, path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not path.startswith(self.base + "/"):
+                return False
+            path = path[len(self.base) + 1:]
+        if self.anchored:
+            return fnmatch.fnmatchcase(path, self.pattern)
+        return fnmatch.fnmatchcase(posixpath.basename(path), self.pattern)
+
+
+class IgnoreRules:
+    """.gitignore风格的忽略规则，支持通配符、目录规则、!取反和子目录中的.gitignore"""
+
+    def __init__(self, lines: Iterable[str] = DEFAULT_IGNORES):
+        self.rules: List[IgnoreRule] = []
+        self.add(lines)
+
+    def add(self, lines: Iterable[str], base: str = ""):
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            line = line[1:] if negated else line
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if line.startswith("**/"):
+                line = line[3:]
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if line:
+                self.rules.append(IgnoreRule(line, base, negated, dir_only, anchored))
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        """路径（相对仓库根目录）是否被忽略，后出现的规则优先"""
+        result = False
+        for rule in self.rules:
+            if rule.negated == result and rule.matches(path, is_dir):
+                result = not rule.negated
+        return result
+
+
+@dataclass(slots=True)
+class SourceFile:
+    """仓库中的一个源文件"""
+    path: str  # 相对仓库根目录的POSIX路径
+    language: str
+    digest: str
+    text: Optional[str]
+
+
+@dataclass
+class CollectStats:
+    """遍历仓库时跳过的文件数"""
+    ignored: int = 0
+    too_large: int = 0
+    binary: int = 0
+    over_limit: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {k: v for k, v in vars(self).items() if v}
+
+
+def file_digest(language: str, data: bytes) -> str:
+    """文件分析的缓存键：内容相同的文件（不论路径）共享分析结果"""
+    return hashlib.sha256(f"{CACHE_VERSION}\0{language}\0".encode("utf-8") + data).hexdigest()
+
+
+def _join(parent: str, name: str) -> str:
+    return f"{parent}/{name}" if parent else name
+
+
+def walk_directory(root: str, rules: IgnoreRules, stats: CollectStats) -> Iterator[Tuple[str, str]]:
+    """遍历目录中未被忽略的源文件，返回 (相对路径, 绝对路径)；不跟随符号链接"""
+    for current, dirs, files in os.walk(root):
+        rel = os.path.relpath(current, root).replace(os.sep, "/")
+        rel = "" if rel == "." else rel
+        if ".gitignore" in files:
+            with open(os.path.join(current, ".gitignore"), encoding="utf-8", errors="replace") as f:
+                rules.add(f, rel)
+        dirs[:] = sorted(
+            d for d in dirs
+            if not os.path.islink(os.path.join(current, d)) and not rules.ignored(_join(rel, d), True)
+        )
+        for name in sorted(files):
+            full = os.path.join(current, name)
+            if os.path.splitext(name)[1].lower() not in LANGUAGE_EXTENSIONS or os.path.islink(full):
+                continue
+            path = _join(rel, name)
+            if rules.ignored(path, False):
+                stats.ignored += 1
+                continue
+            yield path, full
+
+
+def _tar_members(tar: tarfile.TarFile) -> Dict[str, tarfile.TarInfo]:
+    """tar包中的普通文件 {规范化路径: 成员}，去掉所有文件共同的顶层目录"""
+    members = {}
+    for member in tar.getmembers():
+        name = posixpath.normpath(member.name)
+        # 只读取普通文件，忽略链接、设备文件和指向包外的路径
+        if member.isfile() and name != ".." and not name.startswith("../") and not posixpath.isabs(name):
+            members[name] = member
+    tops = {name.split("/", 1)[0] for name in members}
+    if len(tops) == 1 and all("/" in name for name in members):
+        prefix = len(next(iter(tops))) + 1
+        members = {name[prefix:]: member for name, member in members.items()}
+    return members
+
+
+def walk_tarball(tar: tarfile.TarFile, rules: IgnoreRules, stats: CollectStats) -> Iterator[Tuple[str, tarfile.TarInfo]]:
+    """遍历tar包中未被忽略的源文件，只在内存中读取，不解压到磁盘"""
+    members = _tar_members(tar)
+    for name in sorted((n for n in members if posixpath.basename(n) == ".gitignore"), key=lambda n: n.count("/")):
+        data = tar.extractfile(members[name]).read().decode("utf-8", errors="replace")
+        rules.add(data.splitlines(), posixpath.dirname(name))
+
+    ignored_dirs: Dict[str, bool] = {}
+
+    def dir_ignored(path: str) -> bool:
+        if not path:
+            return False
+        if path not in ignored_dirs:
+            ignored_dirs[path] = dir_ignored(posixpath.dirname(path)) or rules.ignored(path, True)
+        return ignored_dirs[path]
+
+    for name in sorted(members):
+        if posixpath.splitext(name)[1].lower() not in LANGUAGE_EXTENSIONS:
+            continue
+        if dir_ignored(posixpath.dirname(name)) or rules.ignored(name, False):
+            stats.ignored += 1
+            continue
+        yield name, members[name]
+
+
+class RepoCache:
+    """仓库分析的持久缓存，键为内容哈希，值为JSON"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: SQLite数据库路径，为空时只缓存在内存中
+        """
+        self.path = path or ":memory:"
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS repo_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM repo_cache WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO repo_cache (key, value, created_at) VALUES (?, ?, ?)", (key, data, time.time())
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM repo_cache").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+_repo_cache: Optional[RepoCache] = None
+_repo_cache_lock = threading.Lock()
+
+
+def get_repo_cache() -> RepoCache:
+    """返回进程共享的仓库分析缓存，路径由 REPO_CACHE_PATH 决定"""
+    global _repo_cache
+    if _repo_cache is None:
+        with _repo_cache_lock:
+            if _repo_cache is None:
+                _repo_cache = RepoCache(config.repo_cache_path)
+    return _repo_cache
+
+
+@dataclass
+class _Directory:
+    """汇总时的目录节点"""
+    path: str
+    files: List[str] = field(default_factory=list)
+    dirs: List[str] = field(default_factory=list)
+    digest: str = ""
+    summary: str = ""
+    ok: bool = True
+
+
+class RepositoryAnalyzer(ContentAnalyzer):
+    """仓库分析器"""
+
+    def __init__(self, code_analyzer: CodeAnalyzer = None, cache: RepoCache = None):
+        """
+        Args:
+            code_analyzer: 用于生成提示词中结构信息的代码分析器
+            cache: 分析结果缓存（默认: 共享的 REPO_CACHE_PATH 缓存）
+        """
+        super().__init__()
+        self.code_analyzer = code_analyzer or CodeAnalyzer()
+        self._cache = cache
+
+    @property
+    def cache(self) -> RepoCache:
+        if self._cache is None:
+            self._cache = get_repo_cache()
+        return self._cache
+
+    def resolve_path(self, path: str) -> str:
+        """解析仓库路径，只允许 REPO_ALLOWED_ROOTS 下已存在的目录或tar包"""
+        resolved = os.path.realpath(os.path.expanduser(path.strip()))
+        if not any(resolved == root or resolved.startswith(root.rstrip(os.sep) + os.sep)
+                   for root in config.repo_allowed_roots):
+            raise ValueError(f"路径不在允许分析的仓库根目录中: {path}")
+        if os.path.isdir(resolved):
+            return resolved
+        if os.path.isfile(resolved) and resolved.lower().endswith(TAR_SUFFIXES):
+            return resolved
+        raise ValueError(f"仓库路径不存在或不是目录/tar包: {path}")
+
+    def collect_files(self, root: str) -> Tuple[List[SourceFile], CollectStats]:
+        """读取仓库中的源文件并计算内容哈希"""
+        stats = CollectStats()
+        rules = IgnoreRules()
+        max_bytes = config.repo_max_file_kb * 1024
+        files: List[SourceFile] = []
+
+        def add(path: str, size: int, read) -> bool:
+            if len(files) >= config.repo_max_files:
+                stats.over_limit += 1
+                return False
+            if size > max_bytes:
+                stats.too_large += 1
+                return True
+            data = read()
+            if b"\0" in data[:8192]:
+                stats.binary += 1
+                return True
+            language = LANGUAGE_EXTENSIONS[posixpath.splitext(path)[1].lower()]
+            files.append(SourceFile(path, language, file_digest(language, data), data.decode("utf-8", errors="replace")))
+            return True
+
+        if os.path.isdir(root):
+            for path, full in walk_directory(root, rules, stats):
+                def read(full=full) -> bytes:
+                    with open(full, "rb") as f:
+                        return f.read()
+                add(path, os.path.getsize(full), read)
+        else:
+            with tarfile.open(root, "r:*") as tar:
+                for path, member in walk_tarball(tar, rules, stats):
+                    add(path, member.size, lambda member=member: tar.extractfile(member).read())
+        return files, stats
+
+    def index_files(self, files: List[SourceFile]) -> List[CodeIndex]:
+        """为文件建立结构索引，文件较多时使用进程池"""
+        texts = [f.text for f in files]
+        languages = [f.language for f in files]
+        processes = config.repo_index_processes
+        if processes > 1 and len(files) > config.repo_index_inline_files:
+            try:
+                # 与逐条并行批处理一致使用spawn启动，避免fork带走父进程中的后台线程
+                with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    # 在子进程中统计完圈复杂度，避免把去掉注释后的全文随索引传回父进程
+                    return list(pool.map(index_code, texts, languages, [True] * len(files), chunksize=16))
+            except Exception as e:
+                logger.warning(f"⚠️ 进程池建立索引失败，改为在当前进程中完成: {str(e)}")
+        return [index_code(text, language) for text, language in zip(texts, languages)]
+
+    def build_file_prompt(self, source: SourceFile, index: CodeIndex) -> str:
+        """创建单个文件的分析提示，超过块大小的文件只发送符号概览和复杂度最高的函数"""
+        if len(source.text) <= config.code_chunk_chars:
+            code_text = f"代码：\n{source.text}"
+        else:
+            code_text = (f"符号概览：\n{index.outline()}\n\n"
+                         f"复杂度最高的部分（节选）：\n{index.excerpt(source.text, config.code_chunk_chars)}")
+        return f"""
+        请分析仓库中的文件 {source.path}（{source.language}）：
+
+        {code_text}
+
+        {self.code_analyzer.describe_structure(index.structure())}
+
+        请用3到5句话说明这个文件的职责、主要的类和函数，以及值得注意的质量问题或风险。
+        """
+
+    def build_rollup_prompt(self, directory: _Directory, children: List[Tuple[str, str]]) -> str:
+        """创建目录汇总提示"""
+        allowance = max(200, ROLLUP_CHARS // max(1, len(children)))
+        sections = "\n\n".join(
+            f"### {name}\n{summary[:allowance]}{'...' if len(summary) > allowance else ''}" for name, summary in children
+        )
+        return f"""
+        以下是仓库目录 {directory.path}/ 中各文件和子目录的分析摘要：
+
+        {sections}
+
+        请用一段话总结这个目录（模块）的职责、主要组成部分及其关系，并指出值得注意的问题。
+        """
+
+    def build_repository_prompt(self, name: str, children: List[Tuple[str, str]], overview: List[str]) -> str:
+        """创建仓库总结提示"""
+        allowance = max(200, ROLLUP_CHARS // max(1, len(children)))
+        sections = "\n\n".join(
+            f"### {child}\n{summary[:allowance]}{'...' if len(summary) > allowance else ''}" for child, summary in children
+        )
+        facts = "\n".join(f"        - {line}" for line in overview)
+        return f"""
+        以下是代码仓库 {name} 顶层各部分的分析摘要：
+
+        {sections}
+
+        仓库概况：
+{facts}
+
+        请提供：
+        1. 仓库的用途和整体架构
+        2. 主要模块及其职责
+        3. 代码质量评估和主要风险
+        4. 改进建议
+        """
+
+    def _submit(self, pool: ThreadPoolExecutor, prompt: str):
+        # 每个任务在当前上下文的副本中运行，保留本次请求的路由策略
+        return pool.submit(contextvars.copy_context().run, self.analyzeWithRouting, prompt)
+
+    def analyze_files(self, files: List[SourceFile], pool: ThreadPoolExecutor) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """
+        分析文件，缓存中已有的文件不再建立索引和调用模型
+
+        Returns:
+            ({文件路径: {"summary", "structure", "ok"}}, 命中缓存的文件数)
+        """
+        entries: Dict[str, Dict[str, Any]] = {}
+        pending: List[SourceFile] = []
+        for source in files:
+            cached = self.cache.get(f"file:{source.digest}")
+            metrics.record_cache("repo_file", cached is not None)
+            if cached is None:
+                pending.append(source)
+            else:
+                entries[source.path] = {**cached, "ok": True}
+                source.text = None
+
+        if pending:
+            logger.info(f"📂 分析 {len(pending)} 个文件 (缓存命中: {len(files) - len(pending)})")
+            indexes = self.index_files(pending)
+            futures = [(source, index, self._submit(pool, self.build_file_prompt(source, index)))
+                       for source, index in zip(pending, indexes)]
+            for source, index, future in futures:
+                result: ProviderResult = future.result()
+                entry = {"summary": result.message, "structure": index.structure(), "provider": result.provider}
+                if result.ok:
+                    self.cache.set(f"file:{source.digest}", entry)
+                entries[source.path] = {**entry, "ok": result.ok}
+                source.text = None
+        return entries, len(files) - len(pending)
+
+    def rollup(self, files: List[SourceFile], entries: Dict[str, Dict[str, Any]],
+               pool: ThreadPoolExecutor) -> Dict[str, _Directory]:
+        """从最深的目录开始逐层汇总，同一层的目录并行汇总；只有一个子项的目录直接沿用子项的摘要"""
+        directories: Dict[str, _Directory] = {"": _Directory("")}
+        for source in files:
+            child = posixpath.dirname(source.path)
+            directories.setdefault(child, _Directory(child)).files.append(source.path)
+            while child:
+                parent = directories.setdefault(posixpath.dirname(child), _Directory(posixpath.dirname(child)))
+                if child in parent.dirs:
+                    break
+                parent.dirs.append(child)
+                child = parent.path
+        digests = {source.path: source.digest for source in files}
+
+        by_depth: Dict[int, List[_Directory]] = defaultdict(list)
+        for directory in directories.values():
+            by_depth[directory.path.count("/") if directory.path else -1].append(directory)
+        for depth in sorted(by_depth, reverse=True):
+            futures = []
+            for directory in by_depth[depth]:
+                # 目录哈希由子目录哈希和文件内容哈希组成，任何后代文件变化都会改变所有祖先目录的哈希
+                directory.digest = hashlib.sha256("\n".join(
+                    [f"d {posixpath.basename(d)} {directories[d].digest}" for d in sorted(directory.dirs)]
+                    + [f"f {posixpath.basename(f)} {digests[f]}" for f in sorted(directory.files)]
+                ).encode("utf-8")).hexdigest()
+                directory.ok = all(entries[f]["ok"] for f in directory.files) and \
+                    all(directories[d].ok for d in directory.dirs)
+                if not directory.path:
+                    # 根目录由仓库总结处理
+                    continue
+                children = self._children(directory, directories, entries)
+                if len(children) == 1:
+                    directory.summary = children[0][1]
+                    continue
+                cached = self.cache.get(f"dir:{directory.digest}")
+                metrics.record_cache("repo_dir", cached is not None)
+                if cached is not None:
+                    directory.summary = cached["summary"]
+                    continue
+                futures.append((directory, self._submit(pool, self.build_rollup_prompt(directory, children))))
+            for directory, future in futures:
+                result = future.result()
+                directory.summary = result.message
+                if result.ok and directory.ok:
+                    self.cache.set(f"dir:{directory.digest}", {"summary": result.text})
+                directory.ok = directory.ok and result.ok
+        return directories
+
+    @staticmethod
+    def _children(directory: _Directory, directories: Dict[str, _Directory],
+                  entries: Dict[str, Dict[str, Any]]) -> List[Tuple[str, str]]:
+        return ([(posixpath.basename(d) + "/", directories[d].summary) for d in sorted(directory.dirs)]
+                + [(posixpath.basename(f), entries[f]["summary"]) for f in sorted(directory.files)])
+
+    @metrics.timed_analyzer("repository")
+    def analyze_repository(self, path: str) -> AnalysisResult:
+        """分析本地目录或tar包中的代码仓库"""
+        print(f"📦 开始分析仓库: {path}")
+        root = self.resolve_path(path)
+        files, stats = self.collect_files(root)
+        if not files:
+            message = "未找到可分析的源文件"
+            return {
+                "content_type": ContentType.REPOSITORY,
+                "original_content": path,
+                "analysis": message,
+                "summary": message,
+                "key_points": [],
+                "confidence": 0.4,
+                "metadata": {"analyzer": "repository", "files": 0, "skipped": stats.as_dict()}
+            }
+
+        with ThreadPoolExecutor(max_workers=max(1, config.repo_llm_concurrency), thread_name_prefix="repo") as pool:
+            entries, cached = self.analyze_files(files, pool)
+            directories = self.rollup(files, entries, pool)
+
+            structures = {f.path: entries[f.path]["structure"] for f in files}
+            languages = Counter(f.language for f in files)
+            hotspots = sorted(
+                ((p, s) for p, s in structures.items() if s.get("hotspots")),
+                key=lambda item: -item[1].get("max_cyclomatic", 0)
+            )[:5]
+            overview = [
+                f"文件数: {len(files)}（{', '.join(f'{lang} {n}' for lang, n in languages.most_common())}）",
+                f"总行数: {sum(s['lines'] for s in structures.values())}",
+            ]
+            if hotspots:
+                overview.append("复杂度最高的函数: " + "; ".join(
+                    f"{p}: {s['hotspots'][0]}（圈复杂度{s['max_cyclomatic']}）" for p, s in hotspots
+                ))
+
+            root_dir = directories[""]
+            children = self._children(root_dir, directories, entries)
+            name = os.path.basename(root.rstrip(os.sep))
+            prompt = self.build_repository_prompt(name, children, overview)
+            root_digest = hashlib.sha256(f"{name}\0{root_dir.digest}".encode("utf-8")).hexdigest()
+            cached_root = self.cache.get(f"repo:{root_digest}")
+            metrics.record_cache("repo_dir", cached_root is not None)
+            if cached_root is not None:
+                result = ProviderResult(provider=cached_root["provider"], text=cached_root["summary"])
+            else:
+                result = self._submit(pool, prompt).result()
+                if result.ok and root_dir.ok:
+                    self.cache.set(f"repo:{root_digest}", {"summary": result.text, "provider": result.provider})
+
+        failed = sum(1 for entry in entries.values() if not entry["ok"])
+        analysis = result.message
+        if not result.ok:
+            # 仓库总结失败时退回到顶层各部分摘要的拼接
+            logger.warning(f"⚠️ 仓库总结失败，使用顶层目录的汇总: {result.error}")
+            analysis = "\n\n".join(f"{child}:\n{summary}" for child, summary in children)
+
+        key_points = overview + [
+            f"本次分析 {len(files) - cached} 个文件，缓存命中 {cached} 个" + (f"，失败 {failed} 个" if failed else "")
+        ] + self.extractKeyPoints(analysis)
+        confidence = 0.9 if result.ok and not failed else (0.6 if any(e["ok"] for e in entries.values()) else 0.3)
+        return {
+            "content_type": ContentType.REPOSITORY,
+            "original_content": path,
+            "analysis": analysis,
+            "summary": analysis[:300] + "..." if len(analysis) > 300 else analysis,
+            "key_points": key_points[:10],
+            "confidence": confidence,
+            "metadata": {
+                "analyzer": "repository",
+                "provider": result.provider,
+                "files": len(files),
+                "analyzed": len(files) - cached,
+                "cached": cached,
+                "failed": failed,
+                "skipped": stats.as_dict(),
+                "languages": dict(languages),
+                "directories": {d.path: d.summary[:300] for d in directories.values() if d.path and "/" not in d.path},
+                "hotspots": [f"{p}:{s['hotspots'][0]}" for p, s in hotspots],
+            }
+        }
@@ -0,0 +1,174 @@
+"""
+站点抓取
+从种子URL开始按广度优先抓取同一站点的页面：限制抓取深度和页面数，请求经过共享的抓取调度器
+（每个主机的并发数和请求间隔有上限），按 url_key（忽略跟踪参数、协议和末尾斜杠）和正文哈希去重。抓取到的页面由 URLAnalyzer 并行分析后汇总为站点总结。
+"""
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from src.config import config
+from src.graph.state import AnalysisRequest, ContentType
+from src.utils import metrics
+from src.utils.fetchScheduler import get_fetch_scheduler
+from src.utils.urlCanonical import canonical_url, url_key
+
+logger = logging.getLogger(__name__)
+
+# URL请求的上下文为该值时抓取整个站点
+CRAWL_CONTEXT = "crawl"
+
+# 不是网页的链接，不抓取
+SKIP_EXTENSIONS = (
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".bmp", ".pdf", ".zip", ".gz", ".tgz", ".tar",
+    ".rar", ".7z", ".mp3", ".mp4", ".webm", ".avi", ".mov", ".css", ".js", ".json", ".xml", ".woff", ".woff2",
+    ".ttf", ".eot", ".exe", ".dmg", ".apk", ".iso",
+)
+
+def site_key(url: str) -> str:
+    """站点标识：去掉 www. 前缀的主机名（含端口）"""
+    host = urlsplit(url).netloc
+    return host[4:] if host.startswith("www.") else host
+
+
+def is_crawl_request(request: AnalysisRequest) -> bool:
+    """是否为站点抓取请求：URL请求且上下文为 "crawl" """
+    return (request["content_type"] == ContentType.URL
+            and (request.get("context") or "").strip().lower() == CRAWL_CONTEXT)
+
+
+@dataclass(slots=True)
+class Page:
+    """抓取到的一个网页"""
+    url: str
+    title: str
+    text: str
+    links: List[str] = field(default_factory=list)
+    depth: int = 0
+    aliases: List[str] = field(default_factory=list)  # 内容相同的其他URL
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+
+
+def extract_page(html: str, url: str) -> Page:
+    """从HTML中提取标题、正文和链接"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # 移除脚本和样式
+    for script in soup(["script", "style"]):
+        script.decompose()
+
+    title = soup.find('title')
+    title_text = title.get_text().strip() if title else "无标题"
+
+    content_tags = soup.find_all(['p', 'h1', 'h2', 'h3', 'article', 'main'])
+    content_text = '\n'.join([tag.get_text().strip() for tag in content_tags if tag.get_text().strip()])
+
+    links = []
+    for anchor in soup.find_all('a', href=True):
+        link = canonical_url(anchor['href'], url)
+        if link and link not in links:
+            links.append(link)
+    return Page(url, title_text, content_text, links)
+
+
+@dataclass
+class CrawlResult:
+    """一次站点抓取的结果"""
+    seed: str
+    pages: List[Page] = field(default_factory=list)
+    duplicates: int = 0  # 重定向到已抓取的页面或正文与已抓取页面相同
+    failed: Dict[str, str] = field(default_factory=dict)  # URL -> 错误信息
+    skipped: int = 0  # 超过深度或页面数上限而未抓取的链接
+
+
+class SiteCrawler:
+    """有界并发的站点抓取器"""
+
+    def __init__(self, session: requests.Session = None, max_depth: int = None, max_pages: int = None,
+                 workers: int = None):
+        """
+        Args:
+            session: 发送请求使用的会话
+            max_depth: 从种子页面开始跟随链接的最大层数（默认: CRAWL_MAX_DEPTH）
+            max_pages: 最多抓取的页面数（默认: CRAWL_MAX_PAGES）
+            workers: 抓取线程数（默认: CRAWL_WORKERS），每个主机的并发请求数由共享的抓取调度器限制
+        """
+        self.session = session
+        self.max_depth = config.crawl_max_depth if max_depth is None else max_depth
+        self.max_pages = max_pages or config.crawl_max_pages
+        self.workers = max(1, workers or config.crawl_workers)
+
+    def fetch(self, url: str) -> Page:
+        """抓取并解析一个页面，不是HTML时抛出 ValueError"""
+        response = get_fetch_scheduler().request("url", "GET", url, session=self.session, timeout=10)
+        response.raise_for_status()
+        metrics.FETCH_BYTES.labels(source="url").inc(len(response.content))
+        content_type = response.headers.get("Content-Type", "text/html")
+        if "html" not in content_type:
+            raise ValueError(f"不是网页: {content_type}")
+        return extract_page(response.text, canonical_url(response.url or url) or url)
+
+    def _follow(self, link: str, site: str) -> bool:
+        return site_key(link) == site and not urlsplit(link).path.lower().endswith(SKIP_EXTENSIONS)
+
+    def crawl(self, seed: str) -> CrawlResult:
+        """从种子URL开始按层抓取，同一层的页面并行抓取"""
+        seed_url = canonical_url(seed)
+        if seed_url is None:
+            raise ValueError(f"无效的URL: {seed}")
+        site = site_key(seed_url)
+        result = CrawlResult(seed_url)
+        seen = {url_key(seed_url)}
+        by_digest: Dict[str, Page] = {}
+        frontier = [seed_url]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crawl") as pool:
+            for depth in range(self.max_depth + 1):
+                level, frontier = frontier, []
+                # 重复或失败的页面不占用页面数，同一层还有链接时继续抓取直到用完页面数
+                while level and len(result.pages) < self.max_pages:
+                    room = self.max_pages - len(result.pages)
+                    batch, level = level[:room], level[room:]
+                    logger.info(f"🕸️ 抓取第 {depth} 层的 {len(batch)} 个页面")
+                    self._fetch_batch(pool, batch, depth, site, seen, by_digest, frontier, result)
+                result.skipped += len(level)
+            result.skipped += len(frontier)
+        logger.info(f"🕸️ 抓取完成: {len(result.pages)} 个页面，重复 {result.duplicates} 个，失败 {len(result.failed)} 个")
+        return result
+
+    def _fetch_batch(self, pool: ThreadPoolExecutor, batch: List[str], depth: int, site: str, seen: set,
+                     by_digest: Dict[str, Page], frontier: List[str], result: CrawlResult):
+        """并行抓取一批页面，新页面加入结果，未见过的同站链接加入下一层"""
+        futures = [(url, pool.submit(self.fetch, url)) for url in batch]
+        for url, future in futures:
+            try:
+                page = future.result()
+            except Exception as e:
+                logger.warning(f"⚠️ 抓取失败 {url}: {str(e)}")
+                result.failed[url] = str(e)
+                continue
+            # 重定向后的地址已经抓取过，或正文与已抓取的页面相同
+            key = url_key(page.url)
+            if key != url_key(url) and key in seen or page.digest in by_digest:
+                if page.digest in by_digest:
+                    by_digest[page.digest].aliases.append(url)
+                result.duplicates += 1
+                continue
+            seen.add(key)
+            page.depth = depth
+            by_digest[page.digest] = page
+            result.pages.append(page)
+            for link in page.links:
+                if url_key(link) not in seen and self._follow(link, site):
+                    seen.add(url_key(link))
+                    frontier.append(link)
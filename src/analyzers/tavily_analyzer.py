@@ -1,20 +1,52 @@
-from typing import Dict, Any, List
-from tavily import TavilyClient
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from requests.adapters import HTTPAdapter
 from src.config import config
+from src.utils import metrics
+from src.utils.cassette import record_call, is_replaying
+from src.utils.ttlCache import MISSING, TTLCache
+import copy
 import logging
 import os
+import requests
+import threading
+import unicodedata
 
 # 配置日志
 log_level = os.getenv("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(level=getattr(logging, log_level, logging.INFO))
 logger = logging.getLogger(__name__)
 
+# 规范化时保留的符号（如 c# 与 c 是不同的查询）
+_QUERY_KEEP_CHARS = "#"
+
+
+def normalize_query(query: str) -> str:
+    """规范化搜索查询：全角转半角、转小写，标点视为空白并合并连续空白"""
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = "".join(
+        " " if unicodedata.category(ch).startswith("P") and ch not in _QUERY_KEEP_CHARS else ch
+        for ch in text
+    )
+    return " ".join(text.split())
+
+
+# 所有Tavily分析器共享的结果缓存，键为 (操作, 规范化的查询, 选项...)
+search_cache = TTLCache("tavily", max_entries=config.tavily_cache_size, ttl=config.tavily_cache_ttl)
+
+
 class TavilyAnalyzer:
     """Tavily搜索分析器"""
     
-    def __init__(self):
-        """初始化Tavily分析器"""
+    def __init__(self, cache: TTLCache = None):
+        """
+        初始化Tavily分析器
+        
+        Args:
+            cache: 搜索结果缓存（默认: 共享的 search_cache）
+        """
         logger.debug("🔧 初始化Tavily分析器...")
+        self.cache = cache if cache is not None else search_cache
         
         # 从配置中获取Tavily API密钥
         self.tavily_api_key = os.getenv("TAVILY_API_KEY")
@@ -25,7 +57,25 @@ class TavilyAnalyzer:
             self.client = None
         else:
             try:
-                self.client = TavilyClient(api_key=self.tavily_api_key)
+                from tavily import TavilyClient
+                
+                # 并发搜索共享同一个连接池，复用TLS连接
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=max(1, config.tavily_search_workers))
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                try:
+                    self.client = TavilyClient(
+                        api_key=self.tavily_api_key,
+                        api_base_url=config.tavily_base_url,
+                        session=session
+                    )
+                except TypeError:
+                    # 旧版tavily-python不支持传入会话
+                    self.client = TavilyClient(
+                        api_key=self.tavily_api_key,
+                        api_base_url=config.tavily_base_url
+                    )
                 logger.info("✅ Tavily客户端初始化成功")
             except Exception as e:
                 logger.error(f"❌ Tavily客户端初始化失败: {str(e)}")
@@ -33,19 +83,29 @@ class TavilyAnalyzer:
     
     def is_available(self) -> bool:
         """检查Tavily分析器是否可用"""
-        return self.client is not None
+        # 回放录制流量时不需要真实的客户端
+        return self.client is not None or is_replaying()
     
-    def search(self, query: str, max_results: int = 5) -> Dict[str, Any]:
+    @metrics.timed_analyzer("tavily")
+    def search(self, query: str, max_results: int = 5, include_answer: bool = True,
+               include_raw_content: bool = None) -> Dict[str, Any]:
         """
         执行Tavily搜索
         
+        只有空白、大小写或标点不同的查询共享同一个缓存结果；成功的结果才会缓存。
+        默认只返回摘要（raw_content为None），需要完整正文时用 raw_content(result) 按结果获取。
+        
         Args:
             query: 搜索查询
             max_results: 最大结果数
+            include_answer: 是否返回Tavily生成的答案
+            include_raw_content: 是否直接返回网页的完整正文（默认: TAVILY_INCLUDE_RAW_CONTENT）
             
         Returns:
-            包含搜索结果的字典
+            包含搜索结果的字典，命中缓存时带有 "cached": True
         """
+        if include_raw_content is None:
+            include_raw_content = config.tavily_include_raw_content
         if not self.is_available():
             logger.warning("⚠️ Tavily分析器不可用，无法执行搜索")
             return {
@@ -54,16 +114,29 @@ class TavilyAnalyzer:
                 "results": []
             }
         
+        cache_key = ("search", normalize_query(query), max_results, include_answer, include_raw_content)
+        cached = self.cache.get(cache_key)
+        if cached is not MISSING:
+            logger.info(f"⚡ 命中Tavily搜索缓存: {query}")
+            # 返回深拷贝，调用方修改结果列表或其中的条目不会影响缓存
+            return {**copy.deepcopy(cached), "cached": True}
+        
         try:
             logger.info(f"🔍 执行Tavily搜索: {query}")
             logger.debug(f"📊 最大结果数: {max_results}")
             
             # 执行搜索
-            response = self.client.search(
-                query=query,
-                max_results=max_results,
-                include_answer=True,
-                include_raw_content=True
+            response = record_call(
+                "tavily",
+                # 与缓存键使用相同的选项，精简搜索和完整搜索分别录制
+                {"op": "search", "query": query, "max_results": max_results, "include_answer": include_answer,
+                 "include_raw_content": include_raw_content},
+                lambda: self.client.search(
+                    query=query,
+                    max_results=max_results,
+                    include_answer=include_answer,
+                    include_raw_content=include_raw_content
+                )
             )
             
             logger.debug(f"📥 Tavily搜索响应: {response}")
@@ -76,19 +149,21 @@ class TavilyAnalyzer:
                         "title": item.get("title", ""),
                         "url": item.get("url", ""),
                         "content": item.get("content", ""),
-                        "raw_content": item.get("raw_content", ""),
+                        "raw_content": (item.get("raw_content") or "") if include_raw_content else None,
                         "score": item.get("score", 0)
                     }
                     results.append(result)
             
             logger.info(f"✅ Tavily搜索完成，返回 {len(results)} 个结果")
             
-            return {
+            search_result = {
                 "success": True,
                 "query": query,
                 "answer": response.get("answer", ""),
                 "results": results
             }
+            self.cache.set(cache_key, copy.deepcopy(search_result))
+            return search_result
             
         except Exception as e:
             logger.error(f"❌ Tavily搜索失败: {str(e)}")
@@ -98,6 +173,93 @@ class TavilyAnalyzer:
                 "results": []
             }
     
+    def search_many(self, queries: List[str], max_results: int = 5, include_answer: bool = True,
+                    include_raw_content: bool = None, max_workers: int = None) -> List[Dict[str, Any]]:
+        """
+        并发执行多个搜索，总耗时约为最慢的一个查询
+        
+        规范化后相同的查询只请求一次，其余参数与 search 相同。
+        
+        Args:
+            queries: 搜索查询列表
+            max_workers: 最大并发数（默认: TAVILY_SEARCH_WORKERS）
+            
+        Returns:
+            与queries顺序一致的搜索结果列表
+        """
+        unique: Dict[str, str] = {}
+        for query in queries:
+            unique.setdefault(normalize_query(query), query)
+        
+        def run(query: str) -> Dict[str, Any]:
+            return self.search(query, max_results, include_answer, include_raw_content)
+        
+        workers = min(max_workers or config.tavily_search_workers, len(unique))
+        if workers <= 1:
+            results = {key: run(query) for key, query in unique.items()}
+        else:
+            logger.info(f"🔍 并发执行 {len(unique)} 个Tavily搜索 (并发数: {workers})")
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tavily") as executor:
+                futures = {key: executor.submit(run, query) for key, query in unique.items()}
+                results = {key: future.result() for key, future in futures.items()}
+        return [results[normalize_query(query)] for query in queries]
+    
+    def extract(self, urls: List[str]) -> Dict[str, str]:
+        """
+        获取网页完整正文，按URL缓存，未缓存的URL合并为一次extract调用
+        
+        Args:
+            urls: 网页URL列表
+            
+        Returns:
+            {URL: 正文}，获取失败的URL不包含在内
+        """
+        contents = {}
+        missing = []
+        for url in dict.fromkeys(urls):
+            cached = self.cache.get(("extract", url))
+            if cached is MISSING:
+                missing.append(url)
+            else:
+                contents[url] = cached
+        if not missing or not self.is_available():
+            return contents
+        
+        # extract接口每次最多接受20个URL
+        for start in range(0, len(missing), 20):
+            chunk = missing[start:start + 20]
+            try:
+                logger.info(f"📄 获取 {len(chunk)} 个网页的完整正文")
+                response = record_call(
+                    "tavily",
+                    {"op": "extract", "urls": chunk},
+                    lambda: self.client.extract(urls=chunk)
+                )
+            except Exception as e:
+                logger.error(f"❌ Tavily正文获取失败: {str(e)}")
+                continue
+            for item in response.get("results", []):
+                url, raw_content = item.get("url"), item.get("raw_content") or ""
+                if url:
+                    contents[url] = raw_content
+                    self.cache.set(("extract", url), raw_content)
+        return contents
+    
+    def raw_content(self, result: Dict[str, Any]) -> str:
+        """
+        返回一个搜索结果的完整正文，精简模式下首次调用时才获取
+        
+        获取到的正文会写回 result["raw_content"]，获取失败时返回空字符串。
+        """
+        if result.get("raw_content") is not None:
+            return result["raw_content"]
+        url = result.get("url", "")
+        raw_content = self.extract([url]).get(url)
+        if raw_content is None:
+            return ""
+        result["raw_content"] = raw_content
+        return raw_content
+    
     def get_context(self, query: str) -> str:
         """
         获取搜索上下文用于RAG应用
@@ -112,13 +274,24 @@ class TavilyAnalyzer:
             logger.warning("⚠️ Tavily分析器不可用，无法获取上下文")
             return "Tavily分析器不可用"
         
+        cache_key = ("get_context", normalize_query(query))
+        cached = self.cache.get(cache_key)
+        if cached is not MISSING:
+            logger.info(f"⚡ 命中Tavily上下文缓存: {query}")
+            return cached
+        
         try:
             logger.info(f"🔍 获取Tavily上下文: {query}")
             
             # 获取上下文
-            context = self.client.get_search_context(query=query)
+            context = record_call(
+                "tavily",
+                {"op": "get_context", "query": query},
+                lambda: self.client.get_search_context(query=query)
+            )
             
             logger.info("✅ Tavily上下文获取完成")
+            self.cache.set(cache_key, context)
             return context
             
         except Exception as e:
@@ -139,18 +312,47 @@ class TavilyAnalyzer:
             logger.warning("⚠️ Tavily分析器不可用，无法执行问答搜索")
             return "Tavily分析器不可用"
         
+        cache_key = ("qna_search", normalize_query(query))
+        cached = self.cache.get(cache_key)
+        if cached is not MISSING:
+            logger.info(f"⚡ 命中Tavily问答缓存: {query}")
+            return cached
+        
         try:
             logger.info(f"🔍 执行Tavily问答搜索: {query}")
             
             # 执行问答搜索
-            answer = self.client.qna_search(query=query)
+            answer = record_call(
+                "tavily",
+                {"op": "qna_search", "query": query},
+                lambda: self.client.qna_search(query=query)
+            )
             
             logger.info("✅ Tavily问答搜索完成")
+            self.cache.set(cache_key, answer)
             return answer
             
         except Exception as e:
             logger.error(f"❌ Tavily问答搜索失败: {str(e)}")
             return f"问答搜索失败: {str(e)}"
 
-# 全局Tavily分析器实例
-tavily_analyzer = TavilyAnalyzer()
\ No newline at end of file
+# 全局Tavily分析器实例，首次使用时创建
+_tavily_analyzer: Optional[TavilyAnalyzer] = None
+_tavily_lock = threading.Lock()
+
+
+def get_tavily_analyzer() -> TavilyAnalyzer:
+    """获取共享的Tavily分析器，首次调用时创建（导入tavily并初始化客户端）"""
+    global _tavily_analyzer
+    if _tavily_analyzer is None:
+        with _tavily_lock:
+            if _tavily_analyzer is None:
+                _tavily_analyzer = TavilyAnalyzer()
+    return _tavily_analyzer
+
+
+def __getattr__(name: str):
+    # 兼容旧代码中的 `from src.analyzers.tavily_analyzer import tavily_analyzer`
+    if name == "tavily_analyzer":
+        return get_tavily_analyzer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -1,8 +1,22 @@
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+import contextvars
+import logging
 import requests
-from bs4 import BeautifulSoup
 from src.analyzers.base import ContentAnalyzer
+from src.analyzers.providerResult import ProviderResult
+from src.analyzers.siteCrawler import Page, SiteCrawler, extract_page
+from src.config import config
 from src.graph.state import AnalysisResult, ContentType
+from src.utils import metrics
+from src.utils.fetchScheduler import fetch
+from src.utils.ttlCache import MISSING, TTLCache
+from src.utils.urlCanonical import canonical_url, get_redirect_resolver
+
+logger = logging.getLogger(__name__)
+
+# 网页分析结果缓存：键为正文哈希，不同地址返回相同内容时只分析一次
+page_cache = TTLCache("url_page", max_entries=config.url_page_cache_size, ttl=config.url_page_cache_ttl)
 
 
 class URLAnalyzer(ContentAnalyzer):
@@ -15,41 +29,33 @@ class URLAnalyzer(ContentAnalyzer):
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
         })
     
+    def fetch_page(self, url: str) -> Page:
+        """抓取并解析网页，页面的 url 为重定向后规范化的地址；请求失败时抛出异常"""
+        response = fetch("url", "GET", url, session=self.session, timeout=10)
+        response.raise_for_status()
+        metrics.FETCH_BYTES.labels(source="url").inc(len(response.content))
+        
+        # 记录重定向，之后指向同一地址的链接不必再跟随跳转
+        final = canonical_url(response.url or url) or url
+        get_redirect_resolver().remember(url, final)
+        
+        # 解析HTML内容，提取标题和正文
+        return extract_page(response.text, final)
+    
+    def page_content(self, page: Page) -> str:
+        """发送给模型的网页内容"""
+        return f"标题: {page.title}\n\n内容: {page.text[:2000]}..."
+    
     def fetch_url_content(self, url: str) -> str:
         """获取URL内容"""
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            # 解析HTML内容
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 移除脚本和样式
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # 提取主要文本内容
-            title = soup.find('title')
-            title_text = title.get_text() if title else "无标题"
-            
-            # 提取正文内容
-            content_tags = soup.find_all(['p', 'h1', 'h2', 'h3', 'article', 'main'])
-            content_text = '\n'.join([tag.get_text().strip() for tag in content_tags if tag.get_text().strip()])
-            
-            return f"标题: {title_text}\n\n内容: {content_text[:2000]}..."
-            
+            return self.page_content(self.fetch_page(url))
         except Exception as e:
             return f"无法获取URL内容: {str(e)}"
     
-    def analyze_url(self, url: str) -> AnalysisResult:
-        """分析URL内容"""
-        print(f"📥 开始分析URL: {url}")
-        
-        # 获取网页内容
-        web_content = self.fetch_url_content(url)
-        
-        # 创建分析提示
-        prompt = f"""
+    def build_prompt(self, url: str, web_content: str) -> str:
+        """创建URL分析提示"""
+        return f"""
         请分析以下网页内容：
         
         URL: {url}
@@ -63,19 +69,17 @@ class URLAnalyzer(ContentAnalyzer):
         
         请用简洁明了的语言总结，突出最重要的信息。
         """
-        
-        # 使用AI分析
-        analysis = self.analyzeWithOpenai(prompt)
-        
-        if "失败" in analysis:
-            analysis = self.analyzeWithGemini(prompt)
+    
+    def build_result(self, url: str, provider_result: ProviderResult, fetch_failed: bool = False) -> AnalysisResult:
+        """根据模型结果构建URL分析结果"""
+        analysis = provider_result.message
         
         # 提取关键点
         key_points = self.extractKeyPoints(analysis)
         
         # 评估置信度
-        confidence = 0.8 if "失败" not in analysis else 0.3
-        if "无法获取" in web_content:
+        confidence = 0.8 if provider_result.ok else 0.3
+        if fetch_failed:
             confidence = 0.1
         
         return {
@@ -84,5 +88,106 @@ class URLAnalyzer(ContentAnalyzer):
             "analysis": analysis,
             "summary": analysis[:300] + "..." if len(analysis) > 300 else analysis,
             "key_points": key_points,
-            "confidence": confidence
-        }
\ No newline at end of file
+            "confidence": confidence,
+            "metadata": {"provider": provider_result.provider}
+        }
+    
+    def analyze_page(self, url: str, page: Page) -> AnalysisResult:
+        """分析已抓取的网页，正文相同的网页复用缓存的分析结果"""
+        # 没有正文的页面（如需要脚本渲染的页面）无法按内容判断是否相同，不使用缓存
+        digest = page.digest if page.text.strip() else None
+        cached = page_cache.get(digest) if digest else MISSING
+        if cached is not MISSING:
+            logger.info(f"♻️ {url} 的正文与已分析的网页相同，复用分析结果")
+            result = cached
+        else:
+            result = self.analyzeWithRouting(self.build_prompt(url, self.page_content(page)))
+            if result.ok and digest:
+                page_cache.set(digest, result)
+        analysis = self.build_result(url, result)
+        analysis["metadata"].update({"url": page.url, "content_digest": digest, "cached": cached is not MISSING})
+        return analysis
+    
+    @metrics.timed_analyzer("url")
+    def analyze_url(self, url: str) -> AnalysisResult:
+        """分析URL内容"""
+        print(f"📥 开始分析URL: {url}")
+        
+        # 获取网页内容
+        try:
+            page = self.fetch_page(url)
+        except Exception as e:
+            web_content = f"无法获取URL内容: {str(e)}"
+        else:
+            return self.analyze_page(url, page)
+        
+        # 使用AI分析
+        result = self.analyzeWithRouting(self.build_prompt(url, web_content))
+        return self.build_result(url, result, True)
+    
+    def build_site_prompt(self, seed: str, pages: List[Page], summaries: List[str]) -> str:
+        """根据各页面的分析创建站点总结提示"""
+        allowance = max(200, 12000 // max(1, len(pages)))
+        sections = "\n\n".join(
+            f"### {page.title}（{page.url}）\n{summary[:allowance]}{'...' if len(summary) > allowance else ''}"
+            for page, summary in zip(pages, summaries)
+        )
+        return f"""
+        以下是从 {seed} 开始抓取的站点中各页面的分析：
+        
+        {sections}
+        
+        请汇总为对整个站点的分析，提供：
+        1. 站点的主题和内容结构
+        2. 各部分的关键信息和要点
+        3. 内容的可信度和价值评估
+        4. 对读者的实用性建议
+        """
+    
+    @metrics.timed_analyzer("site")
+    def crawl_site(self, url: str, max_depth: int = None, max_pages: int = None) -> AnalysisResult:
+        """从种子URL开始抓取同一站点的页面，并行分析各页面后汇总为站点总结"""
+        print(f"🕸️ 开始抓取站点: {url}")
+        crawl = SiteCrawler(self.session, max_depth, max_pages).crawl(url)
+        if not crawl.pages:
+            error = next(iter(crawl.failed.values()), "没有抓取到页面")
+            result = self.build_result(url, ProviderResult(provider="none", text=f"无法获取URL内容: {error}"), True)
+            result["metadata"].update({"analyzer": "site_crawl", "pages": [], "failed": crawl.failed})
+            return result
+        
+        prompts = [self.build_prompt(page.url, f"标题: {page.title}\n\n内容: {page.text[:config.crawl_page_chars]}")
+                   for page in crawl.pages]
+        workers = min(max(1, config.crawl_llm_concurrency), len(prompts))
+        logger.info(f"🕸️ 分析 {len(prompts)} 个页面 (并发数: {workers})")
+        # 每个任务在当前上下文的副本中运行，保留本次请求的路由策略
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawl-llm") as executor:
+            futures = [executor.submit(contextvars.copy_context().run, self.analyzeWithRouting, p) for p in prompts]
+            page_results = [future.result() for future in futures]
+        
+        if len(page_results) == 1:
+            result = page_results[0]
+        else:
+            result = self.analyzeWithRouting(
+                self.build_site_prompt(crawl.seed, crawl.pages, [r.message for r in page_results])
+            )
+            if not result.ok and any(r.ok for r in page_results):
+                # 站点总结失败时退回到各页面分析的拼接
+                logger.warning(f"⚠️ 站点总结失败，使用各页面的分析: {result.error}")
+                text = "\n\n".join(f"{page.url}:\n{r.message}" for page, r in zip(crawl.pages, page_results))
+                result = ProviderResult(provider=next(r.provider for r in page_results if r.ok), text=text)
+        
+        analysis = self.build_result(url, result)
+        failed = sum(1 for r in page_results if not r.ok)
+        if failed or crawl.failed:
+            analysis["confidence"] = min(analysis["confidence"], 0.6)
+        analysis["key_points"].insert(0, f"抓取页面: {len(crawl.pages)}个（重复 {crawl.duplicates}，失败 {len(crawl.failed)}，"
+                                         f"未抓取 {crawl.skipped}）")
+        analysis["metadata"].update({
+            "analyzer": "site_crawl",
+            "pages": [{"url": p.url, "title": p.title, "depth": p.depth, "aliases": p.aliases,
+                       "ok": r.ok} for p, r in zip(crawl.pages, page_results)],
+            "duplicates": crawl.duplicates,
+            "failed": crawl.failed,
+            "skipped": crawl.skipped,
+        })
+        return analysis
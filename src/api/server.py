@@ -12,18 +12,22 @@ import logging
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
 from typing import Dict, Any, List
 import traceback
 import json
+import time
 from datetime import datetime
 
 from src.core.multimodalAgent import run_custom_analysis, create_analysis_request
 from src.graph.state import ContentType, GraphState
 from src.graph.workflow import compile_multimodal_workflow
+from src.analyzers.providerRouter import validate_policy
 from src.config import config
 from src.utils.forumDataAdapter import convert_user_forum_data
+from src.utils import metrics
+from src.utils.singleFlight import SingleFlight, coalesce_key
 
 # 配置日志
 # 从环境变量获取日志级别，默认为INFO
@@ -34,6 +38,42 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # 允许跨域请求
 
+# 内容相同的并发分析请求只执行一次工作流，其余请求等待并共享结果
+analysis_flight = SingleFlight()
+
+
+def _route_label() -> str:
+    """获取当前请求的路由模板，未匹配的请求统一归为unmatched，避免标签基数失控"""
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+@app.before_request
+def start_request_metrics():
+    """记录请求开始时间并增加并发计数"""
+    g.metrics_route = _route_label()
+    g.metrics_start = time.perf_counter()
+    metrics.ROUTE_IN_FLIGHT.labels(route=g.metrics_route).inc()
+
+
+@app.after_request
+def observe_request_metrics(response):
+    """记录请求耗时"""
+    if hasattr(g, "metrics_start"):
+        metrics.ROUTE_LATENCY.labels(
+            route=g.metrics_route,
+            method=request.method,
+            status=str(response.status_code)
+        ).observe(time.perf_counter() - g.metrics_start)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    """无论请求是否异常都要减少并发计数"""
+    route = g.pop("metrics_route", None)
+    if route is not None:
+        metrics.ROUTE_IN_FLIGHT.labels(route=route).dec()
+
 
 def create_error_response(message: str, status_code: int = 400) -> tuple:
     """创建错误响应"""
@@ -55,6 +95,16 @@ def create_success_response(data: Any) -> Dict[str, Any]:
     })
 
 
+def run_coalesced_analysis(analysis_requests: List[Dict[str, Any]], **options) -> GraphState:
+    """执行分析，与正在进行的相同请求合并"""
+    key = coalesce_key(analysis_requests, **options)
+    result, shared = analysis_flight.do(key, lambda: run_custom_analysis(analysis_requests, **options))
+    if shared:
+        metrics.COALESCED_REQUESTS.labels(scope="server").inc()
+        logger.info("🔗 与正在进行的相同请求合并，共享分析结果")
+    return result
+
+
 def validate_content_type(content_type: str) -> ContentType:
     """验证并转换内容类型"""
     type_mapping = {
@@ -62,7 +112,8 @@ def validate_content_type(content_type: str) -> ContentType:
         "image": ContentType.IMAGE, 
         "code": ContentType.CODE,
         "text": ContentType.TEXT,
-        "forum": ContentType.FORUM
+        "forum": ContentType.FORUM,
+        "repository": ContentType.REPOSITORY
     }
     
     if content_type.lower() not in type_mapping:
@@ -82,7 +133,8 @@ def home():
             "POST /analyze/batch": "批量分析多个内容",
             "POST /analyze/forum": "分析论坛数据",
             "GET /health": "健康检查",
-            "GET /config/status": "API配置状态"
+            "GET /config/status": "API配置状态",
+            "GET /metrics": "Prometheus指标"
         },
         "supported_types": ["url", "image", "code", "text", "forum"]
     })
@@ -97,6 +149,13 @@ def health_check():
     })
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus指标"""
+    payload, content_type = metrics.render_metrics()
+    return Response(payload, content_type=content_type)
+
+
 @app.route("/config/status", methods=["GET"])
 def config_status():
     """获取API配置状态"""
@@ -118,8 +177,10 @@ def analyze_single():
     JSON格式:
     {
         "content": "要分析的内容",
-        "content_type": "url|image|code|text",
-        "context": "可选的上下文信息"
+        "content_type": "url|image|code|text|repository",
+        "context": "可选的上下文信息",
+        "previous_content": "可选，code类型的上一版本，提供时只分析修改的部分",
+        "routing_policy": "可选，cost|balanced|latency"
     }
     """
     try:
@@ -141,6 +202,7 @@ def analyze_single():
         content = data["content"]
         content_type_str = data["content_type"]
         context = data.get("context")
+        previous_content = data.get("previous_content")
         
         # 验证内容不为空
         if not content or not content.strip():
@@ -154,12 +216,22 @@ def analyze_single():
         
         logger.info(f"📝 分析内容类型: {content_type_str}")
         
+        # 验证路由策略
+        policy = data.get("routing_policy")
+        if policy:
+            try:
+                policy = validate_policy(policy)
+            except ValueError as e:
+                return create_error_response(str(e))
+        
         # 创建分析请求
-        analysis_request = create_analysis_request(content, content_type, context)
+        if previous_content is not None and content_type != ContentType.CODE:
+            return create_error_response("previous_content 只适用于 code 类型")
+        analysis_request = create_analysis_request(content, content_type, context, previous_content)
         
         # 执行分析
         logger.info("🚀 开始执行分析...")
-        result = run_custom_analysis([analysis_request])
+        result = run_coalesced_analysis([analysis_request], routing_policy=policy)
         logger.info("✅ 分析执行完成")
         
         if not result:
@@ -215,7 +287,9 @@ def analyze_batch():
                 "content_type": "code",
                 "context": "Python"
             }
-        ]
+        ],
+        "routing_policy": "可选，cost|balanced|latency",
+        "micro_batching": "可选，true时把短文本和小代码块打包进共享的模型调用"
     }
     """
     try:
@@ -263,11 +337,25 @@ def analyze_batch():
             except ValueError as e:
                 return create_error_response(f"请求{i+1}: {str(e)}")
             
-            analysis_requests.append(create_analysis_request(content, content_type, context))
+            previous_content = req_data.get("previous_content")
+            if previous_content is not None and content_type != ContentType.CODE:
+                return create_error_response(f"请求{i+1}: previous_content 只适用于 code 类型")
+            analysis_requests.append(create_analysis_request(content, content_type, context, previous_content))
+        
+        policy = data.get("routing_policy")
+        if policy:
+            try:
+                policy = validate_policy(policy)
+            except ValueError as e:
+                return create_error_response(str(e))
+        
+        micro_batching = data.get("micro_batching")
+        if micro_batching is not None and not isinstance(micro_batching, bool):
+            return create_error_response("micro_batching字段必须是布尔值")
         
         # 执行批量分析
         logger.info("🚀 开始执行批量分析...")
-        result = run_custom_analysis(analysis_requests)
+        result = run_coalesced_analysis(analysis_requests, routing_policy=policy, micro_batching=micro_batching)
         logger.info("✅ 批量分析执行完成")
         
         if not result:
@@ -481,6 +569,7 @@ if __name__ == "__main__":
         print("  GET  /                - API首页和文档")
         print("  GET  /health          - 健康检查")
         print("  GET  /config/status   - 配置状态")
+        print("  GET  /metrics         - Prometheus指标")
         print("  POST /analyze         - 单个内容分析") 
         print("  POST /analyze/batch   - 批量内容分析")
         print("  POST /analyze/forum   - 论坛数据分析")
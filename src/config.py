@@ -1,12 +1,13 @@
 import os
 from dotenv import load_dotenv
 from typing import Optional
-import openai
-import google.generativeai as genai
-import dashscope
 import requests
 import json
 import logging
+import threading
+
+# 服务商SDK（google.generativeai、dashscope）导入耗时较长，在首次使用时才导入，
+# 只使用一个服务商的命令行调用和工作进程不需要为其他SDK付出启动时间
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -21,6 +22,15 @@ OPENAI_RATE_LIMIT_ERRORS = [
     "Request rate limit exceeded"
 ]
 
+class ProviderAPIError(Exception):
+    """服务商API请求失败，携带HTTP状态码以便调用方区分错误类型"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None, timeout: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.timeout = timeout
+
+
 class CustomOpenAIClient:
     """自定义OpenAI客户端，用于处理非标准端点"""
     
@@ -94,12 +104,17 @@ class CustomOpenAIClient:
                         # 示例: "https://api.openai.com/v1" -> "https://api.openai.com/v1/chat/completions"
                         endpoint_url = f"{base_url}/chat/completions"
                 
+                # 延迟导入，避免与src.utils之间的循环依赖
+                from src.utils.cassette import http_request
+                
                 try:
                     logger.debug(f"🔗 请求端点: {endpoint_url}")
                     # 使用 ensure_ascii=False 可以在日志中正确显示中文
                     logger.debug(f"📋 请求数据: {json.dumps(data, indent=2, ensure_ascii=False)}")
                     
-                    response = requests.post(
+                    response = http_request(
+                        "openai",
+                        "POST",
                         endpoint_url,
                         headers=headers,
                         json=data,
@@ -120,7 +135,12 @@ class CustomOpenAIClient:
                             error_message += f"\n响应内容: {json.dumps(error_details, indent=2, ensure_ascii=False)}"
                         except json.JSONDecodeError:
                             error_message += f"\n响应内容 (非JSON): {e.response.text}"
-                    raise Exception(error_message)
+                    status_code = e.response.status_code if e.response is not None else None
+                    raise ProviderAPIError(
+                        error_message,
+                        status_code=status_code,
+                        timeout=isinstance(e, requests.exceptions.Timeout)
+                    )
 
 
 class CustomResponse:
@@ -128,6 +148,12 @@ class CustomResponse:
     
     def __init__(self, data: dict):
         self.choices = []
+        # Chat Completions返回prompt/completion_tokens，Responses API返回input/output_tokens
+        usage = data.get('usage') or {}
+        self.usage = {
+            'input_tokens': usage.get('prompt_tokens', usage.get('input_tokens', 0)),
+            'output_tokens': usage.get('completion_tokens', usage.get('output_tokens', 0))
+        } if usage else {}
         
         # 处理Responses API格式
         if 'output' in data:
@@ -246,7 +272,10 @@ class MultiKeyOpenAIClient:
                             # 如果已经尝试过所有密钥，抛出异常
                             if attempt_count >= max_attempts:
                                 logger.error("❌ 所有API密钥都已达到限制")
-                                raise Exception(f"所有API密钥都已达到限制: {error_message}")
+                                raise ProviderAPIError(
+                                    f"所有API密钥都已达到限制: {error_message}",
+                                    status_code=getattr(e, "status_code", None)
+                                )
                         else:
                             # 如果不是速率限制错误，直接抛出异常
                             raise e
@@ -261,8 +290,6 @@ class Config:
     def __init__(self):
         # 读取单个API密钥（向后兼容）
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        if self.openai_api_key:
-            openai.api_key = self.openai_api_key
             
         # 读取多个API密钥
         openai_api_keys_str = os.getenv("OPENAI_API_KEYS")
@@ -276,12 +303,13 @@ class Config:
         self.openai_base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
         
         self.google_api_key = os.getenv("GOOGLE_API_KEY")
-        if self.google_api_key:
-            genai.configure(api_key=self.google_api_key)
+        # Gemini自定义端点（可选），用于代理或本地模拟服务，设置后改用REST传输
+        self.google_api_base_url = os.getenv("GOOGLE_API_BASE_URL")
         
         self.alibaba_api_key = os.getenv("ALIBABA_API_KEY")
-        if self.alibaba_api_key:
-            dashscope.api_key = self.alibaba_api_key
+        
+        self._sdk_lock = threading.Lock()
+        self._gemini_configured = False
         
         self.max_tokens = int(os.getenv("MAX_TOKENS", 32768))
         self.temperature = float(os.getenv("TEMPERATURE", 0.7))
@@ -292,14 +320,115 @@ class Config:
         
         # Tavily配置
         self.tavily_api_key = os.getenv("TAVILY_API_KEY")
+        self.tavily_base_url = os.getenv("TAVILY_BASE_URL")
+        # 搜索时是否直接返回网页完整正文；默认只返回摘要，需要正文时再按结果单独获取
+        self.tavily_include_raw_content = os.getenv("TAVILY_INCLUDE_RAW_CONTENT", "false").lower() in ("1", "true", "yes")
+        # 多个搜索请求并发执行时的最大并发数，也是共享HTTP连接池的大小
+        self.tavily_search_workers = int(os.getenv("TAVILY_SEARCH_WORKERS", 8))
+        # Tavily结果缓存：存活秒数和最大条目数，任一为0时禁用
+        self.tavily_cache_ttl = float(os.getenv("TAVILY_CACHE_TTL", 3600))
+        self.tavily_cache_size = int(os.getenv("TAVILY_CACHE_SIZE", 1024))
+        
+        # 服务商路由配置：cost | balanced | latency
+        self.provider_routing_policy = os.getenv("PROVIDER_ROUTING_POLICY", "balanced")
+        self.provider_hedge_min_delay = float(os.getenv("PROVIDER_HEDGE_MIN_DELAY", 0.5))
+        self.provider_hedge_max_delay = float(os.getenv("PROVIDER_HEDGE_MAX_DELAY", 15))
+        self.provider_router_workers = int(os.getenv("PROVIDER_ROUTER_WORKERS", 32))
+        
+        # 微批处理配置：把多个短文本/小代码块打包进一次模型调用（默认关闭）
+        self.micro_batching = os.getenv("MICRO_BATCHING", "false").lower() in ("1", "true", "yes")
+        self.micro_batch_size = int(os.getenv("MICRO_BATCH_SIZE", 8))
+        self.micro_batch_item_chars = int(os.getenv("MICRO_BATCH_ITEM_CHARS", 1500))
+        self.micro_batch_chars = int(os.getenv("MICRO_BATCH_CHARS", 8000))
+        
+        # 大段代码分块分析：超过块大小的代码按函数/类切分后并行分析再汇总
+        self.code_chunk_chars = int(os.getenv("CODE_CHUNK_CHARS", 6000))
+        self.code_chunk_workers = int(os.getenv("CODE_CHUNK_WORKERS", 4))
+        # 代码块分析结果缓存（按块内容哈希）：存活秒数和最大条目数，任一为0时禁用
+        self.code_chunk_cache_ttl = float(os.getenv("CODE_CHUNK_CACHE_TTL", 86400))
+        self.code_chunk_cache_size = int(os.getenv("CODE_CHUNK_CACHE_SIZE", 4096))
+        
+        # 仓库分析：只允许分析这些根目录下的目录和tar包（逗号分隔，默认当前工作目录）
+        self.repo_allowed_roots = [
+            os.path.realpath(root.strip())
+            for root in os.getenv("REPO_ALLOWED_ROOTS", os.getcwd()).split(",") if root.strip()
+        ]
+        # 文件分析结果和目录汇总的持久缓存（SQLite），为空时只缓存在内存中
+        self.repo_cache_path = os.getenv("REPO_CACHE_PATH", os.path.join(".cache", "repo_analysis.db"))
+        self.repo_max_files = int(os.getenv("REPO_MAX_FILES", 2000))
+        self.repo_max_file_kb = int(os.getenv("REPO_MAX_FILE_KB", 512))
+        # 建立结构索引的进程数，文件数不超过 REPO_INDEX_INLINE_FILES 时在当前进程中完成
+        self.repo_index_processes = int(os.getenv("REPO_INDEX_PROCESSES", min(4, os.cpu_count() or 1)))
+        self.repo_index_inline_files = int(os.getenv("REPO_INDEX_INLINE_FILES", 200))
+        # 同时进行的文件分析和目录汇总模型调用数
+        self.repo_llm_concurrency = int(os.getenv("REPO_LLM_CONCURRENCY", 4))
+        
+        # 出站抓取调度（网页、图片）：每个主机的并发请求数、所有主机合计的请求数、同一主机相邻请求的最小间隔（秒），
+        # 以及遇到429/503时的最大重试次数、初始退避时间和单次暂停的上限（秒）
+        self.fetch_per_host = int(os.getenv("FETCH_PER_HOST", 4))
+        self.fetch_max_connections = int(os.getenv("FETCH_MAX_CONNECTIONS", 32))
+        self.fetch_min_delay = float(os.getenv("FETCH_MIN_DELAY", 0.1))
+        self.fetch_max_retries = int(os.getenv("FETCH_MAX_RETRIES", 3))
+        self.fetch_backoff_base = float(os.getenv("FETCH_BACKOFF_BASE", 1.0))
+        self.fetch_max_backoff = float(os.getenv("FETCH_MAX_BACKOFF", 60))
+        
+        # 链接去重：抓取前解析跳转的短链接域名、跳转目标缓存，以及按正文哈希缓存的网页分析结果（存活秒数和最大条目数）
+        self.url_shortener_hosts = [
+            host.strip().lower() for host in os.getenv(
+                "URL_SHORTENER_HOSTS",
+                "t.co,bit.ly,tinyurl.com,goo.gl,ow.ly,buff.ly,is.gd,rebrand.ly,b23.tv,t.cn,dwz.cn,url.cn,youtu.be",
+            ).split(",") if host.strip()
+        ]
+        self.url_redirect_cache_ttl = float(os.getenv("URL_REDIRECT_CACHE_TTL", 86400))
+        self.url_redirect_cache_size = int(os.getenv("URL_REDIRECT_CACHE_SIZE", 4096))
+        self.url_page_cache_ttl = float(os.getenv("URL_PAGE_CACHE_TTL", 3600))
+        self.url_page_cache_size = int(os.getenv("URL_PAGE_CACHE_SIZE", 1024))
+        # 每个论坛主题最多分析的外部链接数，重复的链接不占用名额
+        self.forum_link_budget = int(os.getenv("FORUM_LINK_BUDGET", 3))
+        
+        # 图片探测：下载前用Range请求读取的字节数、短边小于该像素数的图片跳过；
+        # 超过 IMAGE_MAX_KB 的图片缩小到最长边 IMAGE_MAX_SIDE 像素，超过 IMAGE_MAX_DOWNLOAD_MB 的图片不下载
+        self.image_probe = os.getenv("IMAGE_PROBE", "true").lower() in ("1", "true", "yes")
+        self.image_probe_bytes = int(os.getenv("IMAGE_PROBE_BYTES", 65536))
+        self.image_min_side = int(os.getenv("IMAGE_MIN_SIDE", 64))
+        self.image_max_kb = int(os.getenv("IMAGE_MAX_KB", 1024))
+        self.image_max_side = int(os.getenv("IMAGE_MAX_SIDE", 1568))
+        self.image_max_download_mb = float(os.getenv("IMAGE_MAX_DOWNLOAD_MB", 20))
+        
+        # 多图批量分析：每次阿里百炼调用最多放入的图片数和图片数据总量（MB，base64编码后），
+        # 以及同时进行的批量调用数；批大小为1时逐张分析
+        self.image_batch_size = int(os.getenv("IMAGE_BATCH_SIZE", 4))
+        self.image_batch_max_mb = float(os.getenv("IMAGE_BATCH_MAX_MB", 8))
+        self.image_batch_workers = int(os.getenv("IMAGE_BATCH_WORKERS", 2))
+        
+        # 站点抓取：跟随链接的最大层数、页面数上限、抓取线程数、
+        # 同时分析的页面数以及每个页面发送给模型的正文字符数
+        self.crawl_max_depth = int(os.getenv("CRAWL_MAX_DEPTH", 2))
+        self.crawl_max_pages = int(os.getenv("CRAWL_MAX_PAGES", 20))
+        self.crawl_workers = int(os.getenv("CRAWL_WORKERS", 8))
+        self.crawl_llm_concurrency = int(os.getenv("CRAWL_LLM_CONCURRENCY", 4))
+        self.crawl_page_chars = int(os.getenv("CRAWL_PAGE_CHARS", 4000))
+        
+        # 逐条并行批处理配置：并发数、每次图调用的条目数、最终总结最多纳入的结果数
+        self.batch_workers = int(os.getenv("BATCH_WORKERS", 8))
+        self.batch_group_size = int(os.getenv("BATCH_GROUP_SIZE", 1))
+        self.batch_summary_limit = int(os.getenv("BATCH_SUMMARY_LIMIT", 50))
+        
+        # 内容存储容量（MB）：论坛预处理数据等大块内容保存在这里，工作流状态中只保留引用
+        self.content_store_max_mb = float(os.getenv("CONTENT_STORE_MAX_MB", 256))
     
     def get_openai_client(self):
         """获取OpenAI客户端"""
+        base_url = self.openai_base_url.rstrip('/')
+        
         # 检查是否配置了API密钥
         if not self.openai_api_keys:
+            from src.utils.cassette import is_replaying
+            if is_replaying():
+                # 回放录制流量时不需要真实密钥
+                return CustomOpenAIClient(api_key="cassette-replay", base_url=base_url)
             raise ValueError("OpenAI API密钥未配置")
         
-        base_url = self.openai_base_url.rstrip('/')
         # 如果配置了多个API密钥，返回多密钥客户端
         if len(self.openai_api_keys) > 1:
             return MultiKeyOpenAIClient(api_keys=self.openai_api_keys, base_url=base_url)
@@ -311,8 +440,30 @@ class Config:
         """获取Gemini模型"""
         if not self.google_api_key:
             raise ValueError("Google API密钥未配置")
+        import google.generativeai as genai
+        
+        with self._sdk_lock:
+            if not self._gemini_configured:
+                if self.google_api_base_url:
+                    # 自定义端点（代理或本地模拟服务）改用REST传输
+                    genai.configure(
+                        api_key=self.google_api_key,
+                        transport="rest",
+                        client_options={"api_endpoint": self.google_api_base_url.rstrip('/')}
+                    )
+                else:
+                    genai.configure(api_key=self.google_api_key)
+                self._gemini_configured = True
         return genai.GenerativeModel(model_name)
     
+    def get_dashscope(self):
+        """获取配置好API密钥的dashscope模块"""
+        import dashscope
+        
+        if self.alibaba_api_key:
+            dashscope.api_key = self.alibaba_api_key
+        return dashscope
+    
     def get_smithery_mcp_config(self):
         """获取Smithery MCP配置"""
         if not self.smithery_mcp_key or not self.smithery_mcp_profile:
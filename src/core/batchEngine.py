@@ -0,0 +1,315 @@
+"""
+逐条并行批处理引擎
+每个条目（或一小组条目）作为一次独立的工作流调用，在线程池中并发执行；
+CPU密集的解析（网页HTML、代码结构）成为瓶颈时可以改用进程池，每个进程编译自己的工作流。
+条目完成后立即交给结果回调，运行中按间隔报告吞吐量和预计剩余时间，
+最后可以对抽样保留的有限数量结果生成一次综合总结，总结提示词不会随条目数增长。
+"""
+
+import logging
+import multiprocessing
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from src.config import config
+from src.graph.state import AnalysisRequest, AnalysisResult, GraphState
+from src.utils import metrics
+from src.utils.resultWriter import SUCCESS_CONFIDENCE
+
+logger = logging.getLogger(__name__)
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """把秒数格式化为可读的时长"""
+    if seconds is None:
+        return "未知"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}小时{minutes}分"
+    if minutes:
+        return f"{minutes}分{secs}秒"
+    return f"{secs}秒"
+
+
+class ProgressReporter:
+    """统计已完成条目数，按间隔报告吞吐量（条/秒）和预计剩余时间"""
+
+    def __init__(self, total: int = None, interval: float = 5.0, callback: Callable[[Dict[str, Any]], None] = None):
+        self.total = total
+        self.interval = interval
+        self.callback = callback
+        self.completed = 0
+        self.successful = 0
+        self.start = time.monotonic()
+        self._last_report = self.start
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.start
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = max(0.0, (self.total - self.completed) / rate)
+        return {
+            "completed": self.completed,
+            "successful": self.successful,
+            "total": self.total,
+            "elapsed": elapsed,
+            "items_per_second": rate,
+            "eta": eta,
+        }
+
+    def update(self, completed: int, successful: int):
+        with self._lock:
+            self.completed += completed
+            self.successful += successful
+            now = time.monotonic()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+            snapshot = self.snapshot()
+        total = f"/{snapshot['total']}" if snapshot["total"] is not None else ""
+        logger.info(
+            f"⏱️ 已完成 {snapshot['completed']}{total} 个条目 "
+            f"({snapshot['items_per_second']:.1f} 条/秒, 预计剩余 {format_duration(snapshot['eta'])})"
+        )
+        if self.callback:
+            self.callback(snapshot)
+
+
+class SummaryAccumulator:
+    """用蓄水池抽样保留有限数量的高置信度结果，供最终总结使用"""
+
+    def __init__(self, limit: int, seed: int = 0):
+        self.limit = limit
+        self.seen = 0
+        self.results: List[AnalysisResult] = []
+        self._rng = random.Random(seed)
+
+    def add(self, result: AnalysisResult):
+        if result.get("confidence", 0) <= SUCCESS_CONFIDENCE or self.limit <= 0:
+            return
+        self.seen += 1
+        if len(self.results) < self.limit:
+            self.results.append(result)
+            return
+        slot = self._rng.randrange(self.seen)
+        if slot < self.limit:
+            self.results[slot] = result
+
+
+def build_state(requests: List[AnalysisRequest], metadata: Dict[str, Any]) -> GraphState:
+    """为一组条目创建初始状态"""
+    return {
+        "analysis_requests": list(requests),
+        "analysis_results": [],
+        "final_summary": None,
+        "consolidated_key_points": [],
+        "current_step": "start",
+        "messages": [],
+        "metadata": dict(metadata)
+    }
+
+
+def invoke_group(app, requests: List[AnalysisRequest], metadata: Dict[str, Any], item_store=None) -> List[AnalysisResult]:
+    """用一次工作流调用分析一组条目"""
+    run_config = {"configurable": {"item_store": item_store}} if item_store else None
+    final_state = app.invoke(build_state(requests, metadata), run_config)
+    return final_state.get("analysis_results", [])
+
+
+# 进程池工作进程中的工作流和条目完成记录，由 _init_process_worker 在每个进程中创建一次
+_worker_app = None
+_worker_store = None
+
+
+def _init_process_worker(checkpoint_path: Optional[str], resume: bool):
+    global _worker_app, _worker_store
+    from src.graph.workflow import compile_multimodal_workflow
+    _worker_app = compile_multimodal_workflow(include_summary=False)
+    if checkpoint_path:
+        from multiprocessing.util import Finalize
+        from src.core.checkpointStore import ItemStore
+        _worker_store = ItemStore(checkpoint_path, reuse=resume)
+        # 工作进程退出时不执行 atexit，由 multiprocessing 的退出处理关闭连接
+        Finalize(_worker_store, _worker_store.close, exitpriority=10)
+
+
+def _invoke_in_process(requests: List[AnalysisRequest], metadata: Dict[str, Any]) -> List[AnalysisResult]:
+    return invoke_group(_worker_app, requests, metadata, _worker_store)
+
+
+def _error_result(request: AnalysisRequest, error: Exception) -> AnalysisResult:
+    return {
+        "content_type": request["content_type"],
+        "original_content": request["content"][:100],
+        "analysis": f"分析失败: {str(error)}",
+        "summary": "分析过程中出现错误",
+        "key_points": [],
+        "confidence": 0.0
+    }
+
+
+class BatchEngine:
+    """逐条并行执行的批处理引擎"""
+
+    def __init__(self, workers: int = None, group_size: int = None, processes: int = 0,
+                 routing_policy: str = None, micro_batching: bool = None,
+                 checkpoint_path: str = None, resume: bool = False,
+                 summary_limit: int = None, progress_interval: float = 5.0,
+                 progress_callback: Callable[[Dict[str, Any]], None] = None):
+        """
+        Args:
+            workers: 线程池并发数，应与服务商允许的并发量匹配（默认: BATCH_WORKERS）
+            group_size: 每次工作流调用处理的条目数，大于1时可配合微批处理（默认: BATCH_GROUP_SIZE）
+            processes: 大于0时使用进程池代替线程池，适合HTML/代码解析占满单核的情况
+            routing_policy: 服务商路由策略
+            micro_batching: 是否在组内启用微批处理
+            checkpoint_path: 可选的SQLite检查点路径，记录已完成的条目
+            resume: 跳过检查点中已完成的条目
+            summary_limit: 最终总结最多纳入的结果数（默认: BATCH_SUMMARY_LIMIT）
+            progress_interval: 进度报告间隔秒数
+            progress_callback: 每次报告进度时以统计快照调用
+        """
+        self.workers = workers or config.batch_workers
+        self.group_size = max(1, group_size or config.batch_group_size)
+        self.processes = processes or 0
+        self.checkpoint_path = checkpoint_path
+        self.resume = resume
+        self.summary_limit = config.batch_summary_limit if summary_limit is None else summary_limit
+        self.progress_interval = progress_interval
+        self.progress_callback = progress_callback
+        self.metadata: Dict[str, Any] = {"custom_mode": True, "parallel_mode": True}
+        if routing_policy:
+            self.metadata["routing_policy"] = routing_policy
+        if micro_batching is not None:
+            self.metadata["micro_batching"] = micro_batching
+
+    def _groups(self, requests: Iterable[AnalysisRequest]) -> Iterator[List[AnalysisRequest]]:
+        iterator = iter(requests)
+        while True:
+            group = list(islice(iterator, self.group_size))
+            if not group:
+                return
+            yield group
+
+    def _executor(self):
+        if self.processes:
+            # 使用spawn启动工作进程：父进程中已有服务商路由器等后台线程，fork后子进程可能死锁。
+            # 工作进程从环境变量和.env重新读取配置
+            return ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(self.checkpoint_path, self.resume)
+            )
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch")
+
+    def _submit(self, executor, app, item_store, group: List[AnalysisRequest]) -> Future:
+        if self.processes:
+            return executor.submit(_invoke_in_process, group, self.metadata)
+        return executor.submit(invoke_group, app, group, self.metadata, item_store)
+
+    def run(self, requests: Iterable[AnalysisRequest], result_sink: Callable[[AnalysisResult, int], None] = None,
+            total: int = None, summarize: bool = True) -> Dict[str, Any]:
+        """
+        执行批处理
+
+        Args:
+            requests: 分析请求，可以是生成器；同时在途的条目数受并发数限制，内存占用与总数无关
+            result_sink: 每个条目完成后以 (结果, 条目下标) 调用，按完成顺序而不是输入顺序
+            total: 条目总数，用于估算剩余时间；requests是列表时自动取长度
+            summarize: 是否对抽样的结果生成最终总结
+
+        Returns:
+            统计信息和最终总结
+        """
+        if total is None and hasattr(requests, "__len__"):
+            total = len(requests)
+        progress = ProgressReporter(total, self.progress_interval, self.progress_callback)
+        accumulator = SummaryAccumulator(self.summary_limit if summarize else 0)
+
+        app = None
+        item_store = None
+        if not self.processes:
+            from src.graph.workflow import compile_multimodal_workflow
+            app = compile_multimodal_workflow(include_summary=False)
+            if self.checkpoint_path:
+                from src.core.checkpointStore import ItemStore
+                item_store = ItemStore(self.checkpoint_path, reuse=self.resume)
+
+        concurrency = self.processes or self.workers
+        mode = f"{self.processes} 个进程" if self.processes else f"{self.workers} 个线程"
+        logger.info(f"🚀 逐条并行批处理: {mode}，每组 {self.group_size} 个条目")
+
+        def finish(future: Future, offset: int, group: List[AnalysisRequest]):
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.error(f"❌ 条目 {offset + 1}-{offset + len(group)} 分析失败: {str(e)}")
+                results = [_error_result(request, e) for request in group]
+            successful = 0
+            for k, result in enumerate(results):
+                ok = result.get("confidence", 0) > SUCCESS_CONFIDENCE
+                successful += ok
+                metrics.BATCH_ITEMS.labels(outcome="success" if ok else "failed").inc()
+                accumulator.add(result)
+                if result_sink:
+                    result_sink(result, offset + k)
+            progress.update(len(results), successful)
+
+        pending: Dict[Future, tuple] = {}
+        offset = 0
+        try:
+            with self._executor() as executor:
+                for group in self._groups(requests):
+                    # 限制在途的组数，生成器输入不会被一次性读入内存
+                    while len(pending) >= concurrency * 2:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            finish(future, *pending.pop(future))
+                    pending[self._submit(executor, app, item_store, group)] = (offset, group)
+                    offset += len(group)
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(future, *pending.pop(future))
+        finally:
+            if item_store is not None:
+                item_store.close()
+
+        stats = progress.snapshot()
+        logger.info(
+            f"✅ 批处理完成: {stats['completed']} 个条目，成功 {stats['successful']} 个，"
+            f"{stats['items_per_second']:.1f} 条/秒，耗时 {format_duration(stats['elapsed'])}"
+        )
+        summary = {"final_summary": None, "consolidated_key_points": []}
+        if summarize and accumulator.results:
+            summary = self.summarize(accumulator.results)
+        return {
+            "total": stats["completed"],
+            "successful": stats["successful"],
+            "failed": stats["completed"] - stats["successful"],
+            "elapsed": stats["elapsed"],
+            "items_per_second": stats["items_per_second"],
+            "summary_sample_size": len(accumulator.results),
+            **summary
+        }
+
+    def summarize(self, results: List[AnalysisResult]) -> Dict[str, Any]:
+        """对抽样结果生成综合总结"""
+        from src.graph.nodes import summary_node
+        logger.info(f"📋 基于 {len(results)} 个抽样结果生成综合总结")
+        state = build_state([], self.metadata)
+        state["analysis_results"] = results
+        output = summary_node(state)
+        return {
+            "final_summary": output.get("final_summary"),
+            "consolidated_key_points": output.get("consolidated_key_points", [])
+        }
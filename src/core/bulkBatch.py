@@ -0,0 +1,490 @@
+"""
+离线批量分析
+把大量分析请求渲染为OpenAI Batch格式的JSONL文件，提交给本地或远程批处理执行器，
+轮询完成后把输出映射回 AnalysisResult。渲染和结果映射都以流式方式进行，
+作业状态保存在工作目录中，进程中断后可以继续轮询或重新提交未完成的分片。
+
+工作目录结构:
+    job.json                 作业状态（分片、执行器作业ID、状态）
+    manifest.jsonl           每个请求构建结果所需的信息（custom_id -> 内容类型、上下文等）
+    input-0000.jsonl         批处理输入分片
+    output-0000.jsonl        批处理输出分片
+    skipped.jsonl            批量模式不支持的请求（图片、搜索）的错误结果
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from src.analyzers.base import OPENAI_MODEL
+from src.analyzers.codeAnalyzer import CodeAnalyzer
+from src.analyzers.providerResult import ErrorKind, ProviderResult
+from src.analyzers.urlAnalyzer import URLAnalyzer
+from src.config import config, CustomResponse, ProviderAPIError
+from src.graph.nodes import build_text_prompt, build_text_result
+from src.graph.state import AnalysisRequest, AnalysisResult, ContentType
+from src.utils.resultWriter import dumps
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# OpenAI Batch API 单个文件最多50000个请求
+DEFAULT_SHARD_SIZE = 50000
+
+CONTENT_TYPES = {
+    "url": ContentType.URL,
+    "image": ContentType.IMAGE,
+    "code": ContentType.CODE,
+    "text": ContentType.TEXT,
+}
+
+
+class UnsupportedInBulk(Exception):
+    """批量模式不支持的请求"""
+    pass
+
+
+def parse_request(data: Dict[str, Any]) -> AnalysisRequest:
+    """把输入数据转换为分析请求，字段缺失或类型不支持时抛出ValueError"""
+    try:
+        content = data["content"]
+        content_type_str = data["content_type"]
+    except KeyError as e:
+        raise ValueError(f"缺少必需字段: {str(e)}")
+    content_type = CONTENT_TYPES.get(str(content_type_str).lower())
+    if content_type is None:
+        raise ValueError(f"不支持的内容类型 {content_type_str}")
+    return {"content": content, "content_type": content_type, "context": data.get("context")}
+
+
+def iter_request_file(path: str) -> Iterator[Dict[str, Any]]:
+    """流式读取请求文件：.jsonl 逐行读取，.json 支持列表或 {"requests": [...]}"""
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    yield from data.get("requests", []) if isinstance(data, dict) else data
+
+
+def _write_jsonl(f, record: Dict[str, Any]):
+    f.write(dumps(record) + "\n")
+
+
+class BulkRenderer:
+    """渲染阶段：把分析请求转换为批处理请求行和构建结果所需的清单记录"""
+
+    def __init__(self, model: str = OPENAI_MODEL):
+        self.model = model
+        self.url_analyzer = URLAnalyzer()
+        self.code_analyzer = CodeAnalyzer()
+
+    def render(self, custom_id: str, request: AnalysisRequest) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """返回 (批处理请求行, 清单记录)"""
+        content = request["content"]
+        content_type = request["content_type"]
+        manifest = {"custom_id": custom_id, "content_type": content_type.value}
+
+        if content_type == ContentType.IMAGE:
+            raise UnsupportedInBulk("批量模式不支持图片分析，请使用在线模式")
+        if content_type == ContentType.TEXT and content.startswith("search:"):
+            raise UnsupportedInBulk("批量模式不支持联网搜索，请使用在线模式")
+
+        if content_type == ContentType.URL:
+            # 网页内容在渲染阶段抓取，提交后不再需要网络访问
+            web_content = self.url_analyzer.fetch_url_content(content)
+            prompt = self.url_analyzer.build_prompt(content, web_content)
+            manifest.update(content=content, fetch_failed=web_content.startswith("无法获取URL内容"))
+        elif content_type == ContentType.CODE:
+            prompt, language, structure = self.code_analyzer.build_prompt(content, request.get("context"))
+            # 只保留 build_result 截断 original_content 所需的长度
+            manifest.update(content=content[:201], language=language, structure=structure)
+        else:
+            prompt = build_text_prompt(content)
+            manifest.update(content=content[:100])
+
+        line = {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": self.model,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": config.max_tokens,
+                "temperature": config.temperature,
+            },
+        }
+        return line, manifest
+
+
+def provider_result_from_output(line: Dict[str, Any]) -> ProviderResult:
+    """把一行批处理输出转换为服务商结果"""
+    error = line.get("error")
+    response = line.get("response") or {}
+    if error:
+        return ProviderResult("openai", error_kind=ErrorKind.UNKNOWN, error=error.get("message", str(error)))
+    status_code = response.get("status_code", 200)
+    body = response.get("body") or {}
+    if status_code != 200:
+        message = (body.get("error") or {}).get("message", f"HTTP {status_code}")
+        return ProviderResult.failure("openai", ProviderAPIError(message, status_code=status_code))
+    parsed = CustomResponse(body)
+    text = parsed.choices[0].message.content if parsed.choices else ""
+    return ProviderResult.success("openai", text, parsed.usage)
+
+
+class BulkMapper:
+    """映射阶段：把批处理输出行和清单记录组合为分析结果"""
+
+    def __init__(self):
+        self.url_analyzer = URLAnalyzer()
+        self.code_analyzer = CodeAnalyzer()
+
+    def build(self, manifest: Dict[str, Any], provider_result: ProviderResult) -> AnalysisResult:
+        content_type = ContentType(manifest["content_type"])
+        if content_type == ContentType.URL:
+            result = self.url_analyzer.build_result(manifest["content"], provider_result, manifest.get("fetch_failed", False))
+        elif content_type == ContentType.CODE:
+            result = self.code_analyzer.build_result(
+                manifest["content"], manifest["language"], manifest["structure"], provider_result
+            )
+        else:
+            result = build_text_result(manifest["content"], provider_result)
+        result.setdefault("metadata", {})["custom_id"] = manifest["custom_id"]
+        if not provider_result.ok:
+            result["metadata"]["error_kind"] = provider_result.error_kind.value
+        return result
+
+
+class LocalBatchExecutor:
+    """
+    本地批处理执行器
+    在后台线程中并发执行批处理文件的每一行，输出格式与OpenAI Batch输出一致。
+    适用于没有批处理接口的兼容端点；作业只存在于当前进程中。
+    """
+
+    name = "local"
+
+    def __init__(self, workers: int = 8):
+        self.workers = workers
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _call(self, line: Dict[str, Any]) -> Dict[str, Any]:
+        record = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": line["custom_id"], "response": None, "error": None}
+        try:
+            body = dict(line["body"])
+            response = config.get_openai_client().chat.completions.create(**body)
+            record["response"] = {
+                "status_code": 200,
+                "body": {
+                    "choices": [{"index": i, "message": {"role": c.message.role, "content": c.message.content}}
+                                for i, c in enumerate(response.choices)],
+                    "usage": getattr(response, "usage", {}),
+                },
+            }
+        except ProviderAPIError as e:
+            record["response"] = {"status_code": e.status_code or 500, "body": {"error": {"message": str(e)}}}
+        except Exception as e:
+            record["error"] = {"code": type(e).__name__, "message": str(e)}
+        return record
+
+    def _run(self, job_id: str, input_path: str, output_path: str):
+        job = self._jobs[job_id]
+        tmp_path = output_path + ".part"
+        try:
+            with open(input_path, "r", encoding="utf-8") as src, open(tmp_path, "w", encoding="utf-8") as dst, \
+                    ThreadPoolExecutor(max_workers=self.workers) as pool:
+                chunk: List[Dict[str, Any]] = []
+                for raw in src:
+                    if raw.strip():
+                        chunk.append(json.loads(raw))
+                    if len(chunk) >= self.workers * 4:
+                        self._drain(job, pool, chunk, dst)
+                        chunk = []
+                if chunk:
+                    self._drain(job, pool, chunk, dst)
+            os.replace(tmp_path, output_path)
+            job["status"] = "completed"
+        except Exception as e:
+            logger.error(f"❌ 本地批处理作业 {job_id} 失败: {str(e)}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+
+    def _drain(self, job: Dict[str, Any], pool: ThreadPoolExecutor, chunk: List[Dict[str, Any]], dst):
+        for record in pool.map(self._call, chunk):
+            _write_jsonl(dst, record)
+            job["completed"] += 1
+            if record["error"] or record["response"]["status_code"] != 200:
+                job["failed"] += 1
+
+    def submit(self, input_path: str) -> str:
+        job_id = f"local_{uuid.uuid4().hex[:12]}"
+        output_path = f"{input_path}.{job_id}.out"
+        with open(input_path, "r", encoding="utf-8") as f:
+            total = sum(1 for line in f if line.strip())
+        job = {"status": "in_progress", "total": total, "completed": 0, "failed": 0,
+               "output_path": output_path}
+        with self._lock:
+            self._jobs[job_id] = job
+        thread = threading.Thread(target=self._run, args=(job_id, input_path, output_path), daemon=True)
+        job["thread"] = thread
+        thread.start()
+        return job_id
+
+    def poll(self, job_id: str) -> Dict[str, Any]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            # 上一个进程提交的本地作业已经随进程结束，需要重新提交
+            return {"status": "lost"}
+        return {
+            "status": job["status"],
+            "request_counts": {"total": job["total"], "completed": job["completed"], "failed": job["failed"]},
+            "error": job.get("error"),
+        }
+
+    def download(self, job_id: str, output_path: str):
+        os.replace(self._jobs[job_id]["output_path"], output_path)
+
+
+class OpenAIBatchExecutor:
+    """远程批处理执行器：使用OpenAI Files和Batches接口"""
+
+    name = "openai"
+
+    def __init__(self, base_url: str = None, api_key: str = None, completion_window: str = "24h"):
+        self.base_url = (base_url or config.openai_base_url).rstrip("/")
+        keys = config.openai_api_keys
+        self.api_key = api_key or (keys[0] if keys else None)
+        if not self.api_key:
+            raise ValueError("OpenAI API密钥未配置")
+        self.completion_window = completion_window
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {self.api_key}"})
+
+    def _check(self, response: requests.Response) -> Dict[str, Any]:
+        if response.status_code >= 400:
+            raise ProviderAPIError(f"批处理接口请求失败: {response.text[:500]}", status_code=response.status_code)
+        return response.json()
+
+    def submit(self, input_path: str) -> str:
+        with open(input_path, "rb") as f:
+            uploaded = self._check(self.session.post(
+                f"{self.base_url}/files",
+                data={"purpose": "batch"},
+                files={"file": (os.path.basename(input_path), f, "application/jsonl")},
+                timeout=300,
+            ))
+        batch = self._check(self.session.post(f"{self.base_url}/batches", json={
+            "input_file_id": uploaded["id"],
+            "endpoint": BATCH_ENDPOINT,
+            "completion_window": self.completion_window,
+        }, timeout=60))
+        return batch["id"]
+
+    def poll(self, job_id: str) -> Dict[str, Any]:
+        return self._check(self.session.get(f"{self.base_url}/batches/{job_id}", timeout=60))
+
+    def download(self, job_id: str, output_path: str):
+        batch = self.poll(job_id)
+        tmp_path = output_path + ".part"
+        with open(tmp_path, "wb") as f:
+            # 成功的请求在输出文件中，请求级错误在错误文件中
+            for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+                if not file_id:
+                    continue
+                with self.session.get(f"{self.base_url}/files/{file_id}/content", stream=True, timeout=300) as response:
+                    if response.status_code >= 400:
+                        raise ProviderAPIError(f"下载批处理结果失败: {response.text[:500]}", status_code=response.status_code)
+                    for block in response.iter_content(chunk_size=1 << 16):
+                        f.write(block)
+        os.replace(tmp_path, output_path)
+
+
+def create_executor(name: str, workers: int = 8):
+    """按名称创建批处理执行器"""
+    if name == "local":
+        return LocalBatchExecutor(workers=workers)
+    if name == "openai":
+        return OpenAIBatchExecutor()
+    raise ValueError(f"不支持的批处理执行器: {name}")
+
+
+class BulkJob:
+    """一次离线批量分析作业"""
+
+    def __init__(self, work_dir: str, shard_size: int = DEFAULT_SHARD_SIZE):
+        self.work_dir = work_dir
+        self.shard_size = shard_size
+        self.state_path = os.path.join(work_dir, "job.json")
+        self.manifest_path = os.path.join(work_dir, "manifest.jsonl")
+        self.skipped_path = os.path.join(work_dir, "skipped.jsonl")
+        self.state: Dict[str, Any] = {"shards": [], "total": 0, "skipped": 0, "invalid": 0}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    @property
+    def prepared(self) -> bool:
+        return bool(self.state.get("prepared"))
+
+    def save(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def prepare(self, raw_requests: Iterable[Dict[str, Any]], renderer: BulkRenderer = None) -> Dict[str, int]:
+        """渲染阶段：流式写入输入分片、清单和跳过的请求"""
+        os.makedirs(self.work_dir, exist_ok=True)
+        renderer = renderer or BulkRenderer()
+        shards: List[Dict[str, Any]] = []
+        shard_file = None
+        counts = {"total": 0, "rendered": 0, "skipped": 0, "invalid": 0}
+
+        try:
+            with open(self.manifest_path, "w", encoding="utf-8") as manifest, \
+                    open(self.skipped_path, "w", encoding="utf-8") as skipped:
+                for index, raw in enumerate(raw_requests):
+                    counts["total"] += 1
+                    custom_id = f"req-{index:08d}"
+                    try:
+                        request = parse_request(raw)
+                        line, record = renderer.render(custom_id, request)
+                    except ValueError as e:
+                        logger.warning(f"⚠️ 请求{index + 1}无效: {str(e)}")
+                        counts["invalid"] += 1
+                        continue
+                    except UnsupportedInBulk as e:
+                        counts["skipped"] += 1
+                        _write_jsonl(skipped, {
+                            "content_type": request["content_type"],
+                            "original_content": request["content"][:100],
+                            "analysis": str(e),
+                            "summary": str(e),
+                            "key_points": [],
+                            "confidence": 0.0,
+                            "metadata": {"custom_id": custom_id, "skipped": True},
+                        })
+                        continue
+
+                    if shard_file is None or shards[-1]["count"] >= self.shard_size:
+                        if shard_file is not None:
+                            shard_file.close()
+                        number = len(shards)
+                        shards.append({
+                            "input": f"input-{number:04d}.jsonl",
+                            "output": f"output-{number:04d}.jsonl",
+                            "count": 0,
+                            "job_id": None,
+                            "status": "rendered",
+                        })
+                        shard_file = open(os.path.join(self.work_dir, shards[-1]["input"]), "w", encoding="utf-8")
+                    _write_jsonl(shard_file, line)
+                    _write_jsonl(manifest, record)
+                    shards[-1]["count"] += 1
+                    counts["rendered"] += 1
+        finally:
+            # 渲染中途出错时也关闭当前的分片文件
+            if shard_file is not None:
+                shard_file.close()
+
+        self.state = {"shards": shards, "prepared": True, **counts}
+        self.save()
+        logger.info(f"📝 渲染完成: {counts['rendered']} 个请求，{len(shards)} 个分片，跳过 {counts['skipped']} 个")
+        return counts
+
+    def submit(self, executor):
+        """提交尚未提交的分片"""
+        for shard in self.state["shards"]:
+            if shard["job_id"] is None:
+                shard["job_id"] = executor.submit(os.path.join(self.work_dir, shard["input"]))
+                shard["executor"] = executor.name
+                shard["status"] = "submitted"
+                logger.info(f"📤 已提交分片 {shard['input']}: {shard['job_id']}")
+                self.save()
+
+    def wait(self, executor, poll_interval: float = 30.0, timeout: float = None, progress=None):
+        """轮询所有分片直到结束，完成的分片立即下载输出"""
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            pending = 0
+            for shard in self.state["shards"]:
+                if shard["status"] in TERMINAL_STATUSES:
+                    continue
+                batch = executor.poll(shard["job_id"])
+                status = batch.get("status")
+                if status == "lost":
+                    logger.warning(f"⚠️ 分片 {shard['input']} 的作业已丢失，重新提交")
+                    shard["job_id"] = None
+                    self.submit(executor)
+                    pending += 1
+                    continue
+                shard["request_counts"] = batch.get("request_counts")
+                if status == "completed":
+                    executor.download(shard["job_id"], os.path.join(self.work_dir, shard["output"]))
+                    logger.info(f"📥 分片 {shard['input']} 已完成")
+                elif status in TERMINAL_STATUSES:
+                    logger.error(f"❌ 分片 {shard['input']} 结束状态: {status}")
+                else:
+                    pending += 1
+                shard["status"] = status
+                self.save()
+            if progress:
+                progress(self.state["shards"])
+            if pending == 0:
+                return
+            if deadline and time.monotonic() > deadline:
+                raise TimeoutError("等待批处理作业超时，可以稍后使用 --resume 继续")
+            time.sleep(poll_interval)
+
+    def iter_results(self, mapper: BulkMapper = None) -> Iterator[AnalysisResult]:
+        """
+        映射阶段：逐个分片读取输出，与清单组合为分析结果
+
+        清单按分片顺序写入，每次只加载当前分片的清单记录，内存占用受分片大小限制而与总条目数无关。
+        """
+        mapper = mapper or BulkMapper()
+        with open(self.manifest_path, "r", encoding="utf-8") as manifest_file:
+            for shard in self.state["shards"]:
+                manifest: Dict[str, Dict[str, Any]] = {}
+                for _ in range(shard["count"]):
+                    record = json.loads(manifest_file.readline())
+                    manifest[record["custom_id"]] = record
+
+                output_path = os.path.join(self.work_dir, shard["output"])
+                if shard["status"] == "completed" and os.path.exists(output_path):
+                    with open(output_path, "r", encoding="utf-8") as f:
+                        for line in f:
+                            if not line.strip():
+                                continue
+                            output = json.loads(line)
+                            record = manifest.pop(output.get("custom_id"), None)
+                            if record is None:
+                                continue
+                            yield mapper.build(record, provider_result_from_output(output))
+
+                # 没有输出的请求（分片失败或过期）
+                for record in manifest.values():
+                    missing = ProviderResult("openai", error_kind=ErrorKind.UNKNOWN, error="批处理没有返回该请求的结果")
+                    yield mapper.build(record, missing)
+
+        if os.path.exists(self.skipped_path):
+            with open(self.skipped_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    result = json.loads(line)
+                    result["content_type"] = ContentType(result["content_type"])
+                    yield result
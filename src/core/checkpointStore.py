@@ -0,0 +1,123 @@
+"""
+持久化检查点
+工作流使用SQLite检查点保存每个节点完成后的状态，同一数据库中的条目完成记录按内容哈希
+保存每个请求的分析结果。中断的任务用相同的请求重新运行时，可以从最后一个检查点继续，
+并跳过已经完成的条目，不再重复付费调用模型。
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from src.graph.state import AnalysisRequest, AnalysisResult, ContentType
+from src.utils.resultWriter import dumps
+
+logger = logging.getLogger(__name__)
+
+# 与批量分析脚本的成功统计一致，低于该置信度的结果视为失败，恢复时会重新分析
+MIN_CONFIDENCE = 0.5
+
+
+def item_id(request: AnalysisRequest) -> str:
+    """根据内容类型、内容和上下文生成确定性的条目ID"""
+    fields = [request["content_type"].value, request["content"], request.get("context")]
+    if request.get("previous_content") is not None:
+        fields.append(request["previous_content"])
+    key = json.dumps(fields, ensure_ascii=False)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def job_thread_id(requests: List[AnalysisRequest]) -> str:
+    """根据全部条目ID生成确定性的工作流线程ID，相同的请求列表对应同一个检查点"""
+    digest = hashlib.sha256("\n".join(item_id(r) for r in requests).encode("utf-8")).hexdigest()
+    return f"batch-{digest[:24]}"
+
+
+class ItemStore:
+    """按内容哈希保存已完成条目的分析结果"""
+
+    def __init__(self, path: str, reuse: bool = True):
+        """
+        Args:
+            path: SQLite数据库路径，可以与工作流检查点共用
+            reuse: 是否读取已有记录跳过完成的条目（--resume），为False时只写入
+        """
+        self.path = path
+        self.reuse = reuse
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completed_items ("
+            "item_id TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, request: AnalysisRequest) -> Optional[AnalysisResult]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM completed_items WHERE item_id = ?", (item_id(request),)
+            ).fetchone()
+        if row is None:
+            return None
+        result = json.loads(row[0])
+        result["content_type"] = ContentType(result["content_type"])
+        return result
+
+    def load(self, requests: List[AnalysisRequest]) -> Dict[int, AnalysisResult]:
+        """返回请求列表中已完成条目的结果 {请求下标: 分析结果}"""
+        if not self.reuse:
+            return {}
+        completed = {}
+        for index, request in enumerate(requests):
+            result = self.get(request)
+            if result is not None:
+                completed[index] = result
+        if completed:
+            logger.info(f"♻️ 检查点中已有 {len(completed)}/{len(requests)} 个条目完成")
+        return completed
+
+    def save(self, request: AnalysisRequest, result: AnalysisResult) -> bool:
+        """保存成功的分析结果，失败的结果不保存以便恢复时重试"""
+        if result.get("confidence", 0) <= MIN_CONFIDENCE:
+            return False
+        data = dumps(result)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completed_items (item_id, result, created_at) VALUES (?, ?, ?)",
+                (item_id(request), data, time.time())
+            )
+            self._conn.commit()
+        return True
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completed_items").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+# 工作流状态中出现的自定义类型，新版检查点序列化器只反序列化显式允许的类型
+STATE_TYPES = [
+    ("src.graph.state", "ContentType"),
+    ("src.graph.state", "ContentRef"),
+    ("src.graph.state", "AnalysisRecord"),
+]
+
+
+def open_checkpointer(path: str):
+    """打开SQLite工作流检查点"""
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    try:
+        serde = JsonPlusSerializer(allowed_msgpack_modules=STATE_TYPES)
+    except TypeError:
+        # 旧版序列化器不限制反序列化的类型
+        serde = JsonPlusSerializer()
+    return SqliteSaver(sqlite3.connect(path, check_same_thread=False), serde=serde)
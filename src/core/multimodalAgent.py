@@ -1,19 +1,24 @@
 from src.graph.workflow import compile_multimodal_workflow
 from src.graph.state import GraphState, AnalysisRequest, ContentType
 from src.config import config
+from src.analyzers.siteCrawler import CRAWL_CONTEXT
 import logging
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
 
-def create_analysis_request(content: str, content_type: ContentType, context: str = None) -> AnalysisRequest:
-    """创建分析请求"""
-    return {
+def create_analysis_request(content: str, content_type: ContentType, context: str = None,
+                            previous_content: str = None) -> AnalysisRequest:
+    """创建分析请求，previous_content 为代码的上一版本（差异模式）"""
+    request = {
         "content": content,
         "content_type": content_type,
         "context": context
     }
+    if previous_content is not None:
+        request["previous_content"] = previous_content
+    return request
 
 
 def run_multimodal_analysis():
@@ -93,30 +98,73 @@ def run_multimodal_analysis():
         return None
 
 
-def run_custom_analysis(requests: list):
-    """运行自定义分析"""
+def run_custom_analysis(requests: list, routing_policy: str = None, micro_batching: bool = None,
+                        checkpoint_path: str = None, resume: bool = False, result_sink=None):
+    """
+    运行自定义分析
     
-    logger.info("🔧 编译多模态工作流...")
-    app = compile_multimodal_workflow()
-    logger.info("✅ 工作流编译完成")
+    Args:
+        requests: 分析请求列表
+        routing_policy: 可选的服务商路由策略（cost | balanced | latency）
+        micro_batching: 是否把短文本和小代码块打包进共享的模型调用，默认由MICRO_BATCHING决定
+        checkpoint_path: 可选的SQLite检查点路径，保存工作流状态和已完成条目的结果
+        resume: 从检查点继续：工作流从最后完成的节点继续，已完成的条目不再重新分析
+        result_sink: 可选的回调，每个条目分析完成后立即以结果调用，用于流式输出
+    """
     
-    logger.info("⚙️ 准备初始状态...")
-    initial_state: GraphState = {
-        "analysis_requests": requests,
-        "analysis_results": [],
-        "final_summary": None,
-        "consolidated_key_points": [],
-        "current_step": "start",
-        "messages": [],
-        "metadata": {"start_time": "now", "custom_mode": True}
-    }
-    logger.info("✅ 初始状态准备完成")
+    run_config = {"configurable": {}}
+    checkpointer = None
+    item_store = None
+    if result_sink:
+        run_config["configurable"]["result_sink"] = result_sink
+    if checkpoint_path:
+        from src.core.checkpointStore import ItemStore, job_thread_id, open_checkpointer
+        checkpointer = open_checkpointer(checkpoint_path)
+        item_store = ItemStore(checkpoint_path, reuse=resume)
+        run_config["configurable"].update(thread_id=job_thread_id(requests), item_store=item_store)
+        logger.info(f"💾 使用检查点: {checkpoint_path} (线程: {run_config['configurable']['thread_id']})")
     
-    logger.info("🚀 开始执行工作流...")
-    result = app.invoke(initial_state)
-    logger.info("✅ 工作流执行完成")
-    
-    return result
+    try:
+        logger.info("🔧 编译多模态工作流...")
+        app = compile_multimodal_workflow(checkpointer=checkpointer)
+        logger.info("✅ 工作流编译完成")
+        
+        if resume and checkpointer:
+            snapshot = app.get_state(run_config)
+            if snapshot.next:
+                # 上次运行在某个节点之后中断，从最后一个检查点继续
+                logger.info(f"♻️ 从检查点继续执行: {', '.join(snapshot.next)}")
+                result = app.invoke(None, run_config)
+                logger.info("✅ 工作流执行完成")
+                return result
+        
+        logger.info("⚙️ 准备初始状态...")
+        initial_state: GraphState = {
+            "analysis_requests": requests,
+            "analysis_results": [],
+            "final_summary": None,
+            "consolidated_key_points": [],
+            "current_step": "start",
+            "messages": [],
+            "metadata": {"start_time": "now", "custom_mode": True}
+        }
+        if routing_policy:
+            initial_state["metadata"]["routing_policy"] = routing_policy
+        if micro_batching is not None:
+            initial_state["metadata"]["micro_batching"] = micro_batching
+        logger.info("✅ 初始状态准备完成")
+        
+        logger.info("🚀 开始执行工作流...")
+        result = app.invoke(initial_state, run_config)
+        logger.info("✅ 工作流执行完成")
+        
+        return result
+    finally:
+        # 关闭检查点和条目完成记录的SQLite连接，同一进程中多次运行不会累积打开的连接
+        if item_store is not None:
+            item_store.close()
+        if checkpointer is not None:
+            checkpointer.conn.close()
 
 
 def analyze_url(url: str, context: str = None):
@@ -126,6 +174,13 @@ def analyze_url(url: str, context: str = None):
     return run_custom_analysis([request])
 
 
+def analyze_site(url: str):
+    """从URL开始抓取并分析整个站点"""
+    logger.info(f"🕸️ 分析站点: {url}")
+    request = create_analysis_request(url, ContentType.URL, CRAWL_CONTEXT)
+    return run_custom_analysis([request])
+
+
 def analyze_image(image_path: str, context: str = None):
     """分析单个图片"""
     logger.info(f"🖼️ 分析图片: {image_path}")
@@ -140,6 +195,20 @@ def analyze_code(code: str, language: str = None):
     return run_custom_analysis([request])
 
 
+def analyze_code_diff(code: str, previous_code: str = None, language: str = None):
+    """分析代码修改：code 为新版本（需提供 previous_code）或统一差异格式的补丁"""
+    logger.info(f"💻 分析代码修改 (语言: {language})")
+    request = create_analysis_request(code, ContentType.CODE, language, previous_content=previous_code)
+    return run_custom_analysis([request])
+
+
+def analyze_repository(path: str):
+    """分析本地代码仓库（目录或tar包）"""
+    logger.info(f"📦 分析仓库: {path}")
+    request = create_analysis_request(path, ContentType.REPOSITORY)
+    return run_custom_analysis([request])
+
+
 def analyze_text(text: str, context: str = None):
     """分析单个文本"""
     logger.info(f"📝 分析文本: {text[:50]}...")
@@ -1,7 +1,19 @@
 from typing import Dict, Any, List
 from src.graph.state import GraphState, AnalysisRequest, AnalysisResult, ContentType
-from src.analyzers import URLAnalyzer, ImageAnalyzer, CodeAnalyzer, ForumAnalyzer, MCPAnalyzer, TavilyAnalyzer
+from src.analyzers import (
+    ContentAnalyzer, URLAnalyzer, ImageAnalyzer, CodeAnalyzer, ForumAnalyzer, MCPAnalyzer, MicroBatcher, get_tavily_analyzer,
+    RepositoryAnalyzer
+)
+from src.analyzers.codeDiff import is_diff_request
+from src.analyzers.providerResult import ProviderResult
+from src.analyzers.siteCrawler import is_crawl_request
+from src.analyzers.providerRouter import routing_policy
 from src.config import config
+from src.utils import metrics
+from src.utils.contentStore import get_content_store
+from src.utils.singleFlight import request_key
+from langgraph.config import get_config
+from functools import wraps
 import logging
 import os
 
@@ -12,10 +24,33 @@ logging.basicConfig(level=getattr(logging, log_level, logging.INFO))
 logger = logging.getLogger(__name__)
 
 
+def use_routing_policy(func):
+    """节点装饰器：按state元数据中的routing_policy选择服务商路由策略"""
+    @wraps(func)
+    def wrapper(state: GraphState, *args, **kwargs):
+        with routing_policy(state.get("metadata", {}).get("routing_policy")):
+            return func(state, *args, **kwargs)
+    return wrapper
+
+
+def configurable_value(key: str):
+    """
+    读取本次运行配置中的configurable值，未配置或不在工作流中运行时返回None
+    
+    目前使用的键:
+        item_store: 条目完成记录（ItemStore），用于跳过已完成的条目
+        result_sink: 每个条目完成后调用的回调 result_sink(result)，用于流式输出
+    """
+    try:
+        return get_config().get("configurable", {}).get(key)
+    except RuntimeError:
+        return None
+
+
 def input_node(state: GraphState) -> Dict[str, Any]:
     """输入节点：处理分析请求"""
     logger.info("=== 📥 输入节点：处理分析请求 ===")
-    logger.debug(f"📥 输入状态: {state}")
+    logger.debug("📥 输入状态: %s", state)
     
     analysis_requests = state.get("analysis_requests", [])
     logger.debug(f"📋 分析请求数量: {len(analysis_requests)}")
@@ -25,7 +60,7 @@ def input_node(state: GraphState) -> Dict[str, Any]:
         logger.debug("↩️ 返回错误状态")
         return {
             "current_step": "input_error",
-            "messages": state.get("messages", []) + ["未提供分析请求"],
+            "messages": ["未提供分析请求"],
         }
     
     logger.info(f"📥 收到 {len(analysis_requests)} 个分析请求")
@@ -37,18 +72,65 @@ def input_node(state: GraphState) -> Dict[str, Any]:
     logger.debug("↩️ 返回处理结果")
     return {
         "current_step": "input_processed",
-        "messages": state.get("messages", []) + [f"已接收 {len(analysis_requests)} 个分析请求"],
-        "metadata": {**state.get("metadata", {}), "input_processed": True}
+        "messages": [f"已接收 {len(analysis_requests)} 个分析请求"],
+        "metadata": {"input_processed": True}
+    }
+
+
+def build_text_prompt(content: str) -> str:
+    """创建基础文本分析提示"""
+    return f"请分析以下文本内容：\n{content}\n\n请提供总结和关键点。"
+
+
+def build_text_result(content: str, provider_result: ProviderResult, confidence: float = 0.8,
+                      analyzer_name: str = "text") -> AnalysisResult:
+    """根据模型结果构建文本分析结果"""
+    analysis = provider_result.message
+    return {
+        "content_type": ContentType.TEXT,
+        "original_content": content[:100] + "...",
+        "analysis": analysis,
+        "summary": analysis[:200] + "...",
+        "key_points": ContentAnalyzer().extractKeyPoints(analysis),
+        "confidence": confidence if provider_result.ok else 0.3,
+        "metadata": {"analyzer": analyzer_name, "provider": provider_result.provider}
     }
 
 
+def analyze_text_request(request: AnalysisRequest, confidence: float = 0.8, analyzer_name: str = "text") -> AnalysisResult:
+    """使用基础文本分析处理一个请求"""
+    analyzer = URLAnalyzer()  # 复用URL分析器的文本分析能力
+    logger.debug(f"📝 发送分析请求到服务商路由器...")
+    provider_result = analyzer.analyzeWithRouting(build_text_prompt(request['content']))
+    logger.debug(f"📝 文本分析结果: {provider_result.message}")
+    return build_text_result(request['content'], provider_result, confidence, analyzer_name)
+
+
+def search_query(request: AnalysisRequest):
+    """返回搜索请求（以"search:"开头的文本）的查询，其他请求返回None"""
+    if request['content_type'] == ContentType.TEXT and request['content'].startswith("search:"):
+        return request['content'][7:].strip()  # 移除"search:"前缀
+    return None
+
+
+@use_routing_policy
 def analysis_node(state: GraphState) -> Dict[str, Any]:
     """分析节点：执行多模态内容分析"""
     logger.info("\n=== 🔍 分析节点：执行内容分析 ===")
-    logger.debug(f"🔍 分析节点接收状态: {state}")
+    logger.debug("🔍 分析节点接收状态: %s", state)
     
     analysis_requests = state.get("analysis_requests", [])
     analysis_results = []
+    result_sink = configurable_value("result_sink")
+    content_store = get_content_store()
+    
+    def collect(result: AnalysisResult) -> AnalysisResult:
+        """把结果转换为紧凑记录保存，并在配置了流式输出时立即写出"""
+        record = content_store.compact(result)
+        analysis_results.append(record)
+        if result_sink:
+            result_sink(record)
+        return record
     logger.debug(f"📋 初始分析请求数量: {len(analysis_requests)}")
     
     # 检查是否有论坛数据需要处理
@@ -56,20 +138,20 @@ def analysis_node(state: GraphState) -> Dict[str, Any]:
     logger.debug(f"📂 论坛数据存在: {bool(forum_data)}")
     if forum_data:
         logger.info("🔍 检测到论坛数据，使用论坛分析器")
-        logger.debug(f"📂 论坛数据详情: {forum_data}")
+        logger.debug("📂 论坛数据详情: %s", forum_data)
         forum_analyzer = ForumAnalyzer()
         logger.debug("🔧 创建论坛分析器实例")
         forum_result = forum_analyzer.analyze_forum(forum_data)
-        logger.debug(f"📊 论坛分析结果: {forum_result}")
-        analysis_results.append(forum_result)
+        logger.debug("📊 论坛分析结果: %s", forum_result)
+        collect(forum_result)
         
         # 如果有媒体内容需要进一步分析
         media_requests = forum_result.get("media_requests", [])
         logger.debug(f"📎 媒体请求数量: {len(media_requests)}")
         if media_requests:
             logger.info(f"📎 发现 {len(media_requests)} 个媒体内容需要分析")
-            # 将媒体请求添加到分析队列
-            analysis_requests.extend(media_requests)
+            # 将媒体请求添加到分析队列（不修改state中的请求列表）
+            analysis_requests = analysis_requests + media_requests
             logger.debug(f"📋 更新后分析请求数量: {len(analysis_requests)}")
         
         # 添加链接分析结果到分析结果中
@@ -78,7 +160,7 @@ def analysis_node(state: GraphState) -> Dict[str, Any]:
         if link_analyses:
             logger.info(f"🔗 发现 {len(link_analyses)} 个链接分析结果")
             for link_analysis in link_analyses:
-                analysis_results.append(link_analysis["analysis"])
+                collect(link_analysis["analysis"])
     
     # 初始化分析器
     logger.debug("🔧 初始化分析器...")
@@ -86,19 +168,88 @@ def analysis_node(state: GraphState) -> Dict[str, Any]:
     image_analyzer = ImageAnalyzer()
     code_analyzer = CodeAnalyzer()
     mcp_analyzer = MCPAnalyzer()
-    tavily_analyzer = TavilyAnalyzer()
+    # 仓库分析器在遇到仓库请求时才创建
+    repository_analyzer = None
+    # 只有配置了Smithery MCP时才尝试MCP分析器，否则它会直接回退到OpenAI，
+    # 使专用分析器和搜索分支永远不会被执行
+    use_mcp = config.get_smithery_mcp_config() is not None
     logger.debug("✅ 分析器初始化完成")
     
+    # 恢复中断的任务时跳过检查点中已完成的条目
+    item_store = configurable_value("item_store")
+    completed_results = item_store.load(analysis_requests) if item_store else {}
+    
+    # 批次内内容相同的条目只分析一次，重复的条目复用第一次出现时的结果
+    duplicate_of = {}
+    first_seen = {}
+    for i, request in enumerate(analysis_requests):
+        key = request_key(request)
+        if key in first_seen:
+            duplicate_of[i] = first_seen[key]
+        else:
+            first_seen[key] = i
+    if duplicate_of:
+        logger.info(f"🔗 批次中有 {len(duplicate_of)} 个重复条目，只分析一次")
+        metrics.COALESCED_REQUESTS.labels(scope="batch").inc(len(duplicate_of))
+    records = {}
+    
+    # 微批处理：把短文本和小代码块打包进共享的模型调用（可通过元数据或MICRO_BATCHING开启）
+    batched_results = {}
+    micro_batching = state.get("metadata", {}).get("micro_batching", config.micro_batching)
+    if micro_batching and not use_mcp:
+        try:
+            pending = [i for i in range(len(analysis_requests))
+                       if i not in completed_results and i not in duplicate_of]
+            batched = MicroBatcher().analyze_requests([analysis_requests[i] for i in pending])
+            batched_results = {pending[k]: result for k, result in batched.items()}
+            logger.info(f"📦 微批处理完成 {len(batched_results)} 个条目")
+        except Exception as e:
+            logger.warning(f"⚠️ 微批处理失败，逐条分析: {str(e)}")
+    
+    # 有多个搜索请求时并发执行，搜索总耗时约为最慢的一个查询而不是所有查询之和
+    search_results = {}
+    search_indices = [i for i, request in enumerate(analysis_requests)
+                      if search_query(request) is not None and i not in completed_results and i not in duplicate_of]
+    if len(search_indices) > 1 and not use_mcp:
+        queries = [search_query(analysis_requests[i]) for i in search_indices]
+        search_results = dict(zip(search_indices, get_tavily_analyzer().search_many(queries)))
+    
+    # 有多张图片时打包进共享的阿里百炼调用，论坛中相关的截图一起分析
+    image_results = {}
+    image_indices = [i for i, request in enumerate(analysis_requests)
+                     if request['content_type'] == ContentType.IMAGE and i not in completed_results and i not in duplicate_of]
+    if len(image_indices) > 1 and config.image_batch_size > 1 and not use_mcp:
+        try:
+            images = image_analyzer.analyze_images([analysis_requests[i]['content'] for i in image_indices])
+            image_results = dict(zip(image_indices, images))
+        except Exception as e:
+            logger.warning(f"⚠️ 多图批量分析失败，逐张分析: {str(e)}")
+    
     for i, request in enumerate(analysis_requests):
         logger.info(f"\n🔍 分析第 {i+1} 个内容 ({request['content_type'].value})")
         logger.debug(f"📝 分析请求详情: {request}")
         
+        if i in duplicate_of:
+            logger.info(f"🔗 与第 {duplicate_of[i] + 1} 个条目内容相同，复用其结果")
+            records[i] = collect(records[duplicate_of[i]])
+            continue
+        
+        if i in completed_results:
+            logger.info("♻️ 使用检查点中已完成的结果")
+            records[i] = collect(completed_results[i])
+            continue
+        
         try:
-            # 首先尝试使用MCP分析器
-            logger.info("🔧 尝试使用MCP分析器")
-            mcp_result = mcp_analyzer.analyze_content(request['content'], request['content_type'])
+            mcp_result = None
+            if use_mcp and request['content_type'] != ContentType.REPOSITORY:
+                # 首先尝试使用MCP分析器（仓库路径只能在本地读取，不交给MCP）
+                logger.info("🔧 尝试使用MCP分析器")
+                mcp_result = mcp_analyzer.analyze_content(request['content'], request['content_type'])
             
-            if mcp_result and mcp_result.get('analysis') != "MCP分析失败: None":
+            if i in batched_results:
+                logger.info("📦 使用微批处理结果")
+                result = batched_results[i]
+            elif mcp_result and not mcp_result.get('metadata', {}).get('error'):
                 logger.info("✅ MCP分析器成功返回结果")
                 result = {
                     "content_type": request['content_type'],
@@ -110,97 +261,82 @@ def analysis_node(state: GraphState) -> Dict[str, Any]:
                     "metadata": {**mcp_result.get('metadata', {}), "analyzer": "mcp"}
                 }
                 logger.debug(f"🔧 MCP分析结果: {result}")
-            else:
-                logger.info("🔧 MCP分析器不可用，检查是否为搜索请求")
-                # 检查是否是搜索请求
-                if request['content_type'] == ContentType.TEXT and request['content'].startswith("search:"):
-                    logger.info("🔍 检测到搜索请求，使用Tavily分析器")
-                    query = request['content'][7:].strip()  # 移除"search:"前缀
-                    logger.debug(f"🔍 搜索查询: {query}")
+            elif search_query(request) is not None:
+                logger.info("🔍 检测到搜索请求，使用Tavily分析器")
+                query = search_query(request)
+                logger.debug(f"🔍 搜索查询: {query}")
+                
+                # 执行Tavily搜索（已并发执行过的直接使用结果）
+                tavily_result = search_results.get(i) or get_tavily_analyzer().search(query)
+                logger.debug(f"🔍 Tavily搜索结果: {tavily_result}")
+                
+                if tavily_result["success"]:
+                    # 格式化搜索结果
+                    search_content = f"搜索查询: {query}\n\n"
+                    if tavily_result.get("answer"):
+                        search_content += f"答案: {tavily_result['answer']}\n\n"
                     
-                    # 执行Tavily搜索
-                    tavily_result = tavily_analyzer.search(query)
-                    logger.debug(f"🔍 Tavily搜索结果: {tavily_result}")
-                    
-                    if tavily_result["success"]:
-                        # 格式化搜索结果
-                        search_content = f"搜索查询: {query}\n\n"
-                        if tavily_result.get("answer"):
-                            search_content += f"答案: {tavily_result['answer']}\n\n"
-                        
-                        search_content += "搜索结果:\n"
-                        for i, result in enumerate(tavily_result["results"], 1):
-                            search_content += f"{i}. {result['title']}\n"
-                            search_content += f"   URL: {result['url']}\n"
-                            search_content += f"   内容: {result['content'][:200]}...\n\n"
-                        
-                        result = {
-                            "content_type": ContentType.TEXT,
-                            "original_content": request['content'],
-                            "analysis": search_content,
-                            "summary": f"搜索查询 '{query}' 的结果摘要",
-                            "key_points": [f"搜索结果 {i}: {r['title']}" for i, r in enumerate(tavily_result["results"], 1)],
-                            "confidence": 0.85,
-                            "metadata": {"analyzer": "tavily", "query": query}
-                        }
-                    else:
-                        # 搜索失败，使用基础文本分析
-                        logger.warning(f"❌ Tavily搜索失败: {tavily_result.get('error', '未知错误')}")
-                        logger.info("📝 使用文本分析器作为备选方案")
-                        analyzer = URLAnalyzer()  # 复用URL分析器的文本分析能力
-                        prompt = f"请分析以下文本内容：\n{request['content']}\n\n请提供总结和关键点。"
-                        logger.debug(f"📝 发送分析请求到OpenAI...")
-                        analysis = analyzer.analyze_with_openai(prompt)
-                        logger.debug(f"📝 文本分析结果: {analysis}")
-                        
-                        result = {
-                            "content_type": ContentType.TEXT,
-                            "original_content": request['content'][:100] + "...",
-                            "analysis": analysis,
-                            "summary": analysis[:200] + "...",
-                            "key_points": analyzer.extractKeyPoints(analysis),
-                            "confidence": 0.7,
-                            "metadata": {"analyzer": "fallback"}
-                        }
-                else:
-                    logger.info("🔧 使用传统分析器")
-                if request['content_type'] == ContentType.URL:
-                    logger.info("🌐 使用URL分析器")
-                    logger.debug(f"🔗 分析URL: {request['content']}")
-                    result = url_analyzer.analyze_url(request['content'])
-                    logger.debug(f"🌐 URL分析结果: {result}")
-                elif request['content_type'] == ContentType.IMAGE:
-                    logger.info("🖼️ 使用图像分析器")
-                    logger.debug(f"🖼️ 分析图像: {request['content']}")
-                    result = image_analyzer.analyze_image(request['content'])
-                    logger.debug(f"🖼️ 图像分析结果: {result}")
-                elif request['content_type'] == ContentType.CODE:
-                    # 从context中获取编程语言信息
-                    language = request.get('context', 'Unknown')
-                    logger.info(f"💻 使用代码分析器 (语言: {language})")
-                    logger.debug(f"💻 分析代码: {request['content']}")
-                    result = code_analyzer.analyze_code(request['content'], language)
-                    logger.debug(f"💻 代码分析结果: {result}")
-                else:
-                    # 文本内容使用基础分析器
-                    logger.info("📝 使用文本分析器")
-                    logger.debug(f"📝 分析文本: {request['content']}")
-                    analyzer = URLAnalyzer()  # 复用URL分析器的文本分析能力
-                    prompt = f"请分析以下文本内容：\n{request['content']}\n\n请提供总结和关键点。"
-                    logger.debug(f"📝 发送分析请求到OpenAI...")
-                    analysis = analyzer.analyze_with_openai(prompt)
-                    logger.debug(f"📝 文本分析结果: {analysis}")
+                    search_content += "搜索结果:\n"
+                    for j, item in enumerate(tavily_result["results"], 1):
+                        search_content += f"{j}. {item['title']}\n"
+                        search_content += f"   URL: {item['url']}\n"
+                        search_content += f"   内容: {item['content'][:200]}...\n\n"
                     
                     result = {
                         "content_type": ContentType.TEXT,
-                        "original_content": request['content'][:100] + "...",
-                        "analysis": analysis,
-                        "summary": analysis[:200] + "...",
-                        "key_points": analyzer.extractKeyPoints(analysis),
-                        "confidence": 0.8
+                        "original_content": request['content'],
+                        "analysis": search_content,
+                        "summary": f"搜索查询 '{query}' 的结果摘要",
+                        "key_points": [f"搜索结果 {j}: {r['title']}" for j, r in enumerate(tavily_result["results"], 1)],
+                        "confidence": 0.85,
+                        "metadata": {"analyzer": "tavily", "query": query}
                     }
+                else:
+                    # 搜索失败，使用基础文本分析
+                    logger.warning(f"❌ Tavily搜索失败: {tavily_result.get('error', '未知错误')}")
+                    logger.info("📝 使用文本分析器作为备选方案")
+                    result = analyze_text_request(request, confidence=0.7, analyzer_name="fallback")
+            elif request['content_type'] == ContentType.REPOSITORY:
+                logger.info(f"📦 使用仓库分析器: {request['content']}")
+                if repository_analyzer is None:
+                    repository_analyzer = RepositoryAnalyzer(code_analyzer)
+                result = repository_analyzer.analyze_repository(request['content'])
+            elif request['content_type'] == ContentType.URL:
+                logger.info("🌐 使用URL分析器")
+                logger.debug(f"🔗 分析URL: {request['content']}")
+                if is_crawl_request(request):
+                    # 上下文为 "crawl" 时从该URL开始抓取整个站点
+                    result = url_analyzer.crawl_site(request['content'])
+                else:
+                    result = url_analyzer.analyze_url(request['content'])
+                logger.debug(f"🌐 URL分析结果: {result}")
+            elif request['content_type'] == ContentType.IMAGE:
+                logger.info("🖼️ 使用图像分析器")
+                logger.debug(f"🖼️ 分析图像: {request['content']}")
+                result = image_results.get(i) or image_analyzer.analyze_image(request['content'])
+                logger.debug(f"🖼️ 图像分析结果: {result}")
+            elif request['content_type'] == ContentType.CODE:
+                # 从context中获取编程语言信息
+                language = request.get('context', 'Unknown')
+                logger.info(f"💻 使用代码分析器 (语言: {language})")
+                logger.debug(f"💻 分析代码: {request['content']}")
+                if is_diff_request(request):
+                    # 提供了上一版本或内容是补丁时只分析修改的部分
+                    result = code_analyzer.analyze_code_diff(
+                        request['content'], request.get('previous_content'), language
+                    )
+                else:
+                    result = code_analyzer.analyze_code(request['content'], language)
+                logger.debug(f"💻 代码分析结果: {result}")
+            else:
+                # 文本内容使用基础分析器
+                logger.info("📝 使用文本分析器")
+                logger.debug(f"📝 分析文本: {request['content']}")
+                result = analyze_text_request(request)
             
-            analysis_results.append(result)
+            record = records[i] = collect(result)
+            if item_store:
+                item_store.save(request, record)
             logger.info(f"✅ 分析完成，置信度: {result['confidence']}")
             logger.debug(f"📊 当前分析结果数量: {len(analysis_results)}")
             
@@ -215,24 +351,25 @@ def analysis_node(state: GraphState) -> Dict[str, Any]:
                 "key_points": [],
                 "confidence": 0.0
             }
-            analysis_results.append(error_result)
+            records[i] = collect(error_result)
     
     logger.info(f"\n📊 完成 {len(analysis_results)} 个内容的分析")
     logger.info("✅ 分析节点处理完成")
-    logger.debug(f"↩️ 返回分析结果: {analysis_results}")
+    logger.debug("↩️ 返回分析结果: %s", analysis_results)
     
     return {
         "current_step": "analysis_completed",
-        "messages": state.get("messages", []) + [f"完成 {len(analysis_results)} 个内容的分析"],
+        "messages": [f"完成 {len(analysis_results)} 个内容的分析"],
         "analysis_results": analysis_results,
-        "metadata": {**state.get("metadata", {}), "analysis_completed": True}
+        "metadata": {"analysis_completed": True}
     }
 
 
+@use_routing_policy
 def summary_node(state: GraphState) -> Dict[str, Any]:
     """总结节点：生成综合总结和归纳"""
     logger.info("\n=== 📋 总结节点：生成综合总结 ===")
-    logger.debug(f"📋 总结节点接收状态: {state}")
+    logger.debug("📋 总结节点接收状态: %s", state)
     
     analysis_results = state.get("analysis_results", [])
     logger.debug(f"📊 分析结果数量: {len(analysis_results)}")
@@ -242,7 +379,7 @@ def summary_node(state: GraphState) -> Dict[str, Any]:
         logger.debug("↩️ 返回空总结")
         return {
             "current_step": "summary_error",
-            "messages": state.get("messages", []) + ["没有分析结果可以总结"],
+            "messages": ["没有分析结果可以总结"],
             "final_summary": "无可用内容进行总结",
             "consolidated_key_points": []
         }
@@ -311,15 +448,10 @@ def summary_node(state: GraphState) -> Dict[str, Any]:
         logger.info("🤖 使用OpenAI生成综合总结")
         logger.debug("🔧 创建URL分析器实例...")
         analyzer = URLAnalyzer()  # 复用分析器
-        logger.debug("📤 发送请求到OpenAI...")
-        final_summary = analyzer.analyzeWithOpenai(prompt)
-        logger.debug(f"📥 OpenAI响应: {final_summary[:100]}...")
-        
-        if "失败" in final_summary:
-            logger.info("🔄 OpenAI失败，尝试使用Gemini")
-            logger.debug("📤 发送请求到Gemini...")
-            final_summary = analyzer.analyzeWithGemini(prompt)
-            logger.debug(f"📥 Gemini响应: {final_summary[:100]}...")
+        logger.debug("📤 发送请求到服务商路由器...")
+        summary_result = analyzer.analyzeWithRouting(prompt)
+        final_summary = summary_result.message
+        logger.debug(f"📥 {summary_result.provider}响应: {final_summary[:100]}...")
         
         # 精选关键点（去重并限制数量）
         unique_key_points = []
@@ -356,10 +488,10 @@ def summary_node(state: GraphState) -> Dict[str, Any]:
         
         return {
             "current_step": "summary_completed",
-            "messages": state.get("messages", []) + ["生成综合总结完成"],
+            "messages": ["生成综合总结完成"],
             "final_summary": final_summary,
             "consolidated_key_points": unique_key_points,
-            "metadata": {**state.get("metadata", {}), "summary_completed": True}
+            "metadata": {"summary_completed": True}
         }
         
     except Exception as e:
@@ -375,17 +507,17 @@ def summary_node(state: GraphState) -> Dict[str, Any]:
         logger.debug(f"↩️ 返回备用总结结果")
         return {
             "current_step": "summary_fallback",
-            "messages": state.get("messages", []) + ["使用备用方式生成总结"],
+            "messages": ["使用备用方式生成总结"],
             "final_summary": fallback_summary,
             "consolidated_key_points": all_key_points[:5],
-            "metadata": {**state.get("metadata", {}), "summary_fallback": True}
+            "metadata": {"summary_fallback": True}
         }
 
 
 def output_node(state: GraphState) -> Dict[str, Any]:
     """输出节点：格式化并展示最终结果"""
     logger.info("\n=== 📤 输出节点：生成最终报告 ===")
-    logger.debug(f"📤 输出节点接收状态: {state}")
+    logger.debug("📤 输出节点接收状态: %s", state)
     
     final_summary = state.get("final_summary", "无可用总结")
     consolidated_key_points = state.get("consolidated_key_points", [])
@@ -436,7 +568,7 @@ def output_node(state: GraphState) -> Dict[str, Any]:
     
     return {
         "current_step": "output_generated",
-        "messages": state.get("messages", []) + ["生成最终报告完成"],
+        "messages": ["生成最终报告完成"],
         "final_report": final_report,
-        "metadata": {**state.get("metadata", {}), "output_generated": True}
+        "metadata": {"output_generated": True}
     }
\ No newline at end of file
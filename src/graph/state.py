@@ -1,5 +1,7 @@
-from typing import TypedDict, List, Optional, Dict, Any, Union
-from dataclasses import dataclass
+import operator
+from collections.abc import Mapping
+from typing import TypedDict, List, Optional, Dict, Any, Union, Annotated, Iterator, NotRequired
+from dataclasses import dataclass, fields
 from enum import Enum
 
 
@@ -10,6 +12,7 @@ class ContentType(Enum):
     IMAGE = "image"
     CODE = "code"
     FORUM = "forum"
+    REPOSITORY = "repository"
 
 
 class AnalysisRequest(TypedDict):
@@ -17,6 +20,8 @@ class AnalysisRequest(TypedDict):
     content: str
     content_type: ContentType
     context: Optional[str]
+    # 代码的上一版本，提供时只分析两个版本之间的修改
+    previous_content: NotRequired[Optional[str]]
 
 
 class AnalysisResult(TypedDict):
@@ -29,6 +34,60 @@ class AnalysisResult(TypedDict):
     confidence: float
 
 
+@dataclass(frozen=True, slots=True)
+class ContentRef:
+    """内容存储中一块大数据的引用（见 src/utils/contentStore.py）"""
+    digest: str
+    size: int
+    kind: str = "json"
+
+
+@dataclass(slots=True, eq=False)
+class AnalysisRecord(Mapping):
+    """
+    工作流状态中保存的紧凑分析结果
+    
+    使用 __slots__ 减少每个结果的内存占用，论坛预处理数据等大块内容只保存 ContentRef 引用。
+    实现了只读的Mapping接口，result["summary"]、result.get("metadata", {}) 和 dict(result)
+    与原来的字典结果用法一致；值为None的可选字段视为不存在。
+    """
+    content_type: ContentType
+    original_content: str
+    analysis: str
+    summary: str
+    key_points: List[str]
+    confidence: float
+    metadata: Optional[Dict[str, Any]] = None
+    payload: Optional[ContentRef] = None
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _RECORD_FIELDS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None and key in _OPTIONAL_RECORD_FIELDS:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        for key in _RECORD_FIELDS:
+            if key not in _OPTIONAL_RECORD_FIELDS or getattr(self, key) is not None:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+_RECORD_FIELDS = tuple(f.name for f in fields(AnalysisRecord))
+_OPTIONAL_RECORD_FIELDS = frozenset(("metadata", "payload"))
+
+
+def merge_metadata(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """元数据通道的归并函数：节点只返回新增的键"""
+    if not right:
+        return left or {}
+    return {**(left or {}), **right}
+
+
 class ForumData(TypedDict):
     """论坛数据结构"""
     url: str
@@ -54,7 +113,7 @@ class GraphState(TypedDict):
     forum_data: Optional[ForumData]
     processed_forum_data: Optional[ProcessedForumData]
     
-    # 处理结果
+    # 处理结果（分析节点一次性写入，条目为 AnalysisRecord）
     analysis_results: List[AnalysisResult]
     
     # 最终输出
@@ -63,7 +122,8 @@ class GraphState(TypedDict):
     
     # 流程控制
     current_step: str
-    messages: List[str]
+    # 只追加的通道：节点只返回新增的消息和元数据键，不再复制整个列表和字典
+    messages: Annotated[List[str], operator.add]
     
     # 元数据
-    metadata: Dict[str, Any]
\ No newline at end of file
+    metadata: Annotated[Dict[str, Any], merge_metadata]
\ No newline at end of file
@@ -1,6 +1,7 @@
 from langgraph.graph import StateGraph, END
 from src.graph.state import GraphState
 from src.graph.nodes import input_node, analysis_node, summary_node, output_node
+from src.utils.metrics import timed_node
 import logging
 
 # 配置日志
@@ -11,8 +12,14 @@ logging.basicConfig(level=getattr(logging, log_level, logging.INFO))
 logger = logging.getLogger(__name__)
 
 
-def create_multimodal_workflow() -> StateGraph:
-    """创建多模态内容分析工作流"""
+def create_multimodal_workflow(include_summary: bool = True) -> StateGraph:
+    """
+    创建多模态内容分析工作流
+    
+    Args:
+        include_summary: 是否包含总结和输出节点；逐条并行执行时为False，
+            分析完成后直接结束，由批处理引擎在最后统一生成总结
+    """
     logger.info("🔧 开始创建工作流...")
     logger.debug("🔧 创建状态图对象...")
     
@@ -24,14 +31,17 @@ def create_multimodal_workflow() -> StateGraph:
     # 添加节点
     logger.info("➕ 正在添加节点...")
     logger.debug("➕ 添加输入节点...")
-    workflow.add_node("input", input_node)
+    workflow.add_node("input", timed_node("input", input_node))
     logger.debug("➕ 添加分析节点...")
-    workflow.add_node("analysis", analysis_node)
-    logger.debug("➕ 添加总结节点...")
-    workflow.add_node("summary", summary_node)
-    logger.debug("➕ 添加输出节点...")
-    workflow.add_node("output", output_node)
-    logger.info("✅ 节点添加完成: input, analysis, summary, output")
+    workflow.add_node("analysis", timed_node("analysis", analysis_node))
+    if include_summary:
+        logger.debug("➕ 添加总结节点...")
+        workflow.add_node("summary", timed_node("summary", summary_node))
+        logger.debug("➕ 添加输出节点...")
+        workflow.add_node("output", timed_node("output", output_node))
+        logger.info("✅ 节点添加完成: input, analysis, summary, output")
+    else:
+        logger.info("✅ 节点添加完成: input, analysis")
     
     # 设置入口点
     logger.info("📍 设置入口点为 'input'")
@@ -43,12 +53,16 @@ def create_multimodal_workflow() -> StateGraph:
     logger.info("🔗 正在连接节点...")
     logger.debug("🔗 连接 input -> analysis...")
     workflow.add_edge("input", "analysis")
-    logger.debug("🔗 连接 analysis -> summary...")
-    workflow.add_edge("analysis", "summary")
-    logger.debug("🔗 连接 summary -> output...")
-    workflow.add_edge("summary", "output")
-    logger.debug("🔗 连接 output -> END...")
-    workflow.add_edge("output", END)
+    if include_summary:
+        logger.debug("🔗 连接 analysis -> summary...")
+        workflow.add_edge("analysis", "summary")
+        logger.debug("🔗 连接 summary -> output...")
+        workflow.add_edge("summary", "output")
+        logger.debug("🔗 连接 output -> END...")
+        workflow.add_edge("output", END)
+    else:
+        logger.debug("🔗 连接 analysis -> END...")
+        workflow.add_edge("analysis", END)
     logger.info("✅ 节点连接完成")
     
     logger.info("✅ 工作流创建完成")
@@ -56,11 +70,17 @@ def create_multimodal_workflow() -> StateGraph:
     return workflow
 
 
-def compile_multimodal_workflow() -> callable:
-    """编译多模态分析工作流以便执行"""
+def compile_multimodal_workflow(checkpointer=None, include_summary: bool = True) -> callable:
+    """
+    编译多模态分析工作流以便执行
+    
+    Args:
+        checkpointer: 可选的检查点保存器，每个节点完成后保存状态，中断后可以继续执行
+        include_summary: 是否包含总结和输出节点
+    """
     logger.info("🔨 正在编译工作流...")
-    workflow = create_multimodal_workflow()
-    compiled_workflow = workflow.compile()
+    workflow = create_multimodal_workflow(include_summary=include_summary)
+    compiled_workflow = workflow.compile(checkpointer=checkpointer)
     logger.info("✅ 工作流编译完成")
     return compiled_workflow
 
@@ -0,0 +1,287 @@
+"""
+服务商流量录制与回放（cassette）
+录制模式下记录真实的请求/响应对及耗时，回放模式下按录制顺序确定性地返回响应，
+可选择按录制时的速度或加速回放，用于离线复现线上运行并区分CPU开销和网络耗时。
+
+通过环境变量启用:
+    PROVIDER_CASSETTE_MODE=record|replay
+    PROVIDER_CASSETTE_PATH=cassettes/forum-run.jsonl.gz
+    PROVIDER_CASSETTE_SPEED=0      # 0表示不等待，1表示按录制速度，2表示两倍速
+"""
+
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# 回放HTTP响应时保留的响应头
+KEPT_HEADERS = ("content-type", "content-length", "content-range", "retry-after", "location")
+
+# 录制文件中请求描述的最大长度，键是完整请求的哈希，这里仅用于排查
+SUMMARY_LIMIT = 200
+
+
+class CassetteMissError(Exception):
+    """回放时找不到匹配的录制记录"""
+    pass
+
+
+class RecordedProviderError(Exception):
+    """回放录制时发生的异常"""
+    pass
+
+
+def _summarize(value: Any) -> Any:
+    """截断请求中的长字符串，保持录制文件紧凑"""
+    if isinstance(value, str):
+        return value if len(value) <= SUMMARY_LIMIT else value[:SUMMARY_LIMIT] + "..."
+    if isinstance(value, dict):
+        return {k: _summarize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_summarize(v) for v in value]
+    return value
+
+
+def request_key(provider: str, request: Dict[str, Any]) -> str:
+    """根据服务商和请求内容生成稳定的键"""
+    canonical = json.dumps([provider, request], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def serialize_response(response: requests.Response) -> Dict[str, Any]:
+    """把HTTP响应序列化为可写入录制文件的字典"""
+    headers = {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS}
+    content_type = response.headers.get("content-type", "")
+    data = {
+        "status_code": response.status_code,
+        "reason": response.reason,
+        "url": response.url,
+        "headers": headers,
+        "encoding": response.encoding,
+    }
+    if content_type.startswith("text/") or "json" in content_type or "xml" in content_type:
+        data["text"] = response.content.decode(response.encoding or "utf-8", errors="replace")
+    else:
+        data["body_b64"] = base64.b64encode(response.content).decode("ascii")
+    return data
+
+
+def deserialize_response(data: Dict[str, Any]) -> requests.Response:
+    """从录制数据重建HTTP响应"""
+    response = requests.Response()
+    response.status_code = data["status_code"]
+    response.reason = data.get("reason")
+    response.url = data.get("url")
+    response.headers = CaseInsensitiveDict(data.get("headers", {}))
+    response.encoding = data.get("encoding")
+    if "text" in data:
+        response._content = data["text"].encode(response.encoding or "utf-8")
+    else:
+        response._content = base64.b64decode(data.get("body_b64", ""))
+    return response
+
+
+class Cassette:
+    """录制/回放一组服务商调用"""
+
+    def __init__(self, path: str, mode: str = "replay", speed: float = 0.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"不支持的cassette模式: {mode}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._entries: Dict[str, deque] = defaultdict(deque)
+        self._file = None
+        self.stats = {"calls": 0, "recorded_seconds": 0.0, "replay_wait_seconds": 0.0}
+
+        if mode == "replay":
+            self._load()
+        else:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            # 整个录制共用一个写入流，gzip压缩跨记录进行；close() 时写入gzip结尾
+            self._file = _open(path, "a")
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self):
+        with _open(self.path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+        logger.info(f"📼 已加载录制文件: {self.path}")
+
+    def _write(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                # close() 之后仍有调用时重新打开，追加为新的gzip成员
+                self._file = _open(self.path, "a")
+            self._file.write(line)
+
+    def _next_entry(self, provider: str, key: str, summary: Any) -> Dict[str, Any]:
+        with self._lock:
+            queue = self._entries.get(key)
+            if not queue:
+                raise CassetteMissError(f"录制中没有匹配的{provider}请求: {summary}")
+            # 同一请求的最后一条记录会被重复使用，保证额外的重复调用仍然可以回放
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+            self.stats["calls"] += 1
+            self.stats["recorded_seconds"] += entry.get("elapsed", 0.0)
+        if self.speed > 0:
+            wait = entry.get("elapsed", 0.0) / self.speed
+            time.sleep(wait)
+            with self._lock:
+                self.stats["replay_wait_seconds"] += wait
+        return entry
+
+    @staticmethod
+    def _raise_recorded(error: Dict[str, Any]):
+        exc_class = getattr(requests.exceptions, error.get("type", ""), None)
+        if isinstance(exc_class, type) and issubclass(exc_class, Exception):
+            raise exc_class(error.get("message", ""))
+        raise RecordedProviderError(error.get("message", ""))
+
+    def call(self, provider: str, request: Dict[str, Any], func: Callable[[], Any]) -> Any:
+        """
+        录制或回放一次SDK调用，func的返回值必须可以JSON序列化
+
+        Args:
+            provider: 服务商名称
+            request: 决定响应的请求参数
+            func: 实际执行调用的函数
+        """
+        key = request_key(provider, request)
+        if self.replaying:
+            entry = self._next_entry(provider, key, _summarize(request))
+            if "error" in entry:
+                self._raise_recorded(entry["error"])
+            return entry["response"]
+
+        start = time.perf_counter()
+        entry = {"provider": provider, "key": key, "request": _summarize(request)}
+        try:
+            result = func()
+            entry["response"] = result
+            return result
+        except Exception as e:
+            entry["error"] = {"type": type(e).__name__, "message": str(e)}
+            raise
+        finally:
+            entry["elapsed"] = round(time.perf_counter() - start, 4)
+            self._write(entry)
+
+    def http(self, provider: str, method: str, url: str, session: requests.Session = None, **kwargs) -> requests.Response:
+        """录制或回放一次HTTP请求"""
+        request = {
+            "method": method.upper(),
+            "url": url,
+            "params": kwargs.get("params"),
+            "json": kwargs.get("json"),
+            "data": kwargs.get("data"),
+            "range": (kwargs.get("headers") or {}).get("Range"),
+        }
+
+        def send():
+            sender = session if session is not None else requests
+            return serialize_response(sender.request(method, url, **kwargs))
+
+        return deserialize_response(self.call(provider, request, send))
+
+    def close(self):
+        """关闭录制文件，写出缓冲的记录和gzip结尾"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_active_cassette: Optional[Cassette] = None
+_env_loaded = False
+_active_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """获取当前启用的cassette，首次调用时根据环境变量初始化"""
+    global _active_cassette, _env_loaded
+    if _env_loaded:
+        return _active_cassette
+    with _active_lock:
+        if not _env_loaded:
+            mode = os.getenv("PROVIDER_CASSETTE_MODE", "").strip().lower()
+            path = os.getenv("PROVIDER_CASSETTE_PATH")
+            if mode in ("record", "replay") and path:
+                speed = float(os.getenv("PROVIDER_CASSETTE_SPEED", "0"))
+                _active_cassette = Cassette(path, mode, speed)
+                # 通过环境变量启用的录制没有调用方负责关闭，进程退出时关闭
+                atexit.register(_active_cassette.close)
+                logger.info(f"📼 服务商流量{'录制' if mode == 'record' else '回放'}已启用: {path}")
+            _env_loaded = True
+    return _active_cassette
+
+
+@contextmanager
+def use_cassette(path: str, mode: str = "replay", speed: float = 0.0):
+    """在代码块内启用指定的cassette"""
+    global _active_cassette, _env_loaded
+    cassette = Cassette(path, mode, speed)
+    with _active_lock:
+        previous, previous_loaded = _active_cassette, _env_loaded
+        _active_cassette, _env_loaded = cassette, True
+    try:
+        yield cassette
+    finally:
+        cassette.close()
+        with _active_lock:
+            _active_cassette, _env_loaded = previous, previous_loaded
+
+
+def is_replaying() -> bool:
+    """当前是否处于回放模式"""
+    cassette = get_cassette()
+    return cassette is not None and cassette.replaying
+
+
+def record_call(provider: str, request: Dict[str, Any], func: Callable[[], Any]) -> Any:
+    """经过cassette执行一次SDK调用，未启用时直接调用"""
+    cassette = get_cassette()
+    if cassette is None:
+        return func()
+    return cassette.call(provider, request, func)
+
+
+def http_request(provider: str, method: str, url: str, session: requests.Session = None, **kwargs) -> requests.Response:
+    """经过cassette发送一次HTTP请求，未启用时直接发送"""
+    cassette = get_cassette()
+    if cassette is None:
+        sender = session if session is not None else requests
+        return sender.request(method, url, **kwargs)
+    return cassette.http(provider, method, url, session=session, **kwargs)
@@ -0,0 +1,136 @@
+"""
+内容存储
+按内容哈希保存论坛预处理数据等大块内容，工作流状态和检查点中只保留一个很小的 ContentRef 引用。
+内容以压缩后的JSON保存在进程内，相同内容只保存一份；超过容量上限时淘汰最久未使用的内容，
+被淘汰的引用读取时返回None。
+
+内容只保存在进程内，不随检查点持久化：分析完成后工作流不再读取这些大块内容，
+从检查点恢复的状态中的引用在新进程里读取结果为None。
+"""
+
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.graph.state import AnalysisRecord, AnalysisResult, ContentRef, ContentType
+from src.utils.resultWriter import dumps
+
+# 移入内容存储的大块字段
+PAYLOAD_KEYS = ("processed_data",)
+# 只在分析节点内部使用、不进入工作流状态的字段（论坛的媒体请求和链接分析会被展开为独立条目）
+TRANSIENT_KEYS = ("media_requests", "link_analyses")
+
+
+class ContentStore:
+    """进程内的内容寻址存储"""
+
+    def __init__(self, max_bytes: int = None, level: int = 6):
+        """
+        Args:
+            max_bytes: 压缩后内容的总容量上限，None表示不限制
+            level: zlib压缩级别
+        """
+        self.max_bytes = max_bytes
+        self.level = level
+        self.stored_bytes = 0
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, payload: Any, kind: str = "json") -> ContentRef:
+        """保存一块内容并返回引用"""
+        data = dumps(payload).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self._items:
+                self._items.move_to_end(digest)
+            else:
+                compressed = zlib.compress(data, self.level)
+                self._items[digest] = compressed
+                self.stored_bytes += len(compressed)
+                self._evict()
+        return ContentRef(digest=digest, size=len(data), kind=kind)
+
+    def get(self, ref: Optional[ContentRef]) -> Any:
+        """读取引用的内容，内容不存在（或已被淘汰）时返回None"""
+        if ref is None:
+            return None
+        with self._lock:
+            compressed = self._items.get(ref.digest)
+            if compressed is None:
+                return None
+            self._items.move_to_end(ref.digest)
+        return json.loads(zlib.decompress(compressed))
+
+    def discard(self, ref: ContentRef):
+        with self._lock:
+            compressed = self._items.pop(ref.digest, None)
+            if compressed is not None:
+                self.stored_bytes -= len(compressed)
+
+    def _evict(self):
+        while self.max_bytes is not None and self.stored_bytes > self.max_bytes and len(self._items) > 1:
+            _, compressed = self._items.popitem(last=False)
+            self.stored_bytes -= len(compressed)
+
+    def __contains__(self, ref: ContentRef) -> bool:
+        with self._lock:
+            return ref.digest in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def compact(self, result: AnalysisResult) -> AnalysisRecord:
+        """
+        把分析器返回的字典结果转换为紧凑的 AnalysisRecord
+
+        大块字段保存到内容存储中，只保留引用；只在分析节点内部使用的字段被丢弃；
+        其他非标准字段合并到元数据中。已经是 AnalysisRecord 的结果原样返回。
+        """
+        if isinstance(result, AnalysisRecord):
+            return result
+
+        metadata: Dict[str, Any] = dict(result.get("metadata") or {})
+        payload = result.get("payload")
+        if isinstance(payload, dict):
+            # 从JSON（如条目完成记录）读回的引用
+            payload = ContentRef(**payload)
+        for key, value in result.items():
+            if key in PAYLOAD_KEYS:
+                if value is not None:
+                    payload = self.put(value, kind=key)
+            elif key not in _STANDARD_KEYS and key not in TRANSIENT_KEYS:
+                metadata[key] = value
+
+        content_type = result["content_type"]
+        return AnalysisRecord(
+            content_type=content_type if isinstance(content_type, ContentType) else ContentType(content_type),
+            original_content=result.get("original_content", ""),
+            analysis=result.get("analysis", ""),
+            summary=result.get("summary", ""),
+            key_points=list(result.get("key_points") or []),
+            confidence=result.get("confidence", 0.0),
+            metadata=metadata or None,
+            payload=payload,
+        )
+
+
+_STANDARD_KEYS = frozenset(
+    ("content_type", "original_content", "analysis", "summary", "key_points", "confidence", "metadata", "payload")
+)
+
+_content_store: Optional[ContentStore] = None
+_content_store_lock = threading.Lock()
+
+
+def get_content_store() -> ContentStore:
+    """返回进程共享的内容存储，容量由 CONTENT_STORE_MAX_MB 决定"""
+    global _content_store
+    if _content_store is None:
+        with _content_store_lock:
+            if _content_store is None:
+                from src.config import config
+                _content_store = ContentStore(max_bytes=int(config.content_store_max_mb * 1024 * 1024))
+    return _content_store
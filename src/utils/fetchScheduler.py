@@ -0,0 +1,258 @@
+"""
+出站抓取调度
+访问外部网站（网页、图片）的请求都经过进程共享的调度器：
+- 每个主机同时进行的请求数有上限，所有主机合计的请求数也有上限
+- 同一主机相邻两个请求的开始时间至少间隔 FETCH_MIN_DELAY 秒
+- 遇到429/503时暂停该主机：有 Retry-After 时按其等待，否则指数退避，成功后退避时间复位；请求自动重试
+- 等待中的请求按主机轮转分配，一个主机排队的请求再多也不会让其他主机的请求一直等待
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import config
+from src.utils import metrics
+from src.utils.cassette import http_request
+
+logger = logging.getLogger(__name__)
+
+# 表示主机限流或暂时不可用的状态码
+THROTTLE_STATUSES = (429, 503)
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头（秒数或HTTP日期），无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class _Host:
+    """一个主机的调度状态"""
+    active: int = 0
+    next_start: float = 0.0  # 下一个请求最早的开始时间（time.monotonic）
+    backoff: float = 0.0  # 当前的退避时间，成功后复位
+    waiting: Deque["_Ticket"] = field(default_factory=deque)
+
+
+class _Ticket:
+    __slots__ = ("host", "granted", "status", "retry_after")
+
+    def __init__(self, host: str):
+        self.host = host
+        self.granted = False
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+
+
+class FetchScheduler:
+    """按主机限制并发和请求间隔的出站请求调度器"""
+
+    def __init__(self, per_host: int = None, max_connections: int = None, min_delay: float = None,
+                 max_retries: int = None, backoff_base: float = None, max_backoff: float = None):
+        """
+        Args:
+            per_host: 每个主机同时进行的请求数上限（默认: FETCH_PER_HOST）
+            max_connections: 所有主机合计的请求数上限（默认: FETCH_MAX_CONNECTIONS）
+            min_delay: 同一主机相邻请求开始时间的最小间隔秒数（默认: FETCH_MIN_DELAY）
+            max_retries: 遇到429/503时的最大重试次数（默认: FETCH_MAX_RETRIES）
+            backoff_base: 没有 Retry-After 时的初始退避秒数，连续限流时翻倍（默认: FETCH_BACKOFF_BASE）
+            max_backoff: 单次暂停的最长秒数，Retry-After 超过该值时不再重试（默认: FETCH_MAX_BACKOFF）
+        """
+        self.per_host = max(1, per_host or config.fetch_per_host)
+        self.max_connections = max(1, max_connections or config.fetch_max_connections)
+        self.min_delay = config.fetch_min_delay if min_delay is None else min_delay
+        self.max_retries = config.fetch_max_retries if max_retries is None else max_retries
+        self.backoff_base = config.fetch_backoff_base if backoff_base is None else backoff_base
+        self.max_backoff = config.fetch_max_backoff if max_backoff is None else max_backoff
+
+        self._hosts: Dict[str, _Host] = {}
+        self._rotation: Deque[str] = deque()  # 有请求在等待的主机，按轮转顺序排列
+        self._active = 0
+        self._cond = threading.Condition()
+
+        # 没有传入会话的请求共用一个会话，复用每个主机的连接
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=self.max_connections, pool_maxsize=self.per_host)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _dispatch(self, now: float):
+        """按主机轮转把空闲的名额分配给等待中的请求（调用方持有锁）"""
+        granted = False
+        while self._active < self.max_connections and self._rotation:
+            for _ in range(len(self._rotation)):
+                name = self._rotation[0]
+                self._rotation.rotate(-1)
+                host = self._hosts[name]
+                if host.active < self.per_host and host.next_start <= now:
+                    break
+            else:
+                break
+            ticket = host.waiting.popleft()
+            if not host.waiting:
+                self._rotation.remove(name)
+            ticket.granted = True
+            host.active += 1
+            host.next_start = now + self.min_delay
+            self._active += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _next_wakeup(self, now: float) -> Optional[float]:
+        """最近一个因请求间隔或退避而等待的主机可以开始的时间"""
+        pending = [self._hosts[name].next_start for name in self._rotation
+                   if self._hosts[name].next_start > now and self._hosts[name].active < self.per_host]
+        return min(pending) - now if pending else None
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[_Ticket]:
+        """
+        等待并占用一个请求名额，离开时释放
+
+        请求完成后把响应的状态码和 Retry-After 写入返回的对象，调度器据此决定是否暂停该主机。
+        """
+        name = urlsplit(url).netloc.lower()
+        ticket = _Ticket(name)
+        start = time.monotonic()
+        with self._cond:
+            host = self._hosts.setdefault(name, _Host())
+            host.waiting.append(ticket)
+            if name not in self._rotation:
+                self._rotation.append(name)
+            while True:
+                now = time.monotonic()
+                self._dispatch(now)
+                if ticket.granted:
+                    break
+                self._cond.wait(self._next_wakeup(now))
+        metrics.FETCH_WAIT.observe(time.monotonic() - start)
+        try:
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    def _release(self, ticket: _Ticket):
+        with self._cond:
+            host = self._hosts[ticket.host]
+            host.active -= 1
+            self._active -= 1
+            now = time.monotonic()
+            if ticket.status in THROTTLE_STATUSES:
+                host.backoff = min(self.max_backoff, host.backoff * 2 if host.backoff else self.backoff_base)
+                delay = min(self.max_backoff, ticket.retry_after if ticket.retry_after is not None else host.backoff)
+                host.next_start = max(host.next_start, now + delay)
+                metrics.FETCH_THROTTLED.labels(status=str(ticket.status)).inc()
+                logger.warning(f"⏳ {ticket.host} 返回 {ticket.status}，暂停 {delay:.1f} 秒")
+            elif ticket.status is not None and ticket.status < 400:
+                host.backoff = 0.0
+            self._dispatch(now)
+            self._cond.notify_all()
+
+    def _send(self, ticket: _Ticket, provider: str, method: str, url: str, session: requests.Session,
+              kwargs: dict) -> requests.Response:
+        response = http_request(provider, method, url, session=session, **kwargs)
+        ticket.status = response.status_code
+        ticket.retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        return response
+
+    def _final(self, response: requests.Response, ticket: _Ticket, attempt: int, url: str) -> bool:
+        """响应是否作为最终结果返回（不是限流、重试次数用完或 Retry-After 过长）"""
+        if response.status_code not in THROTTLE_STATUSES or attempt == self.max_retries:
+            return True
+        if ticket.retry_after is not None and ticket.retry_after > self.max_backoff:
+            logger.warning(f"⚠️ {url} 要求等待 {ticket.retry_after:.0f} 秒，超过上限，不再重试")
+            return True
+        return False
+
+    def request(self, provider: str, method: str, url: str, session: requests.Session = None,
+                **kwargs) -> requests.Response:
+        """
+        经过调度发送一次HTTP请求，遇到429/503时等待后重试
+
+        收到响应后即释放名额，需要流式读取响应体时使用 stream()。
+
+        Args:
+            provider: cassette中的服务名（url、image等）
+            method: HTTP方法
+            url: 请求地址
+            session: 使用的会话（默认: 调度器共享的会话）
+            **kwargs: 传给 requests 的其他参数
+
+        Returns:
+            最后一次请求的响应；重试次数用完或 Retry-After 过长时返回限流响应
+        """
+        session = session or self.session
+        for attempt in range(self.max_retries + 1):
+            with self.slot(url) as ticket:
+                response = self._send(ticket, provider, method, url, session, kwargs)
+            if self._final(response, ticket, attempt, url):
+                return response
+            response.close()
+        return response
+
+    @contextmanager
+    def stream(self, provider: str, method: str, url: str, session: requests.Session = None,
+               **kwargs) -> Iterator[requests.Response]:
+        """
+        经过调度发送一次流式HTTP请求，名额一直占用到离开with块（响应体读完）时才释放，离开时关闭响应
+
+        参数和重试与 request() 相同。
+        """
+        session = session or self.session
+        for attempt in range(self.max_retries + 1):
+            with self.slot(url) as ticket:
+                response = self._send(ticket, provider, method, url, session, dict(kwargs, stream=True))
+                if self._final(response, ticket, attempt, url):
+                    try:
+                        yield response
+                    finally:
+                        response.close()
+                    return
+                response.close()
+
+
+_scheduler: Optional[FetchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_fetch_scheduler() -> FetchScheduler:
+    """返回进程共享的出站抓取调度器"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = FetchScheduler()
+    return _scheduler
+
+
+def fetch(provider: str, method: str, url: str, session: requests.Session = None, **kwargs) -> requests.Response:
+    """经过共享调度器发送一次HTTP请求"""
+    return get_fetch_scheduler().request(provider, method, url, session=session, **kwargs)
+
+
+def fetch_stream(provider: str, method: str, url: str, session: requests.Session = None, **kwargs):
+    """经过共享调度器发送一次流式HTTP请求，在with块中读取响应体，读完后才释放名额"""
+    return get_fetch_scheduler().stream(provider, method, url, session=session, **kwargs)
@@ -0,0 +1,227 @@
+"""
+Prometheus指标采集
+提供路由、图节点、分析器和模型服务商的延迟直方图，以及调用计数和并发量指标
+
+多进程部署（gunicorn等）时，请在启动前设置 PROMETHEUS_MULTIPROC_DIR 环境变量，
+指向一个每次启动前清空的目录，各worker会把指标写入该目录下的共享文件，
+/metrics 端点会聚合所有worker的数据。
+"""
+
+import os
+import time
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+
+logger = logging.getLogger(__name__)
+
+# 模型调用可能长达数十秒，桶的上限需要覆盖60秒超时
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+ROUTE_LATENCY = Histogram(
+    "ld_http_request_duration_seconds",
+    "HTTP请求处理耗时",
+    ["route", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+ROUTE_IN_FLIGHT = Gauge(
+    "ld_http_requests_in_flight",
+    "正在处理的HTTP请求数",
+    ["route"],
+    multiprocess_mode="livesum",
+)
+NODE_LATENCY = Histogram(
+    "ld_graph_node_duration_seconds",
+    "图节点执行耗时",
+    ["node"],
+    buckets=LATENCY_BUCKETS,
+)
+ANALYZER_LATENCY = Histogram(
+    "ld_analyzer_duration_seconds",
+    "分析器执行耗时",
+    ["analyzer"],
+    buckets=LATENCY_BUCKETS,
+)
+PROVIDER_LATENCY = Histogram(
+    "ld_provider_request_duration_seconds",
+    "模型服务商请求耗时",
+    ["provider", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+PROVIDER_IN_FLIGHT = Gauge(
+    "ld_provider_requests_in_flight",
+    "正在进行的模型服务商请求数",
+    ["provider"],
+    multiprocess_mode="livesum",
+)
+LLM_CALLS = Counter(
+    "ld_llm_calls_total",
+    "模型调用次数",
+    ["provider", "outcome"],
+)
+LLM_TOKENS = Counter(
+    "ld_llm_tokens_total",
+    "模型调用消耗的token数",
+    ["provider", "direction"],
+)
+PROVIDER_FALLBACKS = Counter(
+    "ld_provider_fallbacks_total",
+    "服务商降级次数",
+    ["from_provider", "to_provider"],
+)
+PROVIDER_HEDGES = Counter(
+    "ld_provider_hedges_total",
+    "对冲请求次数及胜出方",
+    ["primary", "hedge", "winner"],
+)
+MICRO_BATCH_ITEMS = Counter(
+    "ld_micro_batch_items_total",
+    "微批处理的条目数（batched为批量完成，fallback为退回逐条分析）",
+    ["outcome"],
+)
+IMAGE_PROBES = Counter(
+    "ld_image_probe_total",
+    "图片探测结果（skipped_pattern/skipped_small/skipped_large为跳过，analyzed为需要分析，failed为探测失败，thumbnailed为缩小后发送）",
+    ["outcome"],
+)
+IMAGE_BATCH_ITEMS = Counter(
+    "ld_image_batch_items_total",
+    "多图批量分析的图片数（batched为批量完成，fallback为退回逐张分析）",
+    ["outcome"],
+)
+BATCH_ITEMS = Counter(
+    "ld_batch_items_total",
+    "逐条并行批处理完成的条目数",
+    ["outcome"],
+)
+COALESCED_REQUESTS = Counter(
+    "ld_coalesced_requests_total",
+    "与相同内容的请求合并、没有单独执行的请求数（server为并发的API请求，batch为批次内的重复条目）",
+    ["scope"],
+)
+MCP_ATTEMPTS = Counter(
+    "ld_mcp_attempts_total",
+    "MCP工具调用次数",
+    ["tool", "outcome"],
+)
+FETCH_BYTES = Counter(
+    "ld_fetch_bytes_total",
+    "外部资源下载字节数",
+    ["source"],
+)
+FETCH_WAIT = Histogram(
+    "ld_fetch_queue_wait_seconds",
+    "外部资源请求在抓取调度器中排队等待的时间",
+    buckets=LATENCY_BUCKETS,
+)
+FETCH_THROTTLED = Counter(
+    "ld_fetch_throttled_total",
+    "外部网站返回限流（429）或暂时不可用（503）的次数",
+    ["status"],
+)
+CACHE_REQUESTS = Counter(
+    "ld_cache_requests_total",
+    "缓存查询次数",
+    ["cache", "result"],
+)
+
+
+@contextmanager
+def track_latency(histogram: Histogram, in_flight=None, **labels):
+    """
+    统计代码块耗时
+
+    Args:
+        histogram: 延迟直方图
+        in_flight: 可选的并发量指标（已绑定标签的Gauge）
+        **labels: 直方图标签
+    """
+    if in_flight is not None:
+        in_flight.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+        if in_flight is not None:
+            in_flight.dec()
+
+
+def timed_node(name: str, func: Callable) -> Callable:
+    """包装图节点函数，记录节点耗时"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with track_latency(NODE_LATENCY, node=name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def timed_analyzer(name: str) -> Callable:
+    """分析器方法装饰器，记录分析器耗时"""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_latency(ANALYZER_LATENCY, analyzer=name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_provider_call(provider: str, outcome: str, elapsed: float, usage: dict = None):
+    """记录一次模型调用的结果、耗时和token用量"""
+    LLM_CALLS.labels(provider=provider, outcome=outcome).inc()
+    PROVIDER_LATENCY.labels(provider=provider, outcome=outcome).observe(elapsed)
+    for direction in ("input", "output"):
+        tokens = (usage or {}).get(f"{direction}_tokens")
+        if tokens:
+            LLM_TOKENS.labels(provider=provider, direction=direction).inc(tokens)
+
+
+def record_fallback(from_provider: str, to_provider: str):
+    """记录一次服务商降级"""
+    PROVIDER_FALLBACKS.labels(from_provider=from_provider, to_provider=to_provider).inc()
+
+
+def record_cache(cache: str, hit: bool):
+    """记录一次缓存命中或未命中"""
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def is_multiprocess() -> bool:
+    """是否启用了多进程指标模式"""
+    return bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """生成Prometheus文本格式的指标数据"""
+    if is_multiprocess():
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid: int):
+    """
+    worker退出时清理其live指标文件
+
+    在gunicorn配置中使用:
+        def child_exit(server, worker):
+            mark_worker_dead(worker.pid)
+    """
+    if is_multiprocess():
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
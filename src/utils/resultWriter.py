@@ -0,0 +1,140 @@
+"""
+流式结果输出
+每个条目完成后立即写入一行JSONL并刷新到磁盘，进程崩溃时已完成的结果不会丢失。
+可以按大小或条数轮转为多个分片，结束时写入一条汇总记录。内存占用与条目数量无关。
+
+记录格式:
+    {"type": "result", "index": 0, "content_type": "text", ...}
+    {"type": "summary", "total": 100, "successful": 98, ...}
+"""
+
+import dataclasses
+import json
+import os
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+# 与批量分析脚本的成功统计一致
+SUCCESS_CONFIDENCE = 0.5
+
+
+def json_default(value: Any):
+    """json.dump 的default函数：枚举输出其值，集合输出列表，日期输出ISO格式"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def dumps(record: Any) -> str:
+    """序列化为单行JSON"""
+    return json.dumps(record, ensure_ascii=False, default=json_default)
+
+
+class JsonlResultWriter:
+    """
+    逐条写入分析结果的JSONL输出
+
+    未设置轮转时写入 path 本身；设置 max_bytes 或 max_records 后写入
+    <name>-0000.jsonl、<name>-0001.jsonl ... 分片，汇总记录写在最后一个分片末尾。
+    """
+
+    def __init__(self, path: str, max_bytes: int = None, max_records: int = None, fsync: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_records = max_records
+        self.fsync = fsync
+        self.total = 0
+        self.successful = 0
+        self.paths: List[str] = []
+        self._file = None
+        self._shard_bytes = 0
+        self._shard_records = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def rotating(self) -> bool:
+        return bool(self.max_bytes or self.max_records)
+
+    def _shard_path(self, number: int) -> str:
+        if not self.rotating:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return f"{root}-{number:04d}{ext or '.jsonl'}"
+
+    def _needs_rotation(self, size: int) -> bool:
+        if self._file is None:
+            return True
+        if not self.rotating or self._shard_records == 0:
+            return False
+        if self.max_records and self._shard_records >= self.max_records:
+            return True
+        return bool(self.max_bytes and self._shard_bytes + size > self.max_bytes)
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+        path = self._shard_path(len(self.paths))
+        self._file = open(path, "w", encoding="utf-8")
+        self.paths.append(path)
+        self._shard_bytes = 0
+        self._shard_records = 0
+
+    def _write_line(self, line: str):
+        data = line + "\n"
+        size = len(data.encode("utf-8"))
+        if self._needs_rotation(size):
+            self._open_next()
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._shard_bytes += size
+        self._shard_records += 1
+
+    def write(self, result: Dict[str, Any], index: int = None):
+        """写入一个条目的分析结果"""
+        record = {"type": "result", "index": self.total if index is None else index, **result}
+        self._write_line(dumps(record))
+        self.total += 1
+        if result.get("confidence", 0) > SUCCESS_CONFIDENCE:
+            self.successful += 1
+
+    def write_summary(self, **fields):
+        """写入汇总记录，包含条目统计和额外字段（如综合总结）"""
+        record = {
+            "type": "summary",
+            "total": self.total,
+            "successful": self.successful,
+            "failed": self.total - self.successful,
+            **fields
+        }
+        self._write_line(dumps(record))
+
+    def close(self):
+        if self._file is None:
+            # 没有任何记录时也创建输出文件
+            self._open_next()
+        self._file.close()
+
+    def __enter__(self) -> "JsonlResultWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_records(paths: List[str]):
+    """按顺序读取一个或多个JSONL分片中的记录"""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
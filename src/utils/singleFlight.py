@@ -0,0 +1,92 @@
+"""
+请求合并（single-flight）
+相同内容的请求同时到达时只执行一次计算，其余请求等待并共享同一个结果（或同一个异常）。
+计算完成后立即移除，不缓存结果：之后到达的相同请求会重新计算。
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+from src.graph.state import AnalysisRequest, ContentType
+from src.utils.urlCanonical import canonical_url
+
+
+def normalize_content(content: str, content_type: ContentType) -> str:
+    """规范化请求内容：去掉首尾空白；URL按 canonical_url 规范化（协议和域名转为小写，去掉片段和跟踪参数）"""
+    content = content.strip()
+    if content_type == ContentType.URL:
+        return canonical_url(content) or content
+    return content
+
+
+def request_key(request: AnalysisRequest) -> Tuple[str, str, Any]:
+    """单个分析请求的去重键"""
+    content_type = request["content_type"]
+    key = (content_type.value, normalize_content(request["content"], content_type), request.get("context"))
+    if request.get("previous_content") is not None:
+        # 差异模式的请求还取决于上一版本
+        key += (request["previous_content"],)
+    return key
+
+
+def coalesce_key(requests, **options) -> str:
+    """一组请求和运行选项（如路由策略）的合并键"""
+    key = json.dumps([[request_key(r) for r in requests], options], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并同时进行的相同计算"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行func，或等待同一个键正在进行的计算
+
+        Returns:
+            (结果, 是否与其他请求共享了同一次计算)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, call.waiters > 0
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
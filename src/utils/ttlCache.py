@@ -0,0 +1,74 @@
+"""
+带过期时间的LRU缓存
+条目超过存活时间后失效，条目数超过上限时淘汰最久未使用的条目。查询结果记录到
+ld_cache_requests_total{cache=<名称>} 指标。线程安全。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from src.utils import metrics
+
+# 缓存中没有该键时 get 返回的哨兵值（None可以是合法的缓存值）
+MISSING = object()
+
+
+class TTLCache:
+    """按条目数和存活时间淘汰的缓存"""
+
+    def __init__(self, name: str, max_entries: int = 1024, ttl: float = 3600,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            name: 缓存名称，用作指标标签
+            max_entries: 最大条目数，为0时禁用缓存
+            ttl: 条目存活秒数，为0时禁用缓存
+            clock: 时钟函数，测试时可替换
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, key: Hashable) -> Any:
+        """返回未过期的缓存值，不存在或已过期时返回 MISSING"""
+        if not self.enabled:
+            return MISSING
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] <= self.clock():
+                del self._items[key]
+                item = None
+            if item is None:
+                self.misses += 1
+            else:
+                self._items.move_to_end(key)
+                self.hits += 1
+        metrics.record_cache(self.name, item is not None)
+        return MISSING if item is None else item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._items[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -0,0 +1,161 @@
+"""
+URL规范化
+论坛和网页中的链接经常以不同形式指向同一资源：跟踪参数、片段、末尾斜杠、http/https、短链接跳转。
+抓取前先规范化并去重，避免重复抓取和分析：
+- canonical_url: 实际抓取的地址，去掉跟踪参数、片段和默认端口，协议和域名转为小写
+- url_key: 判断是否为同一资源的键，在 canonical_url 的基础上忽略协议、末尾斜杠和查询参数的顺序
+- RedirectResolver: 解析短链接的跳转目标并缓存，抓取时遇到的重定向也记录在同一缓存中
+"""
+
+import logging
+import posixpath
+import threading
+from typing import Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from src.config import config
+from src.utils.ttlCache import MISSING, TTLCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# 只用于统计来源、不影响页面内容的查询参数
+TRACKING_PREFIXES = ("utm_",)
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok", "spm", "ref_src", "ref_url", "share_source", "share_medium",
+    "vd_source",
+})
+
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonical_url(url: str, base: str = None) -> Optional[str]:
+    """
+    规范化URL：解析相对链接，协议和域名转为小写，去掉默认端口、片段、跟踪参数和路径中的 . / ..
+
+    Returns:
+        规范化后的URL，不是http(s)链接时返回None
+    """
+    try:
+        parts = urlsplit(urljoin(base, url.strip()) if base else url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    path = parts.path or "/"
+    if "/." in path:
+        normalized = posixpath.normpath(path)
+        path = normalized + "/" if path.endswith("/") and normalized != "/" else normalized
+    query = parts.query
+    if query:
+        params = parse_qsl(query, keep_blank_values=True)
+        kept = [(name, value) for name, value in params if not is_tracking_param(name)]
+        if len(kept) != len(params):
+            query = urlencode(kept)
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def url_key(url: str) -> str:
+    """
+    同一资源的去重键：忽略协议、末尾斜杠和查询参数的顺序
+
+    不是http(s)链接时返回去掉首尾空白的原字符串。
+    """
+    canonical = canonical_url(url)
+    if canonical is None:
+        return url.strip()
+    parts = urlsplit(canonical)
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{parts.netloc}{path}?{query}" if query else f"{parts.netloc}{path}"
+
+
+def unique_urls(urls: Iterable[str]) -> List[str]:
+    """按 url_key 去重并保持原有顺序，返回规范化后的URL（不是http(s)链接的保留原样）"""
+    seen = set()
+    unique = []
+    for url in urls:
+        key = url_key(url)
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(canonical_url(url) or url.strip())
+    return unique
+
+
+class RedirectResolver:
+    """短链接跳转目标的解析和缓存"""
+
+    def __init__(self, hosts: Iterable[str] = None, cache: TTLCache = None):
+        """
+        Args:
+            hosts: 抓取前需要解析跳转的短链接域名（默认: URL_SHORTENER_HOSTS）
+            cache: 跳转目标缓存，键为 url_key（默认按 URL_REDIRECT_CACHE_TTL/SIZE 创建）
+        """
+        self.hosts = frozenset(h.lower() for h in (config.url_shortener_hosts if hosts is None else hosts))
+        self.cache = cache or TTLCache("url_redirect", max_entries=config.url_redirect_cache_size,
+                                       ttl=config.url_redirect_cache_ttl)
+
+    def remember(self, url: str, final: str):
+        """记录一次跳转（抓取时 requests 已经跟随的重定向也记录在这里）"""
+        final = canonical_url(final)
+        if final and url_key(final) != url_key(url):
+            self.cache.set(url_key(url), final)
+
+    def lookup(self, url: str) -> Optional[str]:
+        """缓存中的跳转目标，没有记录时返回None"""
+        final = self.cache.get(url_key(url))
+        return None if final is MISSING else final
+
+    def resolve(self, url: str) -> str:
+        """
+        返回链接规范化后的最终地址：已知的跳转直接使用缓存，短链接域名发送一次HEAD请求解析
+
+        解析失败时返回规范化后的原地址，由后续的抓取处理错误。
+        """
+        canonical = canonical_url(url)
+        if canonical is None:
+            return url.strip()
+        final = self.lookup(canonical)
+        if final is not None:
+            return final
+        if urlsplit(canonical).hostname not in self.hosts:
+            return canonical
+
+        from src.utils.fetchScheduler import fetch
+
+        try:
+            response = fetch("url", "HEAD", canonical, allow_redirects=True, timeout=10)
+            response.close()
+        except Exception as e:
+            logger.warning(f"⚠️ 短链接解析失败 {canonical}: {str(e)}")
+            return canonical
+        final = canonical_url(response.url or canonical) or canonical
+        logger.info(f"🔗 短链接 {canonical} -> {final}")
+        # 没有跳转的短链接也写入缓存，避免重复解析
+        self.cache.set(url_key(canonical), final)
+        return final
+
+
+_resolver: Optional[RedirectResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_redirect_resolver() -> RedirectResolver:
+    """返回进程共享的跳转解析器"""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = RedirectResolver()
+    return _resolver
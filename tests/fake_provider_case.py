@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+使用模拟服务商服务器的测试基类
+服务器本身在 benchmarks/fake_provider_server.py 中，基准测试和测试共用
+"""
+
+import sys
+import os
+import unittest
+from typing import Optional
+from unittest import mock
+
+# 添加项目根目录和基准测试目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from fake_provider_server import FakeProviderConfig, FakeProviderServer, LatencyModel
+from src.config import config
+
+
+class FakeProviderTestCase(unittest.TestCase):
+    """
+    使用模拟服务商服务器的测试基类
+
+    每个测试启动一个服务器，并把OpenAI兼容接口指向它（关闭微批处理）；子类用 provider_latency 和
+    provider_seed 设置服务器，用 patch_config 临时修改其他配置。服务器和所有配置修改在测试结束后自动恢复。
+    """
+
+    provider_latency: Optional[str] = None  # 延迟分布，格式见 LatencyModel.parse
+    provider_seed: Optional[int] = None
+
+    def setUp(self):
+        """启动服务器并修改配置"""
+        latency = LatencyModel.parse(self.provider_latency) if self.provider_latency else LatencyModel()
+        self.server = FakeProviderServer(FakeProviderConfig(latency=latency, seed=self.provider_seed)).start()
+        self.addCleanup(self.server.stop)
+        self.patch_config(openai_base_url=f"{self.server.url}/v1", openai_api_keys=["fake-openai-key"],
+                          micro_batching=False)
+
+    def patch_config(self, **values):
+        """在当前测试中临时修改 src.config.config 的属性"""
+        for name, value in values.items():
+            patcher = mock.patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+逐条并行批处理引擎测试
+测试并发执行、流式结果回调、有界的最终总结、进程池模式和进度估算
+"""
+
+import sys
+import os
+import time
+import unittest
+from unittest import mock
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fake_provider_case import FakeProviderTestCase
+from src.config import config
+from src.core.batchEngine import BatchEngine, ProgressReporter, SummaryAccumulator
+from src.core.multimodalAgent import create_analysis_request
+from src.graph.state import ContentType
+
+
+class TestBatchEngine(FakeProviderTestCase):
+    """逐条并行批处理引擎测试类"""
+
+    provider_latency = "fixed:0.1"
+
+    def _requests(self, count: int):
+        return [create_analysis_request(f"第{i}段文本：云计算降低了运维成本。", ContentType.TEXT) for i in range(count)]
+
+    def test_items_run_concurrently(self):
+        """测试条目并发执行，结果按完成顺序交给回调，最终总结只调用一次"""
+        received = {}
+        engine = BatchEngine(workers=8, summary_limit=5, progress_interval=0)
+        start = time.perf_counter()
+        stats = engine.run(self._requests(16), result_sink=lambda result, index: received.setdefault(index, result))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(sorted(received), list(range(16)))
+        self.assertEqual(stats["successful"], 16)
+        self.assertEqual(stats["summary_sample_size"], 5)
+        self.assertTrue(stats["final_summary"])
+        # 16次条目调用 + 1次总结，串行至少需要1.7秒
+        self.assertEqual(self.server.snapshot()["openai_chat"], 17)
+        self.assertLess(elapsed, 1.2)
+
+    def test_generator_input_and_groups(self):
+        """测试生成器输入和分组调用"""
+        received = []
+        engine = BatchEngine(workers=2, group_size=3, progress_interval=0)
+        stats = engine.run(iter(self._requests(7)), result_sink=lambda result, index: received.append(index),
+                           summarize=False)
+        self.assertEqual(sorted(received), list(range(7)))
+        self.assertIsNone(stats["final_summary"])
+        self.assertEqual(self.server.snapshot()["openai_chat"], 7)
+
+    def test_process_pool(self):
+        """测试进程池模式"""
+        received = []
+        engine = BatchEngine(processes=2, progress_interval=0)
+        # 工作进程从环境变量读取配置
+        env = {"OPENAI_BASE_URL": config.openai_base_url, "OPENAI_API_KEYS": "fake-openai-key", "MICRO_BATCHING": "false"}
+        with mock.patch.dict(os.environ, env):
+            stats = engine.run(self._requests(4), result_sink=lambda result, index: received.append(result),
+                               summarize=False)
+        self.assertEqual(stats["successful"], 4)
+        self.assertTrue(all(r["content_type"] == ContentType.TEXT for r in received))
+
+    def test_progress_and_sampling(self):
+        """测试进度估算和蓄水池抽样"""
+        snapshots = []
+        progress = ProgressReporter(total=100, interval=0, callback=snapshots.append)
+        progress.start -= 10
+        progress.update(20, 18)
+        self.assertAlmostEqual(snapshots[-1]["items_per_second"], 2.0, places=1)
+        self.assertAlmostEqual(snapshots[-1]["eta"], 40.0, delta=1.0)
+
+        accumulator = SummaryAccumulator(limit=3)
+        for i in range(50):
+            accumulator.add({"confidence": 0.9, "summary": str(i)})
+        accumulator.add({"confidence": 0.2, "summary": "失败"})
+        self.assertEqual(len(accumulator.results), 3)
+        self.assertEqual(accumulator.seen, 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
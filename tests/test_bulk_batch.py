@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线批量分析测试
+测试请求渲染、分片、远程和本地执行器、丢失作业的重新提交以及结果映射
+"""
+
+import sys
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fake_provider_case import FakeProviderTestCase
+from src.config import config
+from src.core import bulkBatch
+from src.core.bulkBatch import (
+    BulkJob, LocalBatchExecutor, OpenAIBatchExecutor, iter_request_file, provider_result_from_output
+)
+from src.analyzers.providerResult import ErrorKind
+from src.graph.state import ContentType
+
+
+class TestBulkBatch(FakeProviderTestCase):
+    """离线批量分析测试类"""
+
+    provider_seed = 7
+
+    def setUp(self):
+        """测试前准备"""
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.requests = [
+            {"content": f"{self.server.url}/pages/1", "content_type": "url"},
+            {"content": "def add(a, b):\n    return a + b\n", "content_type": "code", "context": "Python"},
+            {"content": "云计算降低了运维成本。", "content_type": "text"},
+            {"content": "search: 边缘计算", "content_type": "text"},
+            {"content": f"{self.server.url}/images/1.png", "content_type": "image"},
+            {"content": "缺少类型"},
+        ]
+
+    def tearDown(self):
+        """测试后清理"""
+        self.tmpdir.cleanup()
+
+    def _work_dir(self, name: str) -> str:
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_openai_executor_round_trip(self):
+        """测试通过Files/Batches接口提交并把输出映射回分析结果"""
+        job = BulkJob(self._work_dir("remote"), shard_size=2)
+        counts = job.prepare(self.requests)
+        self.assertEqual(counts, {"total": 6, "rendered": 3, "skipped": 2, "invalid": 1})
+        self.assertEqual(len(job.state["shards"]), 2)
+
+        with open(os.path.join(job.work_dir, "input-0000.jsonl"), encoding="utf-8") as f:
+            line = json.loads(f.readline())
+        self.assertEqual(line["url"], "/v1/chat/completions")
+        self.assertIn("模拟页面 1", line["body"]["messages"][0]["content"])
+
+        executor = OpenAIBatchExecutor(base_url=config.openai_base_url, api_key="fake-openai-key")
+        job.submit(executor)
+        job.wait(executor, poll_interval=0.01)
+        results = list(job.iter_results())
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(self.server.snapshot()["batches"], 2)
+        by_type = {}
+        for result in results:
+            by_type.setdefault(result["content_type"], []).append(result)
+        self.assertEqual(by_type[ContentType.CODE][0]["key_points"][0], "编程语言: python")
+        self.assertGreater(by_type[ContentType.URL][0]["confidence"], 0.5)
+        self.assertTrue(all(r["metadata"].get("skipped") for r in by_type[ContentType.IMAGE]))
+        self.assertEqual(sum(r["metadata"].get("skipped", False) for r in by_type[ContentType.TEXT]), 1)
+
+    def test_local_executor_resubmits_lost_jobs(self):
+        """测试本地执行器的作业在新进程中丢失后重新提交"""
+        path = os.path.join(self.tmpdir.name, "requests.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for request in self.requests[1:3]:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+        job = BulkJob(self._work_dir("local"))
+        job.prepare(iter_request_file(path))
+        job.submit(LocalBatchExecutor(workers=2))
+
+        # 模拟进程重启：重新加载作业状态，之前的本地作业已不存在
+        resumed = BulkJob(self._work_dir("local"))
+        self.assertTrue(resumed.prepared)
+        executor = LocalBatchExecutor(workers=2)
+        resumed.wait(executor, poll_interval=0.01)
+        results = list(resumed.iter_results())
+
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(r["metadata"]["provider"] == "openai" for r in results))
+        self.assertTrue(all(r["confidence"] > 0.5 for r in results))
+
+    def test_prepare_closes_shard_on_error(self):
+        """测试渲染中途出错时分片文件也会关闭"""
+        def requests():
+            yield self.requests[2]
+            raise RuntimeError("输入文件读取失败")
+
+        files = []
+        write = bulkBatch._write_jsonl
+        with mock.patch.object(bulkBatch, "_write_jsonl", side_effect=lambda f, data: (files.append(f), write(f, data))):
+            with self.assertRaises(RuntimeError):
+                BulkJob(self._work_dir("broken")).prepare(requests())
+        self.assertTrue(files)
+        self.assertTrue(all(f.closed for f in files))
+
+    def test_output_errors_are_typed(self):
+        """测试批处理输出中的错误转换为类型化结果"""
+        result = provider_result_from_output({
+            "custom_id": "req-00000000",
+            "response": {"status_code": 429, "body": {"error": {"message": "rate limited"}}},
+            "error": None,
+        })
+        self.assertEqual(result.error_kind, ErrorKind.RATE_LIMIT)
+        result = provider_result_from_output({"custom_id": "req-00000001", "response": None,
+                                              "error": {"code": "batch_expired", "message": "expired"}})
+        self.assertFalse(result.ok)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+录制回放测试
+测试服务商流量的录制、回放和加速回放
+"""
+
+import sys
+import os
+import gzip
+import subprocess
+import textwrap
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目根目录和基准测试目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from fake_provider_server import FakeProviderServer, FakeProviderConfig, LatencyModel
+from src.config import CustomOpenAIClient, config
+from src.analyzers.tavily_analyzer import TavilyAnalyzer
+from src.analyzers.urlAnalyzer import URLAnalyzer
+from src.utils.ttlCache import TTLCache
+from src.utils.cassette import use_cassette, record_call, CassetteMissError
+
+
+class TestCassette(unittest.TestCase):
+    """录制回放测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "run.jsonl.gz")
+        self.server = FakeProviderServer(FakeProviderConfig(latency=LatencyModel.parse("fixed:0.05"))).start()
+
+    def tearDown(self):
+        """测试后清理"""
+        self.server.stop()
+        self.tmpdir.cleanup()
+
+    def _chat(self, prompt: str, base_url: str = None) -> str:
+        client = CustomOpenAIClient(api_key="fake", base_url=f"{base_url or self.server.url}/v1")
+        response = client.chat.completions.create(model="gpt-4.1-mini", messages=[{"role": "user", "content": prompt}])
+        return response.choices[0].message.content
+
+    def test_record_then_replay_offline(self):
+        """测试录制后可以在服务器关闭时回放"""
+        base_url = self.server.url
+        page_url = f"{base_url}/pages/3"
+        with use_cassette(self.path, mode="record"):
+            recorded_answer = self._chat("分析论坛内容")
+            recorded_page = URLAnalyzer().fetch_url_content(page_url)
+        self.server.stop()
+        self.server = FakeProviderServer().start()  # 保证tearDown可以正常关闭
+
+        with use_cassette(self.path, mode="replay") as cassette:
+            replay_answer = self._chat("分析论坛内容", base_url=base_url)
+            replay_page = URLAnalyzer().fetch_url_content(page_url)
+            self.assertEqual(cassette.stats["calls"], 2)
+
+        self.assertEqual(replay_answer, recorded_answer)
+        self.assertEqual(replay_page, recorded_page)
+        self.assertIn("模拟页面 3", replay_page)
+
+    def test_env_recording_survives_exit(self):
+        """测试通过环境变量录制时，进程退出时关闭录制文件，文件完整且可以回放"""
+        root = os.path.join(os.path.dirname(__file__), '..')
+        script = textwrap.dedent("""
+            import sys
+            sys.path.insert(0, sys.argv[1])
+            from src.utils.cassette import record_call
+            for i in range(20):
+                record_call("tavily", {"op": "search", "query": f"q{i}"}, lambda i=i: {"results": [i]})
+        """)
+        env = dict(os.environ, PROVIDER_CASSETTE_MODE="record", PROVIDER_CASSETTE_PATH=self.path)
+        subprocess.run([sys.executable, "-c", script, root], env=env, check=True, timeout=60)
+
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 20)
+        # 所有记录在同一个gzip成员中压缩
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read().count(b"\x1f\x8b\x08"), 1)
+        with use_cassette(self.path, mode="replay"):
+            for i in range(20):
+                result = record_call("tavily", {"op": "search", "query": f"q{i}"}, lambda: None)
+                self.assertEqual(result, {"results": [i]})
+
+    def test_search_options_are_recorded_separately(self):
+        """测试同一查询的精简搜索和完整搜索分别录制和回放"""
+        def analyzer():
+            with mock.patch.dict(os.environ, {"TAVILY_API_KEY": "tvly-fake-key"}):
+                return TavilyAnalyzer(cache=TTLCache("tavily", max_entries=0, ttl=0))
+
+        with mock.patch.object(config, "tavily_base_url", self.server.url):
+            with use_cassette(self.path, mode="record"):
+                analyzer().search("向量数据库", include_raw_content=True)
+                analyzer().search("向量数据库")
+            with use_cassette(self.path, mode="replay"):
+                lean = analyzer().search("向量数据库")
+                full = analyzer().search("向量数据库", include_raw_content=True)
+        self.assertIsNone(lean["results"][0]["raw_content"])
+        self.assertGreater(len(full["results"][0]["raw_content"]), 1000)
+
+    def test_replay_miss_raises(self):
+        """测试回放找不到记录时报错"""
+        with use_cassette(self.path, mode="record"):
+            record_call("tavily", {"op": "search", "query": "a"}, lambda: {"results": []})
+        with use_cassette(self.path, mode="replay"):
+            with self.assertRaises(CassetteMissError):
+                record_call("tavily", {"op": "search", "query": "b"}, lambda: None)
+
+    def test_recorded_errors_are_replayed(self):
+        """测试录制的异常在回放时重新抛出"""
+        def failing():
+            raise RuntimeError("服务不可用")
+
+        with use_cassette(self.path, mode="record"):
+            with self.assertRaises(RuntimeError):
+                record_call("gemini", {"prompt": "x"}, failing)
+        with use_cassette(self.path, mode="replay"):
+            with self.assertRaisesRegex(Exception, "服务不可用"):
+                record_call("gemini", {"prompt": "x"}, lambda: "不应调用")
+
+    def test_replay_speed(self):
+        """测试按录制速度回放和即时回放"""
+        with use_cassette(self.path, mode="record"):
+            self._chat("计时")
+
+        with use_cassette(self.path, mode="replay", speed=0):
+            start = time.perf_counter()
+            self._chat("计时")
+            instant = time.perf_counter() - start
+
+        with use_cassette(self.path, mode="replay", speed=1.0) as cassette:
+            start = time.perf_counter()
+            self._chat("计时")
+            realtime = time.perf_counter() - start
+            self.assertGreater(cassette.stats["replay_wait_seconds"], 0.04)
+
+        self.assertLess(instant, 0.05)
+        self.assertGreaterEqual(realtime, 0.04)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化检查点测试
+测试中断后从检查点继续、跳过已完成的条目和失败结果不被记录
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fake_provider_case import FakeProviderTestCase
+from src.core.checkpointStore import ItemStore, item_id, job_thread_id
+from src.core.multimodalAgent import run_custom_analysis, create_analysis_request
+from src.graph import workflow
+from src.graph.state import ContentType
+
+
+class TestCheckpoint(FakeProviderTestCase):
+    """持久化检查点测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "checkpoint.db")
+        self.requests = [
+            create_analysis_request("云计算降低了运维成本。", ContentType.TEXT, "技术"),
+            create_analysis_request("def add(a, b):\n    return a + b\n", ContentType.CODE, "Python"),
+        ]
+
+    def tearDown(self):
+        """测试后清理"""
+        self.tmpdir.cleanup()
+
+    def _chat_calls(self) -> int:
+        return self.server.snapshot().get("openai_chat", 0)
+
+    def test_resume_skips_completed_items(self):
+        """测试恢复时只分析新增的条目"""
+        streamed = []
+        run_custom_analysis(self.requests, checkpoint_path=self.path, result_sink=streamed.append)
+        first = self._chat_calls()
+        self.assertEqual(ItemStore(self.path).count(), 2)
+        self.assertEqual([r["content_type"] for r in streamed], [ContentType.TEXT, ContentType.CODE])
+
+        extra = create_analysis_request("分布式系统需要考虑一致性。", ContentType.TEXT)
+        result = run_custom_analysis(self.requests + [extra], checkpoint_path=self.path, resume=True)
+
+        self.assertEqual(len(result["analysis_results"]), 3)
+        self.assertEqual(result["analysis_results"][1]["content_type"], ContentType.CODE)
+        # 只新增一次条目分析和一次总结
+        self.assertEqual(self._chat_calls() - first, 2)
+
+    def test_resume_after_crash_in_summary(self):
+        """测试总结节点中断后从检查点继续，不重新执行分析节点；中断时条目完成记录的连接也会关闭"""
+        close = mock.patch.object(ItemStore, "close", autospec=True, side_effect=ItemStore.close)
+        with mock.patch.object(workflow, "summary_node", side_effect=RuntimeError("进程被终止")), close as closed:
+            with self.assertRaises(RuntimeError):
+                run_custom_analysis(self.requests, checkpoint_path=self.path)
+        closed.assert_called_once()
+        analysis_calls = self._chat_calls()
+        self.assertEqual(analysis_calls, 2)
+
+        result = run_custom_analysis(self.requests, checkpoint_path=self.path, resume=True)
+        self.assertTrue(result["final_summary"])
+        self.assertEqual(len(result["analysis_results"]), 2)
+        self.assertEqual(self._chat_calls() - analysis_calls, 1)
+
+    def test_failed_results_are_not_recorded(self):
+        """测试低置信度结果不会被记录，恢复时会重新分析"""
+        store = ItemStore(self.path)
+        request = self.requests[0]
+        self.assertFalse(store.save(request, {"content_type": ContentType.TEXT, "confidence": 0.3}))
+        self.assertTrue(store.save(request, {"content_type": ContentType.TEXT, "confidence": 0.8}))
+        self.assertEqual(store.get(request)["content_type"], ContentType.TEXT)
+        self.assertEqual(ItemStore(self.path, reuse=False).load(self.requests), {})
+        self.assertEqual(item_id(request), item_id(dict(request)))
+        self.assertNotEqual(job_thread_id(self.requests), job_thread_id(self.requests[:1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+代码分块分析测试
+测试按语法边界切分代码、各代码块并行分析后汇总，以及按块内容哈希缓存分析结果
+"""
+
+import sys
+import os
+import time
+import unittest
+from unittest import mock
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fake_provider_case import FakeProviderTestCase
+from src.analyzers import codeAnalyzer
+from src.analyzers.codeAnalyzer import CodeAnalyzer
+from src.analyzers.codeChunker import split_code
+from src.utils.ttlCache import TTLCache
+
+
+def python_module(functions: int = 8, body_lines: int = 12, marker: str = "", grow: int = 0) -> str:
+    """生成包含多个函数的Python模块，marker和grow修改第4个函数（加注释、加长grow行）"""
+    parts = ["import os\nimport sys\n"]
+    for i in range(functions):
+        lines = body_lines + (grow if i == 3 else 0)
+        body = "\n".join(f"    value_{j} = {i} * {j}  # 计算第{j}项" for j in range(lines))
+        extra = f"    # {marker}\n" if marker and i == 3 else ""
+        parts.append(f"def function_{i}(x):\n    \"\"\"函数{i}\"\"\"\n{extra}{body}\n    return x\n")
+    return "\n\n".join(parts)
+
+
+class TestCodeChunker(unittest.TestCase):
+    """代码切分测试类"""
+
+    def test_python_splits_on_definitions(self):
+        """测试Python代码按顶层函数切分，导入语句单独成块"""
+        chunks = split_code(python_module(4), "python", max_chars=2000, min_chars=0)
+        self.assertEqual([c.name for c in chunks], ["module", "function_0", "function_1", "function_2", "function_3"])
+        self.assertTrue(chunks[1].text.startswith("def function_0"))
+        self.assertEqual(chunks[1].start_line, 5)
+
+    def test_large_class_splits_by_method(self):
+        """测试超过块大小的类按方法切分，仍然过大的方法按行切分"""
+        methods = "\n".join(
+            f"    @property\n    def method_{i}(self):\n" + "\n".join(f"        a = {j}" for j in range(20 if i else 200))
+            for i in range(3)
+        )
+        code = f"class Service:\n    \"\"\"服务\"\"\"\n    limit = 3\n\n{methods}\n"
+        chunks = split_code(code, "python", max_chars=600, min_chars=0)
+        names = [c.name for c in chunks]
+        self.assertEqual(names[0], "Service")
+        self.assertIn("Service.method_0#1", names)
+        self.assertIn("Service.method_1", names)
+        self.assertTrue(all(len(c.text) <= 600 for c in chunks))
+        # 装饰器与方法在同一个块中
+        self.assertTrue(chunks[names.index("Service.method_1")].text.lstrip().startswith("@property"))
+
+    def test_brace_languages(self):
+        """测试花括号语言按顶层代码块切分，字符串和注释中的括号不影响切分"""
+        code = (
+            'import { a } from "b";\n\n'
+            "// 辅助函数 }\n"
+            "function foo(x) {\n"
+            '  if (x) { return "}"; }\n'
+            "  return `{`;\n"
+            "}\n"
+            "class Bar {\n"
+            "  /* { */ m() { return 1; }\n"
+            "}\n"
+        )
+        chunks = split_code(code, "javascript", max_chars=1000, min_chars=0)
+        self.assertEqual([c.name for c in chunks], ["module", "foo", "Bar"])
+        self.assertTrue(chunks[1].text.startswith("// 辅助函数"))
+        self.assertEqual((chunks[2].start_line, chunks[2].end_line), (8, 10))
+
+    def test_indent_languages_and_merging(self):
+        """测试其他语言按顶格定义切分，零散语句合并到相邻的块，函数保持独立"""
+        code = "require 'json'\nVERSION = 1\n" + "\n".join(f"def step_{i}\n  puts {i}\nend" for i in range(6))
+        separate = split_code(code, "ruby", max_chars=1000, min_chars=0)
+        self.assertEqual(len(separate), 7)
+        merged = split_code(code, "ruby", max_chars=1000)
+        self.assertEqual([c.name for c in merged], ["module, step_0"] + [f"step_{i}" for i in range(1, 6)])
+        self.assertTrue(merged[0].text.startswith("require 'json'"))
+
+    def test_growing_one_function_keeps_other_chunks(self):
+        """测试加长一个函数时其他块的边界和内容哈希不变"""
+        before = {c.digest("python") for c in split_code(python_module(40, body_lines=4), "python", max_chars=2000)}
+        after = {c.digest("python") for c in split_code(python_module(40, body_lines=4, grow=20), "python",
+                                                         max_chars=2000)}
+        self.assertEqual(len(after - before), 1)
+        self.assertEqual(len(before - after), 1)
+
+
+class TestChunkedCodeAnalysis(FakeProviderTestCase):
+    """代码分块分析测试类"""
+
+    provider_latency = "fixed:0.3"
+
+    def setUp(self):
+        """测试前准备"""
+        super().setUp()
+        self.patch_config(code_chunk_chars=1000, code_chunk_workers=8)
+        patcher = mock.patch.object(codeAnalyzer, "chunk_cache", TTLCache("code_chunk", max_entries=64, ttl=60))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.analyzer = CodeAnalyzer()
+
+    def _calls(self) -> int:
+        return self.server.snapshot().get("openai_chat", 0)
+
+    def test_small_code_uses_single_call(self):
+        """测试未超过块大小的代码仍然只调用一次模型"""
+        result = self.analyzer.analyze_code("def add(a, b):\n    return a + b\n", "python")
+        self.assertGreater(result["confidence"], 0.5)
+        self.assertNotIn("chunks", result["metadata"])
+        self.assertEqual(self._calls(), 1)
+
+    def test_chunks_run_in_parallel_and_reduce(self):
+        """测试各代码块并行分析，再汇总为一次文件级分析"""
+        code = python_module(8)
+        start = time.perf_counter()
+        result = self.analyzer.analyze_code(code, "python")
+        elapsed = time.perf_counter() - start
+
+        chunks = result["metadata"]["chunks"]
+        self.assertGreater(chunks["count"], 3)
+        self.assertEqual(chunks["cached"], 0)
+        self.assertEqual(chunks["failed"], 0)
+        self.assertGreater(result["confidence"], 0.5)
+        self.assertEqual(self._calls(), chunks["count"] + 1)
+        # 并行分析约0.3秒 + 汇总约0.3秒，串行需要1.5秒以上
+        self.assertLess(elapsed, 1.2)
+
+    def test_editing_one_function_reanalyzes_one_chunk(self):
+        """测试只修改一个函数时只重新分析该函数所在的块"""
+        first = self.analyzer.analyze_code(python_module(8), "python")
+        calls = self._calls()
+
+        second = self.analyzer.analyze_code(python_module(8, marker="修改过的函数"), "python")
+        count = second["metadata"]["chunks"]["count"]
+        self.assertEqual(count, first["metadata"]["chunks"]["count"])
+        self.assertEqual(second["metadata"]["chunks"]["cached"], count - 1)
+        # 一个块重新分析 + 一次汇总
+        self.assertEqual(self._calls() - calls, 2)
+
+    def test_growing_one_function_reanalyzes_one_chunk(self):
+        """测试一个函数变长时只有该函数所在的块缓存未命中"""
+        first = self.analyzer.analyze_code(python_module(8), "python")
+        calls = self._calls()
+
+        second = self.analyzer.analyze_code(python_module(8, grow=8), "python")
+        count = second["metadata"]["chunks"]["count"]
+        self.assertEqual(count, first["metadata"]["chunks"]["count"])
+        self.assertEqual(second["metadata"]["chunks"]["cached"], count - 1)
+        self.assertEqual(self._calls() - calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
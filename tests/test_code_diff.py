@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+差异模式代码分析测试
+测试统一差异格式的解析和应用、把修改映射到函数和类，以及只分析被修改的符号
+"""
+
+import sys
+import os
+import unittest
+from unittest import mock
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fake_provider_case import FakeProviderTestCase
+from src.analyzers import codeAnalyzer
+from src.analyzers.codeAnalyzer import CodeAnalyzer
+from src.analyzers.codeDiff import apply_hunks, collect_changes, diff_hunks, is_diff_request, parse_unified_diff
+from src.graph.state import ContentType
+from src.utils.singleFlight import request_key
+from src.utils.ttlCache import TTLCache
+
+OLD_CODE = '''import os
+
+
+class Store:
+    """存储"""
+
+    def get(self, key):
+        return self.items.get(key)
+
+    def put(self, key, value):
+        self.items[key] = value
+
+
+def legacy():
+    return 1
+
+
+def main():
+    print(Store().get("a"))
+'''
+
+NEW_CODE = '''import os
+import sys
+
+
+class Store:
+    """存储"""
+
+    def get(self, key):
+        if key is None:
+            raise KeyError(key)
+        return self.items.get(key)
+
+    def put(self, key, value):
+        self.items[key] = value
+
+
+def main():
+    print(Store().get("a"))
+
+
+def helper():
+    return 2
+'''
+
+GIT_DIFF = '''diff --git a/store.py b/store.py
+index 1111111..2222222 100644
+--- a/store.py
++++ b/store.py
+@@ -7,3 +7,5 @@ class Store:
+     def get(self, key):
++        if key is None:
++            raise KeyError(key)
+         return self.items.get(key)
+
+'''
+
+
+def python_module(functions: int, marker: str = "") -> str:
+    """生成包含多个函数的Python模块"""
+    parts = []
+    for i in range(functions):
+        extra = f"    # {marker}\n" if marker and i == 7 else ""
+        parts.append(f"def function_{i}(x):\n{extra}    if x > {i}:\n        return x - {i}\n    return x + {i}\n")
+    return "\n\n".join(parts)
+
+
+class TestCodeDiff(unittest.TestCase):
+    """代码差异测试类"""
+
+    def test_parse_and_apply(self):
+        """测试比较两个版本得到的差异可以应用回上一版本，git diff 的函数上下文被保留"""
+        hunks = diff_hunks(OLD_CODE, NEW_CODE)
+        self.assertEqual(apply_hunks(OLD_CODE, hunks), NEW_CODE)
+        self.assertEqual(diff_hunks(OLD_CODE, OLD_CODE), [])
+
+        git_hunks = parse_unified_diff(GIT_DIFF)
+        self.assertEqual(len(git_hunks), 1)
+        self.assertEqual((git_hunks[0].section, git_hunks[0].path), ("class Store:", "store.py"))
+        self.assertEqual(git_hunks[0].changed_lines(), ([8, 9], []))
+        self.assertIn("raise KeyError(key)", apply_hunks(OLD_CODE, git_hunks))
+        with self.assertRaises(ValueError):
+            apply_hunks(NEW_CODE, git_hunks)
+
+    def test_changes_map_to_symbols(self):
+        """测试修改映射到最内层的函数或方法，并识别新增、删除和模块级修改"""
+        changes, index, untouched = collect_changes(OLD_CODE, NEW_CODE, diff_hunks(OLD_CODE, NEW_CODE))
+        summary = {(c.name, c.status) for c in changes}
+        self.assertEqual(summary, {
+            ("Store.get", "modified"), ("helper", "added"), ("legacy", "removed"), ("module", "modified"),
+        })
+        get = next(c for c in changes if c.name == "Store.get")
+        self.assertEqual((get.start_line, get.end_line), (8, 11))
+        self.assertNotIn("put", get.new_text)
+        # Store.put 和 main 未修改；包含被修改方法的 Store 类不计入
+        self.assertEqual(untouched, 2)
+        self.assertEqual(index.language, "python")
+
+    def test_diff_requests_are_keyed_by_previous_version(self):
+        """测试差异模式的请求不会与其他上一版本的请求合并，也不进入微批处理"""
+        request = {"content": NEW_CODE, "content_type": ContentType.CODE, "context": "python",
+                   "previous_content": OLD_CODE}
+        plain = {"content": NEW_CODE, "content_type": ContentType.CODE, "context": "python"}
+        self.assertTrue(is_diff_request(request))
+        self.assertFalse(is_diff_request(plain))
+        self.assertTrue(is_diff_request({**plain, "content": GIT_DIFF}))
+        self.assertNotEqual(request_key(request), request_key(plain))
+
+
+class TestDiffAnalysis(FakeProviderTestCase):
+    """差异模式代码分析测试类"""
+
+    provider_latency = "fixed:0.05"
+
+    def setUp(self):
+        """测试前准备"""
+        super().setUp()
+        patcher = mock.patch.object(codeAnalyzer, "chunk_cache", TTLCache("code_chunk", max_entries=64, ttl=60))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.analyzer = CodeAnalyzer()
+
+    def _calls(self) -> int:
+        return self.server.snapshot().get("openai_chat", 0)
+
+    def test_cost_scales_with_change_size(self):
+        """测试大文件中只修改一个函数时只调用一次模型，提示词只包含该函数"""
+        old = python_module(3000)
+        new = python_module(3000, marker="新增的注释")
+        self.assertGreater(len(old), 100_000)
+
+        result = self.analyzer.analyze_code_diff(new, old, "python")
+        diff = result["metadata"]["diff"]
+        self.assertGreater(result["confidence"], 0.5)
+        self.assertEqual([c["name"] for c in diff["changes"]], ["function_7"])
+        self.assertEqual(diff["untouched"], 2999)
+        self.assertEqual(self._calls(), 1)
+
+        changes, _, _ = collect_changes(old, new, diff_hunks(old, new))
+        self.assertLess(len(self.analyzer.build_change_prompt(changes[0], "python")), 1000)
+
+        # 同样的修改再次提交时使用缓存
+        again = self.analyzer.analyze_code_diff(new, old, "python")
+        self.assertEqual(again["metadata"]["diff"]["cached"], 1)
+        self.assertEqual(self._calls(), 1)
+
+    def test_multiple_changes_are_reviewed_together(self):
+        """测试多处修改并行审查后汇总一次"""
+        result = self.analyzer.analyze_code_diff(NEW_CODE, OLD_CODE)
+        diff = result["metadata"]["diff"]
+        self.assertEqual(len(diff["changes"]), 4)
+        self.assertEqual((diff["added"], diff["removed"]), (7, 4))
+        self.assertEqual(self._calls(), 5)
+
+    def test_patch_without_previous_version(self):
+        """测试只提交补丁时按每段修改分析"""
+        result = self.analyzer.analyze_code_diff(GIT_DIFF)
+        diff = result["metadata"]["diff"]
+        self.assertEqual(diff["mode"], "patch")
+        self.assertEqual(diff["changes"][0]["name"], "class Store:")
+        self.assertEqual(self._calls(), 1)
+
+        with self.assertRaises(ValueError):
+            self.analyzer.analyze_code_diff(NEW_CODE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+代码结构索引测试
+测试基于词频的语言检测、符号表和行号范围、圈复杂度和嵌套深度，以及大文件的索引耗时和提示词长度
+"""
+
+import sys
+import os
+import time
+import unittest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.analyzers.codeAnalyzer import CodeAnalyzer
+from src.analyzers.codeIndex import detect_language, index_code
+from src.config import config
+
+PYTHON_CODE = '''import os
+from typing import List
+
+
+class Parser:
+    """解析器"""
+
+    def parse(self, items: List[str]) -> int:
+        total = 0
+        for item in items:
+            if item and not item.startswith("#"):
+                try:
+                    total += int(item)
+                except ValueError:
+                    continue
+            elif item == "end":
+                break
+        return total
+
+    @staticmethod
+    def empty():
+        return None
+
+
+def main():
+    print(Parser().parse(os.environ.get("ITEMS", "").split(",")))
+'''
+
+JAVA_CODE = '''package demo;
+import java.util.List;
+
+public class Service {
+    // 注释中的 } 和字符串中的 { 不影响范围
+    public int handle(List<String> items) throws Exception {
+        int count = 0;
+        for (String item : items) {
+            if (item != null && !item.isEmpty()) {
+                count++;
+            }
+        }
+        return "{".length() + count;
+    }
+
+    private static void log(String message)
+    {
+        System.out.println(message);
+    }
+}
+'''
+
+
+class TestCodeIndex(unittest.TestCase):
+    """代码结构索引测试类"""
+
+    def test_language_detection_uses_tokens(self):
+        """测试语言检测统计完整的词法单元，而不是子串"""
+        self.assertEqual(detect_language(PYTHON_CODE), "python")
+        self.assertEqual(detect_language(JAVA_CODE), "java")
+        # "function"、"letter"、"user" 中的 fn/let/use 不再算作Rust特征
+        self.assertEqual(detect_language("function userLetter(a) {\n  const x = a === 1;\n  return x;\n}\n"),
+                         "javascript")
+        self.assertEqual(detect_language('package main\nimport "fmt"\nfunc main() {\n  x := 1\n  fmt.Println(x)\n}\n'), "go")
+        self.assertEqual(detect_language("hello world"), "unknown")
+
+    def test_python_symbols_and_metrics(self):
+        """测试Python符号表、行号范围、圈复杂度和嵌套深度"""
+        index = index_code(PYTHON_CODE)
+        symbols = {s.name: s for s in index.symbols}
+        self.assertEqual(index.language, "python")
+        self.assertEqual([s.name for s in index.imports], ["os", "typing"])
+        self.assertEqual((symbols["Parser"].start_line, symbols["Parser"].end_line), (5, 22))
+        parse = symbols["Parser.parse"]
+        self.assertEqual(parse.kind, "method")
+        self.assertEqual((parse.start_line, parse.end_line), (8, 18))
+        # for + if + and + except + elif，嵌套为 for > if > try
+        self.assertEqual(parse.complexity, 6)
+        self.assertEqual(parse.depth, 3)
+        # 装饰器属于方法的范围
+        self.assertEqual(symbols["Parser.empty"].start_line, 20)
+        self.assertEqual(index.structure()["hotspots"], ["Parser.parse"])
+
+    def test_brace_language_symbols(self):
+        """测试花括号语言的符号范围和复杂度"""
+        index = index_code(JAVA_CODE, "java", measure=True)
+        symbols = {s.name: s for s in index.symbols}
+        self.assertEqual([s.name for s in index.imports], ["java.util.List"])
+        self.assertEqual((symbols["Service"].start_line, symbols["Service"].end_line), (4, 20))
+        handle = symbols["Service.handle"]
+        self.assertEqual((handle.start_line, handle.end_line), (6, 14))
+        self.assertEqual((handle.complexity, handle.depth), (4, 2))
+        # 花括号在下一行的方法
+        self.assertEqual((symbols["Service.log"].start_line, symbols["Service.log"].end_line), (16, 19))
+
+    def test_indent_language_symbols(self):
+        """测试按缩进划分的语言"""
+        code = "require 'json'\n\nclass Greeter\n  def greet(name)\n    if name\n      puts name\n    end\n  end\nend\n"
+        index = index_code(code, "ruby")
+        self.assertEqual(index.structure()["max_cyclomatic"], 2)
+        symbols = {s.name: s for s in index.symbols}
+        self.assertEqual((symbols["Greeter"].start_line, symbols["Greeter"].end_line), (3, 9))
+        greet = symbols["Greeter.greet"]
+        self.assertEqual((greet.start_line, greet.end_line, greet.complexity, greet.depth), (4, 8, 2, 1))
+
+    def test_large_files_are_fast(self):
+        """测试十万行文件的索引耗时：符号概览和按需统计的圈复杂度分别计时"""
+        python = PYTHON_CODE * 4000
+        java = JAVA_CODE * 5000
+        for code, language in ((python, "python"), (java, "java")):
+            self.assertGreaterEqual(code.count("\n"), 100_000)
+            start = time.perf_counter()
+            index = index_code(code, language)
+            outlined = time.perf_counter()
+            index.measure()
+            measured = time.perf_counter()
+            self.assertLess(outlined - start, 1.0, language)
+            self.assertLess(measured - outlined, 0.5, language)
+            self.assertGreater(len(index.functions), 5000)
+            self.assertEqual(index.structure()["max_cyclomatic"], 6 if language == "python" else 4)
+
+    def test_prompt_keeps_relevant_parts(self):
+        """测试大文件的提示词只包含符号概览和复杂度最高的函数"""
+        filler = "\n".join(f"def helper_{i}(x):\n    return x + {i}\n" for i in range(400))
+        code = PYTHON_CODE + "\n" + filler
+        self.assertGreater(len(code), config.code_chunk_chars)
+
+        prompt, language, structure = CodeAnalyzer().build_prompt(code)
+        self.assertEqual(language, "python")
+        self.assertEqual(structure["max_cyclomatic"], 6)
+        self.assertIn("L8-18 method Parser.parse", prompt)
+        self.assertIn("except ValueError:", prompt)
+        self.assertLess(len(prompt), config.code_chunk_chars + 6000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑工作流状态测试
+测试只追加的消息和元数据通道、紧凑的分析结果记录和内容存储
+"""
+
+import sys
+import os
+import unittest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fake_provider_case import FakeProviderTestCase
+from src.graph.state import AnalysisRecord, ContentType
+from src.graph.workflow import compile_multimodal_workflow
+from src.utils.contentStore import ContentStore, get_content_store
+
+
+def forum_result(post_count: int) -> dict:
+    """构造一个包含完整预处理数据的论坛分析结果"""
+    return {
+        "content_type": ContentType.FORUM,
+        "original_content": "论坛主题: 测试",
+        "analysis": "讨论内容分析",
+        "summary": "讨论摘要",
+        "key_points": ["要点"],
+        "confidence": 0.9,
+        "processed_data": {"structured_content": [{"index": i, "content": "帖子内容" * 50} for i in range(post_count)]},
+        "media_requests": [{"content": "https://example.com/a.png", "content_type": ContentType.IMAGE}],
+        "link_analyses": [],
+        "metadata": {"total_posts": post_count},
+    }
+
+
+class TestCompactState(FakeProviderTestCase):
+    """紧凑工作流状态测试类"""
+
+    def test_record_behaves_like_result_dict(self):
+        """测试紧凑记录与原来的字典结果用法一致"""
+        store = ContentStore()
+        record = store.compact(forum_result(100))
+
+        self.assertIsInstance(record, AnalysisRecord)
+        self.assertFalse(hasattr(record, "__dict__"))
+        self.assertEqual(record["summary"], "讨论摘要")
+        self.assertEqual(record.get("metadata", {})["total_posts"], 100)
+        self.assertNotIn("processed_data", record)
+        self.assertNotIn("media_requests", record)
+        self.assertEqual(dict(record), {**record})
+        self.assertEqual(len(store.get(record.payload)["structured_content"]), 100)
+
+        plain = store.compact({"content_type": "text", "original_content": "", "analysis": "",
+                               "summary": "", "key_points": [], "confidence": 0.3})
+        self.assertNotIn("metadata", plain)
+        self.assertEqual(plain.get("metadata", {}), {})
+        self.assertEqual(plain["content_type"], ContentType.TEXT)
+
+    def test_store_dedupes_and_evicts(self):
+        """测试相同内容只保存一份，超过容量时淘汰最久未使用的内容"""
+        store = ContentStore(max_bytes=1000)
+        first = store.put({"posts": ["a" * 100]})
+        self.assertEqual(store.put({"posts": ["a" * 100]}), first)
+        self.assertEqual(len(store), 1)
+
+        refs = [store.put({"posts": [os.urandom(300).hex()]}) for _ in range(5)]
+        self.assertLessEqual(store.stored_bytes, 1000)
+        self.assertNotIn(first, store)
+        self.assertIsNone(store.get(first))
+        self.assertIsNotNone(store.get(refs[-1]))
+
+    def test_workflow_appends_messages_and_metadata(self):
+        """测试节点只返回增量，消息和元数据在通道中累积"""
+        app = compile_multimodal_workflow()
+        state = app.invoke({
+            "analysis_requests": [{"content": "云计算降低了运维成本。", "content_type": ContentType.TEXT, "context": None}],
+            "analysis_results": [],
+            "final_summary": None,
+            "consolidated_key_points": [],
+            "current_step": "start",
+            "messages": ["开始"],
+            "metadata": {"custom_mode": True},
+        })
+
+        self.assertEqual(len(state["messages"]), 5)
+        self.assertEqual(state["messages"][0], "开始")
+        for key in ("custom_mode", "input_processed", "analysis_completed", "summary_completed", "output_generated"):
+            self.assertTrue(state["metadata"][key])
+        self.assertIsInstance(state["analysis_results"][0], AnalysisRecord)
+
+    def test_forum_payload_kept_out_of_state(self):
+        """测试论坛预处理数据保存在内容存储中，状态只保留引用"""
+        app = compile_multimodal_workflow(include_summary=False)
+        posts = [{"username": f"用户{i}", "content": {"text": f"第{i}楼：讨论地铁闸机常开门。", "images": [], "links": []}}
+                 for i in range(30)]
+        state = app.invoke({
+            "analysis_requests": [],
+            "forum_data": {"url": "https://forum.example.com/t/1", "timestamp": "", "topic_title": "闸机常开门",
+                           "total_posts": len(posts), "posts": posts},
+            "analysis_results": [],
+            "messages": [],
+            "metadata": {},
+        })
+
+        record = state["analysis_results"][0]
+        self.assertEqual(record["content_type"], ContentType.FORUM)
+        processed = get_content_store().get(record.payload)
+        self.assertEqual(len(processed["structured_content"]), 30)
+        self.assertEqual(processed["topic_info"]["title"], "闸机常开门")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟服务商服务器测试
+测试本地模拟服务器与框架客户端的接口兼容性
+"""
+
+import sys
+import os
+import random
+import unittest
+import requests
+
+# 添加项目根目录和基准测试目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from fake_provider_server import FakeProviderServer, FakeProviderConfig, LatencyModel
+from src.config import CustomOpenAIClient
+
+
+class TestFakeProviderServer(unittest.TestCase):
+    """模拟服务商服务器测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.server = FakeProviderServer(FakeProviderConfig(seed=1)).start()
+
+    def tearDown(self):
+        """测试后清理"""
+        self.server.stop()
+
+    def test_chat_completions_format(self):
+        """测试Chat Completions格式"""
+        client = CustomOpenAIClient(api_key="fake", base_url=f"{self.server.url}/v1")
+        response = client.chat.completions.create(
+            model="gpt-4.1-mini", messages=[{"role": "user", "content": "分析这段文本"}]
+        )
+        self.assertIn("模拟分析结果", response.choices[0].message.content)
+
+    def test_responses_format(self):
+        """测试Responses API格式"""
+        client = CustomOpenAIClient(api_key="fake", base_url=f"{self.server.url}/v1/responses")
+        response = client.chat.completions.create(
+            model="gpt-4.1-mini", messages=[{"role": "user", "content": "分析这段文本"}]
+        )
+        self.assertIn("模拟分析结果", response.choices[0].message.content)
+
+    def test_tavily_search_format(self):
+        """测试Tavily搜索格式"""
+        data = requests.post(
+            f"{self.server.url}/search", json={"query": "python", "max_results": 3, "include_answer": True}
+        ).json()
+        self.assertEqual(len(data["results"]), 3)
+        self.assertTrue(data["answer"])
+        self.assertNotIn("raw_content", data["results"][0])
+
+    def test_rate_limit_injection(self):
+        """测试429限流注入"""
+        self.server.stop()
+        self.server = FakeProviderServer(FakeProviderConfig(rate_limit_rate=1.0, retry_after=2)).start()
+        response = requests.post(f"{self.server.url}/v1/chat/completions", json={"messages": []})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "2")
+        self.assertEqual(self.server.snapshot()["rate_limited"], 1)
+
+    def test_latency_model_parse(self):
+        """测试延迟分布解析"""
+        model = LatencyModel.parse("uniform:0.1:0.2")
+        rng = random.Random(0)
+        for _ in range(20):
+            self.assertTrue(0.1 <= model.sample(rng) <= 0.2)
+        with self.assertRaises(ValueError):
+            LatencyModel.parse("pareto:1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+出站抓取调度测试
+使用本地HTTP服务器测试每个主机的并发上限和请求间隔、429/503时的暂停和重试，以及多个主机之间的轮转
+"""
+
+import sys
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.fetchScheduler import FetchScheduler, parse_retry_after
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """按预设的状态码序列响应，并记录每个请求的开始时间和同时处理的请求数"""
+
+    script = []
+    starts = []
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with ScriptedHandler.lock:
+            ScriptedHandler.starts.append(time.monotonic())
+            ScriptedHandler.active += 1
+            ScriptedHandler.peak = max(ScriptedHandler.peak, ScriptedHandler.active)
+            status, headers = ScriptedHandler.script.pop(0) if ScriptedHandler.script else (200, {})
+        try:
+            time.sleep(0.05)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+        finally:
+            with ScriptedHandler.lock:
+                ScriptedHandler.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestFetchScheduler(unittest.TestCase):
+    """出站抓取调度测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        ScriptedHandler.script = []
+        ScriptedHandler.starts = []
+        ScriptedHandler.active = ScriptedHandler.peak = 0
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+
+    def tearDown(self):
+        """测试后清理"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _fetch_all(self, scheduler: FetchScheduler, count: int):
+        threads = [threading.Thread(target=scheduler.request, args=("url", "GET", self.url), kwargs={"timeout": 5})
+                   for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_parse_retry_after(self):
+        """测试解析秒数和HTTP日期格式的 Retry-After"""
+        self.assertEqual(parse_retry_after("3"), 3.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("later"))
+        future = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))
+        self.assertAlmostEqual(parse_retry_after(future), 30, delta=2)
+
+    def test_per_host_limit_and_min_delay(self):
+        """测试同一主机的并发请求数不超过上限，相邻请求的开始时间至少间隔 min_delay"""
+        self._fetch_all(FetchScheduler(per_host=2, min_delay=0), 8)
+        self.assertEqual(len(ScriptedHandler.starts), 8)
+        self.assertLessEqual(ScriptedHandler.peak, 2)
+
+        ScriptedHandler.starts = []
+        self._fetch_all(FetchScheduler(per_host=4, min_delay=0.1), 4)
+        gaps = [b - a for a, b in zip(ScriptedHandler.starts, ScriptedHandler.starts[1:])]
+        self.assertGreaterEqual(min(gaps), 0.09)
+
+    def test_retry_after_is_honored(self):
+        """测试429响应按 Retry-After 暂停该主机后重试成功"""
+        ScriptedHandler.script = [(429, {"Retry-After": "0.3"})]
+        scheduler = FetchScheduler(per_host=2, min_delay=0)
+        response = scheduler.request("url", "GET", self.url, timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ScriptedHandler.starts), 2)
+        self.assertGreaterEqual(ScriptedHandler.starts[1] - ScriptedHandler.starts[0], 0.3)
+
+    def test_exponential_backoff_and_retry_limit(self):
+        """测试没有 Retry-After 时指数退避，重试次数用完后返回限流响应"""
+        ScriptedHandler.script = [(503, {})] * 3
+        scheduler = FetchScheduler(per_host=1, min_delay=0, max_retries=2, backoff_base=0.1)
+        response = scheduler.request("url", "GET", self.url, timeout=5)
+        self.assertEqual(response.status_code, 503)
+        starts = ScriptedHandler.starts
+        self.assertEqual(len(starts), 3)
+        self.assertGreaterEqual(starts[1] - starts[0], 0.1)
+        self.assertGreaterEqual(starts[2] - starts[1], 0.2)
+
+        # 成功后退避时间复位
+        self.assertEqual(scheduler.request("url", "GET", self.url, timeout=5).status_code, 200)
+        self.assertEqual(scheduler._hosts[f"127.0.0.1:{self.httpd.server_address[1]}"].backoff, 0.0)
+
+    def test_long_retry_after_is_not_retried(self):
+        """测试 Retry-After 超过上限时不再重试"""
+        ScriptedHandler.script = [(429, {"Retry-After": "120"})]
+        scheduler = FetchScheduler(per_host=1, min_delay=0, max_backoff=1)
+        response = scheduler.request("url", "GET", self.url, timeout=5)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(ScriptedHandler.starts), 1)
+
+    def test_stream_holds_slot_until_body_is_read(self):
+        """测试流式请求在读完响应体之前一直占用名额，同一主机的下一个请求等它读完才开始"""
+        scheduler = FetchScheduler(per_host=1, min_delay=0)
+        done = []
+
+        def read_slowly():
+            with scheduler.stream("url", "GET", self.url, timeout=5) as response:
+                time.sleep(0.3)
+                body = response.raw.read()
+                done.append(time.monotonic())
+            self.assertEqual(body, b"ok")
+
+        reader = threading.Thread(target=read_slowly)
+        reader.start()
+        time.sleep(0.1)
+        self.assertEqual(scheduler.request("url", "GET", self.url, timeout=5).status_code, 200)
+        reader.join()
+        self.assertEqual(len(ScriptedHandler.starts), 2)
+        self.assertGreaterEqual(ScriptedHandler.starts[1], done[0])
+        self.assertEqual(scheduler._active, 0)
+
+    def test_hosts_take_turns(self):
+        """测试名额按主机轮转分配，一个主机排队的请求不会让另一个主机一直等待"""
+        scheduler = FetchScheduler(per_host=4, max_connections=1, min_delay=0)
+        order = []
+        lock = threading.Lock()
+
+        def take(url: str):
+            with scheduler.slot(url) as ticket:
+                with lock:
+                    order.append(ticket.host)
+                time.sleep(0.02)
+                ticket.status = 200
+
+        # 先占住唯一的名额，让两个主机的请求都进入等待
+        with scheduler.slot("http://busy.test/"):
+            threads = [threading.Thread(target=take, args=("http://a.test/",)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.1)
+            late = [threading.Thread(target=take, args=("http://b.test/",)) for _ in range(2)]
+            for thread in late:
+                thread.start()
+            time.sleep(0.1)
+        for thread in threads + late:
+            thread.join()
+        self.assertEqual(len(order), 6)
+        # b.test 的请求不必等 a.test 的全部请求完成
+        self.assertLess(order.index("b.test"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
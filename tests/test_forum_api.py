@@ -15,7 +15,7 @@ import unittest
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from src.utils.forum_data_adapter import ForumDataAdapter
+from src.utils.forumDataAdapter import ForumDataAdapter
 
 
 class TestForumAPI(unittest.TestCase):
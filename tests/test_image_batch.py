@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多图批量分析测试
+测试按图片数和数据量分批、批量响应按图片拆分、解析失败时逐张分析，
+以及分析节点把多张图片打包进共享的阿里百炼调用
+"""
+
+import sys
+import os
+import json
+import functools
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录和基准测试目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import dashscope
+
+from fake_provider_server import FakeProviderServer, FakeProviderConfig, LatencyModel
+from src.analyzers.imageAnalyzer import ImageAnalyzer
+from src.analyzers.imageProbe import ImageProbe
+from src.analyzers.providerResult import ProviderResult
+from src.config import config
+from src.core.multimodalAgent import create_analysis_request, run_custom_analysis
+from src.graph.state import ContentType
+from src.utils import fetchScheduler
+from src.utils.fetchScheduler import FetchScheduler
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """不输出访问日志的静态文件处理器"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CannedImageAnalyzer(ImageAnalyzer):
+    """不下载图片、按预设响应返回的图片分析器"""
+
+    def __init__(self, batch_response: str):
+        super().__init__()
+        self.batch_response = batch_response
+        self.calls = []
+
+    def probe(self, image_url: str) -> ImageProbe:
+        return ImageProbe(image_url)
+
+    def download_image(self, image_url: str, probe: ImageProbe = None):
+        return None if "missing" in image_url else f"data:image/jpeg;base64,{image_url[-1]}"
+
+    def callAlibaba(self, prompt: str, image_data=None) -> ProviderResult:
+        self.calls.append(image_data)
+        if isinstance(image_data, list):
+            return ProviderResult.success("alibaba", self.batch_response)
+        return ProviderResult.success("alibaba", f"单张分析：{image_data}")
+
+
+class TestImageBatch(unittest.TestCase):
+    """多图批量分析测试类"""
+
+    def test_plan_batches(self):
+        """测试按图片数和数据总量分批，超过总量的单张图片单独成批"""
+        analyzer = ImageAnalyzer()
+        self.assertEqual(analyzer.plan_batches([10] * 10, batch_size=4, max_bytes=1000),
+                         [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+        self.assertEqual(analyzer.plan_batches([400, 400, 5000, 300], batch_size=4, max_bytes=1000),
+                         [[0, 1], [2], [3]])
+
+    def test_batched_response_is_split_per_image(self):
+        """测试一次调用分析多张图片，缺失的图片逐张分析"""
+        payload = {
+            "item_1": {"analysis": "第一张截图显示了错误日志。", "key_points": ["错误日志"]},
+            "item_3": {"analysis": "第三张截图显示了修复后的界面。"},
+        }
+        analyzer = CannedImageAnalyzer("```json\n" + json.dumps(payload, ensure_ascii=False) + "\n```")
+        urls = ["https://img.example.com/1", "https://img.example.com/missing", "https://img.example.com/3"]
+        with mock.patch.object(config, "image_batch_size", 4):
+            results = analyzer.analyze_images(urls)
+
+        # 一次批量调用 + 缺失的第二张单独调用一次
+        self.assertEqual(len(analyzer.calls), 2)
+        self.assertEqual(analyzer.calls[0], ["data:image/jpeg;base64,1", urls[1], "data:image/jpeg;base64,3"])
+        self.assertEqual([r["original_content"] for r in results], urls)
+        self.assertEqual(results[0]["key_points"], ["错误日志"])
+        self.assertEqual(results[0]["metadata"]["analyzer"], "image_batch")
+        self.assertEqual(results[2]["metadata"]["batch_size"], 3)
+        self.assertNotIn("analyzer", results[1]["metadata"])
+        self.assertFalse(results[1]["metadata"]["downloaded"])
+
+    def test_unparsable_response_falls_back(self):
+        """测试批量响应不是JSON时逐张分析"""
+        analyzer = CannedImageAnalyzer("抱歉，我无法按要求输出JSON。")
+        with mock.patch.object(config, "image_batch_size", 2):
+            results = analyzer.analyze_images([f"https://img.example.com/{i}" for i in range(4)])
+        # 两次批量调用 + 四次逐张调用
+        self.assertEqual(len(analyzer.calls), 6)
+        self.assertTrue(all(r["confidence"] == 0.7 for r in results))
+
+
+class TestImageBatchWorkflow(unittest.TestCase):
+    """分析节点的多图批量分析测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for i in range(6):
+            with open(os.path.join(self.tmp.name, f"shot{i}.png"), "wb") as f:
+                f.write(bytes([i]) * 64)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=self.tmp.name))
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+        self.server = FakeProviderServer(FakeProviderConfig(latency=LatencyModel.parse("fixed:0.05"))).start()
+        for target, name, value in ((fetchScheduler, "_scheduler", FetchScheduler(min_delay=0)),
+                                    (dashscope, "base_http_api_url", f"{self.server.url}/api/v1"),
+                                    (config, "alibaba_api_key", "fake-alibaba-key"),
+                                    (config, "openai_base_url", f"{self.server.url}/v1"),
+                                    (config, "openai_api_keys", ["fake-openai-key"]),
+                                    (config, "image_batch_size", 4)):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """测试后清理"""
+        self.server.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_images_share_calls(self):
+        """测试6张图片只需要2次阿里百炼调用"""
+        requests = [create_analysis_request(f"{self.base}/shot{i}.png", ContentType.IMAGE) for i in range(6)]
+        result = run_custom_analysis(requests)
+
+        images = [r for r in result["analysis_results"] if r["content_type"] == ContentType.IMAGE]
+        self.assertEqual(len(images), 6)
+        self.assertEqual({r["metadata"]["analyzer"] for r in images}, {"image_batch"})
+        self.assertTrue(all(r["metadata"]["downloaded"] for r in images))
+        self.assertEqual(self.server.snapshot().get("dashscope"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
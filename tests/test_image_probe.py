@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片探测测试
+使用支持Range请求的本地HTTP服务器测试：表情和头像按URL模式跳过且不发送请求、
+只读取文件开头解析尺寸并跳过过小的图片、超过字节上限的图片缩小为缩略图
+"""
+
+import sys
+import os
+import base64
+import io
+import struct
+import zlib
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image
+
+from src.analyzers.imageAnalyzer import ImageAnalyzer
+from src.analyzers.imageProbe import decorative_reason, image_header, probe_image, shrink_image
+from src.analyzers.providerResult import ProviderResult
+from src.config import config
+from src.utils import fetchScheduler
+from src.utils.fetchScheduler import FetchScheduler
+
+
+def png_header(width: int, height: int) -> bytes:
+    """只有文件头的PNG，声明的尺寸可以任意大而不占用内存"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"")) + chunk(b"IEND", b"")
+
+
+def encode(image: Image.Image, format: str, **kwargs) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **kwargs)
+    return buffer.getvalue()
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """支持 Range 请求的静态文件处理器，记录每个请求发送的字节数"""
+
+    root = ""
+    ranges = True
+    sent = []
+
+    def do_GET(self):
+        path = os.path.join(RangeHandler.root, self.path.lstrip("/"))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        header = self.headers.get("Range")
+        if header and RangeHandler.ranges:
+            start, _, end = header.split("=", 1)[1].partition("-")
+            body = data[int(start):int(end) + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{int(start) + len(body) - 1}/{len(data)}")
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header("Content-Type", "image/png" if path.endswith(".png") else "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        # 先记录再发送，客户端读完响应时记录一定已经存在
+        RangeHandler.sent.append((self.path, len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestImageProbe(unittest.TestCase):
+    """图片探测测试类"""
+
+    @classmethod
+    def setUpClass(cls):
+        """生成测试图片"""
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.tiny = encode(Image.new("RGB", (16, 16), "red"), "PNG")
+        # 随机像素几乎无法压缩，得到几MB的大图
+        cls.large = encode(Image.frombytes("RGB", (1600, 1200), os.urandom(1600 * 1200 * 3)), "JPEG", quality=95)
+        cls.photo = encode(Image.new("RGB", (400, 300), "blue"), "PNG")
+        cls.bomb = png_header(30000, 30000)
+        for name, data in (("tiny.png", cls.tiny), ("large.jpg", cls.large), ("photo.png", cls.photo),
+                           ("bomb.png", cls.bomb)):
+            with open(os.path.join(cls.tmp.name, name), "wb") as f:
+                f.write(data)
+
+    @classmethod
+    def tearDownClass(cls):
+        """删除测试图片"""
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        """测试前准备"""
+        RangeHandler.root = self.tmp.name
+        RangeHandler.ranges = True
+        RangeHandler.sent = []
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        patcher = mock.patch.object(fetchScheduler, "_scheduler", FetchScheduler(min_delay=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """测试后清理"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_decorative_patterns(self):
+        """测试表情、头像、图标和徽章按URL模式识别"""
+        decorative = [
+            "https://linux.do/images/emoji/twitter/smile.png?v=12",
+            "https://emoji.discourse-cdn.com/twitter/heart.png",
+            "https://linux.do/user_avatar/linux.do/alice/48/123_2.png",
+            "https://linux.do/letter_avatar_proxy/v4/letter/a/8e7dd6/48.png",
+            "https://www.gravatar.com/avatar/abc?s=80",
+            "https://img.shields.io/badge/build-passing-green.svg",
+            "https://example.com/favicon.ico",
+        ]
+        content = [
+            "https://linux.do/uploads/default/original/3X/a/b/screenshot.png",
+            "https://cdn.example.com/posts/2024/diagram.jpg",
+        ]
+        for url in decorative:
+            self.assertIsNotNone(decorative_reason(url), url)
+        for url in content:
+            self.assertIsNone(decorative_reason(url), url)
+
+        probe = probe_image(self.base + "/images/emoji/twitter/smile.png")
+        self.assertIsNotNone(probe.skip_reason)
+        self.assertEqual(RangeHandler.sent, [])
+
+    def test_tiny_image_is_skipped_without_model_call(self):
+        """测试只读取文件开头就能识别过小的图片，不下载也不调用模型"""
+        analyzer = ImageAnalyzer()
+        with mock.patch.object(analyzer, "callAlibaba") as call:
+            result = analyzer.analyze_image(self.base + "/tiny.png")
+        call.assert_not_called()
+        self.assertEqual(result["metadata"]["analyzer"], "image_probe")
+        self.assertEqual((result["metadata"]["width"], result["metadata"]["height"]), (16, 16))
+        self.assertEqual(result["confidence"], 0.0)
+        self.assertEqual(len(RangeHandler.sent), 1)
+
+    def test_probe_reads_only_the_header(self):
+        """测试探测只传输开头的字节，但能得到格式、尺寸和文件总大小"""
+        probe = probe_image(self.base + "/large.jpg", head_bytes=4096)
+        self.assertIsNone(probe.skip_reason)
+        self.assertEqual((probe.format, probe.width, probe.height), ("JPEG", 1600, 1200))
+        self.assertEqual(probe.size, len(self.large))
+        self.assertFalse(probe.complete)
+        self.assertEqual(RangeHandler.sent, [("/large.jpg", 4096)])
+
+    def test_oversized_image_is_thumbnailed(self):
+        """测试超过字节上限的图片缩小后再发送给模型"""
+        self.assertGreater(len(self.large), 1024 * 1024)
+        analyzer = ImageAnalyzer()
+        url = self.base + "/large.jpg"
+        with mock.patch.object(config, "image_max_kb", 200), mock.patch.object(config, "image_max_side", 1024):
+            data_uri = analyzer.download_image(url, analyzer.probe(url))
+        header, _, payload = data_uri.partition(",")
+        self.assertEqual(header, "data:image/jpeg;base64")
+        data = base64.b64decode(payload)
+        self.assertLessEqual(len(data), 200 * 1024)
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertLessEqual(max(image.size), 1024)
+
+        data, mime_type = shrink_image(self.photo, max_bytes=1)
+        self.assertEqual(mime_type, "image/jpeg")
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(max(image.size), 256)
+
+    def test_small_files_are_not_downloaded_twice(self):
+        """测试服务器不支持Range时，探测读到的完整文件直接用于分析"""
+        RangeHandler.ranges = False
+        analyzer = ImageAnalyzer()
+        url = self.base + "/photo.png"
+        probe = analyzer.probe(url)
+        self.assertTrue(probe.complete)
+        data_uri = analyzer.download_image(url, probe)
+        self.assertTrue(data_uri.startswith("data:image/png;base64,"))
+        self.assertEqual(base64.b64decode(data_uri.partition(",")[2]), self.photo)
+        self.assertEqual(len(RangeHandler.sent), 1)
+
+    def test_decompression_bomb_is_skipped(self):
+        """测试文件头声明的像素数超过Pillow上限时跳过，不抛出异常也不影响同批的其他图片"""
+        self.assertEqual(image_header(self.bomb), (None, None))
+        probe = probe_image(self.base + "/bomb.png")
+        self.assertIn("像素数超过上限", probe.skip_reason)
+
+        analyzer = ImageAnalyzer()
+        urls = [self.base + "/bomb.png", self.base + "/photo.png"]
+        with mock.patch.object(analyzer, "callAlibaba",
+                               return_value=ProviderResult.success("alibaba", "一张蓝色的图片")) as call:
+            results = analyzer.analyze_images(urls)
+        self.assertEqual(results[0]["metadata"]["analyzer"], "image_probe")
+        self.assertEqual(results[1]["confidence"], 0.7)
+        call.assert_called_once()
+
+    def test_download_cap(self):
+        """测试超过下载上限的图片不下载"""
+        with mock.patch.object(config, "image_max_download_mb", 0.5):
+            self.assertIsNone(ImageAnalyzer().download_image(self.base + "/large.jpg"))
+
+
+if __name__ == "__main__":
+    unittest.main()
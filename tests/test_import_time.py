@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导入耗时测试
+检查入口模块的导入耗时预算，确认服务商SDK只在首次使用时导入
+"""
+
+import sys
+import os
+import unittest
+
+# 添加项目根目录和基准测试目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from import_time import IMPORT_BUDGETS, best_of
+
+
+class TestImportTime(unittest.TestCase):
+    """导入耗时测试类"""
+
+    def test_entry_modules_within_budget(self):
+        """测试入口模块的累计导入耗时不超过预算，且不加载服务商SDK"""
+        for module, budget in IMPORT_BUDGETS.items():
+            with self.subTest(module=module):
+                result = best_of(module, repeat=2)
+                self.assertEqual(result["loaded_lazy"], [])
+                self.assertLess(result["total_ms"], budget)
+
+    def test_lazy_exports(self):
+        """测试分析器包的延迟导出"""
+        import src.analyzers as analyzers
+        from src.analyzers import CodeAnalyzer
+        from src.analyzers.tavily_analyzer import get_tavily_analyzer, tavily_analyzer
+
+        self.assertIs(analyzers.CodeAnalyzer, CodeAnalyzer)
+        self.assertIn("MicroBatcher", dir(analyzers))
+        self.assertIs(tavily_analyzer, get_tavily_analyzer())
+        with self.assertRaises(AttributeError):
+            analyzers.MissingAnalyzer
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指标端点测试
+测试 /metrics 端点和各类指标的采集
+"""
+
+import sys
+import os
+import unittest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.api.server import app
+from src.utils import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """指标采集测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.client = app.test_client()
+
+    def test_metrics_endpoint_format(self):
+        """测试指标端点返回Prometheus文本格式"""
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("text/plain", response.content_type)
+        body = response.get_data(as_text=True)
+        self.assertIn("ld_http_request_duration_seconds", body)
+        self.assertIn("ld_llm_calls_total", body)
+
+    def test_route_latency_recorded(self):
+        """测试路由耗时按路由模板记录"""
+        self.client.get("/health")
+        body = self.client.get("/metrics").get_data(as_text=True)
+        self.assertIn('route="/health"', body)
+        self.assertIn('ld_http_requests_in_flight{route="/health"} 0.0', body)
+
+    def test_unmatched_route_label(self):
+        """测试未匹配的路径不会产生新的标签值"""
+        self.client.get("/no/such/path/12345")
+        body = self.client.get("/metrics").get_data(as_text=True)
+        self.assertIn('route="unmatched"', body)
+        self.assertNotIn("/no/such/path/12345", body)
+
+    def test_provider_and_cache_counters(self):
+        """测试模型调用、降级和缓存计数"""
+        metrics.record_provider_call("openai", "success", 0.2)
+        metrics.record_fallback("openai", "gemini")
+        metrics.record_cache("unit-test", hit=True)
+        metrics.record_cache("unit-test", hit=False)
+
+        body = self.client.get("/metrics").get_data(as_text=True)
+        self.assertIn('ld_llm_calls_total{outcome="success",provider="openai"}', body)
+        self.assertIn('ld_provider_fallbacks_total{from_provider="openai",to_provider="gemini"}', body)
+        self.assertIn('ld_cache_requests_total{cache="unit-test",result="hit"} 1.0', body)
+        self.assertIn('ld_cache_requests_total{cache="unit-test",result="miss"} 1.0', body)
+
+    def test_timed_node_keeps_signature(self):
+        """测试节点包装后保留原函数信息"""
+        def sample_node(state):
+            return {"current_step": "done"}
+
+        wrapped = metrics.timed_node("sample", sample_node)
+        self.assertEqual(wrapped.__name__, "sample_node")
+        self.assertEqual(wrapped({}), {"current_step": "done"})
+
+        body = self.client.get("/metrics").get_data(as_text=True)
+        self.assertIn('ld_graph_node_duration_seconds_count{node="sample"} 1.0', body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+微批处理测试
+测试小条目的分组、批量响应的解析拆分和解析失败时的退回
+"""
+
+import sys
+import os
+import json
+import unittest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.analyzers.microBatcher import MicroBatcher, parse_keyed_json
+from src.analyzers.providerResult import ProviderResult
+from src.core.multimodalAgent import create_analysis_request
+from src.graph.state import ContentType
+
+
+class CannedBatcher(MicroBatcher):
+    """返回预设响应的微批处理器"""
+
+    def __init__(self, response: str, **kwargs):
+        super().__init__(**kwargs)
+        self.response = response
+        self.prompts = []
+
+    def analyzeWithRouting(self, prompt: str, policy: str = None) -> ProviderResult:
+        self.prompts.append(prompt)
+        return ProviderResult.success("openai", self.response)
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """微批处理测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.requests = [
+            create_analysis_request("云计算降低了运维成本。", ContentType.TEXT, "技术"),
+            create_analysis_request("def add(a, b):\n    return a + b\n", ContentType.CODE, "Python"),
+            create_analysis_request("search: 边缘计算", ContentType.TEXT),
+            create_analysis_request("https://example.com", ContentType.URL),
+            create_analysis_request("长文本" * 1000, ContentType.TEXT),
+            create_analysis_request("分布式系统需要考虑一致性。", ContentType.TEXT),
+        ]
+
+    def test_plan_groups_small_items(self):
+        """测试只分组短文本和小代码块，并遵守每批条目数"""
+        batcher = MicroBatcher(batch_size=2, item_chars=500, batch_chars=4000)
+        self.assertEqual(batcher.plan(self.requests), [[0, 1]])
+        batcher = MicroBatcher(batch_size=8, item_chars=500, batch_chars=4000)
+        self.assertEqual(batcher.plan(self.requests), [[0, 1, 5]])
+
+    def test_split_keyed_response(self):
+        """测试把带代码块包裹的JSON响应拆分为各条目结果"""
+        payload = {
+            "item_1": {"analysis": "文本分析：成本下降，但迁移失败的风险需要评估。", "key_points": ["成本下降"]},
+            "item_2": {"analysis": "实现了两数相加。", "key_points": ["函数简单"]},
+            "item_3": {"analysis": "强调一致性。", "key_points": []},
+        }
+        batcher = CannedBatcher("```json\n" + json.dumps(payload, ensure_ascii=False) + "\n```")
+        results = batcher.analyze_requests(self.requests)
+
+        self.assertEqual(len(batcher.prompts), 1)
+        self.assertEqual(sorted(results), [0, 1, 5])
+        self.assertEqual(results[0]["key_points"], ["成本下降"])
+        self.assertEqual(results[0]["confidence"], 0.8)
+        self.assertEqual(results[1]["content_type"], ContentType.CODE)
+        self.assertEqual(results[1]["key_points"][0], "编程语言: python")
+        self.assertEqual(results[5]["metadata"]["batch_size"], 3)
+
+    def test_missing_items_fall_back(self):
+        """测试响应缺少条目或不是JSON时退回逐条分析"""
+        batcher = CannedBatcher(json.dumps({"item_1": {"analysis": "只有第一条"}}, ensure_ascii=False))
+        self.assertEqual(sorted(batcher.analyze_requests(self.requests)), [0])
+
+        batcher = CannedBatcher("抱歉，我无法按要求输出JSON。")
+        self.assertEqual(batcher.analyze_requests(self.requests), {})
+        self.assertIsNone(parse_keyed_json("[1, 2]"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务商路由器测试
+测试延迟感知的对冲请求、失败降级、路由策略和类型化的服务商结果
+"""
+
+import sys
+import os
+import time
+import unittest
+import requests
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.config import config, ProviderAPIError
+from src.analyzers.providerResult import ProviderResult, ErrorKind, classify_error
+from src.analyzers.providerRouter import (
+    ProviderRouter, LatencyTracker, MIN_SAMPLES, current_policy, routing_policy, validate_policy
+)
+
+
+class FakeProvider:
+    """按固定耗时返回结果的模拟服务商"""
+
+    def __init__(self, name: str, delay: float, answer: str = None, error: Exception = None):
+        self.name = name
+        self.delay = delay
+        self.answer = answer or f"{name}的分析结果"
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, prompt: str) -> ProviderResult:
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            return ProviderResult.failure(self.name, self.error)
+        return ProviderResult.success(self.name, self.answer)
+
+
+class TestProviderRouter(unittest.TestCase):
+    """服务商路由器测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.saved = (config.provider_hedge_min_delay, config.provider_hedge_max_delay)
+        config.provider_hedge_min_delay = 0.01
+        config.provider_hedge_max_delay = 0.3
+        self.tracker = LatencyTracker()
+        self.router = ProviderRouter(tracker=self.tracker, max_workers=4)
+
+    def tearDown(self):
+        """测试后清理"""
+        config.provider_hedge_min_delay, config.provider_hedge_max_delay = self.saved
+
+    def _warm(self, provider: str, latency: float):
+        for _ in range(MIN_SAMPLES):
+            self.tracker.observe(provider, latency)
+
+    def test_slow_primary_is_hedged(self):
+        """测试主服务商超过p95延迟后发送对冲请求并采用先返回的结果"""
+        self._warm("openai", 0.05)
+        openai, gemini = FakeProvider("openai", 1.0), FakeProvider("gemini", 0.05)
+
+        start = time.perf_counter()
+        result = self.router.route("提示词", [("openai", openai), ("gemini", gemini)], "balanced")
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(result.text, "gemini的分析结果")
+        self.assertEqual(gemini.calls, 1)
+        self.assertLess(elapsed, 0.5)
+
+    def test_fast_primary_is_not_hedged(self):
+        """测试主服务商按时返回时不发送对冲请求"""
+        self._warm("openai", 0.2)
+        openai, gemini = FakeProvider("openai", 0.02), FakeProvider("gemini", 0.0)
+        result = self.router.route("提示词", [("openai", openai), ("gemini", gemini)], "balanced")
+        self.assertEqual(result.text, "openai的分析结果")
+        self.assertEqual(gemini.calls, 0)
+
+    def test_queue_wait_does_not_trigger_hedge(self):
+        """测试对冲延迟从主服务商调用真正开始时计时，线程池排队的时间不会触发对冲"""
+        router = ProviderRouter(tracker=self.tracker, max_workers=1)
+        busy = router._executor.submit(time.sleep, 0.5)
+        openai, gemini = FakeProvider("openai", 0.1), FakeProvider("gemini", 0.0)
+
+        result = router.route("提示词", [("openai", openai), ("gemini", gemini)], "balanced")
+        busy.result()
+        self.assertEqual(result.text, "openai的分析结果")
+        self.assertEqual(gemini.calls, 0)
+
+    def test_cost_policy_waits_for_primary(self):
+        """测试cost策略不发送对冲请求"""
+        self._warm("openai", 0.01)
+        openai, gemini = FakeProvider("openai", 0.4), FakeProvider("gemini", 0.0)
+        result = self.router.route("提示词", [("openai", openai), ("gemini", gemini)], "cost")
+        self.assertEqual(result.text, "openai的分析结果")
+        self.assertEqual(gemini.calls, 0)
+
+    def test_failure_falls_back_immediately(self):
+        """测试主服务商失败后立即降级"""
+        openai = FakeProvider("openai", 0.0, error=ProviderAPIError("rate limited", status_code=429))
+        gemini = FakeProvider("gemini", 0.0)
+        result = self.router.route("提示词", [("openai", openai), ("gemini", gemini)], "cost")
+        self.assertEqual(result.text, "gemini的分析结果")
+
+        gemini.error = ValueError("Google API密钥未配置")
+        result = self.router.route("提示词", [("openai", openai), ("gemini", gemini)], "cost")
+        self.assertFalse(result.ok)
+        self.assertEqual(result.error_kind, ErrorKind.NOT_CONFIGURED)
+        self.assertEqual(result.message, "Gemini分析失败: Google API密钥未配置")
+
+    def test_answer_mentioning_failure_is_not_fallback(self):
+        """测试正常回答中出现"失败"二字不会触发降级"""
+        openai = FakeProvider("openai", 0.0, "该帖子讨论了部署失败的原因和解决办法")
+        gemini = FakeProvider("gemini", 0.0)
+        result = self.router.route("提示词", [("openai", openai), ("gemini", gemini)], "cost")
+        self.assertTrue(result.ok)
+        self.assertEqual(result.provider, "openai")
+        self.assertEqual(gemini.calls, 0)
+
+    def test_policy_context(self):
+        """测试按请求覆盖路由策略"""
+        with routing_policy("latency"):
+            self.assertEqual(current_policy(), "latency")
+        with routing_policy(None):
+            self.assertEqual(current_policy(), validate_policy(config.provider_routing_policy))
+        with self.assertRaises(ValueError):
+            validate_policy("fastest")
+
+
+class TestProviderResult(unittest.TestCase):
+    """服务商结果测试类"""
+
+    def test_classify_error(self):
+        """测试错误类型判断"""
+        self.assertEqual(classify_error(ProviderAPIError("x", status_code=429))[0], ErrorKind.RATE_LIMIT)
+        self.assertEqual(classify_error(ProviderAPIError("x", status_code=503))[0], ErrorKind.SERVER)
+        self.assertEqual(classify_error(ProviderAPIError("x", status_code=401))[0], ErrorKind.AUTH)
+        self.assertEqual(classify_error(ProviderAPIError("x", timeout=True))[0], ErrorKind.TIMEOUT)
+        self.assertEqual(classify_error(requests.exceptions.ConnectionError("x"))[0], ErrorKind.NETWORK)
+        self.assertEqual(classify_error(Exception("You exceeded your current quota"))[0], ErrorKind.RATE_LIMIT)
+
+    def test_retryable_and_empty(self):
+        """测试可重试判断和空结果"""
+        self.assertTrue(ProviderResult.failure("openai", ProviderAPIError("x", status_code=500)).retryable)
+        self.assertFalse(ProviderResult.failure("openai", ProviderAPIError("x", status_code=400)).retryable)
+        empty = ProviderResult.success("gemini", "  ")
+        self.assertFalse(empty.ok)
+        self.assertEqual(empty.error_kind, ErrorKind.EMPTY)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+仓库分析测试
+测试忽略规则、tar包输入、路径白名单、按目录逐层汇总，以及按内容哈希的增量缓存
+"""
+
+import sys
+import os
+import io
+import tarfile
+import tempfile
+import unittest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fake_provider_case import FakeProviderTestCase
+from src.analyzers.repoAnalyzer import IgnoreRules, RepoCache, RepositoryAnalyzer
+from src.config import config
+from src.graph.state import ContentType
+
+REPO_FILES = {
+    ".gitignore": "*.log\ngenerated/\n",
+    "README.md": "# demo\n",
+    "app/main.py": "from app.util import add\n\n\ndef main():\n    print(add(1, 2))\n",
+    "app/util.py": "def add(a, b):\n    if a > b:\n        return a + b\n    return b + a\n",
+    "app/api/handler.js": "function handle(req) {\n  if (req) { return 1; }\n  return 0;\n}\n",
+    "app/api/routes.js": "const routes = [1, 2];\nfunction route(r) {\n  return routes[r];\n}\n",
+    "lib/only.go": "package lib\n\nfunc Only() int {\n\treturn 1\n}\n",
+    "generated/models.py": "class Model:\n    pass\n",
+    "node_modules/pkg/index.js": "module.exports = 1;\n",
+    "debug.log": "log\n",
+    "lib/ext/.gitignore": "*.go\n!keep.go\n",
+    "lib/ext/drop.go": "package vendor\n",
+    "lib/ext/keep.go": "package vendor\n",
+}
+
+
+def write_repo(root: str, files=REPO_FILES):
+    """在目录中写入测试仓库"""
+    for path, text in files.items():
+        full = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+class TestRepositoryFiles(unittest.TestCase):
+    """仓库文件收集测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.realpath(self.tmp.name)
+        self.saved_roots = config.repo_allowed_roots
+        config.repo_allowed_roots = [self.root]
+        self.analyzer = RepositoryAnalyzer(cache=RepoCache())
+
+    def tearDown(self):
+        """测试后清理"""
+        config.repo_allowed_roots = self.saved_roots
+
+    def test_ignore_rules(self):
+        """测试.gitignore风格的规则：通配符、目录规则、锚定路径和取反"""
+        rules = IgnoreRules()
+        rules.add(["*.log", "build-*/", "/docs/*.py", "!keep.log"])
+        self.assertTrue(rules.ignored("a/b/app.log", False))
+        self.assertFalse(rules.ignored("keep.log", False))
+        self.assertTrue(rules.ignored("build-x", True))
+        self.assertFalse(rules.ignored("build-x", False))
+        self.assertTrue(rules.ignored("docs/conf.py", False))
+        self.assertFalse(rules.ignored("src/docs/conf.py", False))
+        self.assertTrue(rules.ignored("web/node_modules", True))
+
+    def test_directory_walk(self):
+        """测试遍历目录时应用默认规则、各级.gitignore，并跳过二进制文件"""
+        write_repo(self.root)
+        with open(os.path.join(self.root, "app", "blob.py"), "wb") as f:
+            f.write(b"\x00\x01binary")
+        files, stats = self.analyzer.collect_files(self.root)
+        self.assertEqual(sorted(f.path for f in files), [
+            "app/api/handler.js", "app/api/routes.js", "app/main.py", "app/util.py",
+            "lib/ext/keep.go", "lib/only.go",
+        ])
+        self.assertEqual(stats.binary, 1)
+        self.assertEqual(stats.ignored, 1)
+        self.assertEqual({f.path: f.language for f in files}["app/api/routes.js"], "javascript")
+
+    def test_tarball_is_read_in_memory(self):
+        """测试tar包输入：去掉共同的顶层目录，不解压到磁盘，忽略指向包外的成员"""
+        path = os.path.join(self.root, "repo.tar.gz")
+        with tarfile.open(path, "w:gz") as tar:
+            for name, text in list(REPO_FILES.items()) + [("../escape.py", "x = 1\n")]:
+                data = text.encode("utf-8")
+                info = tarfile.TarInfo(name if name.startswith("..") else f"demo-1.0/{name}")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        files, _ = self.analyzer.collect_files(self.analyzer.resolve_path(path))
+        self.assertEqual(sorted(f.path for f in files), sorted(
+            p for p in REPO_FILES if p.endswith((".py", ".js", ".go"))
+            and not p.startswith(("generated/", "node_modules/")) and p != "lib/ext/drop.go"
+        ))
+        self.assertEqual(sorted(os.listdir(self.root)), ["repo.tar.gz"])
+
+    def test_paths_outside_allowed_roots_are_rejected(self):
+        """测试只允许分析白名单根目录下的路径"""
+        with self.assertRaises(ValueError):
+            self.analyzer.resolve_path(os.path.dirname(self.root))
+        with self.assertRaises(ValueError):
+            self.analyzer.resolve_path(os.path.join(self.root, "..", os.path.basename(self.root) + "-other"))
+        with self.assertRaises(ValueError):
+            self.analyzer.resolve_path(os.path.join(self.root, "missing"))
+        self.assertEqual(self.analyzer.resolve_path(self.root), self.root)
+
+
+class TestRepositoryAnalysis(FakeProviderTestCase):
+    """仓库分析测试类"""
+
+    provider_latency = "fixed:0.05"
+
+    def setUp(self):
+        """测试前准备"""
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.join(os.path.realpath(self.tmp.name), "demo")
+        write_repo(self.root)
+        self.patch_config(repo_allowed_roots=[os.path.realpath(self.tmp.name)])
+        self.cache = RepoCache(os.path.join(self.tmp.name, "cache", "repo.db"))
+        self.addCleanup(self.cache.close)
+
+    def _calls(self) -> int:
+        return self.server.snapshot().get("openai_chat", 0)
+
+    def test_hierarchical_summary(self):
+        """测试文件分析后按目录逐层汇总为仓库总结"""
+        result = RepositoryAnalyzer(cache=self.cache).analyze_repository(self.root)
+        metadata = result["metadata"]
+        self.assertEqual(result["content_type"], ContentType.REPOSITORY)
+        self.assertGreater(result["confidence"], 0.5)
+        self.assertEqual((metadata["files"], metadata["analyzed"], metadata["cached"]), (6, 6, 0))
+        self.assertEqual(metadata["languages"], {"javascript": 2, "python": 2, "go": 2})
+        self.assertEqual(sorted(metadata["directories"]), ["app", "lib"])
+        # 6个文件 + app/api、app、lib 三个目录汇总 + 仓库总结；lib/ext 只有一个文件，直接沿用文件摘要
+        self.assertEqual(self._calls(), 10)
+
+    def test_changed_file_reanalyzes_only_its_ancestors(self):
+        """测试修改一个文件后只重新分析该文件、包含它的目录和仓库总结"""
+        RepositoryAnalyzer(cache=self.cache).analyze_repository(self.root)
+        calls = self._calls()
+
+        # 未修改时全部命中缓存
+        unchanged = RepositoryAnalyzer(cache=self.cache).analyze_repository(self.root)
+        self.assertEqual(unchanged["metadata"]["cached"], 6)
+        self.assertEqual(self._calls(), calls)
+
+        with open(os.path.join(self.root, "app", "api", "routes.js"), "a", encoding="utf-8") as f:
+            f.write("function extra() {\n  return 2;\n}\n")
+        result = RepositoryAnalyzer(cache=self.cache).analyze_repository(self.root)
+        self.assertEqual((result["metadata"]["analyzed"], result["metadata"]["cached"]), (1, 5))
+        # routes.js + app/api + app + 仓库总结；lib 的汇总命中缓存
+        self.assertEqual(self._calls() - calls, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式结果输出测试
+测试逐条刷新、分片轮转、汇总记录、枚举序列化和内存占用
+"""
+
+import sys
+import os
+import json
+import tempfile
+import tracemalloc
+import unittest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.graph.state import ContentType
+from src.utils.resultWriter import JsonlResultWriter, iter_records, json_default
+
+
+def make_result(index: int, confidence: float = 0.8) -> dict:
+    return {
+        "content_type": ContentType.TEXT,
+        "original_content": f"条目 {index}",
+        "analysis": "分析内容" * 20,
+        "summary": "摘要",
+        "key_points": ["要点"],
+        "confidence": confidence,
+        "metadata": {"provider": "openai"}
+    }
+
+
+class TestResultWriter(unittest.TestCase):
+    """流式结果输出测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "results.jsonl")
+
+    def tearDown(self):
+        """测试后清理"""
+        self.tmpdir.cleanup()
+
+    def test_records_are_flushed_as_written(self):
+        """测试每条记录写入后立即可读，不需要等到结束"""
+        writer = JsonlResultWriter(self.path)
+        writer.write(make_result(0))
+        writer.write(make_result(1, confidence=0.3))
+        records = list(iter_records([self.path]))
+        self.assertEqual([r["index"] for r in records], [0, 1])
+        self.assertEqual(records[0]["content_type"], "text")
+
+        writer.write_summary(final_summary="总结")
+        writer.close()
+        summary = list(iter_records(writer.paths))[-1]
+        self.assertEqual(summary, {"type": "summary", "total": 2, "successful": 1, "failed": 1, "final_summary": "总结"})
+
+    def test_rotation(self):
+        """测试按条数和大小轮转分片"""
+        with JsonlResultWriter(self.path, max_records=3) as writer:
+            for i in range(7):
+                writer.write(make_result(i))
+            writer.write_summary()
+        self.assertEqual([os.path.basename(p) for p in writer.paths],
+                         ["results-0000.jsonl", "results-0001.jsonl", "results-0002.jsonl"])
+        records = list(iter_records(writer.paths))
+        self.assertEqual([r["index"] for r in records[:-1]], list(range(7)))
+        self.assertEqual(records[-1]["type"], "summary")
+
+        line_size = len((json.dumps({"type": "result", "index": 0, **make_result(0)}, ensure_ascii=False,
+                                    default=json_default) + "\n").encode("utf-8"))
+        with JsonlResultWriter(os.path.join(self.tmpdir.name, "sized.jsonl"), max_bytes=line_size * 2 + 10) as writer:
+            for i in range(5):
+                writer.write(make_result(i))
+        self.assertEqual(len(writer.paths), 3)
+        self.assertTrue(all(os.path.getsize(p) <= line_size * 2 + 10 for p in writer.paths))
+
+    def test_memory_stays_flat(self):
+        """测试写入大量记录时内存不随条目数增长"""
+        def peak(count: int) -> int:
+            tracemalloc.start()
+            with JsonlResultWriter(os.path.join(self.tmpdir.name, f"{count}.jsonl"), max_records=5000) as writer:
+                for i in range(count):
+                    writer.write(make_result(i))
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return peak_bytes
+
+        small, large = peak(200), peak(20000)
+        self.assertLess(large, small * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求合并测试
+测试并发的相同请求只执行一次，以及批次内重复条目的去重
+"""
+
+import sys
+import os
+import threading
+import time
+import unittest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fake_provider_case import FakeProviderTestCase
+from src.api.server import app
+from src.core.multimodalAgent import run_custom_analysis, create_analysis_request
+from src.graph.state import ContentType
+from src.utils.singleFlight import SingleFlight, coalesce_key, normalize_content
+
+
+def run_concurrently(count: int, func):
+    """同时启动count个线程执行func，返回各线程的返回值或异常"""
+    outcomes = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            outcomes[i] = func()
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+class TestSingleFlight(FakeProviderTestCase):
+    """请求合并测试类"""
+
+    provider_latency = "fixed:0.3"
+
+    def test_concurrent_calls_share_one_execution(self):
+        """测试并发的相同调用只执行一次，异常同样传给所有等待者"""
+        flight = SingleFlight()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "结果"
+
+        outcomes = run_concurrently(8, lambda: flight.do("key", compute))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual({result for result, _ in outcomes}, {"结果"})
+        self.assertTrue(all(shared for _, shared in outcomes))
+        self.assertEqual(flight.in_flight(), 0)
+
+        # 计算完成后不缓存结果
+        self.assertEqual(flight.do("key", compute), ("结果", False))
+        self.assertEqual(len(calls), 2)
+
+        def fail():
+            time.sleep(0.2)
+            raise RuntimeError("服务商错误")
+
+        outcomes = run_concurrently(4, lambda: flight.do("error", fail))
+        self.assertTrue(all(isinstance(outcome, RuntimeError) for outcome in outcomes))
+
+    def test_keys_are_normalized(self):
+        """测试合并键忽略首尾空白、URL域名大小写和片段，但区分运行选项"""
+        self.assertEqual(normalize_content(" HTTPS://Example.COM/a?b=1#top ", ContentType.URL), "https://example.com/a?b=1")
+        url = create_analysis_request("https://example.com/a", ContentType.URL)
+        same = create_analysis_request("https://EXAMPLE.com/a#x", ContentType.URL)
+        self.assertEqual(coalesce_key([url]), coalesce_key([same]))
+        self.assertNotEqual(coalesce_key([url], routing_policy="cost"), coalesce_key([url], routing_policy="latency"))
+
+    def test_concurrent_api_requests_are_coalesced(self):
+        """测试并发POST相同内容到 /analyze 时只执行一次工作流"""
+        payload = {"content": "这个链接今天被大量转发。", "content_type": "text"}
+        outcomes = run_concurrently(6, lambda: app.test_client().post("/analyze", json=payload))
+
+        self.assertTrue(all(response.status_code == 200 for response in outcomes))
+        summaries = {response.get_json()["data"]["analysis"]["summary"] for response in outcomes}
+        self.assertEqual(len(summaries), 1)
+        # 一次条目分析 + 一次总结
+        self.assertEqual(self.server.snapshot()["openai_chat"], 2)
+
+    def test_duplicate_items_in_batch(self):
+        """测试批次内的重复条目只分析一次，结果仍与请求一一对应"""
+        requests = [
+            create_analysis_request("云计算降低了运维成本。", ContentType.TEXT),
+            create_analysis_request("分布式系统需要考虑一致性。", ContentType.TEXT),
+            create_analysis_request("  云计算降低了运维成本。\n", ContentType.TEXT),
+        ]
+        result = run_custom_analysis(requests)
+
+        results = result["analysis_results"]
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]["analysis"], results[2]["analysis"])
+        # 两次条目分析 + 一次总结
+        self.assertEqual(self.server.snapshot()["openai_chat"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+站点抓取测试
+使用本地静态HTTP服务器测试同站链接跟随、深度和页面数上限、经过抓取调度器后每个主机的并发上限、
+按规范化URL和正文哈希去重，以及各页面并行分析后汇总为站点总结
+"""
+
+import sys
+import os
+import functools
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fake_provider_case import FakeProviderTestCase
+from src.analyzers.siteCrawler import SiteCrawler, canonical_url
+from src.analyzers.urlAnalyzer import URLAnalyzer
+from src.utils import fetchScheduler
+from src.utils.fetchScheduler import FetchScheduler
+
+
+def html(title: str, body: str, links=()) -> str:
+    anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+    return f"<html><head><title>{title}</title></head><body><p>{body}</p>{anchors}</body></html>"
+
+
+SITE = {
+    "index.html": html("首页", "文档首页", ["guide/", "api.html", "api.html#section", "./copy.html",
+                                          "logo.png", "http://example.invalid/external.html", "mailto:a@b.c"]),
+    "guide/index.html": html("指南", "入门指南", ["../index.html", "step1.html", "step2.html"]),
+    "guide/step1.html": html("步骤一", "安装", ["deep.html"]),
+    "guide/step2.html": html("步骤二", "配置"),
+    "guide/deep.html": html("深层页面", "超过抓取深度"),
+    "api.html": html("接口", "接口说明"),
+    "copy.html": html("接口", "接口说明"),
+    "logo.png": "not an image",
+}
+
+
+class SlowHandler(SimpleHTTPRequestHandler):
+    """记录同时处理的请求数的静态文件处理器"""
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with SlowHandler.lock:
+            SlowHandler.active += 1
+            SlowHandler.peak = max(SlowHandler.peak, SlowHandler.active)
+        try:
+            time.sleep(0.1)
+            super().do_GET()
+        finally:
+            with SlowHandler.lock:
+                SlowHandler.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestSiteCrawler(unittest.TestCase):
+    """站点抓取测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for path, text in SITE.items():
+            full = os.path.join(self.tmp.name, path)
+            os.makedirs(os.path.dirname(full), exist_ok=True)
+            with open(full, "w", encoding="utf-8") as f:
+                f.write(text)
+        SlowHandler.active = SlowHandler.peak = 0
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(SlowHandler, directory=self.tmp.name))
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        # 每个主机最多2个并发请求，不设请求间隔
+        patcher = mock.patch.object(fetchScheduler, "_scheduler", FetchScheduler(per_host=2, min_delay=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """测试后清理"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_canonical_url(self):
+        """测试URL规范化"""
+        self.assertEqual(canonical_url("HTTP://Example.COM:80/a/./b/../c#x"), "http://example.com/a/c")
+        self.assertEqual(canonical_url("../x.html?q=1", "https://example.com/a/b/"), "https://example.com/a/x.html?q=1")
+        self.assertEqual(canonical_url("https://example.com"), "https://example.com/")
+        self.assertIsNone(canonical_url("mailto:a@b.c"))
+        self.assertIsNone(canonical_url("javascript:void(0)"))
+
+    def test_crawl_follows_same_site_links_within_depth(self):
+        """测试只跟随同站网页链接，按规范化URL和正文去重，超过深度的页面不抓取"""
+        result = SiteCrawler(max_depth=2, max_pages=20, workers=8).crawl(self.base + "/index.html")
+        urls = [page.url.replace(self.base, "") for page in result.pages]
+        self.assertEqual(urls, ["/index.html", "/guide/", "/api.html", "/guide/step1.html", "/guide/step2.html"])
+        self.assertEqual(result.duplicates, 1)
+        self.assertEqual(result.pages[2].aliases, [self.base + "/copy.html"])
+        self.assertEqual([page.depth for page in result.pages], [0, 1, 1, 2, 2])
+        # guide/deep.html 超过深度
+        self.assertEqual(result.skipped, 1)
+        self.assertEqual(result.failed, {})
+        self.assertLessEqual(SlowHandler.peak, 2)
+
+    def test_page_budget_and_failures(self):
+        """测试页面数上限，抓取失败的页面单独记录"""
+        os.remove(os.path.join(self.tmp.name, "api.html"))
+        result = SiteCrawler(max_depth=3, max_pages=3).crawl(self.base + "/")
+        self.assertEqual(len(result.pages), 3)
+        self.assertIn(self.base + "/api.html", result.failed)
+        self.assertGreater(result.skipped, 0)
+
+
+class TestSiteAnalysis(FakeProviderTestCase):
+    """站点分析测试类"""
+
+    provider_latency = "fixed:0.2"
+
+    def setUp(self):
+        """测试前准备"""
+        super().setUp()
+        self.patch_config(crawl_llm_concurrency=8)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for path, text in SITE.items():
+            full = os.path.join(self.tmp.name, path)
+            os.makedirs(os.path.dirname(full), exist_ok=True)
+            with open(full, "w", encoding="utf-8") as f:
+                f.write(text)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(SlowHandler, directory=self.tmp.name))
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        # 每个主机最多2个并发请求，不设请求间隔
+        patcher = mock.patch.object(fetchScheduler, "_scheduler", FetchScheduler(per_host=2, min_delay=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """测试后清理"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_pages_are_analyzed_in_parallel_and_summarized(self):
+        """测试各页面并行分析后汇总一次"""
+        start = time.perf_counter()
+        result = URLAnalyzer().crawl_site(self.base + "/index.html", max_depth=1)
+        elapsed = time.perf_counter() - start
+
+        metadata = result["metadata"]
+        self.assertEqual(metadata["analyzer"], "site_crawl")
+        self.assertEqual(len(metadata["pages"]), 3)
+        self.assertGreater(result["confidence"], 0.5)
+        self.assertEqual(self.server.snapshot().get("openai_chat", 0), 4)
+        # 页面分析并行约0.2秒 + 汇总约0.2秒，串行需要0.8秒以上
+        self.assertLess(elapsed, 0.8 + 0.5)
+
+    def test_unreachable_seed(self):
+        """测试种子页面无法访问时返回低置信度结果"""
+        result = URLAnalyzer().crawl_site(self.base + "/missing.html")
+        self.assertLess(result["confidence"], 0.5)
+        self.assertEqual(self.server.snapshot().get("openai_chat", 0), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tavily搜索缓存测试
+测试查询规范化、按选项区分的缓存键、过期和容量淘汰，以及只返回摘要的精简搜索
+"""
+
+import sys
+import os
+import time
+import unittest
+from unittest import mock
+
+# 添加项目根目录和基准测试目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from fake_provider_server import FakeProviderServer, FakeProviderConfig, LatencyModel
+from src.analyzers.tavily_analyzer import TavilyAnalyzer, normalize_query
+from src.config import config
+from src.utils.ttlCache import MISSING, TTLCache
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTavilyCache(unittest.TestCase):
+    """Tavily搜索缓存测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.server = FakeProviderServer(FakeProviderConfig(latency=LatencyModel.parse("fixed:0.2"))).start()
+        self.saved_base_url = config.tavily_base_url
+        config.tavily_base_url = self.server.url
+        self.clock = FakeClock()
+        with mock.patch.dict(os.environ, {"TAVILY_API_KEY": "tvly-fake-key"}):
+            self.analyzer = TavilyAnalyzer(cache=TTLCache("tavily", max_entries=16, ttl=60, clock=self.clock))
+
+    def tearDown(self):
+        """测试后清理"""
+        config.tavily_base_url = self.saved_base_url
+        self.server.stop()
+
+    def _searches(self) -> int:
+        return self.server.snapshot().get("tavily_search", 0)
+
+    def test_repeated_queries_hit_cache(self):
+        """测试只有空白、大小写和标点不同的查询命中同一个缓存条目"""
+        first = self.analyzer.search("Python GIL")
+        self.assertTrue(first["success"])
+
+        start = time.perf_counter()
+        for query in ("python gil", "  Python   GIL? ", "ＰＹＴＨＯＮ，ＧＩＬ"):
+            cached = self.analyzer.search(query)
+            self.assertTrue(cached["cached"])
+            self.assertEqual(cached["results"], first["results"])
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertEqual(self._searches(), 1)
+        self.assertEqual(self.analyzer.cache.hits, 3)
+
+        # 选项不同的搜索不共享结果
+        lean = self.analyzer.search("python gil", max_results=2, include_raw_content=False)
+        self.assertEqual(len(lean["results"]), 2)
+        self.assertFalse(lean["results"][0]["raw_content"])
+        self.assertEqual(self._searches(), 2)
+
+    def test_cached_results_are_not_shared(self):
+        """测试修改返回的结果不会影响缓存中的条目"""
+        first = self.analyzer.search("消息队列")
+        first["results"][0]["content"] = "被调用方修改"
+        cached = self.analyzer.search("消息队列")
+        cached["results"].clear()
+        again = self.analyzer.search("消息队列")
+        self.assertTrue(again["cached"])
+        self.assertEqual(len(again["results"]), 5)
+        self.assertNotEqual(again["results"][0]["content"], "被调用方修改")
+
+    def test_entries_expire(self):
+        """测试条目过期后重新请求"""
+        self.analyzer.search("分布式一致性")
+        self.clock.now += 61
+        self.assertNotIn("cached", self.analyzer.search("分布式一致性"))
+        self.assertEqual(self._searches(), 2)
+
+    def test_failures_are_not_cached(self):
+        """测试失败的搜索不会被缓存"""
+        self.server.stop()
+        self.assertFalse(self.analyzer.search("断网时的查询")["success"])
+        self.assertEqual(len(self.analyzer.cache), 0)
+
+    def test_lean_search_fetches_raw_content_lazily(self):
+        """测试默认只返回摘要，完整正文按结果单独获取并缓存"""
+        lean = self.analyzer.search("向量数据库")
+        self.assertTrue(all(item["raw_content"] is None for item in lean["results"]))
+        full = self.analyzer.search("向量数据库", include_raw_content=True)
+        self.assertGreater(len(full["results"][0]["raw_content"]), 1000)
+
+        first = lean["results"][0]
+        self.assertIn(first["url"], self.analyzer.raw_content(first))
+        self.assertEqual(self.analyzer.raw_content(first), first["raw_content"])
+        self.analyzer.extract([first["url"]])
+        self.assertEqual(self.server.snapshot()["tavily_extract"], 1)
+
+        # 其他调用方取到的缓存结果仍然只有摘要
+        self.assertIsNone(self.analyzer.search("向量数据库")["results"][0]["raw_content"])
+
+        # 未缓存的URL合并为一次调用
+        urls = [item["url"] for item in lean["results"]]
+        self.assertEqual(set(self.analyzer.extract(urls)), set(urls))
+        self.assertEqual(self.server.snapshot()["tavily_extract"], 2)
+
+    def test_cache_limits(self):
+        """测试容量淘汰和禁用缓存"""
+        cache = TTLCache("test", max_entries=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual(cache.get("a"), 1)
+
+        disabled = TTLCache("test", max_entries=0)
+        disabled.set("a", 1)
+        self.assertIs(disabled.get("a"), MISSING)
+        self.assertEqual(normalize_query("c# 入门"), "c# 入门")
+
+
+if __name__ == "__main__":
+    unittest.main()
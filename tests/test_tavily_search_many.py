@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tavily并发搜索测试
+测试多个查询并发执行、结果按输入顺序返回，以及分析节点对多个搜索请求的并发处理
+"""
+
+import sys
+import os
+import time
+import unittest
+from unittest import mock
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fake_provider_case import FakeProviderTestCase
+from src.analyzers import tavily_analyzer
+from src.analyzers.tavily_analyzer import TavilyAnalyzer
+from src.core.multimodalAgent import run_custom_analysis, create_analysis_request
+from src.graph.state import ContentType
+from src.utils.ttlCache import TTLCache
+
+
+class TestTavilySearchMany(FakeProviderTestCase):
+    """Tavily并发搜索测试类"""
+
+    provider_latency = "fixed:0.3"
+
+    def setUp(self):
+        """测试前准备"""
+        super().setUp()
+        self.patch_config(tavily_base_url=self.server.url)
+        with mock.patch.dict(os.environ, {"TAVILY_API_KEY": "tvly-fake-key"}):
+            self.analyzer = TavilyAnalyzer(cache=TTLCache("tavily", max_entries=64, ttl=60))
+        # 让分析节点使用指向模拟服务器的共享分析器
+        patcher = mock.patch.object(tavily_analyzer, "_tavily_analyzer", self.analyzer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_queries_run_concurrently_in_order(self):
+        """测试多个查询并发执行，结果与输入顺序一致，规范化后相同的查询只请求一次"""
+        queries = ["向量数据库", "Rust 所有权", "Python GIL", "python gil?", "分布式事务"]
+        start = time.perf_counter()
+        results = self.analyzer.search_many(queries)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(r["success"] for r in results))
+        self.assertEqual(results[1]["query"], "Rust 所有权")
+        self.assertIs(results[2], results[3])
+        self.assertEqual(self.server.snapshot()["tavily_search"], 4)
+        # 串行需要1.2秒以上
+        self.assertLess(elapsed, 0.8)
+
+    def test_analysis_node_batches_searches(self):
+        """测试分析节点并发执行批次中的多个搜索请求"""
+        requests = [create_analysis_request(f"search: 主题{i}", ContentType.TEXT) for i in range(4)]
+        start = time.perf_counter()
+        result = run_custom_analysis(requests)
+        elapsed = time.perf_counter() - start
+
+        analyzers = [r["metadata"]["analyzer"] for r in result["analysis_results"]]
+        self.assertEqual(analyzers, ["tavily"] * 4)
+        self.assertEqual([r["metadata"]["query"] for r in result["analysis_results"]], [f"主题{i}" for i in range(4)])
+        self.assertEqual(self.server.snapshot()["tavily_search"], 4)
+        # 并发搜索约0.3秒 + 一次总结约0.3秒，串行搜索需要1.2秒以上
+        self.assertLess(elapsed, 1.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+URL规范化测试
+测试跟踪参数、协议、末尾斜杠等不同形式的链接去重，短链接跳转的解析和缓存，
+以及论坛链接分析时重复的链接（包括正文相同的不同地址）不占用分析名额
+"""
+
+import sys
+import os
+import functools
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fake_provider_case import FakeProviderTestCase
+from src.analyzers import urlAnalyzer
+from src.analyzers.forumAnalyzer import ForumAnalyzer, ForumDataPreprocessor
+from src.config import config
+from src.utils import fetchScheduler, urlCanonical
+from src.utils.fetchScheduler import FetchScheduler
+from src.utils.ttlCache import TTLCache
+from src.utils.urlCanonical import RedirectResolver, canonical_url, unique_urls, url_key
+
+
+def html(title: str, body: str) -> str:
+    return f"<html><head><title>{title}</title></head><body><p>{body}</p></body></html>"
+
+
+SITE = {
+    "a.html": html("文章A", "第一篇文章的正文"),
+    "mirror.html": html("文章A", "第一篇文章的正文"),
+    "c.html": html("文章C", "第三篇文章的正文"),
+    "d.html": html("文章D", "第四篇文章的正文"),
+    "e.html": html("文章E", "第五篇文章的正文"),
+}
+
+
+class RedirectHandler(SimpleHTTPRequestHandler):
+    """/s/<名称> 重定向到 /<名称>.html，并记录收到的请求"""
+
+    requests = []
+
+    def _redirect(self) -> bool:
+        RedirectHandler.requests.append((self.command, self.path))
+        if not self.path.startswith("/s/"):
+            return False
+        self.send_response(301)
+        self.send_header("Location", f"/{self.path[3:]}.html")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return True
+
+    def do_GET(self):
+        if not self._redirect():
+            super().do_GET()
+
+    def do_HEAD(self):
+        if not self._redirect():
+            super().do_HEAD()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestCanonicalUrl(unittest.TestCase):
+    """URL规范化测试类"""
+
+    def test_tracking_params_and_fragments_are_removed(self):
+        """测试去掉跟踪参数和片段，保留其他查询参数的顺序"""
+        self.assertEqual(canonical_url("HTTPS://Example.com/post?id=7&utm_source=x&UTM_medium=y&fbclid=z#reply"),
+                         "https://example.com/post?id=7")
+        self.assertEqual(canonical_url("https://example.com/?b=2&a=1"), "https://example.com/?b=2&a=1")
+        self.assertEqual(canonical_url("https://example.com/a?utm_source=x"), "https://example.com/a")
+        self.assertIsNone(canonical_url("ftp://example.com/file"))
+
+    def test_url_key_merges_variants(self):
+        """测试协议、末尾斜杠和参数顺序不同的链接得到同一个键"""
+        variants = [
+            "http://example.com/docs/",
+            "https://EXAMPLE.com:443/docs",
+            "https://example.com/docs?utm_campaign=forum",
+            "https://example.com/docs#intro",
+        ]
+        self.assertEqual(len({url_key(v) for v in variants}), 1)
+        self.assertEqual(url_key("https://x.com/?b=2&a=1"), url_key("https://x.com/?a=1&b=2"))
+        self.assertNotEqual(url_key("https://x.com/?a=1"), url_key("https://x.com/?a=2"))
+
+    def test_unique_urls_keeps_order(self):
+        """测试去重后保持首次出现的顺序"""
+        urls = ["https://b.com/x?utm_source=1", "https://a.com/", "http://b.com/x/", "not a url", "not a url"]
+        self.assertEqual(unique_urls(urls), ["https://b.com/x", "https://a.com/", "not a url"])
+
+    def test_forum_preprocessor_dedupes_link_variants(self):
+        """测试论坛预处理把同一资源的不同写法合并为一个链接"""
+        forum_data = {
+            "topic_title": "测试主题",
+            "posts": [
+                {"username": "a", "content": {
+                    "text": "参考 https://example.com/guide?utm_source=forum，以及 https://example.com/wiki/Foo_(bar)。",
+                    "links": [{"href": "https://example.com/guide/"}],
+                }},
+                {"username": "b", "content": {"text": "同一篇 http://example.com/guide#top", "links": []}},
+            ],
+        }
+        processed = ForumDataPreprocessor().preprocess_forum_data(forum_data)
+        self.assertEqual(processed["content_summary"]["all_links"],
+                         ["https://example.com/guide/", "https://example.com/wiki/Foo_(bar)"])
+        self.assertEqual(processed["structured_content"][0]["links_count"], 2)
+
+
+class TestLinkDedupe(FakeProviderTestCase):
+    """抓取前后的链接去重测试类"""
+
+    provider_latency = "fixed:0.05"
+
+    def setUp(self):
+        """测试前准备"""
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for path, text in SITE.items():
+            with open(os.path.join(self.tmp.name, path), "w", encoding="utf-8") as f:
+                f.write(text)
+        RedirectHandler.requests = []
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(RedirectHandler, directory=self.tmp.name))
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+        self.resolver = RedirectResolver(hosts=["127.0.0.1"], cache=TTLCache("url_redirect", max_entries=64, ttl=60))
+        for module, name, value in ((fetchScheduler, "_scheduler", FetchScheduler(per_host=4, min_delay=0)),
+                                    (urlCanonical, "_resolver", self.resolver),
+                                    (urlAnalyzer, "page_cache", TTLCache("url_page", max_entries=64, ttl=60))):
+            patcher = mock.patch.object(module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """测试后清理"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _calls(self) -> int:
+        return self.server.snapshot().get("openai_chat", 0)
+
+    def test_short_links_are_resolved_once(self):
+        """测试短链接只发送一次HEAD请求解析，之后使用缓存"""
+        self.assertEqual(self.resolver.resolve(self.base + "/s/a?utm_source=x"), self.base + "/a.html")
+        self.assertEqual(self.resolver.resolve(self.base + "/s/a"), self.base + "/a.html")
+        self.assertEqual(RedirectHandler.requests, [("HEAD", "/s/a"), ("HEAD", "/a.html")])
+
+    def test_media_requests_skip_duplicate_links(self):
+        """测试论坛媒体请求中跟踪参数不同和短链接指向同一地址的链接不占用名额"""
+        processed = {
+            "topic_info": {"title": "测试主题"},
+            "content_summary": {
+                "all_links": [
+                    self.base + "/a.html?utm_source=forum",
+                    self.base + "/a.html",
+                    self.base + "/s/a",
+                    self.base + "/c.html",
+                    self.base + "/d.html",
+                    self.base + "/e.html",
+                ],
+                "all_images": [],
+            },
+        }
+        with mock.patch.object(config, "forum_link_budget", 3):
+            requests = ForumAnalyzer().create_media_analysis_requests(processed)
+        self.assertEqual([r["content"] for r in requests],
+                         [self.base + "/a.html", self.base + "/c.html", self.base + "/d.html"])
+
+    def test_duplicate_links_do_not_use_budget(self):
+        """测试重复的链接（短链接、跟踪参数、正文相同的镜像）不占用名额，只分析不同的网页"""
+        links = [
+            self.base + "/a.html",
+            self.base + "/s/a",
+            self.base + "/a.html?utm_source=forum",
+            self.base + "/mirror.html",
+            self.base + "/missing.html",
+            self.base + "/c.html",
+            self.base + "/d.html",
+            self.base + "/e.html",
+        ]
+        analyses, duplicates = ForumAnalyzer().analyze_links(links, budget=3)
+        self.assertEqual([a["url"] for a in analyses],
+                         [self.base + "/a.html", self.base + "/missing.html", self.base + "/c.html"])
+        self.assertEqual(duplicates, 3)
+        self.assertEqual(analyses[0]["aliases"], [self.base + "/mirror.html"])
+        self.assertLess(analyses[1]["analysis"]["confidence"], 0.5)
+        # 抓取失败的链接不调用模型
+        self.assertEqual(self._calls(), 2)
+
+        # 正文相同的网页再次分析时复用缓存的结果
+        again = urlAnalyzer.URLAnalyzer().analyze_url(self.base + "/mirror.html")
+        self.assertTrue(again["metadata"]["cached"])
+        self.assertEqual(self._calls(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
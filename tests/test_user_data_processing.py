@@ -12,12 +12,12 @@ import json
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from src.utils.forum_data_adapter import (
+from src.utils.forumDataAdapter import (
     ForumDataAdapter,
     convert_user_forum_data,
     load_forum_data_from_json
 )
-from src.analyzers.forum_analyzer import ForumAnalyzer
+from src.analyzers.forumAnalyzer import ForumAnalyzer
 
 
 def test_user_provided_data():